@@ -1,14 +1,27 @@
+import inspect
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Dict, Union
 from coordination_layer.state import AgentState
 from coordination_layer.layer import CoordinationLayer
+from coordination_layer.async_layer import AsyncCoordinationLayer
+
+# Set while an agent runs as one branch of a parallel fan-out (graph/workflow.py).
+# A branch only sees part of the step's changes, so its state is not persisted;
+# the join node writes the merged state once instead.
+in_fan_out: ContextVar[bool] = ContextVar("in_fan_out", default=False)
 
 class BaseAgent(ABC):
     '''
     Base class for all agents.
     Every agent MUST read from and write to the coordination layer.
+
+    Works with both CoordinationLayer and AsyncCoordinationLayer:
+    agents go through the async helpers below, which await the
+    coordination call when the layer is async.
     '''
 
-    def __init__(self, name: str, coord_layer: CoordinationLayer):
+    def __init__(self, name: str, coord_layer: Union[CoordinationLayer, AsyncCoordinationLayer]):
         self.name = name
         self.coord = coord_layer
 
@@ -24,9 +37,17 @@ class BaseAgent(ABC):
         '''
         pass
 
-    def log_reasoning(self, state: AgentState, reasoning: str):
+    async def coord_call(self, method: str, *args, **kwargs):
+        '''Call a coordination layer method, awaiting it if the layer is async'''
+        result = getattr(self.coord, method)(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def log_reasoning(self, state: AgentState, reasoning: str):
         '''Helper to log reasoning to coordination layer'''
-        self.coord.log_agent_reasoning(
+        await self.coord_call(
+            "log_agent_reasoning",
             portfolio_id=state["portfolio_id"],
             execution_id=state["execution_id"],
             agent_name=self.name,
@@ -35,4 +56,22 @@ class BaseAgent(ABC):
         )
 
         # Also add to state for in-memory tracking
-        state["agent_reasoning"].append(f"{self.name}: {reasoning}")
\ No newline at end of file
+        state["agent_reasoning"].append(f"{self.name}: {reasoning}")
+
+    async def log_decision(self, state: AgentState, decision_type: str, decision_data: Dict, reasoning: str):
+        '''Helper to log a decision to coordination layer'''
+        await self.coord_call(
+            "log_agent_decision",
+            portfolio_id=state["portfolio_id"],
+            execution_id=state["execution_id"],
+            agent_name=self.name,
+            decision_type=decision_type,
+            decision_data=decision_data,
+            reasoning=reasoning
+        )
+
+    async def write_state(self, state: AgentState):
+        '''Helper to write state to coordination layer (skipped inside a fan-out branch)'''
+        if in_fan_out.get():
+            return
+        await self.coord_call("write_state", state)
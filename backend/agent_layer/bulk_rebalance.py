@@ -0,0 +1,248 @@
+import asyncio
+import inspect
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Any, Union
+import numpy as np
+from coordination_layer.layer import CoordinationLayer
+from coordination_layer.async_layer import AsyncCoordinationLayer
+from coordination_layer.state import AgentState
+from agent_layer.defi_agent import allocation_optimizer, gas_costs_usd, proposal_from_plan
+from models.allocator import HOLD_REASONS
+from tools.defi_tools import get_all_opportunities
+from tools.opportunity_index import opportunity_index
+from tools.portfolio_snapshot import portfolio_states
+from tools.web3_tools import gas_oracle, execute_transaction, get_agent_address
+from tools.intent_batch import proposal_intent, risk_intent, sign_intent_batch, verify_intent_batch
+from tools.simulator import simulator
+from config.settings import settings
+
+class BulkRebalancer:
+    '''
+    Rebalance sweep over many portfolios in one pass.
+
+    Instead of one LangGraph workflow per portfolio, balances and positions
+    of every portfolio are stacked into a (portfolios x pools) matrix and the
+    DeFi Agent's allocation rule (AllocationOptimizer, with the Risk Agent's
+    threshold as its risk ceiling) runs once, vectorised, over all of them.
+    Only the portfolios that need action are signed (one EIP-712 Merkle
+    batch per agent) and executed.
+    '''
+
+    def __init__(self, coord_layer: Union[CoordinationLayer, AsyncCoordinationLayer] = None):
+        self.coord = coord_layer
+
+    async def _coord_call(self, method: str, *args, **kwargs):
+        if self.coord is None:
+            return None
+        result = getattr(self.coord, method)(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # ---------- evaluation ----------
+
+    def evaluate(self, portfolios: List[Dict], opportunities: List[Dict], gas_price_gwei: float = None) -> Dict[str, Any]:
+        '''
+        Decide every portfolio at once with the DeFi Agent's rule: one
+        AllocationOptimizer.solve() over all of them, with the same optimizer
+        settings (MIN_APY_DIFF, risk ceiling, move limit) and gas prices.
+        '''
+        pools, held, apy = allocation_optimizer.stack(opportunities, [p["positions"] for p in portfolios], asset="USDC")
+        idle = np.array([p["balances"].get("USDC", 0) for p in portfolios], dtype=float)
+        if not pools:
+            reason = np.where(idle > 0, HOLD_REASONS.index("no_better_allocation"), HOLD_REASONS.index("no_balance"))
+            return {"act": np.zeros(len(portfolios), dtype=bool), "reason": reason, "pools": pools, "solved": None}
+
+        arrays = allocation_optimizer.pool_arrays(pools, gas_costs_usd({p["protocol"] for p in pools}, gas_price_gwei))
+        arrays["apy"] = apy
+        solved = allocation_optimizer.solve(held=held, idle=idle, **arrays)
+        return {"act": solved["reason"] == -1, "reason": solved["reason"], "pools": pools, "solved": solved}
+
+    # ---------- sweep ----------
+
+    async def run(self, portfolios: List[Dict], execute: bool = True, dry_run: bool = None) -> Dict[str, Any]:
+        '''
+        Evaluate `portfolios` ({"wallet_address", optional "portfolio_id",
+        "balances", "positions"}) and sign + execute the ones that need action.
+        Portfolios without balances/positions are read on-chain in one
+        Multicall pass (demo portfolio for placeholder wallets).
+        '''
+        dry_run = settings.DRY_RUN if dry_run is None else dry_run
+        sweep_id = str(uuid.uuid4())
+        started = time.perf_counter()
+
+        # 1. Load missing portfolio state in bulk
+        missing = [p["wallet_address"] for p in portfolios if p.get("balances") is None or p.get("positions") is None]
+        states = await portfolio_states(missing) if missing else {}
+        portfolios = [
+            dict(p, balances=states[p["wallet_address"]][0], positions=states[p["wallet_address"]][1])
+            if p.get("balances") is None or p.get("positions") is None else p
+            for p in portfolios
+        ]
+        loaded_ms = (time.perf_counter() - started) * 1000
+
+        # 2. One vectorised evaluation over every portfolio (same pools as the DeFi Agent)
+        await opportunity_index.ensure_loaded()
+        await gas_oracle.ensure_fresh()
+        opportunities = get_all_opportunities(k=settings.ALLOCATION_MAX_POOLS, asset="USDC")
+        evaluated_at = time.perf_counter()
+        gas_price_gwei = gas_oracle.gas_price_gwei()
+        decision = await asyncio.to_thread(self.evaluate, portfolios, opportunities, gas_price_gwei)
+        evaluate_ms = (time.perf_counter() - evaluated_at) * 1000
+
+        actionable = np.flatnonzero(decision["act"])
+        skipped = {name: int((decision["reason"] == code).sum()) for code, name in enumerate(HOLD_REASONS)}
+        print(f"🧮 Bulk sweep {sweep_id[:8]}: {len(portfolios)} portfolios evaluated in {evaluate_ms:.1f} ms, {len(actionable)} need action")
+
+        actions = []
+        for i in actionable:
+            plan = allocation_optimizer.plan(decision["pools"], decision["solved"], i)
+            proposal = proposal_from_plan(plan, portfolios[i]["positions"])
+            risk_score = next(a["risk_score"] for a in plan["allocation"] if a["protocol"] == proposal["destination"])
+            actions.append({
+                "execution_id": str(uuid.uuid4()),
+                "portfolio_id": portfolios[i].get("portfolio_id"),
+                "wallet_address": portfolios[i]["wallet_address"],
+                "proposal": proposal,
+                "risk_assessment": {
+                    "protocol": proposal["destination"],
+                    "risk_score": float(risk_score),
+                    "safe": True
+                }
+            })
+
+        # 3. Sign and execute only the portfolios that need action
+        if actions and execute:
+            await self._open_executions(sweep_id, actions, portfolios, actionable)
+            await self._sign(actions)
+            await self._execute(actions, dry_run)
+            await self._record(sweep_id, actions)
+
+        return {
+            "sweep_id": sweep_id,
+            "portfolios": len(portfolios),
+            "actionable": len(actions),
+            "skipped": skipped,
+            "executed": execute,
+            "dry_run": dry_run,
+            "timings_ms": {
+                "load": round(loaded_ms, 2),
+                "evaluate": round(evaluate_ms, 2),
+                "total": round((time.perf_counter() - started) * 1000, 2)
+            },
+            "actions": actions
+        }
+
+    async def _open_executions(self, sweep_id: str, actions: List[Dict], portfolios: List[Dict], rows: np.ndarray):
+        '''An agent_executions row per acted-on portfolio known to the coordination layer'''
+        for action, i in zip(actions, rows):
+            if not action.get("portfolio_id"):
+                continue
+            now = datetime.utcnow().isoformat()
+            state: AgentState = {
+                "portfolio_id": action["portfolio_id"],
+                "execution_id": action["execution_id"],
+                "user_input": f"Bulk rebalance sweep {sweep_id}",
+                "wallet_address": action["wallet_address"],
+                "chain_id": 1,
+                "balances": portfolios[i]["balances"],
+                "positions": portfolios[i]["positions"],
+                "orchestrator_decision": None,
+                "defi_proposal": None,
+                "risk_assessment": None,
+                "prediction_forecast": None,
+                "productivity_actions": None,
+                "qa_results": None,
+                "executed_transactions": [],
+                "pending_transactions": [],
+                "agent_reasoning": [],
+                "next_agent": "END",
+                "iteration_count": 0,
+                "error_messages": [],
+                "created_at": now,
+                "updated_at": now
+            }
+            execution_id = await self._coord_call("init_execution", action["portfolio_id"], state)
+            if execution_id and execution_id != "mock_execution_id":
+                action["execution_id"] = state["execution_id"] = execution_id
+            action["state"] = state
+
+    async def _sign(self, actions: List[Dict]):
+        '''One Merkle-batch signature per agent covering every action, then one verification pass'''
+        proposals = [proposal_intent(a["execution_id"], a["proposal"]) for a in actions]
+        risks = [risk_intent(a["execution_id"], a["risk_assessment"]) for a in actions]
+
+        defi_batch, risk_batch = await asyncio.gather(
+            asyncio.to_thread(sign_intent_batch, "defi_agent", proposals),
+            asyncio.to_thread(sign_intent_batch, "risk_agent", risks)
+        )
+        if "error" in defi_batch or "error" in risk_batch:
+            error = defi_batch.get("error") or risk_batch.get("error")
+            print(f"❌ Bulk signing failed: {error}")
+            for action in actions:
+                action["status"] = "unsigned"
+                action["error"] = error
+            return
+
+        defi_ok = verify_intent_batch(defi_batch, get_agent_address("defi_agent"))
+        risk_ok = verify_intent_batch(risk_batch, get_agent_address("risk_agent"))
+        for action, defi_item, risk_item, ok in zip(actions, defi_batch["items"], risk_batch["items"], np.logical_and(defi_ok, risk_ok)):
+            action["status"] = "approved" if ok else "unsigned"
+            action["proposal"]["batch"] = {key: defi_batch[key] for key in ("root", "count", "signature")} | {"item": defi_item}
+            action["risk_assessment"]["batch"] = {key: risk_batch[key] for key in ("root", "count", "signature")} | {"item": risk_item}
+
+    async def _execute(self, actions: List[Dict], dry_run: bool):
+        approved = [a for a in actions if a.get("status") == "approved"]
+
+        if dry_run:
+            # Same transactions against the simulation node, all at once
+            results = await asyncio.gather(*(
+                simulator.simulate_trade(a["proposal"]["destination"], "migrate", a["proposal"]["amount"], "USDC")
+                for a in approved
+            ))
+        else:
+            # Nonces are allocated locally, so submissions don't wait on each other's receipts
+            results = await asyncio.gather(*(
+                asyncio.to_thread(
+                    execute_transaction,
+                    protocol=a["proposal"]["destination"],
+                    action="migrate",
+                    amount=a["proposal"]["amount"],
+                    token="USDC",
+                    wait=False
+                )
+                for a in approved
+            ))
+
+        for action, result in zip(approved, results):
+            action["result"] = result
+            action["status"] = result.get("status", "failed")
+
+    async def _record(self, sweep_id: str, actions: List[Dict]):
+        '''Final state + decision log for each execution opened by _open_executions'''
+        for action in actions:
+            state = action.pop("state", None)
+            if state is None:
+                continue
+            reasoning = f"Bulk sweep {sweep_id}: {action['proposal']['apy_gain']:.2%} APY gain moving to {action['proposal']['destination']}"
+            state["defi_proposal"] = action["proposal"]
+            state["risk_assessment"] = action["risk_assessment"]
+            state["agent_reasoning"].append(f"Bulk_Rebalancer: {reasoning}")
+            if action.get("result"):
+                state["executed_transactions"].append(action["result"])
+            if action.get("error"):
+                state["error_messages"].append(action["error"])
+
+            await self._coord_call(
+                "log_agent_decision",
+                portfolio_id=action["portfolio_id"],
+                execution_id=action["execution_id"],
+                agent_name="Bulk_Rebalancer",
+                decision_type="bulk_rebalance",
+                decision_data={"sweep_id": sweep_id, **action},
+                reasoning=reasoning
+            )
+            failed = action["status"] in ("failed", "reverted", "unsigned")
+            await self._coord_call("write_state", state, snapshot=True, status="failed" if failed else "completed")
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import re
+from typing import Dict, Any, Optional
+from config.settings import settings
+from coordination_layer.cache import TieredCache
+from coordination_layer.state import AgentState
+
+# Fields that differ between otherwise identical outputs (signatures etc.)
+VOLATILE_FIELDS = {"signature", "intent", "signed_by"}
+
+class DecisionCache:
+    '''
+    Content-addressed cache of Orchestrator routing decisions.
+
+    The key is a hash of the normalised prompt inputs and the model name:
+    user request, balances, positions, agent outputs and the last five
+    reasoning lines. Two executions in the same situation share one LLM call.
+    '''
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600, redis_url: str = None):
+        self.cache = TieredCache("decision", max_size=max_size, ttl=ttl, redis_url=redis_url)
+
+    @staticmethod
+    def _normalise_text(text: str) -> str:
+        return re.sub(r"\s+", " ", (text or "").strip().lower()).rstrip(".!?")
+
+    @staticmethod
+    def _strip_volatile(output: Optional[Dict]) -> Optional[Dict]:
+        if not isinstance(output, dict):
+            return output
+        return {k: v for k, v in output.items() if k not in VOLATILE_FIELDS}
+
+    def key_for(self, state: AgentState, model_name: str) -> str:
+        '''
+        Hash of everything the prompt depends on.
+        Orchestrator lines are left out of the reasoning window: they are
+        free-text LLM output and would make every key unique.
+        '''
+        reasoning = [
+            line for line in state["agent_reasoning"]
+            if not line.startswith("Orchestrator:")
+        ][-5:]
+
+        inputs = {
+            "model": model_name,
+            "risk_threshold": settings.RISK_THRESHOLD,
+            "user_input": self._normalise_text(state["user_input"]),
+            "balances": state["balances"],
+            "positions": state["positions"],
+            "defi_proposal": self._strip_volatile(state.get("defi_proposal")),
+            "risk_assessment": self._strip_volatile(state.get("risk_assessment")),
+            "prediction_forecast": state.get("prediction_forecast"),
+            "reasoning": reasoning
+        }
+        blob = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return await self.cache.get(key)
+
+    async def set(self, key: str, decision: Dict):
+        await self.cache.set(key, decision)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+
+# Shared by every Orchestrator in this process
+decision_cache = DecisionCache(
+    max_size=settings.DECISION_CACHE_SIZE,
+    ttl=settings.DECISION_CACHE_TTL,
+    redis_url=settings.REDIS_URL
+)
@@ -1,15 +1,71 @@
 from agent_layer.base import BaseAgent
 from coordination_layer.state import AgentState
 from tools.defi_tools import get_protocol_apy, get_all_opportunities
-from tools.web3_tools import sign_intent
+from tools.opportunity_index import opportunity_index
+from tools.web3_tools import sign_intent, gas_oracle
 from config.settings import settings
-
+from models.allocator import AllocationOptimizer
+
+# Largest migration proposed per execution (USDC) while strategies are being validated
+MAX_TEST_AMOUNT = 100
+
+allocation_optimizer = AllocationOptimizer(
+    horizon_days=settings.GAS_PAYBACK_DAYS,
+    slippage=settings.ALLOCATION_SLIPPAGE,
+    max_protocol_share=settings.ALLOCATION_MAX_PROTOCOL_SHARE,
+    risk_ceiling=settings.RISK_THRESHOLD,
+    max_move=MAX_TEST_AMOUNT,
+    min_apy_gain=settings.MIN_APY_DIFF
+)
+
+def gas_costs_usd(protocols, gas_price_gwei):
+    '''One deposit or withdraw per protocol (lower-case), priced at the oracle's current fees; None if unpriced'''
+    if gas_price_gwei is None:
+        return None
+    return {
+        p.lower(): gas_oracle.gas_limit(p.lower()) * gas_price_gwei * 1e-9 * settings.ETH_PRICE_USD
+        for p in protocols
+    }
+
+def proposal_from_plan(plan, positions):
+    '''
+    DeFi proposal for an allocation plan: "hold", or the plan's largest leg as
+    the migration the Risk Agent and executor act on (full plan under "plan").
+    Shared by the DeFi Agent and the BulkRebalancer.
+    '''
+    if not plan["legs"]:
+        return {
+            "action": "hold",
+            "gas_cost_usd": plan["gas_cost_usd"],
+            "plan": plan,
+            "reasoning": plan["reasoning"] or f"Current allocation is already optimal ({plan['current_apy']:.2%} APY)."
+        }
+
+    leg = max(plan["legs"], key=lambda l: l["amount"])
+    current_apy = positions.get(leg["source"], {}).get("apy", 0) if leg["source"] != "wallet" else 0
+    new_apy = next(a["apy"] for a in plan["allocation"] if a["protocol"] == leg["destination"])
+
+    gas_note = f", est. gas ${plan['gas_cost_usd']:.4f}" if plan["gas_cost_usd"] is not None else ""
+    split = ", ".join(f"{a['protocol']} {a['amount']:.2f}" for a in plan["allocation"])
+    return {
+        "action": "migrate",
+        "source": leg["source"],
+        "destination": leg["destination"],
+        "asset": "USDC",
+        "amount": leg["amount"],
+        "current_apy": current_apy,
+        "new_apy": new_apy,
+        "apy_gain": new_apy - current_apy,
+        "gas_cost_usd": plan["gas_cost_usd"],
+        "plan": plan,
+        "reasoning": f"Allocation {split} USDC raises APY {plan['current_apy']:.2%} -> {plan['expected_apy']:.2%} in {len(plan['legs'])} leg(s); largest: {leg['amount']:.2f} USDC {leg['source']} -> {leg['destination']}{gas_note}"
+    }
 
 
 class DeFiAgent(BaseAgent):
     '''
     DeFi Strategy Agent - finds yield opportunities.
-    Reads current positions, proposes migrations.
+    Reads current positions, proposes a rebalance plan across pools.
     '''
 
     def __init__(self, coord_layer):
@@ -22,14 +78,19 @@ class DeFiAgent(BaseAgent):
         current_positions = state["positions"]
         current_balances = state["balances"]
 
-        # Get available opportunities
-        opportunities = get_all_opportunities()
+        # Get available opportunities (in-memory index, refreshed in the background)
+        await opportunity_index.ensure_loaded()
+        opportunities = get_all_opportunities(k=settings.ALLOCATION_MAX_POOLS, asset="USDC")
+
+        # Cached fees; refreshed here only if the background poller is not running
+        await gas_oracle.ensure_fresh()
 
         # Analyze and propose
         proposal = self._analyze_opportunities(
             current_positions,
             current_balances,
-            opportunities
+            opportunities,
+            gas_oracle.gas_price_gwei()
         )
 
         reasoning = proposal.get('reasoning', '')
@@ -49,11 +110,9 @@ class DeFiAgent(BaseAgent):
             print(f"❌ Failed to sign proposal: {signature_result['error']}")
 
         # Log to coordination layer
-        self.log_reasoning(state, reasoning)
-        self.coord.log_agent_decision(
-            portfolio_id=state["portfolio_id"],
-            execution_id=state["execution_id"],
-            agent_name=self.name,
+        await self.log_reasoning(state, reasoning)
+        await self.log_decision(
+            state,
             decision_type="strategy",
             decision_data=proposal,
             reasoning=reasoning
@@ -64,46 +123,29 @@ class DeFiAgent(BaseAgent):
         state["next_agent"] = "orchestrator"
 
         # Write to coordination layer
-        self.coord.write_state(state)
+        await self.write_state(state)
 
         return state
 
-    def _analyze_opportunities(self, positions, balances, opportunities):
-        '''Core logic to find best opportunity'''
-
-        # Get current APY (if in a protocol)
-        current_apy = 0
-        current_protocol = None
-
-        for protocol, position_data in positions.items():
-            if "apy" in position_data:
-                current_apy = position_data["apy"]
-                current_protocol = protocol
-                break
-
-        # Find best opportunity
-        best = max(opportunities, key=lambda x: x['apy'])
-
-        # Check if move is worth it
-        apy_diff = best['apy'] - current_apy
-
-        if apy_diff > settings.MIN_APY_DIFF:
-            
-            test_amount = min(balances.get("USDC", 0), 100)  
-            
-            return {
-                "action": "migrate",
-                "source": current_protocol or "wallet",
-                "destination": best['protocol'],
-                "asset": "USDC",
-                "amount": test_amount,
-                "current_apy": current_apy,
-                "new_apy": best['apy'],
-                "apy_gain": apy_diff,
-                "reasoning": f"Found {apy_diff:.2%} APY gain by moving to {best['protocol']} (test amount: {test_amount} USDC)"
-            }
-        else:
+    def _analyze_opportunities(self, positions, balances, opportunities, gas_price_gwei=None):
+        '''
+        Optimal USDC allocation across the indexed pools (see AllocationOptimizer,
+        which also applies MIN_APY_DIFF and the gas check).
+        The largest leg of the plan is the proposal the Risk Agent and executor act
+        on; the full plan is attached under "plan".
+        '''
+        if not opportunities:
             return {
                 "action": "hold",
-                "reasoning": f"Best APY is {best['apy']:.2%}, only {apy_diff:.2%} gain. Not worth gas costs."
-            }
\ No newline at end of file
+                "reasoning": "No indexed opportunities for this asset."
+            }
+
+        protocols = {opp["protocol"] for opp in opportunities} | set(positions)
+        plan = allocation_optimizer.optimize(
+            opportunities,
+            positions,
+            idle=balances.get("USDC", 0),
+            asset="USDC",
+            gas_cost_usd=gas_costs_usd(protocols, gas_price_gwei)
+        )
+        return proposal_from_plan(plan, positions)
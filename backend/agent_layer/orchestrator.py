@@ -1,8 +1,12 @@
 import json
+import asyncio
 import google.generativeai as genai
 from agent_layer.base import BaseAgent
+from agent_layer.decision_cache import DecisionCache, decision_cache
+from agent_layer.routing import RoutingPolicy, get_routing_policy, routing_stats, fan_out
 from coordination_layer.state import AgentState
 from tools.web3_tools import execute_transaction, can_execute_trade, collect_signatures
+from tools.simulator import simulator
 from config.settings import settings
 
 genai.configure(api_key=settings.GOOGLE_API_KEY)
@@ -13,21 +17,26 @@ class OrchestratorAgent(BaseAgent):
     The "Portfolio Manager" - decides which agent to call next.
     '''
 
-    def __init__(self, coord_layer):
+    def __init__(
+        self,
+        coord_layer,
+        cache: DecisionCache = None,
+        routing_policy: RoutingPolicy = None,
+        parallel: bool = False
+    ):
         super().__init__("Orchestrator", coord_layer)
+        self.decision_cache = cache or decision_cache
+        self.routing_policy = routing_policy or get_routing_policy()
+        # Parallel graph mode: dispatch independent agents in the same step
+        self.parallel = parallel
 
     async def execute(self, state: AgentState) -> AgentState:
         print(f"\n{'='*60}")
         print(f"ORCHESTRATOR - Iteration {state['iteration_count']}")
         print(f"{'='*60}")
 
-        # Build context for Gemini
-        prompt = self._build_prompt(state)
-
         try:
-            response = model.generate_content(prompt)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            decision = json.loads(text)
+            decision = await self._decide(state)
 
             reasoning = decision.get('reasoning', 'No reasoning provided')
             next_agent = decision.get('next_agent', 'END')
@@ -35,7 +44,7 @@ class OrchestratorAgent(BaseAgent):
             # Handle trade execution
             if next_agent == "EXECUTE_TRADE":
                 print("🔄 Executing trade...")
-                execution_result = self._execute_trade(state)
+                execution_result = await self._execute_trade(state)
                 state["executed_transactions"].append(execution_result)
                 next_agent = "END"  # End after execution
 
@@ -43,11 +52,9 @@ class OrchestratorAgent(BaseAgent):
             print(f"Reasoning: {reasoning}")
 
             # Log to coordination layer
-            self.log_reasoning(state, reasoning)
-            self.coord.log_agent_decision(
-                portfolio_id=state["portfolio_id"],
-                execution_id=state["execution_id"],
-                agent_name=self.name,
+            await self.log_reasoning(state, reasoning)
+            await self.log_decision(
+                state,
                 decision_type="routing",
                 decision_data=decision,
                 reasoning=reasoning
@@ -58,8 +65,14 @@ class OrchestratorAgent(BaseAgent):
             state["next_agent"] = next_agent
             state["iteration_count"] += 1
 
+            if self.parallel:
+                agents = fan_out(state, next_agent)
+                state["parallel_agents"] = agents if len(agents) > 1 else []
+                if len(agents) > 1:
+                    print(f"Fan-out: {', '.join(agents)}")
+
             # Write back to coordination layer
-            self.coord.write_state(state)
+            await self.write_state(state)
 
             return state
 
@@ -67,18 +80,55 @@ class OrchestratorAgent(BaseAgent):
             print(f"Orchestrator Error: {e}")
             state["error_messages"].append(str(e))
             state["next_agent"] = "END"
+            if self.parallel:
+                state["parallel_agents"] = []
             return state
 
-    def _execute_trade(self, state: AgentState):
+    async def _decide(self, state: AgentState) -> dict:
+        '''
+        Pick the next step. In order:
+        1. Routing policy (deterministic rules, no LLM)
+        2. Decision cache (identical inputs seen before)
+        3. Gemini
+        '''
+        decision = self.routing_policy.route(state)
+        if decision is not None:
+            return self._tag(decision, "rules")
+
+        cache_key = self.decision_cache.key_for(state, settings.ORCHESTRATOR_MODEL)
+        cached = await self.decision_cache.get(cache_key)
+        if cached is not None:
+            return self._tag(dict(cached), "cache")
+
+        # Build context for Gemini
+        prompt = self._build_prompt(state)
+
+        # generate_content is blocking - keep it off the event loop
+        response = await asyncio.to_thread(model.generate_content, prompt)
+        text = response.text.replace('```json', '').replace('```', '').strip()
+        decision = json.loads(text)
+
+        await self.decision_cache.set(cache_key, decision)
+        return self._tag(dict(decision), "llm")
+
+    @staticmethod
+    def _tag(decision: dict, source: str) -> dict:
+        '''Record which path made the decision'''
+        routing_stats.record(source)
+        decision["source"] = source
+        print(f"⚡ Decision source: {source}")
+        return decision
+
+    async def _execute_trade(self, state: AgentState):
         """Execute the approved DeFi trade with signature verification"""
         proposal = state.get("defi_proposal", {})
 
         if not proposal:
             return {"status": "failed", "error": "No proposal to execute"}
 
-        # Verify we have required signatures
-        if not can_execute_trade(state):
-            collected_sigs = collect_signatures(state)
+        # Verify we have required signatures (one verification pass)
+        collected_sigs = collect_signatures(state)
+        if not can_execute_trade(state, collected_sigs):
             return {
                 "status": "failed",
                 "error": f"Insufficient signatures for execution. Required: defi_agent, risk_agent. Collected: {collected_sigs}"
@@ -92,22 +142,27 @@ class OrchestratorAgent(BaseAgent):
         amount = proposal.get("amount", 0.0001)  # Default small amount for testing
         token = proposal.get("asset", "ETH")
 
-        # Execute the transaction
-        result = execute_transaction(
-            protocol=protocol,
-            action=action,
-            amount=amount,
-            token=token
-        )
+        if settings.DRY_RUN:
+            # Same transaction against the simulation node - nothing is signed or broadcast
+            result = await simulator.simulate_trade(protocol, action, amount, token)
+        else:
+            # Broadcast without waiting for the receipt (tracked by tx_pipeline);
+            # signing/sending is blocking RPC work, so keep it off the event loop
+            result = await asyncio.to_thread(
+                execute_transaction,
+                protocol=protocol,
+                action=action,
+                amount=amount,
+                token=token,
+                wait=False
+            )
 
         # Log the execution
-        self.coord.log_agent_decision(
-            portfolio_id=state["portfolio_id"],
-            execution_id=state["execution_id"],
-            agent_name=self.name,
+        await self.log_decision(
+            state,
             decision_type="execution",
             decision_data=result,
-            reasoning=f"Executed {action} on {protocol} for {amount} {token} with multi-sig approval"
+            reasoning=f"{'Simulated' if settings.DRY_RUN else 'Executed'} {action} on {protocol} for {amount} {token} with multi-sig approval"
         )
 
         return result
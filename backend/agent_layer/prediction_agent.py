@@ -1,10 +1,16 @@
 from agent_layer.base import BaseAgent
 from coordination_layer.state import AgentState
+from config.settings import settings
+from models.apy_forecaster import get_apy_forecaster
+from tools.defi_tools import get_all_opportunities
+from tools.opportunity_index import opportunity_index
 
 class PredictionAgent(BaseAgent):
     '''
     Market Prediction Agent - forecasts APY stability.
-    (Mock for now, would use LSTM/time-series later)
+    Reads the shared APY forecaster (EWMA / AR(1) / volatility fitted
+    incrementally on every opportunity index refresh), so a forecast is a
+    lookup of cached parameters rather than a model fit.
     '''
 
     def __init__(self, coord_layer):
@@ -13,22 +19,55 @@ class PredictionAgent(BaseAgent):
     async def execute(self, state: AgentState) -> AgentState:
         print(f"\nPREDICTION AGENT - Forecasting...")
 
-        # Mock forecast (replace with real model later)
-        forecast = {
-            "trend": "stable",
-            "volatility": "low",
-            "confidence": 0.85,
-            "outlook_7d": "APY expected to remain within 0.5% of current"
-        }
+        await opportunity_index.ensure_loaded()
+
+        # Protocols the portfolio holds plus the candidate destinations
+        # (runs alongside the DeFi Agent, so the proposal may not exist yet)
+        protocols = list(dict.fromkeys(
+            [p for p in state["positions"]] +
+            [o["protocol"] for o in get_all_opportunities(asset="USDC")]
+        ))
+        horizon = settings.FORECAST_HORIZON_DAYS
+        forecast = self._overall(get_apy_forecaster().forecast_many(protocols, horizon), horizon)
 
         reasoning = f"Market outlook: {forecast['trend']}, volatility {forecast['volatility']}"
         print(f"Forecast: {reasoning}")
 
-        self.log_reasoning(state, reasoning)
+        await self.log_reasoning(state, reasoning)
 
         state["prediction_forecast"] = forecast
         state["next_agent"] = "orchestrator"
 
-        self.coord.write_state(state)
+        await self.write_state(state)
+
+        return state
 
-        return state
\ No newline at end of file
+    @staticmethod
+    def _overall(forecasts, horizon_days):
+        '''Market-level summary (the worst protocol sets trend and volatility) plus per-protocol detail'''
+        if not forecasts:
+            return {
+                "trend": "unknown",
+                "volatility": "unknown",
+                "confidence": 0.0,
+                "outlook_7d": "No APY history yet - forecast available after the next index refreshes",
+                "protocols": {}
+            }
+
+        levels = ["low", "medium", "high"]
+        volatility = max((f["volatility"] for f in forecasts.values()), key=levels.index)
+        trends = {f["trend"] for f in forecasts.values()}
+        trend = "down" if "down" in trends else "up" if "up" in trends else "stable"
+        confidence = min(f["confidence"] for f in forecasts.values())
+
+        moves = [
+            f"{p} {f['current_apy']:.2%} -> {f['forecast_apy']:.2%} (±{f['band']:.2%})"
+            for p, f in forecasts.items()
+        ]
+        return {
+            "trend": trend,
+            "volatility": volatility,
+            "confidence": confidence,
+            "outlook_7d": f"{horizon_days:g}-day APY outlook: " + ", ".join(moves),
+            "protocols": forecasts
+        }
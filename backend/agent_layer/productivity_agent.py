@@ -33,11 +33,11 @@ class ProductivityAgent(BaseAgent):
 
         print(f"Actions: {len(actions)} notifications sent")
 
-        self.log_reasoning(state, f"Sent {len(actions)} notifications")
+        await self.log_reasoning(state, f"Sent {len(actions)} notifications")
 
         state["productivity_actions"] = actions
         state["next_agent"] = "orchestrator"
 
-        self.coord.write_state(state)
+        await self.write_state(state)
 
         return state
\ No newline at end of file
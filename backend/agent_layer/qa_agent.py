@@ -24,7 +24,7 @@ class QAAgent(BaseAgent):
         print(f"Validation: {'PASSED ' if all_passed else 'FAILED ❌'}")
         print(f"Checks: {checks}")
 
-        self.log_reasoning(
+        await self.log_reasoning(
             state,
             f"QA validation {'passed' if all_passed else 'failed'}"
         )
@@ -32,6 +32,6 @@ class QAAgent(BaseAgent):
         state["qa_results"] = checks
         state["next_agent"] = "END"
 
-        self.coord.write_state(state)
+        await self.write_state(state)
 
         return state
\ No newline at end of file
@@ -1,7 +1,9 @@
 from agent_layer.base import BaseAgent
 from coordination_layer.state import AgentState
-from models.risk_ebm import RiskModel
+from models.risk_ebm import get_risk_model
+from agent_layer.risk_cache import risk_cache
 from tools.web3_tools import sign_intent
+from tools.defi_tools import get_all_opportunities
 from config.settings import settings
 
 class RiskAgent(BaseAgent):
@@ -11,7 +13,7 @@ class RiskAgent(BaseAgent):
 
     def __init__(self, coord_layer):
         super().__init__("Risk_Agent", coord_layer)
-        self.risk_model = RiskModel()
+        self.risk_model = get_risk_model()
 
     async def execute(self, state: AgentState) -> AgentState:
         print(f"\n RISK AGENT - Assessing safety...")
@@ -27,18 +29,22 @@ class RiskAgent(BaseAgent):
         # Extract protocol to assess
         protocol = proposal.get("destination", "Unknown")
 
-        # Run EBM risk model
-        risk_score, risk_factors = self.risk_model.assess_protocol(protocol)
+        # Same protocol, features and model -> reuse the signed assessment
+        assessment = await risk_cache.get(self.risk_model, protocol)
+        if assessment is None:
+            assessment = self._assess(protocol)
+            await risk_cache.set(self.risk_model, protocol, assessment)
+        else:
+            print(f"♻️ Reusing cached risk assessment for {protocol}")
 
-        is_safe = risk_score < settings.RISK_THRESHOLD
+        risk_score = assessment["risk_score"]
+        risk_factors = assessment["factors"]
+        is_safe = assessment["safe"]
 
-        assessment = {
-            "protocol": protocol,
-            "risk_score": risk_score,
-            "safe": is_safe,
-            "factors": risk_factors,
-            "threshold": settings.RISK_THRESHOLD
-        }
+        # Rank every other candidate pool in one batch pass; keep the safest few
+        candidates = list(dict.fromkeys(opp["protocol"] for opp in get_all_opportunities() if opp["protocol"] != protocol))
+        assessment = dict(assessment)
+        assessment["safe_alternatives"] = self.risk_model.rank_protocols(candidates, threshold=settings.RISK_THRESHOLD)[:3]
 
         reasoning = f"Risk Score: {risk_score:.1f}/10. "
         reasoning += "SAFE " if is_safe else "TOO RISKY "
@@ -46,21 +52,10 @@ class RiskAgent(BaseAgent):
         print(f"Assessment: {reasoning}")
         print(f"Factors: {risk_factors}")
 
-        # Sign the risk assessment
-        intent_data = f"Risk Assessment: {protocol} scored {risk_score:.1f}/10. {'APPROVED' if is_safe else 'REJECTED'}. Factors: {', '.join(risk_factors)}"
-        signature_result = sign_intent("risk_agent", intent_data)
-
-        if "error" not in signature_result:
-            assessment["signature"] = signature_result["signature"]
-            assessment["intent"] = intent_data
-            assessment["signed_by"] = signature_result["signer_address"]
-            print(f"✅ Risk assessment signed by Risk Agent: {signature_result['signer_address'][:10]}...")
-        else:
-            print(f"❌ Failed to sign risk assessment: {signature_result['error']}")
-
         # Log to coordination layer
-        self.log_reasoning(state, reasoning)
-        self.coord.record_risk_assessment(
+        await self.log_reasoning(state, reasoning)
+        await self.coord_call(
+            "record_risk_assessment",
             portfolio_id=state["portfolio_id"],
             execution_id=state["execution_id"],
             protocol=protocol,
@@ -74,6 +69,34 @@ class RiskAgent(BaseAgent):
         state["next_agent"] = "orchestrator"
 
         # Write to coordination layer
-        self.coord.write_state(state)
+        await self.write_state(state)
+
+        return state
+
+    def _assess(self, protocol: str) -> dict:
+        '''Score a protocol with the EBM and sign the result'''
+        risk_score, risk_factors = self.risk_model.assess_protocol(protocol)
+
+        is_safe = risk_score < settings.RISK_THRESHOLD
+
+        assessment = {
+            "protocol": protocol,
+            "risk_score": risk_score,
+            "safe": is_safe,
+            "factors": risk_factors,
+            "threshold": settings.RISK_THRESHOLD
+        }
+
+        # Sign the risk assessment
+        intent_data = f"Risk Assessment: {protocol} scored {risk_score:.1f}/10. {'APPROVED' if is_safe else 'REJECTED'}. Factors: {', '.join(risk_factors)}"
+        signature_result = sign_intent("risk_agent", intent_data)
+
+        if "error" not in signature_result:
+            assessment["signature"] = signature_result["signature"]
+            assessment["intent"] = intent_data
+            assessment["signed_by"] = signature_result["signer_address"]
+            print(f"✅ Risk assessment signed by Risk Agent: {signature_result['signer_address'][:10]}...")
+        else:
+            print(f"❌ Failed to sign risk assessment: {signature_result['error']}")
 
-        return state
\ No newline at end of file
+        return assessment
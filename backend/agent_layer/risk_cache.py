@@ -0,0 +1,45 @@
+import hashlib
+import json
+from typing import Dict, Any, Optional
+from config.settings import settings
+from coordination_layer.cache import TieredCache
+
+class RiskAssessmentCache:
+    '''
+    Shared cache of signed risk assessments.
+
+    The key covers everything the assessment depends on: the protocol, a
+    hash of its current feature vector, the model version and the risk
+    threshold. Changing a protocol's features or loading a new model
+    therefore misses automatically; invalidate() drops an entry explicitly.
+    '''
+
+    def __init__(self, max_size: int = 256, ttl: float = 300, redis_url: str = None):
+        self.cache = TieredCache("risk", max_size=max_size, ttl=ttl, redis_url=redis_url)
+
+    def key_for(self, risk_model, protocol: str) -> str:
+        features = risk_model.features_for(protocol)
+        feature_hash = hashlib.sha256(
+            json.dumps(features, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        return f"{risk_model.version}:{settings.RISK_THRESHOLD}:{protocol}:{feature_hash}"
+
+    async def get(self, risk_model, protocol: str) -> Optional[Dict]:
+        return await self.cache.get(self.key_for(risk_model, protocol))
+
+    async def set(self, risk_model, protocol: str, assessment: Dict):
+        await self.cache.set(self.key_for(risk_model, protocol), assessment)
+
+    async def invalidate(self, risk_model, protocol: str):
+        '''Drop the cached assessment for the protocol's current features'''
+        await self.cache.delete(self.key_for(risk_model, protocol))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+
+# Shared by every Risk Agent in this process
+risk_cache = RiskAssessmentCache(
+    max_size=settings.RISK_CACHE_SIZE,
+    ttl=settings.RISK_CACHE_TTL,
+    redis_url=settings.REDIS_URL
+)
@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List
+from coordination_layer.state import AgentState
+from tools.web3_tools import can_execute_trade
+from config.settings import settings
+
+class RoutingPolicy(ABC):
+    '''
+    Decides the Orchestrator's next step without asking the LLM.
+    route() returns a decision dict ({"next_agent", "reasoning"}) or None
+    when the state is ambiguous and the LLM should decide.
+    '''
+
+    name = "base"
+
+    @abstractmethod
+    def route(self, state: AgentState) -> Optional[Dict]:
+        pass
+
+class LLMRoutingPolicy(RoutingPolicy):
+    '''Always defer to the LLM (the original behaviour)'''
+
+    name = "llm"
+
+    def route(self, state: AgentState) -> Optional[Dict]:
+        return None
+
+class RuleBasedRoutingPolicy(RoutingPolicy):
+    '''
+    Resolves the transitions that the Orchestrator prompt's RULES already
+    make deterministic. Only the opening step (no proposal yet, so the user
+    request has to be interpreted) goes to the LLM.
+    '''
+
+    name = "rules"
+
+    def route(self, state: AgentState) -> Optional[Dict]:
+        if state["iteration_count"] >= settings.MAX_ITERATIONS:
+            return self._decision("END", f"Reached max iterations ({settings.MAX_ITERATIONS})")
+
+        if state["executed_transactions"]:
+            return self._decision("END", "Trade already executed")
+
+        proposal = state.get("defi_proposal")
+        if not proposal:
+            return None
+
+        if proposal.get("action") == "hold":
+            return self._decision("END", "DeFi Agent proposes to hold - nothing to execute")
+
+        risk = state.get("risk_assessment")
+        if not risk or risk.get("protocol") != proposal.get("destination"):
+            return self._decision("risk_agent", "Proposal has no risk check yet - risk must be checked before any trade")
+
+        score = risk.get("risk_score", 0)
+        if not risk.get("safe") or score > settings.RISK_THRESHOLD:
+            return self._decision("END", f"Risk score {score:.1f} exceeds threshold {settings.RISK_THRESHOLD} - proposal rejected")
+
+        if can_execute_trade(state):
+            return self._decision("EXECUTE_TRADE", "Risk approved and both DeFi Agent and Risk Agent signatures verified")
+
+        return self._decision("END", "Risk approved but DeFi Agent and Risk Agent signatures are not both valid - cannot execute")
+
+    @staticmethod
+    def _decision(next_agent: str, reasoning: str) -> Dict:
+        return {"next_agent": next_agent, "reasoning": reasoning}
+
+ROUTING_POLICIES = {
+    LLMRoutingPolicy.name: LLMRoutingPolicy,
+    RuleBasedRoutingPolicy.name: RuleBasedRoutingPolicy
+}
+
+def get_routing_policy(name: str = None) -> RoutingPolicy:
+    '''Build the routing policy named in settings.ORCHESTRATOR_ROUTING'''
+    name = name or settings.ORCHESTRATOR_ROUTING
+    if name not in ROUTING_POLICIES:
+        raise ValueError(f"Unknown routing policy '{name}'. Options: {list(ROUTING_POLICIES)}")
+    return ROUTING_POLICIES[name]()
+
+# Agents that read disjoint inputs and can run in the same graph step,
+# with the state key each one fills in.
+PARALLEL_GROUPS = [
+    {"defi_agent": "defi_proposal", "prediction_agent": "prediction_forecast"},
+    {"risk_agent": "risk_assessment", "productivity_agent": "productivity_actions"}
+]
+
+def fan_out(state: AgentState, next_agent: str) -> List[str]:
+    '''
+    Expand a routing decision into every agent of its parallel group
+    whose output is still missing. Returns [next_agent] if it has no group.
+    '''
+    for group in PARALLEL_GROUPS:
+        if next_agent in group:
+            return [next_agent] + [
+                agent for agent, output_key in group.items()
+                if agent != next_agent and state.get(output_key) is None
+            ]
+    return [next_agent]
+
+class RoutingStats:
+    '''How many Orchestrator iterations each decision path handled'''
+
+    SOURCES = ("rules", "cache", "llm")
+
+    def __init__(self):
+        self.counts = {source: 0 for source in self.SOURCES}
+
+    def record(self, source: str):
+        self.counts[source] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        stats: Dict[str, Any] = dict(self.counts)
+        stats["total"] = total
+        stats["llm_share"] = round(self.counts["llm"] / total, 3) if total else 0.0
+        return stats
+
+# Shared by every Orchestrator in this process
+routing_stats = RoutingStats()
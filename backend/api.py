@@ -1,21 +1,38 @@
 import asyncio
+import json
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from typing import Dict, Any, Optional, List
+from fastapi import FastAPI, HTTPException, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 from config.settings import settings
-from coordination_layer.layer import CoordinationLayer
+from coordination_layer.async_layer import AsyncCoordinationLayer
 from coordination_layer.state import AgentState
+from coordination_layer.events import FINAL_STATUSES
 from graph.workflow import build_workflow
+from agent_layer.decision_cache import decision_cache
+from agent_layer.risk_cache import risk_cache
+from agent_layer.routing import routing_stats
+from tools import web3_tools
+from tools.rpc_client import rpc_metrics, close_rpc_clients
+from tools.simulator import simulator
+from tools.portfolio_snapshot import portfolio_snapshots, portfolio_state
+from tools.opportunity_index import opportunity_index
+from tools.metrics_store import metrics_store
+from agent_layer.bulk_rebalance import BulkRebalancer
+from scheduler.execution_scheduler import ExecutionScheduler, SchedulerSaturated
+from scheduler.execution_registry import ExecutionRegistry
 
 # Pydantic models for API
 class ChatRequest(BaseModel):
     message: str
     wallet_address: Optional[str] = None
     user_id: Optional[str] = "demo_user"
+    priority: int = Field(5, ge=0, le=9)  # lower runs first
 
 class ChatResponse(BaseModel):
     execution_id: str
@@ -33,34 +50,80 @@ class ExecutionStatus(BaseModel):
     qa_results: Optional[Dict]
     error_messages: list[str]
 
+class BulkPortfolio(BaseModel):
+    wallet_address: str
+    portfolio_id: Optional[str] = None
+    balances: Optional[Dict[str, float]] = None  # read on-chain when omitted
+    positions: Optional[Dict[str, Dict]] = None
+
+class BulkRebalanceRequest(BaseModel):
+    portfolios: Optional[List[BulkPortfolio]] = None
+    wallet_addresses: Optional[List[str]] = None  # registered portfolios, state read on-chain
+    execute: bool = True
+    dry_run: Optional[bool] = None  # default: DRY_RUN setting
+
 # Global variables for workflow management
 coord_layer = None
 workflow_app = None
-active_executions = {}  # Track running executions
+scheduler = None
+executions = None  # ExecutionRegistry - hot executions in memory, cold ones in the coordination layer
+bulk_sweeps = {"running": 0, "last_seconds": 5.0}  # in-progress bulk sweeps (BULK_MAX_CONCURRENT) and last duration
 
 def initialize_system():
     """Initialize the coordination layer and workflow on startup"""
-    global coord_layer, workflow_app
+    global coord_layer, workflow_app, scheduler, executions
 
     print("🚀 Initializing H2K DeFi AI System...")
 
-    # Initialize coordination layer
-    coord_layer = CoordinationLayer(
+    # Initialize coordination layer (non-blocking, pooled connections)
+    coord_layer = AsyncCoordinationLayer(
         supabase_url=settings.SUPABASE_URL,
         supabase_key=settings.SUPABASE_KEY,
     )
 
     # Build workflow
     workflow_app = build_workflow(coord_layer)
+
+    executions = ExecutionRegistry(
+        coord_layer,
+        max_hot=settings.EXECUTION_CACHE_SIZE,
+        hot_ttl=settings.EXECUTION_CACHE_TTL,
+        max_index=settings.EXECUTION_INDEX_SIZE
+    )
+
+    # Bounded worker pool for executions
+    scheduler = ExecutionScheduler(
+        run_workflow_execution,
+        max_workers=settings.SCHEDULER_WORKERS,
+        max_per_portfolio=settings.SCHEDULER_MAX_PER_PORTFOLIO,
+        max_queue=settings.SCHEDULER_MAX_QUEUE,
+        max_queued_per_portfolio=settings.SCHEDULER_MAX_QUEUED_PER_PORTFOLIO
+    )
     print("✅ System initialized successfully")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     initialize_system()
+    coord_layer.start_write_behind()
+    await scheduler.start()
+    web3_tools.gas_oracle.start()
+    opportunity_index.start()
     yield
     # Shutdown
-    # Add any cleanup code here if needed
+    await scheduler.stop()
+    await web3_tools.gas_oracle.stop()
+    await opportunity_index.stop()
+    await coord_layer.close()
+    await close_rpc_clients()
+
+def raise_saturated(e: SchedulerSaturated):
+    """Turn a scheduler rejection into 429 + Retry-After"""
+    raise HTTPException(
+        status_code=429,
+        detail=e.reason,
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 app = FastAPI(title="H2K DeFi AI API", version="1.0.0", lifespan=lifespan)
 
@@ -71,6 +134,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  
     allow_headers=["*"],  
+    expose_headers=["Retry-After"],  # read by the chat UI after a 429
 )
 
 async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
@@ -78,7 +142,7 @@ async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
     try:
         # Create or get portfolio
         wallet_address = chat_request.wallet_address or settings.DEFAULT_WALLET or "0xDemoWallet123"
-        portfolio_id = coord_layer.create_portfolio(
+        portfolio_id = await coord_layer.create_portfolio(
             user_id=chat_request.user_id,
             wallet_address=wallet_address,
             chain_id=1
@@ -87,6 +151,15 @@ async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
         if not portfolio_id:
             raise HTTPException(status_code=500, detail="Failed to create/get portfolio")
 
+        # Reject before creating any rows if this portfolio already has too much queued
+        try:
+            scheduler.check_admission(portfolio_id)
+        except SchedulerSaturated as e:
+            raise_saturated(e)
+
+        # On-chain balances and positions (one Multicall3 call, cached per block)
+        balances, positions = await portfolio_state(wallet_address)
+
         # Create initial state with user input
         execution_id = str(uuid.uuid4())
 
@@ -96,8 +169,8 @@ async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
             "user_input": chat_request.message,
             "wallet_address": wallet_address,
             "chain_id": 1,
-            "balances": {"USDC": 10000, "ETH": 2},  # Default demo balances
-            "positions": {"Aave": {"USDC": 10000, "apy": 0.05}},  # Default demo positions
+            "balances": balances,
+            "positions": positions,
             "orchestrator_decision": None,
             "defi_proposal": None,
             "risk_assessment": None,
@@ -115,29 +188,26 @@ async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
         }
 
         # Initialize execution in database
-        actual_execution_id = coord_layer.init_execution(portfolio_id, initial_state)
+        actual_execution_id = await coord_layer.init_execution(portfolio_id, initial_state)
         if actual_execution_id:
             execution_id = actual_execution_id
             initial_state["execution_id"] = execution_id
 
-        # Store execution in active executions
-        active_executions[execution_id] = {
-            "status": "running",
-            "portfolio_id": portfolio_id,
-            "start_time": datetime.utcnow(),
-            "state": initial_state
-        }
+        # Track execution in the registry
+        executions.add(execution_id, portfolio_id, initial_state, status="queued")
 
         # Write initial state
-        coord_layer.write_state(initial_state)
+        await coord_layer.write_state(initial_state)
 
         return {
             "execution_id": execution_id,
             "portfolio_id": portfolio_id,
-            "status": "running",
-            "message": f"Started processing your request: '{chat_request.message}'"
+            "status": "queued",
+            "message": f"Queued your request: '{chat_request.message}'"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing chat request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -145,48 +215,79 @@ async def process_chat_request(chat_request: ChatRequest) -> Dict[str, Any]:
 async def run_workflow_execution(execution_id: str):
     """Run the workflow execution in the background"""
     try:
-        initial_state = active_executions[execution_id]["state"]
+        executions.update(execution_id, status="running")
+        initial_state = executions.get(execution_id)["state"]
 
         # Run workflow
         final_state = await workflow_app.ainvoke(initial_state)
 
-        # Update execution status
-        active_executions[execution_id].update({
-            "status": "completed",
-            "completed_at": datetime.utcnow(),
-            "final_state": final_state
-        })
+        # Write final state (persisted so the record can be evicted later)
+        await coord_layer.write_state(final_state, snapshot=True, status="completed")
 
-        # Write final state
-        coord_layer.write_state(final_state)
+        # Update execution status
+        executions.update(
+            execution_id,
+            status="completed",
+            completed_at=datetime.utcnow(),
+            final_state=final_state
+        )
 
         print(f"✅ Execution {execution_id} completed successfully")
 
     except Exception as e:
         print(f"❌ Execution {execution_id} failed: {e}")
-        active_executions[execution_id].update({
-            "status": "failed",
-            "error": str(e),
-            "completed_at": datetime.utcnow()
-        })
+        record = executions.get(execution_id)
+        if record:
+            record["state"]["error_messages"].append(str(e))
+            await coord_layer.write_state(record["state"], snapshot=True, status="failed")
+        executions.update(
+            execution_id,
+            status="failed",
+            error=str(e),
+            completed_at=datetime.utcnow()
+        )
+
+    finally:
+        # Execution ended - push its queued audit writes out now
+        await coord_layer.aflush()
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(chat_request: ChatRequest, background_tasks: BackgroundTasks):
+async def chat_endpoint(chat_request: ChatRequest):
     """Main chat endpoint that accepts user messages and starts agent execution"""
+    # Cheap global check first so a saturated worker does no DB work
+    try:
+        scheduler.check_admission()
+    except SchedulerSaturated as e:
+        raise_saturated(e)
+
     result = await process_chat_request(chat_request)
 
-    # Start workflow execution in background
-    background_tasks.add_task(run_workflow_execution, result["execution_id"])
+    # Queue workflow execution on the scheduler
+    try:
+        scheduler.submit(result["execution_id"], result["portfolio_id"], chat_request.priority)
+    except SchedulerSaturated as e:
+        # The execution row already exists: close it instead of leaving it "running"
+        record = executions.get(result["execution_id"])
+        if record:
+            await coord_layer.write_state(record["state"], snapshot=True, status="rejected")
+        else:
+            coord_layer.events.end(result["execution_id"], "rejected")
+        executions.update(
+            result["execution_id"],
+            status="rejected",
+            completed_at=datetime.utcnow()
+        )
+        raise_saturated(e)
 
     return ChatResponse(**result)
 
 @app.get("/api/executions/{execution_id}", response_model=ExecutionStatus)
 async def get_execution_status(execution_id: str):
     """Get the status and results of a specific execution"""
-    if execution_id not in active_executions:
+    execution = await executions.load(execution_id)
+    if execution is None:
         raise HTTPException(status_code=404, detail="Execution not found")
 
-    execution = active_executions[execution_id]
     state = execution.get("final_state") or execution["state"]
 
     return ExecutionStatus(
@@ -200,19 +301,144 @@ async def get_execution_status(execution_id: str):
         error_messages=state.get("error_messages", [])
     )
 
+def format_sse(event: Optional[Dict]) -> str:
+    """Serialise a bus event as a Server-Sent Events frame (None = keep-alive comment)"""
+    if event is None:
+        return ": keep-alive\n\n"
+    frame = f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    if event["id"] is not None:
+        frame = f"id: {event['id']}\n" + frame
+    return frame
+
+@app.get("/api/executions/{execution_id}/events")
+async def stream_execution_events(
+    execution_id: str,
+    last_event_id: Optional[int] = Header(None),
+    from_id: Optional[int] = Query(None, ge=0)
+):
+    """
+    Stream an execution's progress as Server-Sent Events.
+
+    Events: "reasoning" (one per agent reasoning line), "state" (changed
+    proposal/risk/QA fields after each state write), "resync" (events were
+    missed - refetch GET /api/executions/{id}) and "end" (final status).
+    Reconnects resume after the Last-Event-ID header (or ?from_id=).
+    """
+    execution = await executions.load(execution_id)
+    if execution is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+
+    cursor = last_event_id if last_event_id is not None else (from_id or 0)
+
+    async def event_stream():
+        if execution["status"] in FINAL_STATUSES and not coord_layer.events.known(execution_id):
+            # Events already expired - only the outcome is left
+            yield format_sse({"id": None, "type": "end", "data": {"status": execution["status"]}})
+            return
+        async for event in coord_layer.events.subscribe(
+            execution_id,
+            last_event_id=cursor,
+            heartbeat=settings.EVENT_HEARTBEAT
+        ):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/executions")
-async def list_executions():
-    """List all executions with their status"""
-    return [
-        {
-            "execution_id": exec_id,
-            "status": data["status"],
-            "portfolio_id": data["portfolio_id"],
-            "start_time": data["start_time"].isoformat(),
-            "completed_at": data.get("completed_at", "").isoformat() if data.get("completed_at") else None
-        }
-        for exec_id, data in active_executions.items()
-    ]
+async def list_executions(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    status: Optional[str] = None,
+    portfolio_id: Optional[str] = None
+):
+    """List executions newest first, one page at a time"""
+    return await executions.list(limit=limit, offset=offset, status=status, portfolio_id=portfolio_id)
+
+@app.get("/api/transactions/{tx_hash}")
+async def get_transaction_status(tx_hash: str):
+    """Receipt tracking for a transaction sent by an execution (including gas-bumped replacements)"""
+    status = web3_tools.tx_pipeline.status(tx_hash) if web3_tools.tx_pipeline else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return status
+
+@app.post("/api/rebalance/bulk")
+async def bulk_rebalance(request: BulkRebalanceRequest):
+    """
+    Evaluate many portfolios in one vectorised pass; sign and execute only
+    those that need action (see agent_layer/bulk_rebalance.py)
+    """
+    portfolios = [p.model_dump() for p in request.portfolios or []]
+    if request.wallet_addresses:
+        known = await coord_layer.get_portfolios_by_addresses(request.wallet_addresses)
+        portfolios += [
+            {"wallet_address": wallet, "portfolio_id": known[wallet]["id"] if wallet in known else None}
+            for wallet in request.wallet_addresses
+        ]
+    if not portfolios:
+        raise HTTPException(status_code=400, detail="No portfolios given")
+    if len(portfolios) > settings.BULK_MAX_PORTFOLIOS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_MAX_PORTFOLIOS} portfolios per sweep")
+
+    # Sweeps run inline, so they are bounded here; executing ones also queue
+    # behind the scheduler's executions (same signer and RPC capacity)
+    if bulk_sweeps["running"] >= settings.BULK_MAX_CONCURRENT:
+        raise_saturated(SchedulerSaturated(
+            f"{bulk_sweeps['running']} bulk sweep(s) already running",
+            max(1, int(bulk_sweeps["last_seconds"] + 0.5))
+        ))
+    if request.execute:
+        try:
+            scheduler.check_admission()
+        except SchedulerSaturated as e:
+            raise_saturated(e)
+
+    bulk_sweeps["running"] += 1
+    started = time.monotonic()
+    try:
+        return await BulkRebalancer(coord_layer).run(portfolios, execute=request.execute, dry_run=request.dry_run)
+    finally:
+        bulk_sweeps["running"] -= 1
+        bulk_sweeps["last_seconds"] = time.monotonic() - started
+
+@app.get("/api/opportunities")
+async def list_opportunities(
+    k: int = Query(10, ge=1, le=500),
+    asset: Optional[str] = None,
+    chain: Optional[str] = None,
+    protocol: Optional[str] = None,
+    min_tvl: Optional[float] = None,
+    max_risk: Optional[float] = None
+):
+    """Best pools by risk-adjusted APY from the opportunity index"""
+    await opportunity_index.ensure_loaded()
+    return opportunity_index.top(k, asset=asset, chain=chain, protocol=protocol, min_tvl=min_tvl, max_risk=max_risk)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Internal metrics for the API worker"""
+    return {
+        "coordination_writes": coord_layer.write_metrics(),
+        "state_log": coord_layer.state_metrics(),
+        "decision_cache": decision_cache.stats(),
+        "risk_cache": risk_cache.stats(),
+        "routing": routing_stats.get_stats(),
+        "scheduler": scheduler.get_metrics(),
+        "bulk_sweeps": dict(bulk_sweeps),
+        "executions": executions.get_metrics(),
+        "events": coord_layer.events.get_metrics(),
+        "transactions": web3_tools.tx_pipeline.get_metrics() if web3_tools.tx_pipeline else None,
+        "gas": web3_tools.gas_oracle.get_metrics(),
+        "simulation": simulator.get_metrics(),
+        "portfolio_snapshots": portfolio_snapshots.get_metrics(),
+        "opportunities": opportunity_index.get_metrics(),
+        "metrics_store": metrics_store.get_metrics(),
+        "rpc": rpc_metrics()
+    }
 
 @app.get("/health")
 async def health_check():
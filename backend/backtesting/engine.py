@@ -0,0 +1,275 @@
+'''
+Vectorised backtest of the DeFi strategy's allocation rule.
+
+Replays aligned per-protocol APY and gas history and, at every decision
+step, runs the same AllocationOptimizer the DeFi Agent and BulkRebalancer
+use (AllocationOptimizer.solve), with each parameter set's
+min_apy_diff / risk_threshold / gas_payback_days as its minimum APY gain,
+risk ceiling and horizon. Acting portfolios pay the plan's gas and
+slippage.
+
+State is a (parameter combinations x portfolios, pools) holdings matrix,
+so one solve decides every portfolio under every parameter set. Yield
+between decisions is applied in closed form from cumulative log-growth,
+so cost scales with the number of decisions, not with the history's
+resolution. run_sweep() splits the grid across a process pool.
+'''
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from models.allocator import AllocationOptimizer
+from models.risk_ebm import MAX_SCORE
+from tools.gas_oracle import DEFAULT_GAS_LIMITS
+from tools.metrics_store import MetricsStore
+
+SECONDS_PER_YEAR = 365 * 86400
+WALLET = -1  # position index for "not deposited"
+
+class MarketHistory:
+    '''Per-protocol metrics on a regular time grid: apy/tvl are (T, P), gas_gwei is (T,)'''
+
+    def __init__(self, timestamps: np.ndarray, protocols: List[str], apy: np.ndarray, tvl: np.ndarray, gas_gwei: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.protocols = list(protocols)
+        self.apy = np.asarray(apy, dtype=float)
+        self.tvl = np.asarray(tvl, dtype=float)
+        self.gas_gwei = np.asarray(gas_gwei, dtype=float)
+
+    @property
+    def days(self) -> float:
+        return (self.timestamps[-1] - self.timestamps[0]) / 86400 if len(self.timestamps) > 1 else 0.0
+
+def _forward_fill(store: MetricsStore, series: str, field: str, grid: np.ndarray) -> np.ndarray:
+    '''
+    Last value at or before each grid time (NaN before the first record).
+    Works one memory-mapped segment at a time, so memory stays bounded by the
+    grid and one segment's timestamps.
+    '''
+    out = np.full(len(grid), np.nan)
+    for view in store.views(series, None, int(grid[-1]) + 1):
+        timestamps = np.asarray(view["timestamp"])
+        pos = np.searchsorted(timestamps, grid, side="right") - 1
+        covered = pos >= 0
+        values = np.asarray(view[field])[np.maximum(pos, 0)]
+        # Later segments overwrite earlier ones where they have data
+        out = np.where(covered & ~np.isnan(values), values, out)
+    return out
+
+def load_history(store: MetricsStore, protocols: List[str], start: int, end: int, step: int = 3600, gas_series: str = "_gas") -> MarketHistory:
+    '''Resample stored protocol metrics (and the gas series) onto start..end every `step` seconds'''
+    grid = np.arange(start, end, step, dtype=np.int64)
+    apy = np.column_stack([_forward_fill(store, p, "apy", grid) for p in protocols])
+    tvl = np.column_stack([_forward_fill(store, p, "tvl", grid) for p in protocols])
+    gas = _forward_fill(store, gas_series, "gas_gwei", grid)
+    return MarketHistory(grid, protocols, apy, tvl, gas)
+
+def synthetic_history(pools: List[Dict], days: float = 365, step: int = 3600, seed: int = 7) -> MarketHistory:
+    '''
+    Mean-reverting APY paths around each pool's APY (with rare regime
+    shifts), TVL random walks and log-normal gas, for offline sweeps.
+    '''
+    rng = np.random.default_rng(seed)
+    steps = int(days * 86400 / step)
+    base = np.array([p["apy"] for p in pools])
+    n = len(pools)
+
+    # AR(1) around a level that occasionally jumps
+    phi = 0.995
+    shocks = rng.normal(0, 0.002, (steps, n))
+    jumps = (rng.random((steps, n)) < 1 / (30 * 86400 / step)) * rng.normal(0, 0.02, (steps, n))
+    level = np.maximum(base + np.cumsum(jumps, axis=0), 0.0)
+    apy = np.empty((steps, n))
+    x = base.copy()
+    for t in range(steps):
+        x = level[t] + phi * (x - level[t]) + shocks[t] * (1 - phi) ** 0.5
+        apy[t] = x
+    apy = np.maximum(apy, 0.0)
+
+    tvl = np.array([p["tvl"] for p in pools]) * np.exp(np.cumsum(rng.normal(0, 0.002, (steps, n)), axis=0))
+    gas = np.exp(rng.normal(np.log(0.05), 0.6, steps))
+
+    start = int(time.time()) - steps * step
+    return MarketHistory(start + np.arange(steps) * step, [p["protocol"] for p in pools], apy, tvl, gas)
+
+def parameter_grid(**axes) -> Dict[str, np.ndarray]:
+    '''Cartesian product of parameter values, as one array per parameter'''
+    names = list(axes)
+    combos = list(itertools.product(*(axes[name] for name in names)))
+    return {name: np.array([c[i] for c in combos], dtype=float) for i, name in enumerate(names)}
+
+def synthetic_portfolios(n: int, protocols: List[str], seed: int = 7) -> Dict[str, np.ndarray]:
+    '''Start amounts (USD) and starting protocol index (WALLET for idle)'''
+    rng = np.random.default_rng(seed)
+    return {
+        "amount": np.round(10 ** rng.uniform(2, 5, n), 2),
+        "start": rng.integers(WALLET, len(protocols), n)
+    }
+
+class StrategyBacktest:
+
+    def __init__(
+        self,
+        history: MarketHistory,
+        risk_scores: np.ndarray,
+        eth_price_usd: float = 2000.0,
+        gas_limits: Dict[str, int] = None,
+        optimizer: AllocationOptimizer = None
+    ):
+        self.history = history
+        self.risk = np.asarray(risk_scores, dtype=float)
+        self.eth_price_usd = eth_price_usd
+        self.optimizer = optimizer or AllocationOptimizer()
+        limits = gas_limits or DEFAULT_GAS_LIMITS
+        self.gas_units = np.array([limits.get(p.lower(), 300000) for p in history.protocols], dtype=float)
+
+        apy = np.nan_to_num(history.apy, nan=0.0)
+        self.available = ~np.isnan(history.apy)
+        dt = np.diff(history.timestamps, prepend=history.timestamps[0]) / SECONDS_PER_YEAR
+        # log of value growth from the start to step t, per protocol; wallet (last column) earns nothing
+        growth = np.log1p(apy * dt[:, None])
+        self.log_growth = np.concatenate([np.cumsum(growth, axis=0), np.zeros((len(apy), 1))], axis=1)
+
+        gas = history.gas_gwei
+        if np.isnan(gas).all():
+            gas = np.zeros_like(gas)
+        self.gas_gwei = np.where(np.isnan(gas), np.nanmedian(gas), gas)
+
+    def run(self, grid: Dict[str, np.ndarray], portfolios: Dict[str, np.ndarray], decision_every: int = 24) -> Dict[str, np.ndarray]:
+        '''
+        Simulate every (parameter combination, portfolio) pair.
+        grid: arrays "min_apy_diff", "risk_threshold", "gas_payback_days" (length G).
+        portfolios: "amount" and "start" (length N).
+        Decisions happen every `decision_every` history steps.
+        Returns (G, N) arrays: final_value, gas_usd, migrations (rebalances),
+        risk_exposure (value-weighted) and final_protocol (largest holding, P = wallet).
+        '''
+        h = self.history
+        G, N = len(grid["min_apy_diff"]), len(portfolios["amount"])
+        P = len(h.protocols)
+        protocol = np.arange(P)
+
+        # One row per (parameter set, portfolio), parameter-major
+        per_row = lambda name: np.repeat(grid[name].astype(float), N)
+        min_diff, ceiling, horizon = per_row("min_apy_diff"), per_row("risk_threshold"), per_row("gas_payback_days")
+
+        amount = np.tile(portfolios["amount"].astype(float), G)
+        start = np.tile(portfolios["start"], G)
+        holdings = np.zeros((G * N, P))
+        invested = start >= 0
+        holdings[np.flatnonzero(invested), start[invested]] = amount[invested]
+        idle = np.where(invested, 0.0, amount)
+
+        gas_usd = np.zeros(G * N)
+        migrations = np.zeros(G * N, dtype=np.int64)
+        risk_time = np.zeros(G * N)
+
+        def exposure():
+            value = holdings.sum(axis=1) + idle
+            return (holdings @ self.risk) / np.where(value > 0, value, 1.0)  # the wallet carries no risk
+
+        decisions = np.arange(0, len(h.timestamps), decision_every)
+        previous = 0
+        for t in decisions:
+            # Yield since the last decision for each pool, in one broadcast
+            risk_time += exposure() * (t - previous)
+            holdings *= np.exp(self.log_growth[t, :P] - self.log_growth[previous, :P])
+            previous = t
+
+            # Pools without data at t earn nothing and accept no new money
+            available = self.available[t]
+            apy_t = np.where(available, h.apy[t], 0.0)
+            solved = self.optimizer.solve(
+                apy=apy_t,
+                risk_adjusted_apy=apy_t * (1 - self.risk / MAX_SCORE),
+                risk=np.where(available, self.risk, np.inf),
+                tvl=np.nan_to_num(h.tvl[t], nan=0.0),
+                protocol=protocol,
+                held=holdings,
+                idle=idle,
+                gas=self.gas_units * self.gas_gwei[t] * 1e-9 * self.eth_price_usd,
+                horizon_days=horizon,
+                risk_ceiling=ceiling,
+                min_apy_gain=min_diff
+            )
+
+            act = solved["reason"] == -1
+            if not act.any():
+                continue
+            # Acting portfolios pay the plan's gas and slippage out of what they end up holding
+            budget = solved["budget"][act]
+            cost = np.minimum(solved["gas"][act] + solved["slippage"][act], budget)
+            keep = np.where(budget > 0, (budget - cost) / np.where(budget > 0, budget, 1.0), 0.0)
+            target = solved["x"][act]
+            idle[act] = (budget - target.sum(axis=1)) * keep
+            holdings[act] = target * keep[:, None]
+            gas_usd[act] += solved["gas"][act]
+            migrations[act] += 1
+
+        end = len(h.timestamps) - 1
+        risk_time += exposure() * (end - previous)
+        holdings *= np.exp(self.log_growth[end, :P] - self.log_growth[previous, :P])
+
+        value = holdings.sum(axis=1) + idle
+        largest = np.argmax(holdings, axis=1)
+        final_protocol = np.where(holdings[np.arange(G * N), largest] > idle, largest, P)
+        shape = lambda values: values.reshape(G, N)
+        return {
+            "final_value": shape(value),
+            "gas_usd": shape(gas_usd),
+            "migrations": shape(migrations),
+            "risk_exposure": shape(risk_time / max(end, 1)),
+            "final_protocol": shape(final_protocol)
+        }
+
+    def hold(self, portfolios: Dict[str, np.ndarray]) -> np.ndarray:
+        '''Final value of never moving (the baseline)'''
+        P = len(self.history.protocols)
+        start = np.where(portfolios["start"] < 0, P, portfolios["start"])
+        return portfolios["amount"] * np.exp(self.log_growth[-1, start] - self.log_growth[0, start])
+
+def _run_chunk(args):
+    backtest, grid, portfolios, decision_every = args
+    return backtest.run(grid, portfolios, decision_every)
+
+def run_sweep(
+    backtest: StrategyBacktest,
+    grid: Dict[str, np.ndarray],
+    portfolios: Dict[str, np.ndarray],
+    decision_every: int = 24,
+    workers: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    '''
+    StrategyBacktest.run over the whole grid, split into one chunk per worker
+    process when workers > 1 (each combination is independent).
+    '''
+    size = len(grid["min_apy_diff"])
+    if not workers or workers <= 1 or size < 2:
+        return backtest.run(grid, portfolios, decision_every)
+
+    bounds = np.array_split(np.arange(size), min(workers, size))
+    chunks = [({k: v[idx] for k, v in grid.items()}) for idx in bounds if len(idx)]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        results = list(pool.map(_run_chunk, [(backtest, chunk, portfolios, decision_every) for chunk in chunks]))
+    return {key: np.concatenate([r[key] for r in results]) for key in results[0]}
+
+def summarize(grid: Dict[str, np.ndarray], results: Dict[str, np.ndarray], portfolios: Dict[str, np.ndarray], days: float, baseline: np.ndarray = None) -> List[Dict]:
+    '''One row per parameter combination, best mean annualised return first'''
+    start = portfolios["amount"][None, :]
+    years = max(days, 1e-9) / 365
+    annualised = (results["final_value"] / start) ** (1 / years) - 1
+    rows = []
+    for g in range(len(grid["min_apy_diff"])):
+        row = {name: float(values[g]) for name, values in grid.items()}
+        row.update({
+            "mean_apy": float(annualised[g].mean()),
+            "median_apy": float(np.median(annualised[g])),
+            "gas_usd": float(results["gas_usd"][g].sum()),
+            "migrations": float(results["migrations"][g].mean()),
+            "risk_exposure": float(results["risk_exposure"][g].mean())
+        })
+        if baseline is not None:
+            row["vs_hold"] = float((results["final_value"][g] - baseline).sum())
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["mean_apy"], reverse=True)
@@ -0,0 +1,116 @@
+'''
+Parameter sweep of the DeFi strategy over historical (or synthetic) pool metrics.
+
+    python -m backtesting.run [--synthetic] [--days 365] [--workers 4] [--top 10] [--max-move 1000]
+
+History comes from the metrics store (tools/metrics_store.py) unless it is
+empty or --synthetic is given. The default grid crosses MIN_APY_DIFF,
+RISK_THRESHOLD and GAS_PAYBACK_DAYS values around the current settings;
+every other allocation setting is the DeFi Agent's own optimizer.
+'''
+import argparse
+import copy
+import json
+import os
+import time
+import numpy as np
+from config.settings import settings
+from agent_layer.defi_agent import allocation_optimizer
+from models.risk_ebm import get_risk_model
+from tools.metrics_store import metrics_store
+from tools.opportunity_index import FIXTURE_POOLS
+from backtesting.engine import (
+    StrategyBacktest, load_history, synthetic_history, parameter_grid,
+    synthetic_portfolios, run_sweep, summarize
+)
+
+def _floats(text: str):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+def _stored_history(days: float, step: int):
+    '''Stored protocol series over the last `days` days, or None if the store is empty'''
+    protocols = [name for name in metrics_store.series() if not name.startswith("_")]
+    spans = []
+    for name in protocols:
+        views = metrics_store.views(name)
+        if views:
+            spans.append((int(views[0]["timestamp"][0]), int(views[-1]["timestamp"][-1])))
+    if not spans:
+        return None
+    end = max(last for _, last in spans) + 1
+    start = max(min(first for first, _ in spans), end - int(days * 86400))
+    if end - start < 2 * step:
+        return None
+    return load_history(metrics_store, protocols, start, end, step)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the DeFi strategy over a parameter grid")
+    parser.add_argument("--synthetic", action="store_true", help="Use generated history instead of the metrics store")
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--step", type=int, default=3600, help="History resolution in seconds")
+    parser.add_argument("--decision-hours", type=float, default=24, help="How often the agent decides")
+    parser.add_argument("--portfolios", type=int, default=200)
+    parser.add_argument("--min-apy-diff", default="0,0.005,0.01,0.015,0.02,0.025,0.03,0.035,0.04,0.045,0.05")
+    parser.add_argument("--risk-threshold", default="1.2,1.6,2,2.5,3,3.5,10")
+    parser.add_argument("--payback-days", default="7,14,30,60,90")
+    parser.add_argument("--max-move", type=float, help="Largest deposit per decision in USD (default: the agent's; 0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for the sweep (1 = in-process)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="Write every combination's summary as JSON")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("📈 STRATEGY BACKTEST")
+    print("="*60)
+
+    history = None if args.synthetic else _stored_history(args.days, args.step)
+    if history is None:
+        print("Using synthetic history (metrics store empty or --synthetic)")
+        history = synthetic_history(FIXTURE_POOLS, days=args.days, step=args.step)
+
+    risk = np.array([score for score, _ in get_risk_model().assess_protocols(history.protocols)])
+    optimizer = allocation_optimizer
+    if args.max_move is not None:
+        optimizer = copy.copy(allocation_optimizer)
+        optimizer.max_move = args.max_move or None
+    backtest = StrategyBacktest(history, risk, eth_price_usd=settings.ETH_PRICE_USD, optimizer=optimizer)
+
+    grid = parameter_grid(
+        min_apy_diff=_floats(args.min_apy_diff),
+        risk_threshold=_floats(args.risk_threshold),
+        gas_payback_days=_floats(args.payback_days)
+    )
+    portfolios = synthetic_portfolios(args.portfolios, history.protocols)
+    decision_every = max(1, int(round(args.decision_hours * 3600 / args.step)))
+
+    print(f"History: {len(history.protocols)} protocols, {history.days:.0f} days at {args.step}s")
+    print(f"Grid: {len(grid['min_apy_diff'])} combinations x {args.portfolios} portfolios, decision every {decision_every} steps, {args.workers} worker(s)")
+    print(f"Optimizer: max move {optimizer.max_move or 'unlimited'}, protocol share {optimizer.max_protocol_share:.0%}, slippage {optimizer.slippage}")
+
+    started = time.perf_counter()
+    results = run_sweep(backtest, grid, portfolios, decision_every, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    rows = summarize(grid, results, portfolios, history.days, baseline=backtest.hold(portfolios))
+
+    current = next(
+        (r for r in rows if r["min_apy_diff"] == settings.MIN_APY_DIFF and r["risk_threshold"] == settings.RISK_THRESHOLD and r["gas_payback_days"] == settings.GAS_PAYBACK_DAYS),
+        None
+    )
+
+    print(f"\n⏱️ Swept in {elapsed:.2f}s")
+    print(f"\n{'min_diff':>8} {'risk':>5} {'payback':>7} {'mean APY':>9} {'median':>8} {'moves':>6} {'gas $':>10} {'risk exp':>8}")
+    for row in rows[:args.top] + ([current] if current and current not in rows[:args.top] else []):
+        marker = "  <- current settings" if row is current else ""
+        print(
+            f"{row['min_apy_diff']:>8.3f} {row['risk_threshold']:>5.1f} {row['gas_payback_days']:>7.0f} "
+            f"{row['mean_apy']:>9.2%} {row['median_apy']:>8.2%} {row['migrations']:>6.1f} "
+            f"{row['gas_usd']:>10.2f} {row['risk_exposure']:>8.2f}{marker}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+'''
+Latency of RiskModel scoring: mock formula vs trained EBM artifact.
+
+    python -m benchmarks.risk_model_bench [--protocols 500] [--repeat 200]
+
+Measures one-protocol predictions (what RiskAgent does per execution) and
+one batch pass over --protocols synthetic rows. Uses the latest artifact
+in RISK_MODEL_DIR; run models/train_risk_ebm.py first to include the EBM.
+'''
+import argparse
+import time
+import numpy as np
+from models.risk_ebm import RiskModel, load_risk_model
+from models.train_risk_ebm import synthetic_training_set
+
+def _time(fn, repeat: int) -> np.ndarray:
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return timings * 1000
+
+def _report(name: str, timings: np.ndarray, rows: int = 1):
+    p50, p95 = np.percentile(timings, [50, 95])
+    print(
+        f"{name:<28} p50 {p50:8.3f} ms   p95 {p95:8.3f} ms   "
+        f"{p50 * 1000 / rows:8.2f} us/protocol"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RiskModel latency")
+    parser.add_argument("--protocols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    features = synthetic_training_set(args.protocols).drop(columns="risky")
+    single = features.iloc[:1].to_numpy(dtype=float)
+
+    models = {"mock": RiskModel()}
+    loaded = load_risk_model()
+    if loaded.ebm is not None:
+        models[loaded.version] = loaded
+    else:
+        print("(no EBM artifact found - benchmarking the mock only)")
+
+    for name, model in models.items():
+        model.assess_protocol("Aave")  # warm up
+        _report(f"{name} assess_protocol", _time(lambda: model.assess_protocol("Aave"), args.repeat))
+        _report(f"{name} assess_batch(1)", _time(lambda: model.assess_batch(single), args.repeat))
+        _report(
+            f"{name} assess_batch({args.protocols})",
+            _time(lambda: model.assess_batch(features), max(1, args.repeat // 10)),
+            rows=args.protocols
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+'''
+Signature verification throughput: uncached vs RecoveryCache vs batched.
+
+    python -m benchmarks.signature_bench [--intents 200] [--checks 5]
+
+Each intent is verified --checks times, as in one execution (routing
+policy, Orchestrator, later state checks). "uncached" is the previous
+path: Account.from_key for the expected address plus ECDSA recovery on
+every check. "batched" signs all intents as one EIP-712 Merkle batch and
+verifies it with verify_intent_batch (one recovery + inclusion proofs).
+'''
+import argparse
+import os
+import time
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+# Throwaway agent key, set before tools.web3_tools builds its key registry
+KEY = Account.create().key.hex()
+os.environ["DEFI_AGENT_KEY"] = KEY
+
+from tools.web3_tools import RecoveryCache, get_agent_address
+from tools.intent_batch import proposal_intent, sign_intent_batch, verify_intent_batch
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark signature verification")
+    parser.add_argument("--intents", type=int, default=200)
+    parser.add_argument("--checks", type=int, default=5)
+    args = parser.parse_args()
+
+    account = Account.from_key(KEY)
+    address = get_agent_address("defi_agent")
+    intents = [f"DeFi Proposal: migrate {i} USDC from Aave to Curve" for i in range(args.intents)]
+    signatures = [account.sign_message(encode_defunct(text=intent)).signature.hex() for intent in intents]
+    total = args.intents * args.checks
+
+    started = time.perf_counter()
+    for _ in range(args.checks):
+        for intent, signature in zip(intents, signatures):
+            expected = Account.from_key(KEY).address
+            Account.recover_message(encode_defunct(text=intent), signature=signature) == expected
+    uncached = time.perf_counter() - started
+
+    cache = RecoveryCache(max_size=args.intents)
+    started = time.perf_counter()
+    for _ in range(args.checks):
+        for intent, signature in zip(intents, signatures):
+            cache.recover(intent, signature) == address
+    cached = time.perf_counter() - started
+
+    typed = [
+        proposal_intent(f"execution-{i}", {"action": "migrate", "source": "Aave", "destination": "Curve", "asset": "USDC", "amount": i})
+        for i in range(args.intents)
+    ]
+    started = time.perf_counter()
+    batch = sign_intent_batch("defi_agent", typed)
+    signed = time.perf_counter() - started
+    started = time.perf_counter()
+    assert all(verify_intent_batch(batch, address))
+    batched = time.perf_counter() - started
+
+    print(f"{total} verifications ({args.intents} intents x {args.checks} checks)")
+    print(f"uncached  {total / uncached:10.0f} verifications/s")
+    print(f"cached    {total / cached:10.0f} verifications/s   (hits {cache.stats['hits']}, misses {cache.stats['misses']})")
+    print(f"batched   {args.intents / batched:10.0f} verifications/s   (1 signature for {args.intents} intents, signed in {signed * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
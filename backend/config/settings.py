@@ -9,12 +9,97 @@ class Settings:
     DEFAULT_WALLET = os.getenv("WALLET_ADDRESS", "0xYourDefaultWalletAddress")
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+    REDIS_URL = os.getenv("REDIS_URL")
    
     MAX_ITERATIONS = 10
     ORCHESTRATOR_MODEL = "gemini-2.5-flash"
+    ORCHESTRATOR_ROUTING = os.getenv("ORCHESTRATOR_ROUTING", "rules")  # "rules" or "llm"
+    PARALLEL_AGENTS = os.getenv("PARALLEL_AGENTS", "false").lower() == "true"
 
    
+    # Approved trades are simulated against SIM_RPC_URL (tools/simulator.py) instead of broadcast
+    DRY_RUN = os.getenv("DRY_RUN", "false").lower() == "true"
+
     RISK_THRESHOLD = 3.0  
     MIN_APY_DIFF = 0.02   
 
+    # "Worth gas costs": yield gain over this many days must exceed the migration gas cost
+    GAS_PAYBACK_DAYS = float(os.getenv("GAS_PAYBACK_DAYS", "30"))
+    ETH_PRICE_USD = float(os.getenv("ETH_PRICE_USD", "2000"))  # same 1 USDC ~ 0.0005 ETH as the tx builders
+
+    # Trained EBM artifacts (models/train_risk_ebm.py); mock model if none
+    RISK_MODEL_DIR = os.getenv("RISK_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "models", "artifacts"))
+    RISK_MODEL_VERSION = os.getenv("RISK_MODEL_VERSION", "latest")  # "latest" or a version number
+
+    # Signed risk assessments, keyed by protocol features + model version
+    RISK_CACHE_SIZE = int(os.getenv("RISK_CACHE_SIZE", "256"))
+    RISK_CACHE_TTL = float(os.getenv("RISK_CACHE_TTL", "300"))  # seconds
+
+    # Write-behind buffer for audit writes (coordination layer)
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "50"))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))  # seconds
+    AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "1000"))
+    AUDIT_MAX_RETRIES = int(os.getenv("AUDIT_MAX_RETRIES", "3"))  # flushes a failed write is attempted in
+
+    # Full state snapshot every N state versions (deltas in between)
+    STATE_SNAPSHOT_INTERVAL = int(os.getenv("STATE_SNAPSHOT_INTERVAL", "10"))
+
+    # Orchestrator decision cache (memory LRU/TTL + optional Redis tier)
+    DECISION_CACHE_SIZE = int(os.getenv("DECISION_CACHE_SIZE", "1024"))
+    DECISION_CACHE_TTL = float(os.getenv("DECISION_CACHE_TTL", "600"))  # seconds
+
+    # Execution scheduler for /api/chat
+    SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+    SCHEDULER_MAX_PER_PORTFOLIO = int(os.getenv("SCHEDULER_MAX_PER_PORTFOLIO", "1"))
+    SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "100"))
+    SCHEDULER_MAX_QUEUED_PER_PORTFOLIO = int(os.getenv("SCHEDULER_MAX_QUEUED_PER_PORTFOLIO", "10"))
+
+    # Execution registry (hot executions in memory, cold ones in Supabase)
+    EXECUTION_CACHE_SIZE = int(os.getenv("EXECUTION_CACHE_SIZE", "500"))
+    EXECUTION_CACHE_TTL = float(os.getenv("EXECUTION_CACHE_TTL", "900"))  # seconds after completion
+    EXECUTION_INDEX_SIZE = int(os.getenv("EXECUTION_INDEX_SIZE", "100000"))
+
+    # Yield opportunity index (tools/opportunity_index.py)
+    OPPORTUNITY_SOURCES = os.getenv("OPPORTUNITY_SOURCES", "fixture")  # comma-separated: fixture, defillama
+    OPPORTUNITY_REFRESH_INTERVAL = float(os.getenv("OPPORTUNITY_REFRESH_INTERVAL", "300"))  # seconds
+    OPPORTUNITY_CHAINS = os.getenv("OPPORTUNITY_CHAINS", "")  # comma-separated DefiLlama chains; empty = all
+    OPPORTUNITY_MIN_TVL = float(os.getenv("OPPORTUNITY_MIN_TVL", "100000"))
+    OPPORTUNITY_TOP_K = int(os.getenv("OPPORTUNITY_TOP_K", "10"))
+
+    # APY forecasting (models/apy_forecaster.py); one point per protocol per index refresh
+    FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW", "288"))  # points in the rolling window
+    FORECAST_EWMA_ALPHA = float(os.getenv("FORECAST_EWMA_ALPHA", "0.1"))
+    FORECAST_HORIZON_DAYS = float(os.getenv("FORECAST_HORIZON_DAYS", "7"))
+
+    # Protocol metrics history (tools/metrics_store.py): memory-mapped append-only segments
+    METRICS_STORE_DIR = os.getenv("METRICS_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "local_state", "metrics"))
+    METRICS_SEGMENT_RECORDS = int(os.getenv("METRICS_SEGMENT_RECORDS", str(1 << 20)))  # 48 MB segments
+    METRICS_COMPACT_AFTER_DAYS = float(os.getenv("METRICS_COMPACT_AFTER_DAYS", "30"))
+    METRICS_COMPACT_RESOLUTION = int(os.getenv("METRICS_COMPACT_RESOLUTION", "0"))  # seconds per record after compaction; 0 = keep all
+
+    # DeFi Agent allocation (models/allocator.py)
+    ALLOCATION_MAX_POOLS = int(os.getenv("ALLOCATION_MAX_POOLS", "200"))  # candidate pools per plan
+    ALLOCATION_MAX_PROTOCOL_SHARE = float(os.getenv("ALLOCATION_MAX_PROTOCOL_SHARE", "0.5"))  # of the portfolio
+    ALLOCATION_SLIPPAGE = float(os.getenv("ALLOCATION_SLIPPAGE", "0.5"))  # price impact = slippage * amount / TVL
+
+    # Bulk rebalance sweeps (agent_layer/bulk_rebalance.py)
+    BULK_MAX_PORTFOLIOS = int(os.getenv("BULK_MAX_PORTFOLIOS", "10000"))
+    BULK_MAX_CONCURRENT = int(os.getenv("BULK_MAX_CONCURRENT", "1"))  # sweeps at once per API worker; beyond that 429
+
+    # Async JSON-RPC client (tools/rpc_client.py)
+    RPC_MAX_BATCH = int(os.getenv("RPC_MAX_BATCH", "50"))
+    RPC_BATCH_WINDOW = float(os.getenv("RPC_BATCH_WINDOW", "0.002"))  # seconds to collect a batch
+    RPC_MAX_CONCURRENCY = int(os.getenv("RPC_MAX_CONCURRENCY", "8"))  # in-flight HTTP requests per endpoint
+    RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+
+    # Execution progress events (SSE)
+    EVENT_HISTORY = int(os.getenv("EVENT_HISTORY", "500"))  # events kept per execution for resume
+    EVENT_TTL = float(os.getenv("EVENT_TTL", "300"))  # seconds an ended execution's events are kept
+    EVENT_IDLE_TTL = float(os.getenv("EVENT_IDLE_TTL", "3600"))  # seconds a never-ended channel is kept without events or subscribers
+    EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+    # Async coordination layer (pooled Supabase REST client)
+    COORD_HTTP_POOL_SIZE = int(os.getenv("COORD_HTTP_POOL_SIZE", "20"))
+    COORD_HTTP_TIMEOUT = float(os.getenv("COORD_HTTP_TIMEOUT", "10"))  # seconds
+
 settings = Settings()
\ No newline at end of file
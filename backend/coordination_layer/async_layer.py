@@ -0,0 +1,480 @@
+import json
+import time
+import asyncio
+import httpx
+import redis.asyncio as aioredis
+from typing import Dict, Any, Optional, List
+from dotenv import load_dotenv
+from config.settings import settings
+from coordination_layer.state import AgentState
+from coordination_layer.layer import WriteBehindBuffer, INSERTED, REJECTED, UNAVAILABLE
+from coordination_layer.core import CoordinationCore
+
+# Load environment variables
+load_dotenv()
+
+class AsyncWriteBehindBuffer(WriteBehindBuffer):
+    '''
+    Write-behind buffer for the async coordination layer.
+    Same queues and metrics as WriteBehindBuffer, but flushes are
+    awaited on the event loop instead of running on a worker thread.
+    Rows queued from worker threads are flushed on the buffer's loop.
+    '''
+
+    def __init__(self, layer: "AsyncCoordinationLayer", **kwargs):
+        super().__init__(layer, **kwargs)
+        self._async_flush_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # loop the flushes run on
+
+    def _after_enqueue(self, depth: int, table_full: bool):
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], depth)
+        # Producers cannot flush inline from sync code here;
+        # backpressure is applied in wait_for_capacity() instead.
+        if table_full or depth >= self.max_pending:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        '''Start an aflush() on the buffer's loop, hopping onto it from other threads'''
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Worker thread: there is no synchronous flush for this buffer
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._schedule_flush)
+            return  # no loop yet: the interval flusher or the next flush picks the rows up
+
+        self._loop = self._loop or loop
+        if self._inflight is None or self._inflight.done():
+            self.metrics["size_flushes"] += 1
+            self._inflight = loop.create_task(self.aflush())
+
+    def flush(self) -> int:
+        raise RuntimeError("AsyncWriteBehindBuffer must be flushed with 'await aflush()'")
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        super().start()
+
+    async def aflush(self) -> int:
+        async with self._async_flush_lock:
+            rows, states = self._drain()
+            if not rows and not states:
+                return 0
+
+            started = time.perf_counter()
+            table_results = await asyncio.gather(*[
+                self._insert_rows(table, entries) for table, entries in rows.items()
+            ])
+            for (table, entries), failed in zip(rows.items(), table_results):
+                self._record_rows(table, entries, failed)
+
+            state_results = await asyncio.gather(*[
+                self.layer._write_state_row(state, status) for state, status, _ in states.values()
+            ])
+            for (state, status, attempts), ok in zip(states.values(), state_results):
+                self._record_state(state, status, attempts, ok)
+
+            return self._record_flush(started, rows, states)
+
+    async def _insert_rows(self, table: str, entries: List[tuple]) -> List[tuple]:
+        '''Bulk insert, falling back to one insert per row. Returns the entries that failed.'''
+        outcome = await self.layer._bulk_insert(table, [row for row, _ in entries])
+        if outcome == INSERTED:
+            return []
+        if outcome == UNAVAILABLE or len(entries) == 1:
+            return entries
+        self.metrics["row_fallbacks"] += 1
+        results = await asyncio.gather(*[self.layer._bulk_insert(table, [row]) for row, _ in entries])
+        return [entry for entry, outcome in zip(entries, results) if outcome != INSERTED]
+
+    async def wait_for_capacity(self):
+        '''Backpressure: make the producer wait for a flush when the queue is full'''
+        if self.pending() >= self.max_pending:
+            self.metrics["backpressure_flushes"] += 1
+            await self.aflush()
+
+class AsyncCoordinationLayer(CoordinationCore):
+    '''
+    Non-blocking version of CoordinationLayer.
+    Same public API, but every method is a coroutine.
+
+    Talks to Supabase through its PostgREST endpoint on a pooled
+    httpx.AsyncClient and to Redis through redis.asyncio, so DB calls
+    from agents and FastAPI handlers never block the event loop.
+    State versioning, cache layout and row shapes are CoordinationCore's.
+    '''
+
+    write_buffer_class = AsyncWriteBehindBuffer
+
+    def _connect_supabase(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=f"{self.url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Content-Type": "application/json"
+            },
+            limits=httpx.Limits(
+                max_connections=settings.COORD_HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.COORD_HTTP_POOL_SIZE
+            ),
+            timeout=settings.COORD_HTTP_TIMEOUT
+        )
+
+    def _connect_redis(self, url: str):
+        return aioredis.from_url(url)
+
+    # ==================== POSTGREST HELPERS ====================
+
+    async def _select(self, table: str, filters: Dict[str, str], columns: str = "*", **extra) -> List[Dict]:
+        '''
+        GET rows from `table`. `filters` are equality filters; `extra` is passed
+        through as raw PostgREST params (e.g. version="lte.5", order="version.desc").
+        '''
+        params = [("select", columns)]
+        params += [(column, f"eq.{value}") for column, value in filters.items()]
+        params += list(extra.items())
+        response = await self.supabase.get(f"/{table}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def _insert(self, table: str, rows, returning: bool = False, on_conflict: str = None) -> List[Dict]:
+        prefer = ["return=representation" if returning else "return=minimal"]
+        params = {}
+        if on_conflict:
+            prefer.append("resolution=merge-duplicates")
+            params["on_conflict"] = on_conflict
+
+        response = await self.supabase.post(
+            f"/{table}",
+            params=params,
+            headers={"Prefer": ",".join(prefer)},
+            content=json.dumps(rows, default=str)
+        )
+        response.raise_for_status()
+        return response.json() if returning else []
+
+    async def _update(self, table: str, values: Dict, filters: Dict[str, str]):
+        params = {column: f"eq.{value}" for column, value in filters.items()}
+        response = await self.supabase.patch(
+            f"/{table}",
+            params=params,
+            headers={"Prefer": "return=minimal"},
+            content=json.dumps(values, default=str)
+        )
+        response.raise_for_status()
+
+    # ==================== 1. PORTFOLIO & WALLET ====================
+
+    async def get_portfolio_by_address(self, wallet_address: str) -> Optional[Dict]:
+        '''Fetch portfolio ID from wallet address'''
+        if not self.supabase: return None
+        try:
+            rows = await self._select("portfolios", {"wallet_address": wallet_address})
+            if rows:
+                return rows[0]
+            return None
+        except Exception as e:
+            print(f"Error fetching portfolio: {e}")
+            return None
+
+    async def get_portfolios_by_addresses(self, wallet_addresses: List[str], chunk_size: int = 200) -> Dict[str, Dict]:
+        '''Portfolios for many wallets, one request per `chunk_size` addresses'''
+        if not self.supabase: return {}
+        portfolios = {}
+        try:
+            for i in range(0, len(wallet_addresses), chunk_size):
+                chunk = wallet_addresses[i:i + chunk_size]
+                rows = await self._select("portfolios", {}, wallet_address=f"in.({','.join(chunk)})")
+                portfolios.update({row["wallet_address"]: row for row in rows})
+        except Exception as e:
+            print(f"Error fetching portfolios: {e}")
+        return portfolios
+
+    async def create_portfolio(self, user_id: str, wallet_address: str, chain_id: int = 1) -> str:
+        '''Create new portfolio if doesn't exist'''
+        if not self.supabase: return None
+        try:
+            # Uses upsert to avoid duplicates
+            rows = await self._insert(
+                "portfolios", self._portfolio_row(user_id, wallet_address, chain_id), returning=True, on_conflict="wallet_address"
+            )
+            if rows:
+                return rows[0]['id']
+            return None
+        except Exception as e:
+            print(f"Error creating portfolio: {e}")
+            return None
+
+    # ==================== 2. STATE MANAGEMENT (EXECUTION) ====================
+
+    async def read_state(self, execution_id: str, version: int = None) -> Optional[AgentState]:
+        '''
+        Read current state for this execution (or an older `version`).
+        Tries Redis first, then the Supabase 'agent_state_deltas' log,
+        then the 'agent_executions' table.
+        '''
+        # 1. Try Cache (only holds deltas since the latest snapshot)
+        if self.redis_enabled:
+            try:
+                state = self._state_from_cache(await self._cache_read_pipeline(execution_id).execute(), version)
+                if state is not None:
+                    return state
+            except Exception:
+                pass  # includes a gap in the cached log: Supabase has the full log
+
+        # 2. Try the writes that have not been flushed yet
+        state, pending = self._unflushed_state(execution_id, version)
+        if state is not None:
+            return state
+
+        # 3. Try Supabase
+        if not self.supabase: return None
+        try:
+            upper = {"version": f"lte.{version}"} if version is not None else {}
+            snaps = await self._select(
+                "agent_state_deltas",
+                {"execution_id": execution_id, "is_snapshot": "true"},
+                columns="version,state_data",
+                order="version.desc",
+                limit="1",
+                **upper
+            )
+
+            if snaps:
+                snap = snaps[0]
+                bounds = [("version", f"gt.{snap['version']}")]
+                if version is not None:
+                    bounds.append(("version", f"lte.{version}"))
+                response = await self.supabase.get("/agent_state_deltas", params=[
+                    ("select", "version,ops"),
+                    ("execution_id", f"eq.{execution_id}"),
+                    ("order", "version.asc"),
+                    *bounds
+                ])
+                response.raise_for_status()
+                return self._state_from_log(execution_id, snap, response.json() + pending, version)
+
+            rows = await self._select("agent_executions", {"execution_id": execution_id}, columns="state_data")
+            if rows:
+                return rows[0]["state_data"]
+        except Exception as e:
+            print(f"Error reading state: {e}")
+
+        return None
+
+    async def write_state(self, state: AgentState, snapshot: bool = False, status: str = "running"):
+        '''
+        Write updated state to 'agent_executions' table.
+        Also updates Redis cache.
+
+        Same delta/snapshot scheme as CoordinationLayer.write_state:
+        only changed keys go to 'agent_state_deltas', with a full snapshot
+        every STATE_SNAPSHOT_INTERVAL versions.
+        '''
+        if self._needs_seed(state["execution_id"]):
+            self.state_log.seed(state["execution_id"], await self._latest_version(state["execution_id"]))
+
+        entry = self._record_state(state, snapshot, status)
+        if entry is None:
+            return
+
+        # 1. Queue Supabase writes
+        if self.supabase:
+            await self.write_buffer.wait_for_capacity()
+            self._queue_state_entry(entry, status)
+
+        # 2. Update Cache
+        if self.redis_enabled:
+            try:
+                await self._cache_entry_pipeline(entry).execute()
+            except Exception:
+                pass
+
+    async def _latest_version(self, execution_id: str) -> int:
+        '''Highest state version stored for an execution the state log is not tracking (-1 = none)'''
+        if not self.supabase:
+            return -1
+        version = self._unflushed_version(execution_id)
+        if version is not None:
+            return version
+        try:
+            rows = await self._select(
+                "agent_state_deltas",
+                {"execution_id": execution_id},
+                columns="version",
+                order="version.desc",
+                limit="1"
+            )
+            return rows[0]["version"] if rows else -1
+        except Exception as e:
+            print(f"Error reading state version: {e}")
+            return -1
+
+    async def _write_state_row(self, state: Dict, status: str = "running") -> bool:
+        '''Write one state row to 'agent_executions' (called by the write buffer)'''
+        try:
+            await self._update("agent_executions", self._state_row(state, status), {"execution_id": state["execution_id"]})
+            return True
+        except Exception as e:
+            print(f"Error writing state to Supabase: {e}")
+            return False
+
+    async def _bulk_insert(self, table: str, rows: List[Dict]) -> str:
+        '''Insert many rows in one request (called by the write buffer)'''
+        try:
+            await self._insert(table, rows)
+            return INSERTED
+        except Exception as e:
+            print(f"Error bulk inserting {len(rows)} rows into {table}: {e}")
+            # Only a 4xx is about the rows; connection failures and 5xx are not
+            if isinstance(e, httpx.HTTPStatusError) and 400 <= e.response.status_code < 500:
+                return REJECTED
+            return UNAVAILABLE
+
+    async def init_execution(self, portfolio_id: str, initial_state: AgentState) -> str:
+        '''Create a new row in agent_executions'''
+        if not self.supabase: return "mock_execution_id"
+        try:
+            rows = await self._insert("agent_executions", self._execution_row(portfolio_id, initial_state), returning=True)
+            if rows:
+                self.state_log.seed(rows[0]['execution_id'], -1)  # nothing stored yet
+                return rows[0]['execution_id']
+            return None
+        except Exception as e:
+            print(f"Error init execution: {e}")
+            return None
+
+    async def get_execution(self, execution_id: str) -> Optional[Dict]:
+        '''Fetch one 'agent_executions' row (status + last snapshot)'''
+        if not self.supabase: return None
+        try:
+            rows = await self._select(
+                "agent_executions",
+                {"execution_id": execution_id},
+                columns="execution_id,portfolio_id,status,created_at,updated_at,state_data",
+                limit="1"
+            )
+            if rows:
+                return self._with_unflushed_state(rows[0])
+        except Exception as e:
+            print(f"Error fetching execution: {e}")
+        return None
+
+    async def list_executions(self, limit: int = 50, offset: int = 0, status: str = None, portfolio_id: str = None) -> List[Dict]:
+        '''Page through 'agent_executions' newest first (without state_data)'''
+        if not self.supabase: return []
+        try:
+            filters = {}
+            if status:
+                filters["status"] = status
+            if portfolio_id:
+                filters["portfolio_id"] = portfolio_id
+            return await self._select(
+                "agent_executions",
+                filters,
+                columns="execution_id,portfolio_id,status,created_at,updated_at",
+                order="created_at.desc",
+                limit=str(limit),
+                offset=str(offset)
+            )
+        except Exception as e:
+            print(f"Error listing executions: {e}")
+            return []
+
+    # ==================== WRITE-BEHIND CONTROL ====================
+
+    async def flush(self) -> int:
+        '''Flush all queued audit writes (call when an execution ends)'''
+        return await self.write_buffer.aflush()
+
+    async def aflush(self) -> int:
+        return await self.write_buffer.aflush()
+
+    async def close(self):
+        '''Flush remaining writes and release pooled connections'''
+        await self.write_buffer.stop()
+        if self.supabase:
+            await self.supabase.aclose()
+        if self.redis_enabled:
+            await self.redis.aclose()
+
+    # ==================== 3. AGENT LOGGING (DECISIONS & REASONING) ====================
+
+    async def log_agent_decision(
+        self,
+        portfolio_id: str,
+        execution_id: str,
+        agent_name: str,
+        decision_type: str,
+        decision_data: Dict,
+        reasoning: str
+    ):
+        '''Log high-level choice to 'agent_decisions' table'''
+        if not self.supabase: return
+        await self.write_buffer.wait_for_capacity()
+        self.write_buffer.add_row("agent_decisions", self._decision_row(
+            portfolio_id, execution_id, agent_name, decision_type, decision_data, reasoning
+        ))
+
+    async def log_agent_reasoning(
+        self,
+        portfolio_id: str,
+        execution_id: str,
+        agent_name: str,
+        step_number: int,
+        reasoning_text: str
+    ):
+        '''Log granular thought process to 'agent_reasoning' table'''
+        row = self._reasoning_row(execution_id, agent_name, step_number, reasoning_text)
+        if not self.supabase: return
+        await self.write_buffer.wait_for_capacity()
+        self.write_buffer.add_row("agent_reasoning", row)
+
+    # ==================== 4. RISK ASSESSMENTS ====================
+
+    async def record_risk_assessment(
+        self,
+        portfolio_id: str,
+        execution_id: str,
+        protocol: str,
+        risk_score: float,
+        risk_factors: Dict,
+        safe: bool
+    ):
+        '''Record EBM output to 'risk_assessments' table'''
+        if not self.supabase: return
+        await self.write_buffer.wait_for_capacity()
+        self.write_buffer.add_row("risk_assessments", self._risk_row(
+            portfolio_id, execution_id, protocol, risk_score, risk_factors, safe
+        ))
+
+    # ==================== 5. TRANSACTIONS & BALANCES ====================
+
+    async def update_balance(self, portfolio_id: str, asset: str, location: str, amount: float):
+        '''Update 'balances' table'''
+        if not self.supabase: return
+        try:
+            await self._insert("balances", self._balance_row(portfolio_id, asset, location, amount))
+
+        except Exception as e:
+            print(f"Error updating balance: {e}")
+
+    async def record_transaction(
+        self,
+        portfolio_id: str,
+        execution_id: str,
+        tx_hash: str,
+        protocol: str,
+        action: str,
+        amount: float,
+        status: str = "success"
+    ):
+        '''Record tx to 'executed_transactions' table'''
+        if not self.supabase: return
+        try:
+            await self._insert("executed_transactions", self._transaction_row(
+                portfolio_id, execution_id, tx_hash, protocol, action, amount, status
+            ))
+        except Exception as e:
+            print(f"Error recording transaction: {e}")
@@ -0,0 +1,140 @@
+import json
+import time
+import redis.asyncio as aioredis
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+class TTLCache:
+    '''
+    In-process LRU cache with a per-entry TTL.
+    Least recently used entries are evicted once `max_size` is reached.
+    '''
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TieredCache:
+    '''
+    Two-tier cache: in-process TTLCache in front of an optional Redis tier
+    shared by all workers. Values must be JSON-serialisable.
+
+    Redis failures never fail a lookup; they are counted and the
+    cache falls back to the memory tier.
+    '''
+
+    def __init__(self, namespace: str, max_size: int = 1024, ttl: float = 300, redis_url: str = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+
+        self.redis = None
+        if redis_url:
+            try:
+                self.redis = aioredis.from_url(redis_url)
+            except Exception as e:
+                print(f"⚠️ Redis tier for '{namespace}' cache disabled: {e}")
+
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "redis_errors": 0
+        }
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(self._redis_key(key))
+                if cached:
+                    value = json.loads(cached)
+                    self.memory.set(key, value)
+                    self.stats["hits"] += 1
+                    self.stats["redis_hits"] += 1
+                    return value
+            except Exception:
+                self.stats["redis_errors"] += 1
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: float = None):
+        ttl = ttl or self.ttl
+        self.memory.set(key, value, ttl)
+        self.stats["sets"] += 1
+
+        if self.redis is not None:
+            try:
+                await self.redis.setex(self._redis_key(key), int(ttl), json.dumps(value, default=str))
+            except Exception:
+                self.stats["redis_errors"] += 1
+
+    async def delete(self, key: str):
+        self.memory.delete(key)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._redis_key(key))
+            except Exception:
+                self.stats["redis_errors"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["size"] = len(self.memory)
+        stats["evictions"] = self.memory.stats["evictions"]
+        stats["expirations"] = self.memory.stats["expirations"]
+        stats["redis_enabled"] = self.redis is not None
+        return stats
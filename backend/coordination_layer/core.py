@@ -0,0 +1,288 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+from config.settings import settings
+from coordination_layer.events import ExecutionEventBus, FINAL_STATUSES, state_event
+from coordination_layer.state_delta import StateDeltaLog, StateGapError, rebuild_state
+
+class CoordinationCore:
+    '''
+    What CoordinationLayer and AsyncCoordinationLayer share: state
+    versioning and events, the Redis cache layout and the shape of every
+    row they write. Nothing here talks to Supabase or Redis; each layer
+    adds only the I/O (supabase-py + redis, or PostgREST on httpx +
+    redis.asyncio).
+
+    Subclasses set `write_buffer_class` and implement _connect_supabase()
+    and _connect_redis().
+    '''
+
+    write_buffer_class = None
+    cache_ttl = 300  # 5 minutes
+
+    def __init__(self, supabase_url: str = None, supabase_key: str = None, redis_url: str = None):
+        # Load from env if not provided
+        self.url = supabase_url or os.getenv("SUPABASE_URL")
+        self.key = supabase_key or os.getenv("SUPABASE_KEY")
+
+        if not self.url or not self.key:
+            # We allow initialization without keys for testing, but warn
+            print("Warning: SUPABASE_URL and SUPABASE_KEY not found. Operations will fail.")
+            self.supabase = None
+        else:
+            self.supabase = self._connect_supabase()
+
+        # Redis Client (Optional)
+        self.redis_url = redis_url or os.getenv("REDIS_URL")
+        self.redis_enabled = False
+        if self.redis_url:
+            try:
+                self.redis = self._connect_redis(self.redis_url)
+                self.redis_enabled = True
+                print("✅ Redis Cache Enabled")
+            except Exception as e:
+                print(f"⚠️ Redis connection failed: {e}. Using Supabase only.")
+
+        # State writes are persisted as versioned deltas
+        self.state_log = StateDeltaLog(snapshot_interval=settings.STATE_SNAPSHOT_INTERVAL)
+
+        # Progress events for streaming clients
+        self.events = ExecutionEventBus(
+            history=settings.EVENT_HISTORY,
+            ttl=settings.EVENT_TTL,
+            idle_ttl=settings.EVENT_IDLE_TTL
+        )
+
+        # Audit rows and state updates are written behind the agents
+        self.write_buffer = self.write_buffer_class(
+            self,
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+            max_pending=settings.AUDIT_MAX_PENDING,
+            max_retries=settings.AUDIT_MAX_RETRIES
+        )
+
+    def _connect_supabase(self):
+        raise NotImplementedError
+
+    def _connect_redis(self, url: str):
+        raise NotImplementedError
+
+    # ---------- state writes ----------
+
+    def _needs_seed(self, execution_id: str) -> bool:
+        '''True if the state log has no version for this execution (the store must be asked)'''
+        return self.state_log.version(execution_id) is None
+
+    def _record_state(self, state: Dict, snapshot: bool, status: str) -> Optional[Dict]:
+        '''
+        Version a state write: returns the delta/snapshot entry to persist
+        (None if nothing changed), publishes it and ends the execution's
+        events and version tracking on a final status.
+        '''
+        state["updated_at"] = datetime.utcnow().isoformat()
+        entry = self.state_log.record(state, snapshot=snapshot)
+        if entry is not None:
+            self.events.publish(state["execution_id"], "state", state_event(entry, state, status))
+        if status in FINAL_STATUSES:
+            self.events.end(state["execution_id"], status)
+            self.state_log.forget(state["execution_id"])
+        return entry
+
+    def _queue_state_entry(self, entry: Dict, status: str):
+        '''Queue an entry's Supabase writes (snapshots also refresh agent_executions)'''
+        self.write_buffer.add_row("agent_state_deltas", entry)
+        if entry["is_snapshot"]:
+            self.write_buffer.put_state(entry["state_data"], status)
+
+    # ---------- redis cache ----------
+
+    @staticmethod
+    def _cache_keys(execution_id: str):
+        return f"state_snap:{execution_id}", f"state_log:{execution_id}"
+
+    def _cache_entry_pipeline(self, entry: Dict):
+        '''
+        Redis pipeline (not yet executed) that caches an entry: the latest
+        snapshot plus the deltas recorded after it
+        '''
+        snap_key, log_key = self._cache_keys(entry["execution_id"])
+        pipe = self.redis.pipeline()
+        if entry["is_snapshot"]:
+            pipe.setex(snap_key, self.cache_ttl, json.dumps({
+                "version": entry["version"],
+                "state_data": entry["state_data"]
+            }, default=str))
+            pipe.delete(log_key)
+        else:
+            pipe.rpush(log_key, json.dumps(entry, default=str))
+            pipe.expire(log_key, self.cache_ttl)
+            pipe.expire(snap_key, self.cache_ttl)
+        return pipe
+
+    def _cache_read_pipeline(self, execution_id: str):
+        '''Redis pipeline (not yet executed) reading the cached snapshot and deltas'''
+        snap_key, log_key = self._cache_keys(execution_id)
+        return self.redis.pipeline().get(snap_key).lrange(log_key, 0, -1)
+
+    @staticmethod
+    def _state_from_cache(cached, version: int = None) -> Optional[Dict]:
+        '''State from a _cache_read_pipeline() result; None if the cache cannot serve it'''
+        snap, deltas = cached
+        if not snap:
+            return None
+        snap = json.loads(snap)
+        if version is not None and snap["version"] > version:
+            return None
+        # A gap raises StateGapError: the caller falls through to Supabase
+        return rebuild_state(snap["state_data"], [json.loads(d) for d in deltas], version, base_version=snap["version"])
+
+    @staticmethod
+    def _state_from_log(execution_id: str, snap: Dict, deltas: List[Dict], version: int = None) -> Dict:
+        '''
+        State from a snapshot row and the delta rows after it (the snapshot
+        if there is a gap). A delta both stored and still buffered counts once.
+        '''
+        deltas = {d["version"]: d for d in deltas if d["version"] > snap["version"]}
+        try:
+            return rebuild_state(snap["state_data"], list(deltas.values()), version, base_version=snap["version"])
+        except StateGapError as e:
+            print(f"⚠️ {e} for execution {execution_id}; returning snapshot v{snap['version']}")
+            return snap["state_data"]
+
+    # ---------- reads through the write buffer ----------
+
+    def _unflushed_state(self, execution_id: str, version: int = None):
+        '''
+        Serve a read from writes Supabase may not have yet, instead of
+        flushing first. Returns (state, pending): `state` is the state log's
+        copy of a tracked execution, or a rebuild from a snapshot still in
+        the write buffer; otherwise None, and `pending` are buffered deltas
+        to replay on top of what Supabase returns.
+        '''
+        tracked = self.state_log.version(execution_id)
+        if tracked is not None and (version is None or version == tracked):
+            state = self.state_log.latest(execution_id)
+            if state is not None:
+                return state, []
+
+        pending = [
+            entry for entry in self.write_buffer.unflushed_rows("agent_state_deltas", execution_id)
+            if version is None or entry["version"] <= version
+        ]
+        snaps = [entry for entry in pending if entry["is_snapshot"]]
+        if snaps:
+            snap = max(snaps, key=lambda entry: entry["version"])
+            return self._state_from_log(execution_id, snap, pending, version), []
+        return None, pending
+
+    def _unflushed_version(self, execution_id: str) -> Optional[int]:
+        '''Highest state version of an execution still in the write buffer'''
+        pending = self.write_buffer.unflushed_rows("agent_state_deltas", execution_id)
+        return max((entry["version"] for entry in pending), default=None)
+
+    def _with_unflushed_state(self, row: Dict) -> Dict:
+        '''An 'agent_executions' row with the state update the buffer has not written yet'''
+        queued = self.write_buffer.unflushed_state(row["execution_id"])
+        if queued:
+            row.update(self._state_row(*queued))
+        return row
+
+    def state_metrics(self) -> Dict[str, Any]:
+        '''Delta/snapshot write sizes of the state log'''
+        return self.state_log.get_metrics()
+
+    # ---------- rows ----------
+
+    @staticmethod
+    def _state_row(state: Dict, status: str) -> Dict:
+        ''''agent_executions' columns refreshed by a state snapshot'''
+        return {
+            "state_data": state,
+            "status": status,
+            "updated_at": state["updated_at"]
+        }
+
+    @staticmethod
+    def _execution_row(portfolio_id: str, initial_state: Dict) -> Dict:
+        return {
+            "portfolio_id": portfolio_id,
+            "state_data": initial_state,
+            "status": "running"
+        }
+
+    @staticmethod
+    def _portfolio_row(user_id: str, wallet_address: str, chain_id: int) -> Dict:
+        return {
+            "user_id": user_id,
+            "wallet_address": wallet_address,
+            "chain_id": chain_id
+        }
+
+    @staticmethod
+    def _decision_row(portfolio_id, execution_id, agent_name, decision_type, decision_data, reasoning) -> Dict:
+        return {
+            "execution_id": execution_id,
+            "portfolio_id": portfolio_id,
+            "agent_name": agent_name,
+            "decision_type": decision_type,
+            "decision_data": json.loads(json.dumps(decision_data, default=str)),
+            "reasoning": reasoning
+        }
+
+    def _reasoning_row(self, execution_id, agent_name, step_number, reasoning_text) -> Dict:
+        '''Publishes the reasoning step to streaming clients and returns its row'''
+        self.events.publish(execution_id, "reasoning", {
+            "agent": agent_name,
+            "step": step_number,
+            "text": reasoning_text
+        })
+        return {
+            "execution_id": execution_id,
+            "agent_name": agent_name,
+            "step_number": step_number,
+            "reasoning_text": reasoning_text
+        }
+
+    @staticmethod
+    def _risk_row(portfolio_id, execution_id, protocol, risk_score, risk_factors, safe) -> Dict:
+        return {
+            "execution_id": execution_id,
+            "portfolio_id": portfolio_id,
+            "protocol": protocol,
+            "risk_score": risk_score,
+            "risk_factors": json.loads(json.dumps(risk_factors, default=str)),
+            "safe": safe
+        }
+
+    @staticmethod
+    def _balance_row(portfolio_id, asset, location, amount) -> Dict:
+        return {
+            "portfolio_id": portfolio_id,
+            "asset": asset,
+            "amount": amount,
+            "location": location
+        }
+
+    @staticmethod
+    def _transaction_row(portfolio_id, execution_id, tx_hash, protocol, action, amount, status) -> Dict:
+        return {
+            "execution_id": execution_id,
+            "portfolio_id": portfolio_id,
+            "tx_hash": tx_hash,
+            "protocol": protocol,
+            "action": action,
+            "amount": amount,
+            "status": status
+        }
+
+    # ---------- write-behind control ----------
+
+    def start_write_behind(self):
+        '''Start the interval flusher (call from inside the event loop)'''
+        self.write_buffer.start()
+
+    def write_metrics(self) -> Dict[str, Any]:
+        '''Flush/backpressure metrics of the write-behind buffer'''
+        return self.write_buffer.get_metrics()
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, AsyncIterator
+
+# Statuses after which no more events are published for an execution
+FINAL_STATUSES = ("completed", "failed", "rejected")
+
+# State keys streamed to the UI on every write (agent_reasoning has its own events)
+STREAM_FIELDS = (
+    "next_agent",
+    "iteration_count",
+    "defi_proposal",
+    "risk_assessment",
+    "prediction_forecast",
+    "qa_results",
+    "executed_transactions",
+    "error_messages"
+)
+
+def state_event(entry: Dict[str, Any], state: Dict[str, Any], status: str) -> Dict[str, Any]:
+    '''
+    Payload of a "state" event for a StateDeltaLog entry: the version plus
+    the streamed keys that changed (all of them for a snapshot).
+    '''
+    if entry["is_snapshot"]:
+        keys = STREAM_FIELDS
+    else:
+        touched = {op["path"].lstrip("/").split("/")[0] for op in entry["ops"]}
+        keys = [key for key in STREAM_FIELDS if key in touched]
+
+    return {
+        "version": entry["version"],
+        "status": status,
+        "changed": json.loads(json.dumps({key: state.get(key) for key in keys}, default=str))
+    }
+
+class _Channel:
+    def __init__(self, history: int):
+        self.events = deque(maxlen=history)
+        self.next_id = 1
+        self.ended_at: Optional[float] = None
+        self.active_at = time.monotonic()  # last publish or subscriber change
+        self.waiters = []  # (loop, asyncio.Event) per live subscriber
+
+class ExecutionEventBus:
+    '''
+    In-process pub/sub of per-execution progress events.
+
+    The coordination layer publishes an event for every reasoning line and
+    state write; API subscribers stream them out (Server-Sent Events).
+
+    - Event ids are sequential per execution, so a reconnecting client can
+      resume after the last id it saw
+    - Each execution keeps its last `history` events; a resume from before
+      that window gets a single "resync" event instead
+    - Ended executions are kept for `ttl` seconds for late subscribers;
+      channels that never ended (a crashed execution, a subscriber to an
+      unknown id) are dropped after `idle_ttl` seconds without events or
+      subscribers
+    - At most `max_executions` channels are kept (oldest ended dropped
+      first, then the longest idle); channels with subscribers are kept
+
+    publish() is safe to call from any thread.
+    '''
+
+    def __init__(self, history: int = 500, ttl: float = 300, idle_ttl: float = 3600, max_executions: int = 1000):
+        self.history = history
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self.max_executions = max_executions
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.metrics = {
+            "published": 0,
+            "delivered": 0,
+            "resyncs": 0,
+            "subscribers": 0
+        }
+
+    def _channel(self, execution_id: str) -> _Channel:
+        channel = self._channels.get(execution_id)
+        if channel is None:
+            self._expire()  # before adding, so the new channel cannot be dropped
+            channel = self._channels[execution_id] = _Channel(self.history)
+        return channel
+
+    def publish(self, execution_id: str, event_type: str, data: Dict[str, Any]) -> Dict:
+        with self._lock:
+            channel = self._channel(execution_id)
+            event = {
+                "id": channel.next_id,
+                "type": event_type,
+                "data": data,
+                "ts": time.time()
+            }
+            channel.next_id += 1
+            channel.events.append(event)
+            channel.active_at = time.monotonic()
+            if event_type == "end":
+                channel.ended_at = time.monotonic()
+            waiters = list(channel.waiters)
+            self.metrics["published"] += 1
+
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+        return event
+
+    def end(self, execution_id: str, status: str):
+        '''Publish the closing event; subscribers stop after it'''
+        self.publish(execution_id, "end", {"status": status})
+
+    async def subscribe(
+        self,
+        execution_id: str,
+        last_event_id: int = 0,
+        heartbeat: float = 15
+    ) -> AsyncIterator[Optional[Dict]]:
+        '''
+        Yield events after `last_event_id` until the "end" event.
+        Yields None every `heartbeat` seconds without events (keep-alive).
+        '''
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        with self._lock:
+            channel = self._channel(execution_id)
+            channel.waiters.append((loop, wake))
+            channel.active_at = time.monotonic()
+            self.metrics["subscribers"] += 1
+
+        try:
+            cursor = last_event_id or 0
+            oldest = channel.events[0]["id"] if channel.events else channel.next_id
+            if cursor < oldest - 1 or cursor >= channel.next_id:
+                # Requested events have been dropped from the window, or the
+                # channel expired and was recreated with ids starting over
+                self.metrics["resyncs"] += 1
+                yield {"id": None, "type": "resync", "data": {"from_id": oldest}, "ts": time.time()}
+                cursor = oldest - 1
+
+            while True:
+                wake.clear()
+                with self._lock:
+                    pending = [event for event in channel.events if event["id"] > cursor]
+
+                for event in pending:
+                    cursor = event["id"]
+                    self.metrics["delivered"] += 1
+                    yield event
+                    if event["type"] == "end":
+                        return
+
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                channel.waiters.remove((loop, wake))
+                channel.active_at = time.monotonic()
+                self.metrics["subscribers"] -= 1
+
+    def known(self, execution_id: str) -> bool:
+        '''Whether events are still held for this execution'''
+        return execution_id in self._channels
+
+    def _expire(self):
+        '''
+        Drop unwatched channels past their TTL (ended) or idle TTL (never
+        ended), then the oldest ended and longest idle ones until there is
+        room for one more channel
+        '''
+        now = time.monotonic()
+        ended, idle = [], []
+        for execution_id, channel in self._channels.items():
+            if channel.waiters:
+                continue
+            if channel.ended_at is not None:
+                ended.append(execution_id)
+            else:
+                idle.append(execution_id)
+
+        for execution_id in ended:
+            if now - self._channels[execution_id].ended_at > self.ttl:
+                del self._channels[execution_id]
+        for execution_id in idle:
+            if now - self._channels[execution_id].active_at > self.idle_ttl:
+                del self._channels[execution_id]
+
+        excess = len(self._channels) + 1 - self.max_executions
+        idle = sorted(
+            (execution_id for execution_id in idle if execution_id in self._channels),
+            key=lambda execution_id: self._channels[execution_id].active_at
+        )
+        for execution_id in ended + idle:
+            if excess <= 0:
+                break
+            if execution_id in self._channels:
+                del self._channels[execution_id]
+                excess -= 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["channels"] = len(self._channels)
+        return metrics
@@ -1,10 +1,13 @@
-import json
 import redis
-import os
-from datetime import datetime
+import time
+import asyncio
+import threading
+from collections import defaultdict
 from typing import Dict, Any, Optional, List
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
+from coordination_layer.core import CoordinationCore
 
 # Load environment variables
 load_dotenv()
@@ -56,7 +59,260 @@ class AgentState(TypedDict):
     created_at: str
     updated_at: str
 
-class CoordinationLayer:
+# What a layer's _bulk_insert() reports back to the write buffer
+INSERTED = "inserted"        # rows are stored
+REJECTED = "rejected"        # the store refused the rows (4xx): retry them one by one
+UNAVAILABLE = "unavailable"  # connection failure or 5xx: retry the batch as is
+
+class WriteBehindBuffer:
+    '''
+    Write-behind queue for audit writes.
+
+    Rows for 'agent_decisions', 'agent_reasoning', 'risk_assessments' and
+    'agent_state_deltas' are grouped per table and written as one bulk insert per table.
+    State updates for 'agent_executions' are coalesced per execution, so
+    only the latest state of each execution is written.
+
+    A flush happens when:
+    - a table reaches `batch_size` rows
+    - `flush_interval` seconds pass (once start() is running in an event loop)
+    - an execution ends (CoordinationLayer.flush / aflush)
+
+    If more than `max_pending` writes are queued the caller flushes inline
+    (backpressure) instead of letting the queue grow without bound.
+
+    A bulk insert the store rejects (4xx) is retried row by row, so one bad
+    row does not drop the rest of its batch; while the store is unreachable
+    the batch is requeued as is. Rows and state updates that still fail are
+    requeued for the next flush, at most `max_retries` times, then dropped.
+
+    Writes stay readable until they are stored: unflushed_rows() and
+    unflushed_state() cover both the queues and the batch being flushed.
+    '''
+
+    def __init__(
+        self,
+        layer: "CoordinationLayer",
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        max_retries: int = 3
+    ):
+        self.layer = layer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+
+        self._rows: Dict[str, List[tuple]] = defaultdict(list)  # table -> [(row, attempts)]
+        self._states: Dict[str, tuple] = {}  # execution_id -> (state, status, attempts)
+        self._lock = threading.Lock()        # guards the queues
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._flushing = ({}, {})           # batch taken by the running flush
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "queued_rows": 0,
+            "queued_states": 0,
+            "coalesced_states": 0,
+            "flushes": 0,
+            "size_flushes": 0,
+            "interval_flushes": 0,
+            "backpressure_flushes": 0,
+            "rows_written": 0,
+            "states_written": 0,
+            "failed_writes": 0,
+            "row_fallbacks": 0,
+            "retried_writes": 0,
+            "dropped_writes": 0,
+            "max_depth": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0
+        }
+
+    # ---------- enqueue ----------
+
+    def add_row(self, table: str, row: Dict):
+        '''Queue one row for a bulk insert into `table`'''
+        with self._lock:
+            self._rows[table].append((row, 0))
+            self.metrics["queued_rows"] += 1
+            table_full = len(self._rows[table]) >= self.batch_size
+            depth = self._depth()
+        self._after_enqueue(depth, table_full)
+
+    def put_state(self, state: Dict, status: str = "running"):
+        '''Queue a state update, replacing any queued update for the same execution'''
+        with self._lock:
+            if state["execution_id"] in self._states:
+                self.metrics["coalesced_states"] += 1
+            self._states[state["execution_id"]] = (state, status, 0)
+            self.metrics["queued_states"] += 1
+            depth = self._depth()
+        self._after_enqueue(depth, False)
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._depth()
+
+    def unflushed_rows(self, table: str, execution_id: str) -> List[Dict]:
+        '''Rows of an execution queued for `table` that may not be stored yet'''
+        with self._lock:
+            entries = self._flushing[0].get(table, []) + self._rows.get(table, [])
+        return [row for row, _ in entries if row.get("execution_id") == execution_id]
+
+    def unflushed_state(self, execution_id: str) -> Optional[tuple]:
+        '''(state, status) of the latest state update not stored yet, if any'''
+        with self._lock:
+            queued = self._states.get(execution_id) or self._flushing[1].get(execution_id)
+        return queued[:2] if queued else None
+
+    def _depth(self) -> int:
+        return sum(len(rows) for rows in self._rows.values()) + len(self._states)
+
+    def _after_enqueue(self, depth: int, table_full: bool):
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], depth)
+
+        if depth >= self.max_pending:
+            # Writer is not keeping up - make the producer pay for the flush
+            self.metrics["backpressure_flushes"] += 1
+            self.flush()
+        elif table_full:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        '''Flush off the event loop if there is one, inline otherwise'''
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.metrics["size_flushes"] += 1
+            self.flush()
+            return
+
+        if self._inflight is None or self._inflight.done():
+            self.metrics["size_flushes"] += 1
+            self._inflight = loop.create_task(self.aflush())
+
+    # ---------- flush ----------
+
+    def flush(self) -> int:
+        '''Write everything queued so far. Returns number of writes issued.'''
+        with self._flush_lock:
+            rows, states = self._drain()
+            if not rows and not states:
+                return 0
+
+            started = time.perf_counter()
+
+            for table, entries in rows.items():
+                self._record_rows(table, entries, self._insert_rows(table, entries))
+
+            for state, status, attempts in states.values():
+                self._record_state(state, status, attempts, self.layer._write_state_row(state, status))
+
+            return self._record_flush(started, rows, states)
+
+    def _insert_rows(self, table: str, entries: List[tuple]) -> List[tuple]:
+        '''Bulk insert, falling back to one insert per row. Returns the entries that failed.'''
+        outcome = self.layer._bulk_insert(table, [row for row, _ in entries])
+        if outcome == INSERTED:
+            return []
+        if outcome == UNAVAILABLE or len(entries) == 1:
+            return entries
+        self.metrics["row_fallbacks"] += 1
+        failed = []
+        for i, entry in enumerate(entries):
+            outcome = self.layer._bulk_insert(table, [entry[0]])
+            if outcome == UNAVAILABLE:
+                return failed + entries[i:]  # store went away mid-fallback
+            if outcome == REJECTED:
+                failed.append(entry)
+        return failed
+
+    def _drain(self):
+        '''Take everything queued so far, leaving the queues empty'''
+        with self._lock:
+            rows, self._rows = self._rows, defaultdict(list)
+            states, self._states = self._states, {}
+            rows = {table: batch for table, batch in rows.items() if batch}
+            self._flushing = (rows, states)
+        return rows, states
+
+    def _record_rows(self, table: str, entries: List[tuple], failed: List[tuple]):
+        self.metrics["rows_written"] += len(entries) - len(failed)
+        if not failed:
+            return
+        self.metrics["failed_writes"] += len(failed)
+        retry = [(row, attempts + 1) for row, attempts in failed if attempts + 1 < self.max_retries]
+        self.metrics["dropped_writes"] += len(failed) - len(retry)
+        if retry:
+            self.metrics["retried_writes"] += len(retry)
+            with self._lock:
+                # Ahead of anything queued during the flush, to keep insert order
+                self._rows[table][:0] = retry
+
+    def _record_state(self, state: Dict, status: str, attempts: int, ok: bool):
+        if ok:
+            self.metrics["states_written"] += 1
+            return
+        self.metrics["failed_writes"] += 1
+        with self._lock:
+            if state["execution_id"] in self._states:
+                return  # a newer state was queued during the flush and supersedes this one
+            if attempts + 1 < self.max_retries:
+                self.metrics["retried_writes"] += 1
+                self._states[state["execution_id"]] = (state, status, attempts + 1)
+                return
+        self.metrics["dropped_writes"] += 1
+
+    def _record_flush(self, started: float, rows: Dict, states: Dict) -> int:
+        with self._lock:
+            self._flushing = ({}, {})  # stored or requeued by now
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.metrics["flushes"] += 1
+        self.metrics["last_flush_ms"] = round(elapsed_ms, 2)
+        self.metrics["total_flush_ms"] = round(self.metrics["total_flush_ms"] + elapsed_ms, 2)
+        return len(rows) + len(states)
+
+    async def aflush(self) -> int:
+        '''Flush on a worker thread so the event loop keeps running'''
+        return await asyncio.to_thread(self.flush)
+
+    # ---------- background flusher ----------
+
+    def start(self):
+        '''Start the interval flusher. Must be called from inside an event loop.'''
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        '''Stop the interval flusher and flush whatever is left'''
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.aflush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.pending():
+                self.metrics["interval_flushes"] += 1
+                await self.aflush()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["pending"] = self.pending()
+        metrics["avg_flush_ms"] = round(
+            metrics["total_flush_ms"] / metrics["flushes"], 2
+        ) if metrics["flushes"] else 0.0
+        return metrics
+
+class CoordinationLayer(CoordinationCore):
     '''
     The 'Whiteboard' where all agents read/write state.
     Uses Supabase (persistent) + Redis (cache).
@@ -65,36 +321,23 @@ class CoordinationLayer:
     - portfolios
     - balances
     - agent_executions
+    - agent_state_deltas (execution_id, version, ops, is_snapshot, state_data)
     - agent_decisions
     - agent_reasoning
     - risk_assessments
     - executed_transactions
+
+    State versioning, cache layout and row shapes live in CoordinationCore;
+    this class only does the (blocking) I/O.
     '''
 
-    def __init__(self, supabase_url: str = None, supabase_key: str = None, redis_url: str = None):
-        # Load from env if not provided
-        self.url = supabase_url or os.getenv("SUPABASE_URL")
-        self.key = supabase_key or os.getenv("SUPABASE_KEY")
-
-        if not self.url or not self.key:
-            # We allow initialization without keys for testing, but warn
-            print("Warning: SUPABASE_URL and SUPABASE_KEY not found. Operations will fail.")
-            self.supabase = None
-        else:
-            self.supabase: Client = create_client(self.url, self.key)
-
-        # Redis Client (Optional)
-        self.redis_url = redis_url or os.getenv("REDIS_URL")
-        self.redis_enabled = False
-        if self.redis_url:
-            try:
-                self.redis = redis.from_url(self.redis_url)
-                self.redis_enabled = True
-                print("✅ Redis Cache Enabled")
-            except Exception as e:
-                print(f"⚠️ Redis connection failed: {e}. Using Supabase only.")
+    write_buffer_class = WriteBehindBuffer
+
+    def _connect_supabase(self) -> Client:
+        return create_client(self.url, self.key)
 
-        self.cache_ttl = 300  # 5 minutes
+    def _connect_redis(self, url: str):
+        return redis.from_url(url)
 
     # ==================== 1. PORTFOLIO & WALLET ====================
 
@@ -110,17 +353,27 @@ class CoordinationLayer:
             print(f"Error fetching portfolio: {e}")
             return None
 
+    def get_portfolios_by_addresses(self, wallet_addresses: List[str], chunk_size: int = 200) -> Dict[str, Dict]:
+        '''Portfolios for many wallets, one request per `chunk_size` addresses'''
+        if not self.supabase: return {}
+        portfolios = {}
+        try:
+            for i in range(0, len(wallet_addresses), chunk_size):
+                chunk = wallet_addresses[i:i + chunk_size]
+                result = self.supabase.table("portfolios").select("*").in_("wallet_address", chunk).execute()
+                portfolios.update({row["wallet_address"]: row for row in result.data or []})
+        except Exception as e:
+            print(f"Error fetching portfolios: {e}")
+        return portfolios
+
     def create_portfolio(self, user_id: str, wallet_address: str, chain_id: int = 1) -> str:
         '''Create new portfolio if doesn't exist'''
         if not self.supabase: return None
         try:
-            data = {
-                "user_id": user_id,
-                "wallet_address": wallet_address,
-                "chain_id": chain_id
-            }
             # Uses upsert to avoid duplicates
-            result = self.supabase.table("portfolios").upsert(data, on_conflict="wallet_address").execute()
+            result = self.supabase.table("portfolios").upsert(
+                self._portfolio_row(user_id, wallet_address, chain_id), on_conflict="wallet_address"
+            ).execute()
             # result.data is a list of inserted rows
             if result.data:
                 return result.data[0]['id']
@@ -131,24 +384,42 @@ class CoordinationLayer:
 
     # ==================== 2. STATE MANAGEMENT (EXECUTION) ====================
 
-    def read_state(self, execution_id: str) -> Optional[AgentState]:
+    def read_state(self, execution_id: str, version: int = None) -> Optional[AgentState]:
         '''
-        Read current state for this execution.
-        Tries Redis first, then Supabase 'agent_executions' table.
+        Read current state for this execution (or an older `version`).
+        Tries Redis first, then the Supabase 'agent_state_deltas' log,
+        then the 'agent_executions' table.
         '''
-        # 1. Try Cache
+        # 1. Try Cache (only holds deltas since the latest snapshot)
         if self.redis_enabled:
             try:
-                cache_key = f"state:{execution_id}"
-                cached = self.redis.get(cache_key)
-                if cached:
-                    return json.loads(cached)
+                state = self._state_from_cache(self._cache_read_pipeline(execution_id).execute(), version)
+                if state is not None:
+                    return state
             except Exception:
-                pass
+                pass  # includes a gap in the cached log: Supabase has the full log
+
+        # 2. Try the writes that have not been flushed yet
+        state, pending = self._unflushed_state(execution_id, version)
+        if state is not None:
+            return state
 
-        # 2. Try Supabase
+        # 3. Try Supabase
         if not self.supabase: return None
         try:
+            query = self.supabase.table("agent_state_deltas").select("version, state_data").eq("execution_id", execution_id).eq("is_snapshot", True)
+            if version is not None:
+                query = query.lte("version", version)
+            snaps = query.order("version", desc=True).limit(1).execute()
+
+            if snaps.data:
+                snap = snaps.data[0]
+                query = self.supabase.table("agent_state_deltas").select("version, ops").eq("execution_id", execution_id).gt("version", snap["version"])
+                if version is not None:
+                    query = query.lte("version", version)
+                deltas = query.order("version").execute()
+                return self._state_from_log(execution_id, snap, (deltas.data or []) + pending, version)
+
             result = self.supabase.table("agent_executions").select("state_data").eq("execution_id", execution_id).single().execute()
             if result.data:
                 return result.data["state_data"]
@@ -157,47 +428,136 @@ class CoordinationLayer:
 
         return None
 
-    def write_state(self, state: AgentState):
+    def write_state(self, state: AgentState, snapshot: bool = False, status: str = "running"):
         '''
         Write updated state to 'agent_executions' table.
         Also updates Redis cache.
+
+        Only the keys that changed since the last write are persisted, as a
+        versioned entry in 'agent_state_deltas'. Every
+        STATE_SNAPSHOT_INTERVAL versions (or when `snapshot=True`) the full
+        state is written instead, and 'agent_executions.state_data' is
+        refreshed. Supabase writes go through the write-behind buffer.
+
+        `status` is stored on 'agent_executions' with the snapshot; pass
+        snapshot=True with "completed"/"failed" when an execution ends.
         '''
-        state["updated_at"] = datetime.utcnow().isoformat()
+        if self._needs_seed(state["execution_id"]):
+            self.state_log.seed(state["execution_id"], self._latest_version(state["execution_id"]))
+
+        entry = self._record_state(state, snapshot, status)
+        if entry is None:
+            return
 
-        # 1. Update Supabase
+        # 1. Queue Supabase writes
         if self.supabase:
-            try:
-                self.supabase.table("agent_executions").update({
-                    "state_data": state,
-                    "status": "running",
-                    "updated_at": state["updated_at"]
-                }).eq("execution_id", state["execution_id"]).execute()
-            except Exception as e:
-                print(f"Error writing state to Supabase: {e}")
+            self._queue_state_entry(entry, status)
 
         # 2. Update Cache
         if self.redis_enabled:
             try:
-                cache_key = f"state:{state['execution_id']}"
-                self.redis.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps(state, default=str)
-                )
+                self._cache_entry_pipeline(entry).execute()
             except Exception:
                 pass
 
+    def _latest_version(self, execution_id: str) -> int:
+        '''Highest state version stored for an execution the state log is not tracking (-1 = none)'''
+        if not self.supabase:
+            return -1
+        version = self._unflushed_version(execution_id)
+        if version is not None:
+            return version
+        try:
+            result = self.supabase.table("agent_state_deltas").select("version").eq("execution_id", execution_id).order("version", desc=True).limit(1).execute()
+            return result.data[0]["version"] if result.data else -1
+        except Exception as e:
+            print(f"Error reading state version: {e}")
+            return -1
+
+    def _write_state_row(self, state: Dict, status: str = "running") -> bool:
+        '''Write one state row to 'agent_executions' (called by the write buffer)'''
+        try:
+            self.supabase.table("agent_executions").update(
+                self._state_row(state, status)
+            ).eq("execution_id", state["execution_id"]).execute()
+            return True
+        except Exception as e:
+            print(f"Error writing state to Supabase: {e}")
+            return False
+
+    def _bulk_insert(self, table: str, rows: List[Dict]) -> str:
+        '''Insert many rows in one request (called by the write buffer)'''
+        try:
+            self.supabase.table(table).insert(rows).execute()
+            return INSERTED
+        except Exception as e:
+            print(f"Error bulk inserting {len(rows)} rows into {table}: {e}")
+            return REJECTED if self._rows_rejected(e) else UNAVAILABLE
+
+    @staticmethod
+    def _rows_rejected(error: Exception) -> bool:
+        '''
+        True if PostgREST refused the rows themselves (a 4xx), so inserting
+        them one by one can save the good ones. supabase-py only passes on
+        the error code: PostgreSQL data (22), constraint (23) and
+        column/permission (42) errors, PostgREST request errors (PGRST1xx/2xx)
+        or the HTTP status when the body was not JSON.
+        '''
+        if not isinstance(error, APIError):
+            return False  # connection failure
+        code = error.code
+        if isinstance(code, int):
+            return 400 <= code < 500
+        code = str(code or "")
+        return code[:2] in ("22", "23", "42") or code.startswith(("PGRST1", "PGRST2"))
+
+    def get_execution(self, execution_id: str) -> Optional[Dict]:
+        '''Fetch one 'agent_executions' row (status + last snapshot)'''
+        if not self.supabase: return None
+        try:
+            result = self.supabase.table("agent_executions").select("execution_id, portfolio_id, status, created_at, updated_at, state_data").eq("execution_id", execution_id).limit(1).execute()
+            if result.data:
+                return self._with_unflushed_state(result.data[0])
+        except Exception as e:
+            print(f"Error fetching execution: {e}")
+        return None
+
+    def list_executions(self, limit: int = 50, offset: int = 0, status: str = None, portfolio_id: str = None) -> List[Dict]:
+        '''Page through 'agent_executions' newest first (without state_data)'''
+        if not self.supabase: return []
+        try:
+            query = self.supabase.table("agent_executions").select("execution_id, portfolio_id, status, created_at, updated_at")
+            if status:
+                query = query.eq("status", status)
+            if portfolio_id:
+                query = query.eq("portfolio_id", portfolio_id)
+            result = query.order("created_at", desc=True).range(offset, offset + limit - 1).execute()
+            return result.data or []
+        except Exception as e:
+            print(f"Error listing executions: {e}")
+            return []
+
+    # ==================== WRITE-BEHIND CONTROL ====================
+
+    def flush(self) -> int:
+        '''Flush all queued audit writes (call when an execution ends)'''
+        return self.write_buffer.flush()
+
+    async def aflush(self) -> int:
+        '''Flush all queued audit writes without blocking the event loop'''
+        return await self.write_buffer.aflush()
+
+    async def close(self):
+        '''Stop the interval flusher and flush remaining writes'''
+        await self.write_buffer.stop()
+
     def init_execution(self, portfolio_id: str, initial_state: AgentState) -> str:
         '''Create a new row in agent_executions'''
         if not self.supabase: return "mock_execution_id"
         try:
-            data = {
-                "portfolio_id": portfolio_id,
-                "state_data": initial_state,
-                "status": "running"
-            }
-            result = self.supabase.table("agent_executions").insert(data).execute()
+            result = self.supabase.table("agent_executions").insert(self._execution_row(portfolio_id, initial_state)).execute()
             if result.data:
+                self.state_log.seed(result.data[0]['execution_id'], -1)  # nothing stored yet
                 return result.data[0]['execution_id']
             return None
         except Exception as e:
@@ -217,17 +577,9 @@ class CoordinationLayer:
     ):
         '''Log high-level choice to 'agent_decisions' table'''
         if not self.supabase: return
-        try:
-            self.supabase.table("agent_decisions").insert({
-                "execution_id": execution_id,
-                "portfolio_id": portfolio_id,
-                "agent_name": agent_name,
-                "decision_type": decision_type,
-                "decision_data": decision_data,
-                "reasoning": reasoning
-            }).execute()
-        except Exception as e:
-            print(f"Error logging decision: {e}")
+        self.write_buffer.add_row("agent_decisions", self._decision_row(
+            portfolio_id, execution_id, agent_name, decision_type, decision_data, reasoning
+        ))
 
     def log_agent_reasoning(
         self,
@@ -238,16 +590,9 @@ class CoordinationLayer:
         reasoning_text: str
     ):
         '''Log granular thought process to 'agent_reasoning' table'''
+        row = self._reasoning_row(execution_id, agent_name, step_number, reasoning_text)
         if not self.supabase: return
-        try:
-            self.supabase.table("agent_reasoning").insert({
-                "execution_id": execution_id,
-                "agent_name": agent_name,
-                "step_number": step_number,
-                "reasoning_text": reasoning_text
-            }).execute()
-        except Exception as e:
-            print(f"Error logging reasoning: {e}")
+        self.write_buffer.add_row("agent_reasoning", row)
 
     # ==================== 4. RISK ASSESSMENTS ====================
 
@@ -262,17 +607,9 @@ class CoordinationLayer:
     ):
         '''Record EBM output to 'risk_assessments' table'''
         if not self.supabase: return
-        try:
-            self.supabase.table("risk_assessments").insert({
-                "execution_id": execution_id,
-                "portfolio_id": portfolio_id,
-                "protocol": protocol,
-                "risk_score": risk_score,
-                "risk_factors": risk_factors,
-                "safe": safe
-            }).execute()
-        except Exception as e:
-            print(f"Error recording risk: {e}")
+        self.write_buffer.add_row("risk_assessments", self._risk_row(
+            portfolio_id, execution_id, protocol, risk_score, risk_factors, safe
+        ))
 
     # ==================== 5. TRANSACTIONS & BALANCES ====================
 
@@ -280,15 +617,9 @@ class CoordinationLayer:
         '''Update 'balances' table'''
         if not self.supabase: return
         try:
-            data = {
-                "portfolio_id": portfolio_id,
-                "asset": asset,
-                "amount": amount,
-                "location": location
-            }
             # Insert new record. If you want updates, you need a constraint and upsert.
             # Assuming simple insert for now.
-            self.supabase.table("balances").insert(data).execute() 
+            self.supabase.table("balances").insert(self._balance_row(portfolio_id, asset, location, amount)).execute()
 
         except Exception as e:
             print(f"Error updating balance: {e}")
@@ -306,14 +637,8 @@ class CoordinationLayer:
         '''Record tx to 'executed_transactions' table'''
         if not self.supabase: return
         try:
-            self.supabase.table("executed_transactions").insert({
-                "execution_id": execution_id,
-                "portfolio_id": portfolio_id,
-                "tx_hash": tx_hash,
-                "protocol": protocol,
-                "action": action,
-                "amount": amount,
-                "status": status
-            }).execute()
+            self.supabase.table("executed_transactions").insert(self._transaction_row(
+                portfolio_id, execution_id, tx_hash, protocol, action, amount, status
+            )).execute()
         except Exception as e:
             print(f"Error recording transaction: {e}")
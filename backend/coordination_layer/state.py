@@ -1,4 +1,4 @@
-from typing import TypedDict, Optional, Dict, List, Any
+from typing import TypedDict, Optional, Dict, List, Any, Annotated
 
 class AgentState(TypedDict):
     '''
@@ -42,4 +42,68 @@ class AgentState(TypedDict):
 
     # Timestamps
     created_at: str
-    updated_at: str
\ No newline at end of file
+    updated_at: str
+
+# ==================== PARALLEL MODE ====================
+# When several agents run in the same graph step, LangGraph merges their
+# partial updates key by key with these reducers.
+
+def append_items(left: Optional[List], right: Optional[List]) -> List:
+    '''Lists grow: each agent returns only the items it appended'''
+    return (left or []) + (right or [])
+
+def take_latest(left: Any, right: Any) -> Any:
+    '''Scalar/dict outputs: the last update wins'''
+    return right
+
+def take_max(left: Any, right: Any) -> Any:
+    '''Counters and ISO timestamps only move forward'''
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return max(left, right)
+
+class ParallelAgentState(TypedDict):
+    '''
+    AgentState for the parallel workflow graph.
+    Same keys as AgentState, plus `parallel_agents`, each with a reducer
+    so concurrent agents can update the state in the same step.
+    '''
+    # Execution Context
+    portfolio_id: Annotated[str, take_latest]
+    execution_id: Annotated[str, take_latest]
+    user_input: Annotated[str, take_latest]
+
+    # Wallet & Portfolio (READ by all agents)
+    wallet_address: Annotated[str, take_latest]
+    chain_id: Annotated[int, take_latest]
+
+    # Current Balances / Active Positions
+    balances: Annotated[Dict[str, float], take_latest]
+    positions: Annotated[Dict[str, Dict[str, Any]], take_latest]
+
+    # Agent Outputs (each written by exactly one agent)
+    orchestrator_decision: Annotated[Optional[Dict], take_latest]
+    defi_proposal: Annotated[Optional[Dict], take_latest]
+    risk_assessment: Annotated[Optional[Dict], take_latest]
+    prediction_forecast: Annotated[Optional[Dict], take_latest]
+    productivity_actions: Annotated[Optional[List], take_latest]
+    qa_results: Annotated[Optional[Dict], take_latest]
+
+    # Execution History
+    executed_transactions: Annotated[List[Dict], append_items]
+    pending_transactions: Annotated[List[Dict], append_items]
+
+    # Reasoning Chain
+    agent_reasoning: Annotated[List[str], append_items]
+
+    # Control Flow
+    next_agent: Annotated[str, take_latest]
+    parallel_agents: Annotated[List[str], take_latest]  # set by Orchestrator to fan out
+    iteration_count: Annotated[int, take_max]
+    error_messages: Annotated[List[str], append_items]
+
+    # Timestamps
+    created_at: Annotated[str, take_latest]
+    updated_at: Annotated[str, take_max]
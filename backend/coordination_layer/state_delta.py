@@ -0,0 +1,199 @@
+import copy
+import json
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+def diff_state(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict]:
+    '''
+    JSON-patch style delta between two states (top-level keys only).
+
+    - Lists that only grew at the end (agent_reasoning, executed_transactions...)
+      become one {"op": "add", "path": "/key/-"} per appended item
+    - Any other changed key becomes {"op": "replace", "path": "/key"}
+    - Keys that disappeared become {"op": "remove", "path": "/key"}
+    '''
+    ops = []
+
+    for key, value in new.items():
+        if key not in old:
+            ops.append({"op": "add", "path": f"/{key}", "value": copy.deepcopy(value)})
+            continue
+
+        previous = old[key]
+        if previous == value:
+            continue
+
+        if (
+            isinstance(previous, list) and isinstance(value, list)
+            and len(value) > len(previous)
+            and value[:len(previous)] == previous
+        ):
+            for item in value[len(previous):]:
+                ops.append({"op": "add", "path": f"/{key}/-", "value": copy.deepcopy(item)})
+        else:
+            ops.append({"op": "replace", "path": f"/{key}", "value": copy.deepcopy(value)})
+
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"/{key}"})
+
+    return ops
+
+def apply_delta(state: Dict[str, Any], ops: List[Dict]) -> Dict[str, Any]:
+    '''Apply ops produced by diff_state() to `state` in place'''
+    for op in ops:
+        parts = op["path"].lstrip("/").split("/")
+        key = parts[0]
+
+        if op["op"] == "remove":
+            state.pop(key, None)
+        elif len(parts) == 2 and parts[1] == "-":
+            state.setdefault(key, []).append(copy.deepcopy(op["value"]))
+        else:
+            state[key] = copy.deepcopy(op["value"])
+
+    return state
+
+class StateGapError(ValueError):
+    '''A delta between the snapshot and the requested version is missing'''
+
+def rebuild_state(
+    snapshot: Dict[str, Any],
+    deltas: List[Dict],
+    version: int = None,
+    base_version: int = None
+) -> Dict[str, Any]:
+    '''
+    Rebuild a state from a snapshot and the delta entries recorded after it.
+    Stops at `version` if given, otherwise replays every delta.
+
+    With `base_version` (the snapshot's version) the deltas must follow it
+    without a gap; a missing version raises StateGapError instead of
+    silently skipping the changes it carried.
+    '''
+    state = copy.deepcopy(snapshot)
+    expected = base_version
+    for entry in sorted(deltas, key=lambda e: e["version"]):
+        if version is not None and entry["version"] > version:
+            break
+        if expected is not None:
+            if entry["version"] != expected + 1:
+                raise StateGapError(f"state delta v{expected + 1} missing (next is v{entry['version']})")
+            expected = entry["version"]
+        apply_delta(state, entry["ops"])
+    return state
+
+class StateDeltaLog:
+    '''
+    Versioned delta log for AgentState writes.
+
+    Keeps the last persisted copy of every execution's state and turns
+    each write into an entry with only the changed keys:
+
+        {"execution_id", "version", "ops", "is_snapshot", "state_data"}
+
+    Every `snapshot_interval` versions (and the first time an execution
+    is seen) the entry also carries the full state, so a read never has
+    to replay more than `snapshot_interval` deltas.
+
+    Shadow copies and version counters are kept for at most `max_executions`
+    executions (LRU), and dropped by forget() when an execution ends. An
+    execution that is not tracked gets a fresh snapshot on its next write,
+    numbered after the version given to seed() (the layers read it from the
+    store) so versions stay monotonic.
+    '''
+
+    def __init__(self, snapshot_interval: int = 10, max_executions: int = 10000):
+        self.snapshot_interval = snapshot_interval
+        self.max_executions = max_executions
+        self._shadows: "OrderedDict[str, Dict]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+        self.metrics = {
+            "writes": 0,
+            "unchanged": 0,
+            "snapshots": 0,
+            "delta_bytes": 0,
+            "snapshot_bytes": 0
+        }
+
+    def record(self, state: Dict[str, Any], snapshot: bool = False) -> Optional[Dict]:
+        '''
+        Turn a state write into a delta entry. Returns None if nothing changed.
+        `snapshot=True` forces a full snapshot (e.g. for the final state).
+        '''
+        execution_id = state["execution_id"]
+        shadow = self._shadows.get(execution_id)
+
+        if shadow is None or snapshot:
+            version = self._versions.get(execution_id, -1) + 1
+            return self._snapshot(execution_id, version, state)
+
+        ops = diff_state(shadow, state)
+        if not ops:
+            self.metrics["unchanged"] += 1
+            return None
+
+        version = self._versions[execution_id] + 1
+        if version % self.snapshot_interval == 0:
+            return self._snapshot(execution_id, version, state)
+
+        apply_delta(shadow, ops)
+        self._versions[execution_id] = version
+        self._shadows.move_to_end(execution_id)
+
+        self.metrics["writes"] += 1
+        self.metrics["delta_bytes"] += len(json.dumps(ops, default=str))
+
+        return {
+            "execution_id": execution_id,
+            "version": version,
+            "ops": ops,
+            "is_snapshot": False,
+            "state_data": None
+        }
+
+    def _snapshot(self, execution_id: str, version: int, state: Dict[str, Any]) -> Dict:
+        snapshot = json.loads(json.dumps(state, default=str))
+
+        self._shadows[execution_id] = copy.deepcopy(snapshot)
+        self._shadows.move_to_end(execution_id)
+        self._versions[execution_id] = version
+        while len(self._shadows) > self.max_executions:
+            evicted, _ = self._shadows.popitem(last=False)
+            self._versions.pop(evicted, None)
+
+        self.metrics["writes"] += 1
+        self.metrics["snapshots"] += 1
+        self.metrics["snapshot_bytes"] += len(json.dumps(snapshot))
+
+        return {
+            "execution_id": execution_id,
+            "version": version,
+            "ops": [],
+            "is_snapshot": True,
+            "state_data": snapshot
+        }
+
+    def version(self, execution_id: str) -> Optional[int]:
+        return self._versions.get(execution_id)
+
+    def latest(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        '''Copy of the last recorded state of a tracked execution (None if not tracked)'''
+        shadow = self._shadows.get(execution_id)
+        return copy.deepcopy(shadow) if shadow is not None else None
+
+    def seed(self, execution_id: str, version: int):
+        '''Set the last persisted version of an execution this log is not tracking (-1 = none)'''
+        self._versions.setdefault(execution_id, version)
+
+    def forget(self, execution_id: str):
+        '''Drop the shadow copy and version counter once an execution has ended'''
+        self._shadows.pop(execution_id, None)
+        self._versions.pop(execution_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        deltas = metrics["writes"] - metrics["snapshots"]
+        metrics["avg_delta_bytes"] = round(metrics["delta_bytes"] / deltas, 1) if deltas else 0.0
+        return metrics
@@ -1,18 +1,78 @@
+import copy
+from typing import Union
 from langgraph.graph import StateGraph, START, END
-from coordination_layer.state import AgentState
+from config.settings import settings
+from coordination_layer.state import AgentState, ParallelAgentState
 from coordination_layer.layer import CoordinationLayer
+from coordination_layer.async_layer import AsyncCoordinationLayer
+from agent_layer.base import in_fan_out
 from agent_layer.orchestrator import OrchestratorAgent
+from agent_layer.routing import RoutingPolicy
 from agent_layer.defi_agent import DeFiAgent
 from agent_layer.risk_agent import RiskAgent
 from agent_layer.prediction_agent import PredictionAgent
 from agent_layer.productivity_agent import ProductivityAgent
 from agent_layer.qa_agent import QAAgent
 
-def build_workflow(coord_layer: CoordinationLayer):
-    '''Build the LangGraph workflow with all agents'''
+# List keys merged by appending in parallel mode (see ParallelAgentState)
+APPEND_KEYS = ("agent_reasoning", "error_messages", "executed_transactions", "pending_transactions")
+
+def _partial_update_node(agent, join: bool = False):
+    '''
+    Wrap an agent for the parallel graph.
+    The agent works on its own deep copy of the state and the node returns
+    only what it changed (appended items for list keys), which LangGraph
+    then merges with the other agents' updates using the state reducers.
+
+    Agents running as branches of a fan-out do not persist their partial
+    state. The `join` node (the Orchestrator, where every branch returns)
+    writes the merged state once before it runs.
+    '''
+    async def node(state):
+        fanned_out = bool(state.get("parallel_agents"))
+        working = copy.deepcopy(dict(state))
+
+        if join and fanned_out:
+            await agent.write_state(working)
+
+        token = in_fan_out.set(fanned_out and not join)
+        try:
+            after = await agent.execute(working)
+        finally:
+            in_fan_out.reset(token)
+
+        update = {}
+        for key, value in after.items():
+            if key in APPEND_KEYS:
+                appended = value[len(state.get(key) or []):]
+                if appended:
+                    update[key] = appended
+            elif key not in state or state[key] != value:
+                update[key] = value
+        return update
+
+    return node
+
+def build_workflow(
+    coord_layer: Union[CoordinationLayer, AsyncCoordinationLayer],
+    routing_policy: RoutingPolicy = None,
+    parallel: bool = None
+):
+    '''
+    Build the LangGraph workflow with all agents.
+    `routing_policy` overrides settings.ORCHESTRATOR_ROUTING for the Orchestrator.
+
+    `parallel` (default settings.PARALLEL_AGENTS) lets the Orchestrator
+    dispatch a group of independent agents in one step, e.g. DeFi + Prediction.
+    Their partial updates are merged by the reducers on ParallelAgentState;
+    the agents in a fan-out do not write state themselves, the Orchestrator
+    node persists the merged state once when the branches join.
+    '''
+    if parallel is None:
+        parallel = settings.PARALLEL_AGENTS
 
     # Initialize agents
-    orchestrator = OrchestratorAgent(coord_layer)
+    orchestrator = OrchestratorAgent(coord_layer, routing_policy=routing_policy, parallel=parallel)
     defi_agent = DeFiAgent(coord_layer)
     risk_agent = RiskAgent(coord_layer)
     prediction_agent = PredictionAgent(coord_layer)
@@ -20,23 +80,25 @@ def build_workflow(coord_layer: CoordinationLayer):
     qa_agent = QAAgent(coord_layer)
 
     # Create graph
-    workflow = StateGraph(AgentState)
+    workflow = StateGraph(ParallelAgentState if parallel else AgentState)
+    wrap = _partial_update_node if parallel else (lambda agent: agent.execute)
 
     # Add nodes
-    workflow.add_node("orchestrator", orchestrator.execute)
-    workflow.add_node("defi_agent", defi_agent.execute)
-    workflow.add_node("risk_agent", risk_agent.execute)
-    workflow.add_node("prediction_agent", prediction_agent.execute)
-    workflow.add_node("productivity_agent", productivity_agent.execute)
-    workflow.add_node("qa_agent", qa_agent.execute)
+    workflow.add_node("orchestrator", _partial_update_node(orchestrator, join=True) if parallel else orchestrator.execute)
+    workflow.add_node("defi_agent", wrap(defi_agent))
+    workflow.add_node("risk_agent", wrap(risk_agent))
+    workflow.add_node("prediction_agent", wrap(prediction_agent))
+    workflow.add_node("productivity_agent", wrap(productivity_agent))
+    workflow.add_node("qa_agent", wrap(qa_agent))
 
     # Add edges
     workflow.add_edge(START, "orchestrator")
 
     # Conditional routing from orchestrator
+    # (a list of agents fans out; they all run in the same step)
     workflow.add_conditional_edges(
         "orchestrator",
-        lambda state: state["next_agent"],
+        lambda state: state.get("parallel_agents") or state["next_agent"],
         {
             "defi_agent": "defi_agent",
             "risk_agent": "risk_agent",
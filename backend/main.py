@@ -5,6 +5,8 @@ from config.settings import settings
 from coordination_layer.layer import CoordinationLayer
 from coordination_layer.state import AgentState
 from graph.workflow import build_workflow
+from tools.web3_tools import tx_pipeline
+from tools.portfolio_snapshot import portfolio_state
 
 async def main():
     print("\n" + "="*60)
@@ -33,6 +35,9 @@ async def main():
         print("❌ Failed to create/get portfolio. Using mock ID for demo.")
         portfolio_id = str(uuid.uuid4())  # Generate a UUID for demo purposes
 
+    # On-chain balances and positions (demo portfolio if the wallet can't be read)
+    balances, positions = await portfolio_state(wallet_address)
+
     # Create initial state
     temp_execution_id = str(uuid.uuid4())
 
@@ -42,8 +47,8 @@ async def main():
         "user_input": "Find me the best yield opportunity for my USDC",
         "wallet_address": settings.DEFAULT_WALLET or "0xDemo...",
         "chain_id": 1,
-        "balances": {"USDC": 10000, "ETH": 2},
-        "positions": {"Aave": {"USDC": 10000, "apy": 0.05}},
+        "balances": balances,
+        "positions": positions,
         "orchestrator_decision": None,
         "defi_proposal": None,
         "risk_assessment": None,
@@ -97,10 +102,22 @@ async def main():
         print(f"\n✅ QA RESULTS:")
         print(f"  {final_state.get('qa_results')}")
 
+        # Transactions are broadcast without waiting - wait for their receipts before exiting
+        pending = [tx for tx in final_state["executed_transactions"] if tx.get("status") == "pending"]
+        if pending:
+            print(f"\n⛓️ WAITING FOR {len(pending)} RECEIPT(S):")
+            for tx in pending:
+                receipt = await asyncio.to_thread(tx_pipeline.wait, tx["hash"], tx_pipeline.receipt_timeout)
+                print(f"  {tx['hash']} mined in block {receipt.blockNumber} (status {receipt.status})")
+
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
         import traceback
         traceback.print_exc()
 
+    finally:
+        # Push queued audit writes before exiting
+        coord_layer.flush()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,421 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Bisection steps for a water level; the final allocation is interpolated
+# between the last bracket, so sums are exact regardless
+BISECT_STEPS = 48
+
+# Why a plan holds instead of moving (index into HOLD_REASONS; -1 = act)
+HOLD_REASONS = ("no_balance", "no_better_allocation", "gain_below_min", "gas_exceeds_gain")
+
+class AllocationOptimizer:
+    '''
+    Splits a portfolio's capital across many pools.
+
+    For a target allocation x (USD per pool) and current holdings x0 it maximises,
+    over a `horizon_days` payback horizon,
+
+        sum_i  m_i * x_i  -  k_i * max(x_i - x0_i, 0)^2  -  gas for every touched pool
+
+    where m_i = risk-adjusted APY * horizon / 365 and k_i = slippage / TVL_i
+    (price impact grows linearly with the size of a deposit relative to the
+    pool). Constraints: sum x <= budget, x_i <= max_protocol_share * budget
+    summed over each protocol's pools, and pools at or above the risk ceiling
+    cannot receive new funds. Both limits apply to new money only: existing
+    holdings above them are kept, never force-withdrawn.
+
+    Without the gas term the problem is concave and separable, so the optimum
+    is water-filling: every pool is filled until its marginal gain
+    m_i - 2 k_i (x_i - x0_i) drops to a common level. The level is found by
+    vectorised bisection, first per protocol (for its cap) and then for the
+    budget. Gas is fixed per touched pool, so legs that do not pay for their
+    gas are pruned and the plan is re-solved.
+
+    A plan is only proposed if it beats holding, gains more than
+    `min_apy_gain` APY per dollar moved (when set) and, when gas is priced,
+    earns more than its gas. solve() decides many portfolios at once; the
+    DeFi Agent, the BulkRebalancer and the backtest all go through it.
+    '''
+
+    def __init__(
+        self,
+        horizon_days: float = 30.0,
+        slippage: float = 0.5,
+        max_protocol_share: float = 0.5,
+        risk_ceiling: float = 3.0,
+        max_move: float = None,
+        min_apy_gain: float = None
+    ):
+        self.horizon_days = horizon_days
+        self.slippage = slippage
+        self.max_protocol_share = max_protocol_share
+        self.risk_ceiling = risk_ceiling
+        self.max_move = max_move
+        self.min_apy_gain = min_apy_gain
+
+    # ---------- water-filling ----------
+
+    @staticmethod
+    def _fill(level: np.ndarray, m: np.ndarray, k2: np.ndarray, x0: np.ndarray, u: np.ndarray) -> np.ndarray:
+        '''Allocation per pool at water level `level` (held funds stay while m_i > level)'''
+        x = np.minimum(x0 + np.maximum(m - level, 0.0) / k2, u)
+        return np.where(m > level, x, 0.0)
+
+    def _water_fill(self, m, k2, x0, u, group, targets, floor) -> np.ndarray:
+        '''
+        For every group g, the allocation whose total is targets[g] (or the
+        fill at `floor` if that total is not reachable above it).
+        `group` gives each pool's group; None means one group per row of 2-D inputs.
+        Bisects one level per binding group at once; each step is one sum per group.
+        '''
+        if group is None:
+            spread = lambda level, g: level[:, None]
+            sums = lambda values, g, n: values.sum(axis=1)
+        else:
+            spread = lambda level, g: level[g]
+            sums = lambda values, g, n: np.bincount(g, weights=values, minlength=n)
+
+        x = self._fill(floor, m, k2, x0, u)
+        binding = sums(x, group, len(targets)) > targets
+        if not binding.any():
+            return x
+
+        # Only the pools of groups whose target binds need a level
+        if group is None:
+            pools, g = binding, None
+            targets = targets[binding]
+        else:
+            pools = binding[group]
+            ids, g = np.unique(group[pools], return_inverse=True)
+            targets = targets[ids]
+        m, k2, x0, u = m[pools], k2[pools], x0[pools], u[pools]
+        groups = len(targets)
+        total = lambda level: sums(self._fill(spread(level, g), m, k2, x0, u), g, groups)
+
+        lo = np.full(groups, floor, dtype=float)
+        hi = np.full(groups, m.max(), dtype=float)
+        for _ in range(BISECT_STEPS):
+            mid = (lo + hi) / 2
+            over = total(mid) > targets
+            lo = np.where(over, mid, lo)
+            hi = np.where(over, hi, mid)
+
+        # x(hi) is under the target and x(lo) over it: share the remainder in
+        # proportion to what each pool gains between the two levels
+        x_hi = self._fill(spread(hi, g), m, k2, x0, u)
+        gap = self._fill(spread(lo, g), m, k2, x0, u) - x_hi
+        remainder = targets - sums(x_hi, g, groups)
+        gap_total = sums(gap, g, groups)
+        share = np.where(gap_total > 0, remainder / np.where(gap_total > 0, gap_total, 1.0), 0.0)
+        x[pools] = x_hi + gap * spread(np.clip(share, 0.0, 1.0), g)
+        return x
+
+    def _solve(self, m, k2, x0, u, protocol, protocol_cap, budget) -> np.ndarray:
+        '''(B, K) inputs; protocol_cap is (B, codes) for the pools' protocol codes'''
+        B, K = m.shape
+        codes = protocol_cap.shape[1]
+        group = (np.arange(B)[:, None] * codes + protocol[None, :]).ravel()
+        # Per-protocol caps: the most each pool can hold while its protocol is at the cap
+        capped = self._water_fill(
+            m.ravel(), k2.ravel(), x0.ravel(), u.ravel(), group, protocol_cap.ravel(),
+            floor=float((m - k2 * u).min()) - 1.0
+        ).reshape(B, K)
+        # Budget of each portfolio (level >= 0: money is never put where it earns less than idle)
+        return self._water_fill(m, k2, x0, capped, None, budget, floor=0.0)
+
+    def _allocate(self, m, k2, held, limit, protocol, protocol_cap, budget) -> np.ndarray:
+        '''Water-filled (B, K) allocation of B portfolios within `limit`, scaled to the move limit'''
+        return self._limit_move(held, self._solve(m, k2, np.minimum(held, limit), limit, protocol, protocol_cap, budget))
+
+    def _limit_move(self, held: np.ndarray, x: np.ndarray) -> np.ndarray:
+        '''Scale each portfolio's move toward x so at most max_move is deposited (keeps every constraint)'''
+        if self.max_move is None:
+            return x
+        inflow = np.maximum(x - held, 0.0).sum(axis=1, keepdims=True)
+        scale = np.where(inflow > self.max_move, self.max_move / np.where(inflow > 0, inflow, 1.0), 1.0)
+        return held + (x - held) * scale
+
+    # ---------- batch ----------
+
+    @staticmethod
+    def stack(pools: List[Dict], positions: List[Dict[str, Dict]], asset: str = "USDC") -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        '''
+        Holdings of many portfolios as a (portfolios, pools) matrix.
+        A held position sits in its protocol's best indexed pool, or in a pool
+        of its own (unknown risk: may be held, not added to) if not indexed.
+        Returns the pools (extended), held amounts and each portfolio's APY per pool.
+        '''
+        pools = list(pools)
+        first_pool = {}
+        for i, pool in enumerate(pools):
+            first_pool.setdefault(pool["protocol"], i)
+
+        cells = []
+        for b, portfolio in enumerate(positions):
+            for protocol, position in portfolio.items():
+                amount = float(position.get(asset, 0) or 0)
+                if amount <= 0:
+                    continue
+                if protocol not in first_pool:
+                    first_pool[protocol] = len(pools)
+                    pools.append({
+                        "protocol": protocol,
+                        "pool_id": None,
+                        "apy": position.get("apy", 0.0),
+                        "risk_adjusted_apy": position.get("apy", 0.0),
+                        "risk_score": None,  # unknown: pool_arrays() treats it as unsafe
+                        "tvl": None
+                    })
+                cells.append((b, first_pool[protocol], amount, position.get("apy")))
+
+        held = np.zeros((len(positions), len(pools)))
+        apy = np.tile(np.array([p["apy"] for p in pools], dtype=float), (len(positions), 1))
+        for b, i, amount, position_apy in cells:
+            held[b, i] += amount
+            if pools[i]["pool_id"] is None and position_apy is not None:
+                apy[b, i] = position_apy  # unindexed pools earn what each portfolio reports
+        return pools, held, apy
+
+    @staticmethod
+    def pool_arrays(pools: List[Dict], gas_cost_usd: Dict[str, float] = None) -> Dict[str, np.ndarray]:
+        '''
+        Per-pool arrays for solve(); gas from a per protocol (lower-case) cost, None = not priced.
+        Unknown risk (None) becomes inf and unknown TVL nan, so such pools get no new money.
+        '''
+        names = [p["protocol"] for p in pools]
+        codes = {}
+        return {
+            "apy": np.array([p["apy"] for p in pools], dtype=float),
+            "risk_adjusted_apy": np.array([p.get("risk_adjusted_apy", p["apy"]) for p in pools], dtype=float),
+            "risk": np.array([np.inf if p.get("risk_score") is None else p["risk_score"] for p in pools], dtype=float),
+            "tvl": np.array([p.get("tvl") or np.nan for p in pools], dtype=float),
+            "protocol": np.array([codes.setdefault(n, len(codes)) for n in names], dtype=np.int64),
+            "gas": np.array([gas_cost_usd.get(n.lower(), 0.0) for n in names], dtype=float) if gas_cost_usd is not None else None
+        }
+
+    def solve(
+        self,
+        apy: np.ndarray,
+        risk_adjusted_apy: np.ndarray,
+        risk: np.ndarray,
+        tvl: np.ndarray,
+        protocol: np.ndarray,
+        held: np.ndarray,
+        idle: np.ndarray,
+        gas: np.ndarray = None,
+        horizon_days=None,
+        risk_ceiling=None,
+        min_apy_gain=None
+    ) -> Dict[str, np.ndarray]:
+        '''
+        Decide B portfolios over the same K pools at once.
+
+        apy, risk_adjusted_apy, risk, tvl: (K,) or (B, K). protocol: (K,) integer codes.
+        held: (B, K) current holdings; idle: (B,) uninvested cash.
+        gas: (K,) or (B, K) USD cost of touching each pool; None = not priced.
+        horizon_days, risk_ceiling, min_apy_gain: scalar or (B,); default the optimizer's.
+
+        Returns (B, K) "x" (what to hold: the target, or `held` where the
+        portfolio holds) and "target", plus per portfolio "reason" (-1 = act,
+        else an index into HOLD_REASONS) and the target's "budget", "gain",
+        "gas", "slippage", "moved" and "apy_gain".
+        '''
+        held = np.atleast_2d(np.asarray(held, dtype=float))
+        B, K = held.shape
+        per_row = lambda value, default: np.broadcast_to(np.asarray(default if value is None else value, dtype=float), (B,))
+        per_cell = lambda value: np.broadcast_to(np.asarray(value, dtype=float), (B, K))
+
+        horizon = per_row(horizon_days, self.horizon_days)[:, None]
+        ceiling = per_row(risk_ceiling, self.risk_ceiling)[:, None]
+        if min_apy_gain is None:
+            min_apy_gain = self.min_apy_gain
+        apy = per_cell(apy)
+        m = per_cell(risk_adjusted_apy) * horizon / 365
+        risk = per_cell(risk)
+        tvl = per_cell(tvl)
+        k2 = np.maximum(2 * self.slippage / np.where(tvl > 0, tvl, 1.0), 1e-18)  # unknown TVL: prohibitive slippage
+        cost = np.zeros((B, K)) if gas is None else per_cell(gas)
+        budget = np.asarray(idle, dtype=float).reshape(B) + held.sum(axis=1)
+
+        # Caps limit new money only: a protocol already above its share keeps what
+        # it holds (it is never forced out), and unsafe pools receive nothing new
+        protocol = np.asarray(protocol, dtype=np.int64)
+        codes = int(protocol.max()) + 1 if K else 1
+        cap = self.max_protocol_share * budget
+        held_protocol = np.bincount(
+            (np.arange(B)[:, None] * codes + protocol[None, :]).ravel(), weights=held.ravel(), minlength=B * codes
+        ).reshape(B, codes)
+        protocol_cap = np.maximum(cap[:, None], held_protocol)
+        u = np.where(risk < ceiling, np.maximum(cap[:, None], held), held)
+
+        # Solve, then drop new pools whose deposit does not pay for its gas and
+        # re-solve the portfolios that lost one, until no deposit loses
+        # (pools that lose even at the best deposit they could ever get never enter)
+        x = np.empty((B, K))
+        largest = np.minimum(np.maximum(u - held, 0.0), budget[:, None])
+        if self.max_move is not None:
+            largest = np.minimum(largest, self.max_move)
+        best = np.clip(m / k2, 0.0, largest)
+        allowed = m * best - k2 / 2 * best ** 2 - cost > 0
+        rows = np.arange(B)
+        while len(rows):
+            limit = np.where(allowed[rows], u[rows], np.minimum(held[rows], u[rows]))
+            x[rows] = self._allocate(m[rows], k2[rows], held[rows], limit, protocol, protocol_cap[rows], budget[rows])
+            inflow = np.maximum(x[rows] - held[rows], 0.0)
+            net = m[rows] * inflow - k2[rows] / 2 * inflow ** 2 - np.where(inflow > 1e-9, cost[rows], 0.0)
+            losing = allowed[rows] & (inflow > 1e-9) & (net <= 0)
+            allowed[rows] &= ~losing
+            rows = rows[losing.any(axis=1)]
+        inflow = np.maximum(x - held, 0.0)
+
+        # Whole plan: gain over holding vs every withdraw/deposit it needs
+        moved = np.abs(x - held) > 1e-9
+        slippage = (k2 / 2 * inflow ** 2).sum(axis=1)
+        gain = (m * (x - held)).sum(axis=1) - slippage
+        plan_gas = np.where(moved, cost, 0.0).sum(axis=1)
+        amount = inflow.sum(axis=1)
+        # APY gained per dollar moved (what MIN_APY_DIFF is compared against)
+        apy_gain = np.where(amount > 1e-9, (apy * (x - held)).sum(axis=1) / np.where(amount > 1e-9, amount, 1.0), 0.0)
+
+        # First failing rule wins
+        reason = np.full(B, -1)
+        checks = (
+            budget <= 0,
+            ~moved.any(axis=1) | (gain <= 0),
+            apy_gain <= per_row(min_apy_gain, 0.0) if min_apy_gain is not None else np.zeros(B, dtype=bool),
+            gain <= plan_gas if gas is not None else np.zeros(B, dtype=bool)
+        )
+        for code, failed in reversed(list(enumerate(checks))):
+            reason[failed] = code
+
+        return {
+            "x": np.where((reason == -1)[:, None], x, held),
+            "target": x,
+            "held": held,
+            "apy": apy,
+            "k2": k2,
+            "allowed": allowed,
+            "reason": reason,
+            "budget": budget,
+            "gain": gain,
+            "gas": plan_gas if gas is not None else None,
+            "slippage": slippage,
+            "moved": amount,
+            "apy_gain": apy_gain
+        }
+
+    # ---------- plan ----------
+
+    def optimize(
+        self,
+        pools: List[Dict],
+        positions: Dict[str, Dict],
+        idle: float,
+        asset: str = "USDC",
+        gas_cost_usd: Dict[str, float] = None
+    ) -> Dict:
+        '''
+        Rebalance plan for one portfolio.
+
+        pools: index rows ("protocol", "apy", "risk_adjusted_apy", "risk_score", "tvl", "pool_id").
+        positions: {protocol: {asset: amount, "apy": ...}} as held now.
+        idle: uninvested `asset` in the wallet.
+        gas_cost_usd: per protocol (lower-case) cost of one deposit/withdraw; None = unknown, not priced.
+        '''
+        pools, held, apy = self.stack(pools, [positions], asset)
+        if not pools or float(idle) + float(held.sum()) <= 0:
+            return self._plan(pools, held[0], held[0], float(idle) + float(held.sum()), {}, "No capital to allocate.")
+
+        arrays = self.pool_arrays(pools, gas_cost_usd)
+        arrays["apy"] = apy
+        solved = self.solve(held=held, idle=np.array([float(idle)]), **arrays)
+        return self.plan(pools, solved, 0)
+
+    def plan(self, pools: List[Dict], solved: Dict[str, np.ndarray], row: int) -> Dict:
+        '''Plan for one portfolio of a solve() result'''
+        held, x = solved["held"][row], solved["x"][row]
+        reason = int(solved["reason"][row])
+        gain = float(solved["gain"][row])
+        gas = float(solved["gas"][row]) if solved["gas"] is not None else None
+
+        reasoning = None
+        if reason == 0:
+            reasoning = "No capital to allocate."
+        elif reason == 1 and solved["moved"][row] > 1e-9:
+            reasoning = f"No allocation beats the current one over {self.horizon_days:g} days (best gain ${gain:.2f})."
+        elif reason == 1 and not solved["allowed"][row].all():
+            pruned = sorted({pools[i]["protocol"] for i in np.flatnonzero(~solved["allowed"][row])})
+            reasoning = f"No deposit into {', '.join(pruned)} covers its gas over {self.horizon_days:g} days. Not worth gas costs."
+        elif reason == 2:
+            reasoning = f"Best allocation gains only {solved['apy_gain'][row]:.2%} APY on the {solved['moved'][row]:.2f} USDC it moves. Not worth gas costs."
+        elif reason == 3:
+            reasoning = f"Best allocation earns ${gain:.2f} over {self.horizon_days:g} days, less than ~${gas:.2f} gas. Not worth gas costs."
+
+        if reason >= 0:
+            # Holding: nothing is gained, paid or moved
+            gain, gas = 0.0, (0.0 if gas is not None else None)
+        stats = {"apy": solved["apy"][row], "gain": gain, "gas": gas, "k2": solved["k2"][row]}
+        plan = self._plan(pools, held, x, float(solved["budget"][row]), stats, reasoning)
+        plan["hold_reason"] = HOLD_REASONS[reason] if reason >= 0 else None
+        return plan
+
+    @staticmethod
+    def _legs(pools: List[Dict], held: np.ndarray, x: np.ndarray, idle: float) -> List[Dict]:
+        '''Pair withdrawals (then idle cash) with deposits, largest first'''
+        delta = x - held
+        sources = [(pools[i]["protocol"], -delta[i]) for i in np.argsort(delta) if delta[i] < -1e-9]
+        if idle > 1e-9:
+            sources.append(("wallet", idle))
+        destinations = [(pools[i]["protocol"], delta[i]) for i in np.argsort(-delta) if delta[i] > 1e-9]
+
+        legs = []
+        s = 0
+        for destination, need in destinations:
+            while need > 1e-9 and s < len(sources):
+                source, available = sources[s]
+                amount = min(need, available)
+                if source != destination:
+                    legs.append({"source": source, "destination": destination, "amount": round(float(amount), 6)})
+                need -= amount
+                available -= amount
+                if available <= 1e-9:
+                    s += 1
+                else:
+                    sources[s] = (source, available)
+        return legs
+
+    def _plan(self, pools, held, x, budget, stats, reasoning: str = None) -> Dict:
+        apy = stats.get("apy")
+        idle = budget - float(held.sum())
+        current_apy = float(apy @ held) / budget if apy is not None and budget > 0 else 0.0
+        expected_apy = float(apy @ x) / budget if apy is not None and budget > 0 else 0.0
+        # APY gained per dollar moved (what MIN_APY_DIFF is compared against)
+        moved = float(np.maximum(x - held, 0.0).sum())
+        moved_gain = float(apy @ (x - held)) / moved if apy is not None and moved > 1e-9 else 0.0
+        slippage = float((stats["k2"] / 2 * np.maximum(x - held, 0.0) ** 2).sum()) if "k2" in stats else 0.0
+
+        allocation = [
+            {
+                "protocol": pools[i]["protocol"],
+                "pool_id": pools[i].get("pool_id"),
+                "amount": round(float(x[i]), 6),
+                "current": round(float(held[i]), 6),
+                "apy": pools[i]["apy"],
+                "risk_score": pools[i].get("risk_score")
+            }
+            for i in np.argsort(-x) if x[i] > 1e-9 or held[i] > 1e-9
+        ]
+        return {
+            "budget": budget,
+            "allocation": allocation,
+            "legs": self._legs(pools, held, x, idle),
+            "idle_after": round(budget - float(x.sum()), 6),
+            "moved": round(moved, 6),
+            "current_apy": current_apy,
+            "expected_apy": expected_apy,
+            "apy_gain": moved_gain,
+            "expected_gain_usd": stats.get("gain"),
+            "slippage_usd": slippage,
+            "gas_cost_usd": stats.get("gas"),
+            "reasoning": reasoning
+        }
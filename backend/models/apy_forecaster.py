@@ -0,0 +1,276 @@
+import threading
+import numpy as np
+from typing import Dict, List, Iterable, Optional
+from config.settings import settings
+
+# Forecast labels
+TRENDS = ("down", "stable", "up")
+VOLATILITY_LEVELS = ((0.001, "low"), (0.005, "medium"), (np.inf, "high"))  # std of per-step APY change
+
+class APYForecaster:
+    '''
+    Per-protocol APY forecasting over a rolling window.
+
+    Every protocol is one row of a set of arrays, and all fitted statistics
+    are running sums over the last `window` observations, updated when a
+    point arrives (and subtracted when it drops out of the window):
+
+    - EWMA level and EWMA variance of APY changes (RiskMetrics style)
+    - AR(1) fit x[t] = c + phi * x[t-1], from sums of (x[t-1], x[t]) pairs
+    - volatility: std of per-step APY changes
+
+    update() takes one new point for many protocols in a single NumPy pass;
+    forecast() only evaluates the closed-form AR(1) forecast from the cached
+    parameters, so nothing is refit per request.
+    '''
+
+    def __init__(self, window: int = 288, alpha: float = 0.1, step_seconds: float = 300.0, capacity: int = 64):
+        self.window = window
+        self.alpha = alpha
+        self.step_seconds = step_seconds
+
+        self._lock = threading.Lock()
+        self._row: Dict[str, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self.apy = np.zeros((capacity, self.window))  # ring buffers
+        self.tvl = np.zeros((capacity, self.window))
+        self.count = np.zeros(capacity, dtype=np.int64)  # points seen (not capped)
+        self.level = np.zeros(capacity)  # EWMA of APY
+        self.ewma_var = np.zeros(capacity)  # EWMA of squared APY changes
+
+        # Running sums over the window's consecutive pairs (x = x[t-1], y = x[t])
+        self.sx = np.zeros(capacity)
+        self.sy = np.zeros(capacity)
+        self.sxx = np.zeros(capacity)
+        self.sxy = np.zeros(capacity)
+        self.sd = np.zeros(capacity)  # sum of changes
+        self.sdd = np.zeros(capacity)  # sum of squared changes
+
+    def _grow(self, capacity: int):
+        old = {name: getattr(self, name) for name in ("apy", "tvl", "count", "level", "ewma_var", "sx", "sy", "sxx", "sxy", "sd", "sdd")}
+        size = self.capacity
+        self._allocate(capacity)
+        for name, values in old.items():
+            getattr(self, name)[:size] = values
+
+    def _rows(self, protocols: Iterable[str]) -> np.ndarray:
+        rows = []
+        for protocol in protocols:
+            row = self._row.get(protocol)
+            if row is None:
+                row = self._row[protocol] = len(self._row)
+                if row >= self.capacity:
+                    self._grow(self.capacity * 2)
+            rows.append(row)
+        return np.array(rows, dtype=np.int64)
+
+    # ---------- incremental fit ----------
+
+    def update(self, protocols: List[str], apy, tvl=None):
+        '''Append one observation per protocol (one vectorised pass over all of them)'''
+        apy = np.asarray(apy, dtype=float)
+        tvl = np.zeros_like(apy) if tvl is None else np.asarray(tvl, dtype=float)
+
+        with self._lock:
+            rows = self._rows(protocols)
+            n = self.count[rows]
+            w = self.window
+            slot = n % w
+
+            has_prev = n > 0
+            prev = self.apy[rows, (n - 1) % w]
+
+            # The buffer holds the last `window` points, i.e. window - 1 pairs; once it is
+            # full, the new point overwrites x[n-w] and the pair (x[n-w], x[n-w+1]) leaves
+            leaving = n >= w
+            old_x = self.apy[rows, slot]
+            old_y = self.apy[rows, (n - w + 1) % w]
+
+            # New pair (prev, apy) enters the window
+            x = np.where(has_prev, prev, 0.0)
+            y = np.where(has_prev, apy, 0.0)
+            d = y - x
+            ox = np.where(leaving, old_x, 0.0)
+            oy = np.where(leaving, old_y, 0.0)
+            od = oy - ox
+
+            self.sx[rows] += x - ox
+            self.sy[rows] += y - oy
+            self.sxx[rows] += x * x - ox * ox
+            self.sxy[rows] += x * y - ox * oy
+            self.sd[rows] += d - od
+            self.sdd[rows] += d * d - od * od
+
+            # EWMA level / variance of changes (first point seeds the level)
+            a = self.alpha
+            self.level[rows] = np.where(has_prev, a * apy + (1 - a) * self.level[rows], apy)
+            self.ewma_var[rows] = np.where(has_prev, a * d * d + (1 - a) * self.ewma_var[rows], 0.0)
+
+            self.apy[rows, slot] = apy
+            self.tvl[rows, slot] = tvl
+            self.count[rows] = n + 1
+
+            # Add/subtract drift: recompute the sums exactly once per full window
+            stale = rows[(n + 1) % w == 0]
+            if len(stale):
+                self._resync(stale)
+
+    def _resync(self, rows: np.ndarray):
+        '''Exact window sums for rows whose buffer is full and ordered oldest-first (count % window == 0)'''
+        x, y = self.apy[rows, :-1], self.apy[rows, 1:]
+        d = y - x
+        self.sx[rows] = x.sum(axis=1)
+        self.sy[rows] = y.sum(axis=1)
+        self.sxx[rows] = (x * x).sum(axis=1)
+        self.sxy[rows] = (x * y).sum(axis=1)
+        self.sd[rows] = d.sum(axis=1)
+        self.sdd[rows] = (d * d).sum(axis=1)
+
+    def fit(self, history: Dict[str, np.ndarray], tvl_history: Dict[str, np.ndarray] = None):
+        '''
+        Load full histories (oldest first), e.g. from the metrics store. Steps
+        through time with update(), so the cost is one vectorised update per
+        time step across all protocols; only the last `window` points matter.
+        '''
+        protocols = list(history)
+        if not protocols:
+            return
+        length = max(len(history[p]) for p in protocols)
+        start = max(0, length - self.window - 1)
+        for t in range(start, length):
+            # Right-align histories so every protocol's latest point lands on the last step
+            active = [p for p in protocols if len(history[p]) >= length - t]
+            if not active:
+                continue
+            offsets = [len(history[p]) - (length - t) for p in active]
+            apy = [history[p][i] for p, i in zip(active, offsets)]
+            tvl = [tvl_history[p][i] for p, i in zip(active, offsets)] if tvl_history else None
+            self.update(active, apy, tvl)
+
+    # ---------- parameters ----------
+
+    def parameters(self, protocols: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        '''Fitted AR(1) / EWMA / volatility parameters from the cached running sums'''
+        protocols = list(protocols) if protocols is not None else list(self._row)
+        rows = np.array([self._row[p] for p in protocols], dtype=np.int64)
+
+        n = self.count[rows]
+        pairs = np.minimum(np.maximum(n - 1, 0), self.window - 1).astype(float)
+        safe_pairs = np.maximum(pairs, 1.0)
+
+        mean_x = self.sx[rows] / safe_pairs
+        mean_y = self.sy[rows] / safe_pairs
+        var_x = self.sxx[rows] / safe_pairs - mean_x ** 2
+        cov_xy = self.sxy[rows] / safe_pairs - mean_x * mean_y
+
+        # Flat history (var ~ 0) or too few points: no autoregression, forecast the EWMA level
+        fitted = (pairs >= 3) & (var_x > 1e-14)
+        phi = np.where(fitted, np.clip(cov_xy / np.where(fitted, var_x, 1.0), -0.999, 0.999), 0.0)
+        c = np.where(fitted, mean_y - phi * mean_x, self.level[rows])
+
+        mean_d = self.sd[rows] / safe_pairs
+        volatility = np.sqrt(np.maximum(self.sdd[rows] / safe_pairs - mean_d ** 2, 0.0))
+
+        return {
+            "protocols": protocols,
+            "rows": rows,
+            "points": n,
+            "phi": phi,
+            "c": c,
+            "level": self.level[rows],
+            "ewma_vol": np.sqrt(self.ewma_var[rows]),
+            "volatility": volatility
+        }
+
+    # ---------- forecasts ----------
+
+    def forecast_batch(self, protocols: Iterable[str] = None, horizon_days: float = 7.0) -> Dict[str, np.ndarray]:
+        '''
+        h-step AR(1) forecast for many protocols:
+            x[t+h] = mu + phi^h * (x[t] - mu),  mu = c / (1 - phi)
+        plus a 1-sigma band from the volatility of APY changes.
+        '''
+        with self._lock:
+            params = self.parameters(protocols)
+            rows = params["rows"]
+            current = self.apy[rows, (self.count[rows] - 1) % self.window]
+
+        h = max(1, int(round(horizon_days * 86400 / self.step_seconds)))
+        phi, c = params["phi"], params["c"]
+        mu = c / (1 - phi)
+        decay = phi ** h
+        forecast = mu + decay * (current - mu)
+
+        # Variance of the AR(1) h-step error, with the change volatility as innovation scale
+        sigma = params["volatility"]
+        horizon_var = np.where(np.abs(phi) > 0, (1 - phi ** (2 * h)) / np.maximum(1 - phi ** 2, 1e-9), h)
+        band = sigma * np.sqrt(horizon_var)
+
+        return dict(params, current=current, forecast=forecast, band=band, horizon_steps=h)
+
+    def forecast(self, protocol: str, horizon_days: float = 7.0) -> Optional[Dict]:
+        '''Forecast summary for one protocol, or None if it has no history'''
+        if protocol not in self._row:
+            return None
+        batch = self.forecast_batch([protocol], horizon_days)
+        return self._summary(batch, 0, horizon_days)
+
+    @staticmethod
+    def _summary(batch: Dict[str, np.ndarray], i: int, horizon_days: float) -> Dict:
+        current, forecast, band = float(batch["current"][i]), float(batch["forecast"][i]), float(batch["band"][i])
+        volatility = float(batch["volatility"][i])
+        change = forecast - current
+
+        # Trend only when the expected move is outside the noise band
+        trend = TRENDS[1] if abs(change) <= max(band, 1e-4) else TRENDS[2 if change > 0 else 0]
+        volatility_label = next(label for bound, label in VOLATILITY_LEVELS if volatility < bound)
+
+        # More history and a tighter band -> more confidence
+        points = int(batch["points"][i])
+        confidence = min(points / 30, 1.0) * (1.0 / (1.0 + band / max(abs(current), 1e-4)))
+
+        return {
+            "current_apy": round(current, 6),
+            "forecast_apy": round(forecast, 6),
+            "band": round(band, 6),
+            "ewma_apy": round(float(batch["level"][i]), 6),
+            "trend": trend,
+            "volatility": volatility_label,
+            "volatility_std": round(volatility, 6),
+            "ar_phi": round(float(batch["phi"][i]), 4),
+            "points": points,
+            "confidence": round(confidence, 2),
+            "horizon_days": horizon_days
+        }
+
+    def forecast_many(self, protocols: Iterable[str] = None, horizon_days: float = 7.0) -> Dict[str, Dict]:
+        '''Summaries for the given (default: all) tracked protocols from one batch evaluation; unknown ones are skipped'''
+        protocols = [p for p in protocols if p in self._row] if protocols is not None else list(self._row)
+        if not protocols:
+            return {}
+        batch = self.forecast_batch(protocols, horizon_days)
+        return {protocol: self._summary(batch, i, horizon_days) for i, protocol in enumerate(batch["protocols"])}
+
+    def __contains__(self, protocol: str) -> bool:
+        return protocol in self._row
+
+# ==================== PROCESS-WIDE INSTANCE ====================
+
+_forecaster: Optional[APYForecaster] = None
+_forecaster_lock = threading.Lock()
+
+def get_apy_forecaster() -> APYForecaster:
+    '''Shared forecaster; one observation per protocol arrives with every opportunity index refresh'''
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = APYForecaster(
+                    window=settings.FORECAST_WINDOW,
+                    alpha=settings.FORECAST_EWMA_ALPHA,
+                    step_seconds=settings.OPPORTUNITY_REFRESH_INTERVAL
+                )
+    return _forecaster
@@ -1,12 +1,63 @@
+import glob
+import os
+import re
+import threading
+import joblib
 import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Union, Iterable, Optional
+from config.settings import settings
+
+# Model inputs, in feature-matrix column order
+FEATURES = ("age", "tvl", "audits", "hacks")
+
+# Per feature: (transform, scale, risk weight, contribution weight, contribution name)
+#   "inverse": factor = max(0, 1 - value / scale)   (more is safer)
+#   "linear":  factor = value * scale               (more is riskier)
+FEATURE_SPECS = {
+    "age": ("inverse", 5.0, 2.0, -1.0, "protocol_age_impact"),  # Newer = riskier
+    "tvl": ("inverse", 10000000000, 3.0, -0.5, "tvl_impact"),  # Lower TVL = riskier
+    "audits": ("inverse", 5.0, 2.0, -0.8, "audit_impact"),
+    "hacks": ("linear", 2.0, 3.0, 1.0, "hack_history_impact")
+}
+
+CONTRIBUTION_NAMES = tuple(FEATURE_SPECS[f][4] for f in FEATURES)
+
+MAX_SCORE = 10.0
+UNKNOWN_SCORE = 9.0
+
+ARTIFACT_PATTERN = re.compile(r"risk_ebm-v(\d+)\.joblib$")
+
+def artifact_path(model_dir: str, version: int) -> str:
+    return os.path.join(model_dir, f"risk_ebm-v{version}.joblib")
+
+def latest_artifact_version(model_dir: str) -> Optional[int]:
+    '''Highest artifact version in `model_dir`, or None if there is none'''
+    versions = [
+        int(match.group(1))
+        for match in map(ARTIFACT_PATTERN.search, glob.glob(os.path.join(model_dir, "risk_ebm-v*.joblib")))
+        if match
+    ]
+    return max(versions) if versions else None
 
 class RiskModel:
     '''
-    Mock EBM Risk Model
-    In production, this would be interpret.glassbox.ExplainableBoostingClassifier
+    EBM Risk Model
+
+    Backed by a trained interpret.glassbox.ExplainableBoostingClassifier
+    when an artifact is loaded (see models/train_risk_ebm.py), otherwise by
+    the mock formula below. The risk score is 10 x P(risky); contributions
+    are the EBM's per-feature local explanations (logits, + = riskier).
+
+    Scoring is vectorised: assess_batch() scores a whole feature matrix
+    (one row per protocol, columns FEATURES) in one pass; assess_protocol()
+    is a one-row wrapper around it.
     '''
 
-    def __init__(self):
+    def __init__(self, artifact: Dict = None):
+        self.ebm = artifact["model"] if artifact else None
+        self.version = f"ebm-v{artifact['version']}" if artifact else "mock"
+
         # Mock protocol risk database
         self.protocol_risk_db = {
             "Aave": {"age": 4.0, "tvl": 8000000000, "audits": 5, "hacks": 0},
@@ -15,35 +66,164 @@ class RiskModel:
             "Yearn": {"age": 3.0, "tvl": 500000000, "audits": 3, "hacks": 1}
         }
 
+        self._index_db()
+
+        transforms = [FEATURE_SPECS[f][0] for f in FEATURES]
+        self._inverse = np.array([t == "inverse" for t in transforms])
+        self._scale = np.array([FEATURE_SPECS[f][1] for f in FEATURES], dtype=float)
+        self._weights = np.array([FEATURE_SPECS[f][2] for f in FEATURES], dtype=float)
+        self._contribution_weights = np.array([FEATURE_SPECS[f][3] for f in FEATURES], dtype=float)
+
+    def _index_db(self):
+        '''Same database as a feature matrix, rebuilt only when the database changes'''
+        self._protocols = list(self.protocol_risk_db)
+        self._row = {protocol: i for i, protocol in enumerate(self._protocols)}
+        self._db_matrix = np.array(
+            [[self.protocol_risk_db[p][f] for f in FEATURES] for p in self._protocols],
+            dtype=float
+        ).reshape(-1, len(FEATURES))
+
+    def update_protocol(self, protocol: str, features: Dict[str, float]):
+        '''Add or replace a protocol's features in the risk database'''
+        self.protocol_risk_db[protocol] = {f: features[f] for f in FEATURES}
+        self._index_db()
+
+    def features_for(self, protocol: str) -> Optional[Dict[str, float]]:
+        '''Current feature values of a protocol, or None if it is unknown'''
+        return self.protocol_risk_db.get(protocol)
+
+    def feature_matrix(self, protocols: Iterable[str]) -> np.ndarray:
+        '''Feature rows for `protocols` from the risk database (NaN rows for unknown ones)'''
+        protocols = list(protocols)
+        matrix = np.full((len(protocols), len(FEATURES)), np.nan)
+        known = [(i, self._row[p]) for i, p in enumerate(protocols) if p in self._row]
+        if known:
+            rows, db_rows = zip(*known)
+            matrix[list(rows)] = self._db_matrix[list(db_rows)]
+        return matrix
+
+    def assess_batch(self, features: Union[np.ndarray, pd.DataFrame]) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Score many protocols at once.
+
+        `features` is an (n, len(FEATURES)) array, or a DataFrame with the
+        FEATURES columns (extra columns are ignored).
+        Returns (scores, contributions): an (n,) array of risk scores and an
+        (n, len(FEATURES)) array of contributions, columns CONTRIBUTION_NAMES.
+        Rows with any missing feature score UNKNOWN_SCORE with zero contributions.
+        '''
+        if isinstance(features, pd.DataFrame):
+            features = features.loc[:, list(FEATURES)].to_numpy(dtype=float)
+        x = np.asarray(features, dtype=float).reshape(-1, len(FEATURES))
+
+        if self.ebm is not None:
+            scores, contributions = self._ebm_batch(x)
+        else:
+            scores, contributions = self._mock_batch(x)
+
+        unknown = np.isnan(x).any(axis=1)
+        scores[unknown] = UNKNOWN_SCORE
+        contributions[unknown] = 0.0
+
+        return scores, contributions
+
+    def _ebm_batch(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        known = ~np.isnan(x).any(axis=1)
+        scores = np.zeros(len(x))
+        contributions = np.zeros_like(x)
+        if known.any():
+            scores[known] = self.ebm.predict_proba(x[known])[:, 1] * MAX_SCORE
+            contributions[known] = self.ebm.eval_terms(x[known])
+        return scores, contributions
+
+    def _mock_batch(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        factors = np.where(
+            self._inverse,
+            np.maximum(0.0, 1.0 - x / self._scale),
+            x * self._scale
+        )
+
+        scores = np.minimum(factors @ self._weights, MAX_SCORE)
+        contributions = factors * self._contribution_weights
+        return scores, contributions
+
+    @staticmethod
+    def _factors(contributions: np.ndarray) -> Dict[str, float]:
+        return {name: float(value) for name, value in zip(CONTRIBUTION_NAMES, contributions)}
+
+    def assess_protocols(self, protocols: Iterable[str]) -> List[Tuple[float, Dict]]:
+        '''(risk_score, feature_contributions) for each protocol, scored in one pass'''
+        protocols = list(protocols)
+        scores, contributions = self.assess_batch(self.feature_matrix(protocols))
+        return [
+            (float(score), self._factors(row)) if protocol in self._row
+            else (UNKNOWN_SCORE, {"reason": "Unknown protocol"})
+            for protocol, score, row in zip(protocols, scores, contributions)
+        ]
+
     def assess_protocol(self, protocol: str):
         '''
-        Mock EBM assessment
+        EBM assessment of one protocol
         Returns: (risk_score, feature_contributions)
         '''
-        data = self.protocol_risk_db.get(protocol)
-
-        if not data:
-            return 9.0, {"reason": "Unknown protocol"}
-
-        # Simple risk calculation (mock EBM logic)
-        age_factor = max(0, 1.0 - (data['age'] / 5.0))  # Newer = riskier
-        tvl_factor = max(0, 1.0 - (data['tvl'] / 10000000000))  # Lower TVL = riskier
-        audit_factor = max(0, 1.0 - (data['audits'] / 5.0))
-        hack_factor = data['hacks'] * 2.0
-
-        risk_score = (
-            age_factor * 2.0 +
-            tvl_factor * 3.0 +
-            audit_factor * 2.0 +
-            hack_factor * 3.0
-        )
+        return self.assess_protocols([protocol])[0]
 
-        # Feature contributions (what EBM would show)
-        factors = {
-            "protocol_age_impact": -age_factor,  # Negative = reduces risk
-            "tvl_impact": -tvl_factor * 0.5,
-            "audit_impact": -audit_factor * 0.8,
-            "hack_history_impact": hack_factor
-        }
+    def rank_protocols(self, protocols: Iterable[str] = None, threshold: float = None) -> List[Dict]:
+        '''
+        Score `protocols` (default: every protocol in the database) and
+        return them safest first. With `threshold`, only those scoring below it.
+        '''
+        protocols = list(protocols) if protocols is not None else self._protocols
+        scores, _ = self.assess_batch(self.feature_matrix(protocols))
+
+        order = np.argsort(scores, kind="stable")
+        if threshold is not None:
+            order = order[scores[order] < threshold]
+
+        return [
+            {"protocol": protocols[i], "risk_score": round(float(scores[i]), 2)}
+            for i in order
+        ]
+
+# ==================== PROCESS-WIDE LOADER ====================
+
+_model: Optional[RiskModel] = None
+_model_lock = threading.Lock()
+
+def load_risk_model(model_dir: str = None, version: str = None) -> RiskModel:
+    '''
+    Load a RiskModel from the versioned artifact in `model_dir`
+    (RISK_MODEL_VERSION, default the latest). Arrays are memory-mapped, so
+    every worker shares the same pages. Falls back to the mock model when
+    there is no artifact.
+    '''
+    model_dir = model_dir or settings.RISK_MODEL_DIR
+    version = version or settings.RISK_MODEL_VERSION
+
+    number = latest_artifact_version(model_dir) if version == "latest" else int(str(version).lstrip("v"))
+    if number is None:
+        print(f"⚠️ No EBM artifact in {model_dir} - using mock risk model")
+        return RiskModel()
+
+    path = artifact_path(model_dir, number)
+    try:
+        artifact = joblib.load(path, mmap_mode="r")
+    except Exception as e:
+        print(f"⚠️ Failed to load EBM artifact {path}: {e} - using mock risk model")
+        return RiskModel()
+
+    if tuple(artifact.get("features", ())) != FEATURES:
+        print(f"⚠️ EBM artifact {path} was trained on {artifact.get('features')}, expected {FEATURES} - using mock risk model")
+        return RiskModel()
+
+    print(f"✅ Loaded EBM risk model v{number}")
+    return RiskModel(artifact)
 
-        return min(risk_score, 10.0), factors
\ No newline at end of file
+def get_risk_model() -> RiskModel:
+    '''Shared RiskModel, loaded on first use'''
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_risk_model()
+    return _model
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import random
+from config.settings import settings
+from coordination_layer.layer import CoordinationLayer
+from agent_layer.bulk_rebalance import BulkRebalancer
+from tools.opportunity_index import FIXTURE_POOLS
+from tools.web3_tools import tx_pipeline
+
+def demo_portfolios(n: int, seed: int = 7):
+    '''Synthetic portfolios spread over the fixture protocols (for trying the sweep offline)'''
+    rng = random.Random(seed)
+    portfolios = []
+    for i in range(n):
+        pool = rng.choice(FIXTURE_POOLS + [None])
+        usdc = round(rng.uniform(0, 20000), 2)
+        positions = {pool["protocol"]: {"USDC": usdc, "apy": round(pool["apy"] * rng.uniform(0.5, 1.0), 4)}} if pool else {}
+        portfolios.append({
+            "wallet_address": f"0xDemoWallet{i:06d}",
+            "balances": {"USDC": usdc, "ETH": round(rng.uniform(0, 3), 3)},
+            "positions": positions
+        })
+    return portfolios
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebalance many portfolios in one pass")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--wallets", help="File with one wallet address per line (state read on-chain)")
+    source.add_argument("--demo", type=int, help="Generate N synthetic portfolios")
+    parser.add_argument("--evaluate-only", action="store_true", help="Decide, but do not sign or execute")
+    parser.add_argument("--dry-run", action="store_true", help="Simulate trades instead of broadcasting (see DRY_RUN)")
+    parser.add_argument("--output", help="Write the full sweep result as JSON")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("🔁 BULK REBALANCE SWEEP")
+    print("="*60)
+
+    coord_layer = CoordinationLayer(
+        supabase_url=settings.SUPABASE_URL,
+        supabase_key=settings.SUPABASE_KEY,
+    )
+
+    if args.wallets:
+        with open(args.wallets) as f:
+            wallets = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        known = coord_layer.get_portfolios_by_addresses(wallets)
+        portfolios = [
+            {"wallet_address": wallet, "portfolio_id": known[wallet]["id"] if wallet in known else None}
+            for wallet in wallets
+        ]
+    else:
+        portfolios = demo_portfolios(args.demo)
+
+    rebalancer = BulkRebalancer(coord_layer)
+    try:
+        result = await rebalancer.run(
+            portfolios,
+            execute=not args.evaluate_only,
+            dry_run=True if args.dry_run else None
+        )
+
+        print(f"\n📊 Portfolios: {result['portfolios']}")
+        print(f"   Need action: {result['actionable']}")
+        print(f"   Skipped: {result['skipped']}")
+        print(f"   Timings (ms): {result['timings_ms']}")
+
+        statuses = {}
+        for action in result["actions"]:
+            statuses[action.get("status", "evaluated")] = statuses.get(action.get("status", "evaluated"), 0) + 1
+        print(f"   Action statuses: {statuses}")
+
+        # Transactions are broadcast without waiting - wait for their receipts before exiting
+        pending = [a["result"] for a in result["actions"] if a.get("result", {}).get("status") == "pending"]
+        if pending:
+            print(f"\n⛓️ WAITING FOR {len(pending)} RECEIPT(S):")
+            for tx in pending:
+                receipt = await asyncio.to_thread(tx_pipeline.wait, tx["hash"], tx_pipeline.receipt_timeout)
+                print(f"  {tx['hash']} mined in block {receipt.blockNumber} (status {receipt.status})")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2, default=str)
+            print(f"\n💾 Sweep written to {args.output}")
+
+    finally:
+        # Push queued audit writes before exiting
+        coord_layer.flush()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,234 @@
+import inspect
+import time
+from collections import OrderedDict, defaultdict, deque
+from itertools import count, islice
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class ExecutionRegistry:
+    '''
+    In-process registry of API executions, replacing the unbounded
+    `active_executions` dict.
+
+    - Hot tier: full records (state, final_state) in an LRU. Queued/running
+      executions are pinned; finished ones are evicted after `hot_ttl`
+      seconds or when more than `max_hot` finished records are held.
+    - Cold tier: evicted executions are served from the coordination layer
+      ('agent_executions' row with the final snapshot).
+    - Index: small summaries in start order, plus per-portfolio and
+      per-status indexes (also in start order), used for paginated listing
+      without touching full states. The oldest entries are trimmed past
+      `max_index`; a page that goes past the in-memory index is read from
+      the coordination layer.
+    '''
+
+    def __init__(self, coord_layer, max_hot: int = 500, hot_ttl: float = 900, max_index: int = 100000):
+        self.coord = coord_layer
+        self.max_hot = max_hot
+        self.hot_ttl = hot_ttl
+        self.max_index = max_index
+
+        self._hot: "OrderedDict[str, Dict]" = OrderedDict()
+        self._finished_at: Dict[str, float] = {}  # monotonic time a hot record finished
+
+        self._summaries: Dict[str, Dict] = {}
+        self._seq: Dict[str, int] = {}       # execution id -> start sequence number
+        self._next_seq = count()
+        self._order: "deque[str]" = deque()  # execution ids, oldest first
+        self._by_portfolio: Dict[str, "deque[str]"] = defaultdict(deque)
+        self._by_status: Dict[str, "deque[str]"] = defaultdict(deque)
+
+        self.metrics = {
+            "hot_hits": 0,
+            "cold_hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+
+    async def _coord(self, method: str, *args, **kwargs):
+        result = getattr(self.coord, method)(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # ---------- writes ----------
+
+    def add(self, execution_id: str, portfolio_id: str, state: Dict, status: str = "queued"):
+        record = {
+            "status": status,
+            "portfolio_id": portfolio_id,
+            "start_time": datetime.utcnow(),
+            "state": state
+        }
+        self._hot[execution_id] = record
+
+        self._summaries[execution_id] = self._summary(execution_id, record)
+        self._seq[execution_id] = next(self._next_seq)
+        self._order.append(execution_id)
+        self._by_portfolio[portfolio_id].append(execution_id)
+        self._by_status[status].append(execution_id)
+        self._trim_index()
+        self._evict()
+
+    def update(self, execution_id: str, **fields):
+        '''Update a hot record (status, final_state, error, completed_at...)'''
+        record = self._hot.get(execution_id)
+        if record is None:
+            return
+
+        record.update(fields)
+        self._hot.move_to_end(execution_id)
+        summary = self._summaries.get(execution_id)
+        if summary is not None:
+            self._summaries[execution_id] = self._summary(execution_id, record)
+            if record["status"] != summary["status"]:
+                self._move_status(execution_id, summary["status"], record["status"])
+
+        if record["status"] not in ACTIVE_STATUSES:
+            self._finished_at[execution_id] = time.monotonic()
+            self._evict()
+
+    # ---------- reads ----------
+
+    def get(self, execution_id: str) -> Optional[Dict]:
+        '''Hot record only (used by the workers running the execution)'''
+        return self._hot.get(execution_id)
+
+    async def load(self, execution_id: str) -> Optional[Dict]:
+        '''Hot record, or rebuild a read-only record from the coordination layer'''
+        self._evict()
+        record = self._hot.get(execution_id)
+        if record is not None:
+            self._hot.move_to_end(execution_id)
+            self.metrics["hot_hits"] += 1
+            return record
+
+        row = await self._coord("get_execution", execution_id)
+        summary = self._summaries.get(execution_id, {})
+        if not row and not summary:
+            self.metrics["misses"] += 1
+            return None
+
+        self.metrics["cold_hits"] += 1
+        row = row or {"portfolio_id": summary["portfolio_id"]}
+        return {
+            "status": row.get("status") or summary.get("status", "completed"),
+            "portfolio_id": row.get("portfolio_id"),
+            "start_time": summary.get("start_time") or row.get("created_at"),
+            "completed_at": summary.get("completed_at") or row.get("updated_at"),
+            "state": row.get("state_data") or {}
+        }
+
+    async def list(self, limit: int = 50, offset: int = 0, status: str = None, portfolio_id: str = None) -> Dict[str, Any]:
+        '''Newest-first page of execution summaries'''
+        self._evict()
+        if portfolio_id:
+            ids = self._by_portfolio.get(portfolio_id, ())
+            if status:
+                # One portfolio's executions: filtering them is cheaper than the status index
+                ids = [i for i in ids if self._summaries[i]["status"] == status]
+        elif status:
+            ids = self._by_status.get(status, ())
+        else:
+            ids = self._order
+
+        indexed = len(ids)
+        items = [self._summaries[i] for i in islice(reversed(ids), offset, offset + limit)]
+
+        source = "index"
+        if len(items) < limit and len(self._order) >= self.max_index:
+            # Index has been trimmed - older executions live only in the coordination layer
+            rows = await self._coord(
+                "list_executions",
+                limit=limit - len(items),
+                offset=max(offset, indexed),
+                status=status,
+                portfolio_id=portfolio_id
+            )
+            items += [{
+                "execution_id": row["execution_id"],
+                "status": row.get("status"),
+                "portfolio_id": row.get("portfolio_id"),
+                "start_time": row.get("created_at"),
+                "completed_at": row.get("updated_at") if row.get("status") not in ACTIVE_STATUSES else None
+            } for row in rows]
+            source = "index+coordination_layer"
+
+        return {
+            "items": items,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + len(items) if len(items) == limit else None,
+            "source": source
+        }
+
+    # ---------- housekeeping ----------
+
+    @staticmethod
+    def _summary(execution_id: str, record: Dict) -> Dict:
+        completed_at = record.get("completed_at")
+        return {
+            "execution_id": execution_id,
+            "status": record["status"],
+            "portfolio_id": record["portfolio_id"],
+            "start_time": record["start_time"].isoformat(),
+            "completed_at": completed_at.isoformat() if completed_at else None
+        }
+
+    def _move_status(self, execution_id: str, old: str, new: str):
+        '''Move an execution between status indexes, keeping each in start order'''
+        ids = self._by_status[old]
+        ids.remove(execution_id)  # old is normally queued/running: only active executions
+        if not ids:
+            del self._by_status[old]
+
+        # Executions change status soon after they start, so the slot is
+        # almost always a few places from the end
+        ids = self._by_status[new]
+        seq = self._seq[execution_id]
+        position = len(ids)
+        for other in reversed(ids):
+            if self._seq[other] < seq:
+                break
+            position -= 1
+        ids.insert(position, execution_id)
+
+    def _trim_index(self):
+        while len(self._order) > self.max_index:
+            execution_id = self._order.popleft()
+            summary = self._summaries.pop(execution_id)
+            del self._seq[execution_id]
+            # The oldest execution overall is also the oldest in its indexes
+            for index, key in ((self._by_portfolio, summary["portfolio_id"]), (self._by_status, summary["status"])):
+                ids = index[key]
+                ids.popleft()
+                if not ids:
+                    del index[key]
+
+    def _evict(self):
+        '''Drop finished records past their TTL, then the least recently used ones'''
+        now = time.monotonic()
+        expired = [i for i, at in self._finished_at.items() if now - at > self.hot_ttl]
+        for execution_id in expired:
+            self._drop(execution_id)
+
+        if len(self._finished_at) > self.max_hot:
+            finished_lru = [i for i in self._hot if i in self._finished_at]
+            for execution_id in finished_lru[:len(self._finished_at) - self.max_hot]:
+                self._drop(execution_id)
+
+    def _drop(self, execution_id: str):
+        self._hot.pop(execution_id, None)
+        self._finished_at.pop(execution_id, None)
+        self.metrics["evictions"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics.update({
+            "hot": len(self._hot),
+            "active": len(self._hot) - len(self._finished_at),
+            "indexed": len(self._order)
+        })
+        return metrics
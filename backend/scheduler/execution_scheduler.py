@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+class SchedulerSaturated(Exception):
+    '''Raised when a new execution cannot be admitted. Maps to HTTP 429.'''
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class ExecutionScheduler:
+    '''
+    Bounded scheduler for workflow executions.
+
+    - `max_workers` executions run at once (one asyncio worker each)
+    - at most `max_per_portfolio` of them belong to the same portfolio;
+      extra jobs for that portfolio are parked until one finishes
+    - waiting jobs are served by priority (0-9, lower number first), FIFO within a priority
+    - at most `max_queue` jobs wait in total and `max_queued_per_portfolio`
+      per portfolio; beyond that submit() raises SchedulerSaturated with a
+      Retry-After estimate
+    '''
+
+    def __init__(
+        self,
+        run: Callable[[str], Awaitable[Any]],
+        max_workers: int = 4,
+        max_per_portfolio: int = 1,
+        max_queue: int = 100,
+        max_queued_per_portfolio: int = 10
+    ):
+        self.run = run
+        self.max_workers = max_workers
+        self.max_per_portfolio = max_per_portfolio
+        self.max_queue = max_queue
+        self.max_queued_per_portfolio = max_queued_per_portfolio
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._workers = []
+        self._parked: Dict[str, deque] = defaultdict(deque)
+        self._running: Dict[str, int] = defaultdict(int)
+        self._queued: Dict[str, int] = defaultdict(int)
+
+        self._waits = deque(maxlen=1000)     # seconds from submit to start
+        self._run_times = deque(maxlen=1000)  # seconds from start to finish
+
+        self.metrics = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0
+        }
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.max_workers)
+        ]
+        print(f"✅ Execution scheduler started ({self.max_workers} workers)")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------- admission ----------
+
+    def depth(self) -> int:
+        '''Jobs waiting to run (queued + parked)'''
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(jobs) for jobs in self._parked.values())
+
+    def retry_after(self) -> int:
+        '''Seconds until a slot is likely to free up'''
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        return max(1, math.ceil(avg_run * (self.depth() + 1) / self.max_workers))
+
+    def check_admission(self, portfolio_id: str = None):
+        '''Raise SchedulerSaturated if a new job would be rejected'''
+        if self.depth() >= self.max_queue:
+            self.metrics["rejected"] += 1
+            raise SchedulerSaturated(
+                f"Execution queue is full ({self.max_queue} waiting)",
+                self.retry_after()
+            )
+        if portfolio_id and self._queued[portfolio_id] >= self.max_queued_per_portfolio:
+            self.metrics["rejected"] += 1
+            raise SchedulerSaturated(
+                f"Portfolio {portfolio_id} already has {self.max_queued_per_portfolio} executions waiting",
+                self.retry_after()
+            )
+
+    def submit(self, execution_id: str, portfolio_id: str, priority: int = 5):
+        '''Queue an execution. Raises SchedulerSaturated when full.'''
+        if self._queue is None:
+            raise RuntimeError("ExecutionScheduler.start() has not been called")
+
+        self.check_admission(portfolio_id)
+
+        priority = min(max(int(priority), 0), 9)
+        job = {
+            "execution_id": execution_id,
+            "portfolio_id": portfolio_id,
+            "priority": priority,
+            "submitted_at": time.monotonic()
+        }
+        self._queue.put_nowait((priority, next(self._seq), job))
+        self._queued[portfolio_id] += 1
+        self.metrics["submitted"] += 1
+
+    # ---------- workers ----------
+
+    async def _worker(self, worker_id: int):
+        while True:
+            priority, seq, job = await self._queue.get()
+            portfolio_id = job["portfolio_id"]
+
+            if self._running[portfolio_id] >= self.max_per_portfolio:
+                # Portfolio is at its limit - park the job until one of its runs ends
+                self._parked[portfolio_id].append((priority, seq, job))
+                continue
+
+            self._queued[portfolio_id] -= 1
+            self._running[portfolio_id] += 1
+            started = time.monotonic()
+            self._waits.append(started - job["submitted_at"])
+
+            try:
+                await self.run(job["execution_id"])
+                self.metrics["completed"] += 1
+            except Exception as e:
+                print(f"❌ Scheduled execution {job['execution_id']} failed: {e}")
+                self.metrics["failed"] += 1
+            finally:
+                self._run_times.append(time.monotonic() - started)
+                self._running[portfolio_id] -= 1
+                if not self._running[portfolio_id]:
+                    del self._running[portfolio_id]
+                if not self._queued[portfolio_id]:
+                    del self._queued[portfolio_id]
+
+                parked = self._parked.get(portfolio_id)
+                if parked:
+                    self._queue.put_nowait(parked.popleft())
+                    if not parked:
+                        del self._parked[portfolio_id]
+
+    # ---------- metrics ----------
+
+    @staticmethod
+    def _percentile(values, pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        waits = list(self._waits)
+        metrics = dict(self.metrics)
+        metrics.update({
+            "workers": self.max_workers,
+            "running": sum(self._running.values()),
+            "queue_depth": self.depth(),
+            "parked": sum(len(jobs) for jobs in self._parked.values()),
+            "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_p95_s": self._percentile(waits, 95),
+            "wait_max_s": round(max(waits), 3) if waits else 0.0,
+            "run_avg_s": round(sum(self._run_times) / len(self._run_times), 3) if self._run_times else 0.0,
+            "retry_after_s": self.retry_after()
+        })
+        return metrics
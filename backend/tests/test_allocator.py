@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from models.allocator import AllocationOptimizer
+
+def pool(protocol, apy, risk, tvl=1e9, pool_id=None):
+    return {
+        "protocol": protocol,
+        "pool_id": pool_id or f"{protocol.lower()}-usdc",
+        "apy": apy,
+        "risk_adjusted_apy": apy * (1 - risk / 10),
+        "risk_score": risk,
+        "tvl": tvl
+    }
+
+POOLS = [
+    pool("Aave", 0.05, 1.0),
+    pool("Uniswap", 0.03, 1.5),
+    pool("Curve", 0.12, 3.1),  # best risk-adjusted, but above the 3.0 risk ceiling
+    pool("Morpho", 0.09, 2.0, tvl=1e7),  # shallow: large deposits spill into the second pool
+    pool("Morpho", 0.085, 2.0, tvl=1e7, pool_id="morpho-usdc-2"),
+    pool("Spark", 0.06, 1.2)
+]
+
+def by_protocol(plan, key="amount"):
+    totals = {}
+    for row in plan["allocation"]:
+        totals[row["protocol"]] = totals.get(row["protocol"], 0.0) + row[key]
+    return totals
+
+def test_budget_is_fully_allocated_and_legs_balance():
+    plan = AllocationOptimizer(max_protocol_share=0.4).optimize(POOLS, {}, idle=10_000)
+    assert sum(row["amount"] for row in plan["allocation"]) == pytest.approx(10_000, rel=1e-9)
+    assert plan["idle_after"] == pytest.approx(0, abs=1e-6)
+    assert sum(leg["amount"] for leg in plan["legs"]) == pytest.approx(10_000, rel=1e-6)
+    assert {leg["source"] for leg in plan["legs"]} == {"wallet"}
+
+def test_protocol_cap_spans_all_of_a_protocols_pools():
+    plan = AllocationOptimizer(max_protocol_share=0.4).optimize(POOLS, {}, idle=10_000)
+    totals = by_protocol(plan)
+    assert max(totals.values()) <= 4_000 + 1e-6
+    assert totals["Morpho"] == pytest.approx(4_000, rel=1e-6)
+    assert len([row for row in plan["allocation"] if row["protocol"] == "Morpho"]) == 2
+
+def test_risk_ceiling_blocks_new_money():
+    plan = AllocationOptimizer(max_protocol_share=1.0).optimize(POOLS, {}, idle=10_000)
+    assert "Curve" not in by_protocol(plan)
+    assert all(row["risk_score"] < 3.0 for row in plan["allocation"])
+
+def test_unsafe_holding_is_kept_not_grown():
+    plan = AllocationOptimizer(max_protocol_share=0.5).optimize(
+        POOLS, {"Curve": {"USDC": 6_000, "apy": 0.12}}, idle=4_000
+    )
+    assert by_protocol(plan)["Curve"] == pytest.approx(6_000)
+
+def test_caps_apply_to_inflows_only():
+    # 10,000 held in Aave, above a 50% share: holding is better than moving
+    plan = AllocationOptimizer(max_protocol_share=0.5, max_move=100).optimize(
+        [pool("Aave", 0.05, 1.0), pool("Uniswap", 0.048, 1.0)],
+        {"Aave": {"USDC": 10_000, "apy": 0.05}},
+        idle=0,
+        gas_cost_usd={"aave": 0.0, "uniswap": 0.0}
+    )
+    assert plan["legs"] == []
+    assert by_protocol(plan)["Aave"] == pytest.approx(10_000)
+
+def test_losing_plan_is_never_proposed_without_gas_prices():
+    optimizer = AllocationOptimizer(max_protocol_share=0.5)
+    plan = optimizer.optimize(
+        [pool("Aave", 0.05, 1.0), pool("Uniswap", 0.02, 1.0)],
+        {"Aave": {"USDC": 10_000, "apy": 0.05}},
+        idle=0
+    )
+    assert plan["legs"] == []
+    assert plan["expected_gain_usd"] >= 0
+
+def test_gas_prunes_deposits_that_do_not_pay_for_themselves():
+    pools = [pool("Aave", 0.05, 1.0), pool("Spark", 0.0505, 1.0)]
+    optimizer = AllocationOptimizer(horizon_days=30, max_protocol_share=1.0)
+
+    free = optimizer.optimize(pools, {}, idle=1_000, gas_cost_usd={"aave": 0.0, "spark": 0.0})
+    assert "Spark" in by_protocol(free)
+
+    priced = optimizer.optimize(pools, {}, idle=1_000, gas_cost_usd={"aave": 0.5, "spark": 5.0})
+    assert set(by_protocol(priced)) == {"Aave"}
+    assert priced["gas_cost_usd"] == pytest.approx(0.5)
+
+def test_move_is_limited_and_keeps_the_split():
+    unlimited = AllocationOptimizer(max_protocol_share=0.4).optimize(POOLS, {}, idle=10_000)
+    limited = AllocationOptimizer(max_protocol_share=0.4, max_move=100).optimize(POOLS, {}, idle=10_000)
+    assert limited["moved"] == pytest.approx(100)
+    ratio = {k: v / 100 for k, v in by_protocol(limited).items()}
+    assert ratio == pytest.approx({k: v / 10_000 for k, v in by_protocol(unlimited).items()}, rel=1e-6)
+
+def test_slippage_spreads_large_deposits():
+    shallow = [pool("Aave", 0.05, 1.0, tvl=1e5), pool("Spark", 0.045, 1.0, tvl=1e9)]
+    plan = AllocationOptimizer(max_protocol_share=1.0).optimize(shallow, {}, idle=100_000)
+    amounts = by_protocol(plan)
+    assert 0 < amounts["Aave"] < 100_000
+    # Interior optimum: equal marginal gain in both pools
+    m = np.array([0.05 * 0.9, 0.045 * 0.9]) * 30 / 365
+    k2 = 2 * 0.5 / np.array([1e5, 1e9])
+    marginal = m - k2 * np.array([amounts["Aave"], amounts["Spark"]])
+    assert marginal[0] == pytest.approx(marginal[1], rel=1e-6)
+
+def test_unindexed_holding_is_kept_and_plan_is_json_safe():
+    import json
+    plan = AllocationOptimizer(max_protocol_share=0.5).optimize(
+        [pool("Spark", 0.06, 1.2)], {"Aave": {"USDC": 5_000, "apy": 0.05}}, idle=1_000
+    )
+    aave = next(row for row in plan["allocation"] if row["protocol"] == "Aave")
+    assert aave["risk_score"] is None and aave["pool_id"] is None
+    assert aave["amount"] <= 5_000 + 1e-6  # unknown risk: never added to
+    json.dumps(plan, allow_nan=False)
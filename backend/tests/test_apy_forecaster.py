@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from models.apy_forecaster import APYForecaster
+
+def exact_fit(series, window):
+    '''Reference statistics computed directly from the last `window` points'''
+    last = np.asarray(series[-window:], dtype=float)
+    x, y = last[:-1], last[1:]
+    d = y - x
+    return {
+        "phi": np.cov(x, y, bias=True)[0, 1] / x.var(),
+        "volatility": d.std()
+    }
+
+def ar1_series(n, c=0.01, phi=0.8, noise=0.0005, seed=0):
+    rng = np.random.default_rng(seed)
+    series = [c / (1 - phi)]
+    for _ in range(n - 1):
+        series.append(c + phi * series[-1] + rng.normal(0, noise))
+    return np.array(series)
+
+def test_running_sums_match_an_exact_window_fit():
+    window = 20
+    forecaster = APYForecaster(window=window)
+    a, b = ar1_series(57, seed=1), ar1_series(57, phi=0.3, seed=2)
+    # Check mid-window, right before and after a resync and after wrapping
+    for t in range(57):
+        forecaster.update(["aave", "curve"], [a[t], b[t]])
+        if t + 1 in (10, 39, 40, 41, 57):
+            params = forecaster.parameters(["aave", "curve"])
+            for i, series in enumerate((a[:t + 1], b[:t + 1])):
+                expected = exact_fit(series, window)
+                assert params["phi"][i] == pytest.approx(expected["phi"], rel=1e-6)
+                assert params["volatility"][i] == pytest.approx(expected["volatility"], rel=1e-6)
+
+def test_ar1_coefficient_is_recovered():
+    forecaster = APYForecaster(window=500)
+    series = ar1_series(500, c=0.015, phi=0.7, noise=0.001)
+    forecaster.fit({"aave": series})
+    params = forecaster.parameters(["aave"])
+    assert params["phi"][0] == pytest.approx(0.7, abs=0.1)
+    # The long-run mean c / (1 - phi) is the forecast far out
+    far = forecaster.forecast_batch(["aave"], horizon_days=365)["forecast"][0]
+    assert far == pytest.approx(0.05, abs=0.005)
+
+def test_ewma_level_is_seeded_by_the_first_point():
+    forecaster = APYForecaster(window=10, alpha=0.5)
+    forecaster.update(["aave"], [0.04])
+    assert forecaster.parameters(["aave"])["level"][0] == 0.04
+    forecaster.update(["aave"], [0.06])
+    forecaster.update(["aave"], [0.08])
+    params = forecaster.parameters(["aave"])
+    assert params["level"][0] == pytest.approx(0.065)  # 0.5 * 0.08 + 0.5 * (0.5 * 0.06 + 0.5 * 0.04)
+    assert params["ewma_vol"][0] == pytest.approx(np.sqrt(0.5 * 0.02 ** 2 + 0.25 * 0.02 ** 2))
+
+def test_flat_history_forecasts_its_level():
+    forecaster = APYForecaster(window=10)
+    forecaster.fit({"aave": [0.05] * 12})
+    summary = forecaster.forecast("aave", horizon_days=7)
+    assert summary["ar_phi"] == 0.0
+    assert summary["forecast_apy"] == pytest.approx(0.05)
+    assert (summary["trend"], summary["volatility"]) == ("stable", "low")
+
+def test_trend_needs_a_move_outside_the_band():
+    forecaster = APYForecaster(window=50, step_seconds=86400)
+    rising = 0.02 + 0.001 * np.arange(30)
+    forecaster.fit({"rising": rising, "noisy": ar1_series(30, noise=0.01)})
+    many = forecaster.forecast_many(["rising", "noisy", "unknown"], horizon_days=7)
+    assert set(many) == {"rising", "noisy"}
+    assert many["rising"]["trend"] == "up"
+    assert many["noisy"]["volatility"] == "high"
+    assert forecaster.forecast("unknown") is None
+
+def test_fit_right_aligns_histories_of_different_length():
+    window = 8
+    long, short = ar1_series(30, seed=3), ar1_series(5, seed=4)
+    fitted = APYForecaster(window=window)
+    fitted.fit({"long": long, "short": short})
+
+    stepped = APYForecaster(window=window)
+    for value in long[-window - 1:]:
+        stepped.update(["long"], [value])
+    for value in short:
+        stepped.update(["short"], [value])
+
+    a, b = fitted.forecast_batch(["long", "short"]), stepped.forecast_batch(["long", "short"])
+    assert list(a["current"]) == [long[-1], short[-1]]
+    for key in ("phi", "volatility", "forecast"):
+        assert a[key] == pytest.approx(b[key])
+
+def test_capacity_grows_without_losing_rows():
+    forecaster = APYForecaster(window=5, capacity=2)
+    names = [f"pool-{n}" for n in range(5)]
+    for step in range(3):
+        forecaster.update(names, [0.01 * (n + 1) + 0.001 * step for n in range(5)])
+    assert forecaster.capacity >= 5
+    assert list(forecaster.parameters(names)["points"]) == [3] * 5
+    assert forecaster.forecast_batch(names)["current"] == pytest.approx([0.012, 0.022, 0.032, 0.042, 0.052])
@@ -0,0 +1,232 @@
+import json
+import asyncio
+import threading
+import httpx
+from coordination_layer.layer import CoordinationLayer
+from coordination_layer.async_layer import AsyncCoordinationLayer
+
+class FakePostgREST:
+    '''
+    In-memory tables behind an httpx.MockTransport (eq/gt/lte filters, order, limit).
+    Inserts answer 503 while `down` and 400 for batches with a "bad" row.
+    '''
+
+    def __init__(self):
+        self.tables = {}
+        self.requests = []
+        self.down = False
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        table = request.url.path.rsplit("/", 1)[-1]
+        rows = self.tables.setdefault(table, [])
+        self.requests.append((request.method, table))
+
+        if request.method == "POST":
+            body = json.loads(request.content)
+            new = body if isinstance(body, list) else [body]
+            if self.down:
+                return httpx.Response(503, json={"code": "PGRST000"})
+            if any(row.get("bad") for row in new):
+                return httpx.Response(400, json={"code": "23502"})
+            for row in new:
+                row.setdefault("execution_id", f"exec-{len(rows)}")
+            rows.extend(new)
+            returning = "return=representation" in request.headers.get("Prefer", "")
+            return httpx.Response(201, json=new if returning else None)
+
+        matched = [row for row in rows if self._matches(row, request.url.params.multi_items())]
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(json.loads(request.content))
+            return httpx.Response(204)
+
+        params = dict(request.url.params)
+        if "order" in params:
+            column, direction = params["order"].split(".")
+            matched.sort(key=lambda row: row[column], reverse=direction == "desc")
+        if "limit" in params:
+            matched = matched[:int(params["limit"])]
+        return httpx.Response(200, json=matched)
+
+    @staticmethod
+    def _matches(row, params) -> bool:
+        for column, condition in params:
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            op, _, value = condition.partition(".")
+            actual = row.get(column)
+            if op == "eq" and str(actual).lower() != value.lower():
+                return False
+            if op == "gt" and not actual > int(value):
+                return False
+            if op == "lte" and not actual <= int(value):
+                return False
+        return True
+
+def make_layer(backend: FakePostgREST, **buffer) -> AsyncCoordinationLayer:
+    layer = AsyncCoordinationLayer(supabase_url="http://supabase.test", supabase_key="key", redis_url="")
+    layer.redis_enabled = False
+    layer.supabase = httpx.AsyncClient(
+        base_url="http://supabase.test/rest/v1",
+        transport=httpx.MockTransport(backend.handler)
+    )
+    for name, value in buffer.items():
+        setattr(layer.write_buffer, name, value)
+    return layer
+
+def test_state_round_trips_through_the_delta_log():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend)
+        execution_id = await layer.init_execution("p1", {"balances": {}})
+        state = {"execution_id": execution_id, "portfolio_id": "p1", "balances": {"USDC": 1.0}, "iteration_count": 0}
+        await layer.write_state(state)
+        await layer.write_state({**state, "iteration_count": 1})
+        await layer.write_state({**state, "iteration_count": 2})
+
+        latest = await layer.read_state(execution_id)
+        first = await layer.read_state(execution_id, version=0)
+        await layer.close()
+        return latest, first
+
+    latest, first = asyncio.run(scenario())
+    assert latest["iteration_count"] == 2
+    assert first["iteration_count"] == 0
+    deltas = backend.tables["agent_state_deltas"]
+    assert [row["version"] for row in deltas] == [0, 1, 2]
+    assert [row["is_snapshot"] for row in deltas] == [True, False, False]
+    # One bulk insert for all three entries
+    assert backend.requests.count(("POST", "agent_state_deltas")) == 1
+
+def test_reads_do_not_flush_the_write_buffer():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend)
+        execution_id = await layer.init_execution("p1", {})
+        for step in range(3):
+            await layer.write_state({"execution_id": execution_id, "step": step})
+        latest = await layer.read_state(execution_id)
+        older = await layer.read_state(execution_id, version=1)
+        await layer.write_state({"execution_id": execution_id, "step": 3}, snapshot=True, status="completed")
+        row = await layer.get_execution(execution_id)  # state log no longer tracks it
+        final = await layer.read_state(execution_id)
+        writes = backend.requests.count(("POST", "agent_state_deltas"))
+        await layer.close()
+        return latest, older, row, final, writes
+
+    latest, older, row, final, writes = asyncio.run(scenario())
+    assert (latest["step"], older["step"], final["step"]) == (2, 1, 3)
+    assert row["status"] == "completed" and row["state_data"]["step"] == 3
+    assert writes == 0
+
+def test_untracked_read_replays_buffered_deltas_on_stored_snapshot():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend)
+        execution_id = await layer.init_execution("p1", {})
+        await layer.write_state({"execution_id": execution_id, "step": 0})
+        await layer.flush()  # snapshot v0 is stored
+        await layer.write_state({"execution_id": execution_id, "step": 1})
+        layer.state_log.forget(execution_id)  # e.g. evicted from the LRU
+        state = await layer.read_state(execution_id)
+        version = await layer._latest_version(execution_id)
+        await layer.close()
+        return state, version
+
+    state, version = asyncio.run(scenario())
+    assert state["step"] == 1
+    assert version == 1
+
+def test_rejected_batch_falls_back_but_outage_does_not():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend)
+        for n in range(3):
+            await layer.log_agent_reasoning("p1", "e1", "defi", n, "ok")
+        layer.write_buffer._rows["agent_reasoning"][1][0]["bad"] = True
+        await layer.flush()
+        rejected = backend.requests.count(("POST", "agent_reasoning"))
+
+        backend.down = True
+        await layer.log_agent_reasoning("p1", "e1", "defi", 3, "ok")
+        await layer.log_agent_reasoning("p1", "e1", "defi", 4, "ok")
+        await layer.flush()
+        down = backend.requests.count(("POST", "agent_reasoning")) - rejected
+        pending = layer.write_buffer.pending()
+        backend.down = False
+        await layer.close()
+        return rejected, down, pending
+
+    rejected, down, pending = asyncio.run(scenario())
+    assert rejected == 4  # the batch, then each row
+    assert down == 1
+    assert pending == 2 + 1  # the outage batch plus the bad row's retry
+    assert [row["step_number"] for row in backend.tables["agent_reasoning"]] == [0, 2, 3, 4]
+
+def test_final_status_refreshes_agent_executions():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend)
+        execution_id = await layer.init_execution("p1", {})
+        await layer.write_state({"execution_id": execution_id, "step": 1})
+        await layer.write_state({"execution_id": execution_id, "step": 2}, snapshot=True, status="completed")
+        await layer.flush()
+        row = await layer.get_execution(execution_id)
+        await layer.close()
+        return row
+
+    row = asyncio.run(scenario())
+    assert row["status"] == "completed"
+    assert row["state_data"]["step"] == 2
+
+def test_rows_queued_from_a_worker_thread_flush_on_the_loop():
+    backend = FakePostgREST()
+
+    async def scenario():
+        layer = make_layer(backend, batch_size=2, flush_interval=60)
+        layer.start_write_behind()
+
+        def worker():
+            for step in range(2):
+                layer.write_buffer.add_row("agent_reasoning", {"execution_id": "e1", "step_number": step})
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        for _ in range(50):
+            if backend.tables.get("agent_reasoning"):
+                break
+            await asyncio.sleep(0.01)
+        pending = layer.write_buffer.pending()
+        await layer.close()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+    assert [row["step_number"] for row in backend.tables["agent_reasoning"]] == [0, 1]
+
+def test_sync_and_async_layers_queue_identical_rows():
+    sync_layer = CoordinationLayer(supabase_url="", supabase_key="", redis_url="")
+    sync_layer.supabase = object()  # only queues; nothing is flushed
+    backend = FakePostgREST()
+
+    sync_layer.log_agent_decision("p1", "e1", "risk", "approve", {"apy": 0.05}, "fine")
+    sync_layer.record_risk_assessment("p1", "e1", "aave", 0.2, {"tvl": 1e9}, True)
+    sync_layer.log_agent_reasoning("p1", "e1", "defi", 1, "compare pools")
+
+    async def scenario():
+        layer = make_layer(backend)
+        for call in (
+            layer.log_agent_decision("p1", "e1", "risk", "approve", {"apy": 0.05}, "fine"),
+            layer.record_risk_assessment("p1", "e1", "aave", 0.2, {"tvl": 1e9}, True),
+            layer.log_agent_reasoning("p1", "e1", "defi", 1, "compare pools")
+        ):
+            await call
+        return dict(layer.write_buffer._rows)
+
+    async_rows = asyncio.run(scenario())
+    assert dict(sync_layer.write_buffer._rows) == async_rows
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from backtesting.engine import MarketHistory, StrategyBacktest, WALLET, parameter_grid
+from models.allocator import AllocationOptimizer
+from models.risk_ebm import MAX_SCORE
+
+PROTOCOLS = ["Aave", "Spark", "Morpho"]
+RISK = np.array([1.0, 1.2, 4.0])
+
+def flat_history(apy, days=30, gas_gwei=0.0):
+    steps = days * 24
+    timestamps = 1_700_000_000 + np.arange(steps) * 3600
+    apy = np.tile(np.asarray(apy, dtype=float), (steps, 1))
+    return MarketHistory(timestamps, PROTOCOLS, apy, np.full_like(apy, 1e9), np.full(steps, gas_gwei))
+
+def backtest(history, **optimizer):
+    return StrategyBacktest(history, RISK, optimizer=AllocationOptimizer(**optimizer))
+
+PORTFOLIOS = {"amount": np.array([1_000.0, 20_000.0]), "start": np.array([0, WALLET])}
+
+def test_first_decision_is_the_optimizers_plan():
+    history = flat_history([0.03, 0.08, 0.15])
+    grid = parameter_grid(min_apy_diff=[0.0], risk_threshold=[3.0], gas_payback_days=[30])
+    bt = backtest(history, max_protocol_share=1.0)
+    results = bt.run(grid, PORTFOLIOS, decision_every=len(history.timestamps))
+
+    # One decision at t=0: both portfolios end up fully in Spark (Morpho is above the risk ceiling)
+    solved = bt.optimizer.solve(
+        apy=history.apy[0], risk_adjusted_apy=history.apy[0] * (1 - RISK / MAX_SCORE), risk=RISK,
+        tvl=history.tvl[0], protocol=np.arange(3), held=np.array([[1_000.0, 0, 0], [0, 0, 0]]),
+        idle=np.array([0.0, 20_000.0]), gas=np.zeros(3), horizon_days=30, risk_ceiling=3.0, min_apy_gain=0.0
+    )
+    assert (solved["reason"] == -1).all()
+    assert results["migrations"].tolist() == [[1, 1]]
+    assert results["final_protocol"].tolist() == [[1, 1]]
+    assert results["risk_exposure"][0] == pytest.approx([1.2, 1.2])
+    # Everything earned Spark's APY after paying slippage
+    growth = np.exp(bt.log_growth[-1, 1] - bt.log_growth[0, 1])
+    assert results["final_value"][0] == pytest.approx((PORTFOLIOS["amount"] - solved["slippage"]) * growth)
+
+def test_parameters_change_decisions_per_row():
+    history = flat_history([0.05, 0.06, 0.15])
+    grid = parameter_grid(min_apy_diff=[0.005, 0.02], risk_threshold=[3.0, 10.0], gas_payback_days=[30])
+    results = backtest(history, max_protocol_share=1.0).run(grid, PORTFOLIOS, decision_every=24)
+
+    moved = results["migrations"][:, 0] > 0  # the portfolio starting in Aave
+    by_params = dict(zip(zip(grid["min_apy_diff"], grid["risk_threshold"]), moved))
+    assert by_params == {(0.005, 3.0): True, (0.005, 10.0): True, (0.02, 3.0): False, (0.02, 10.0): True}
+    assert (results["final_protocol"][grid["risk_threshold"] == 10.0] == 2).all()
+
+def test_gas_is_paid_and_blocks_unprofitable_moves():
+    history = flat_history([0.05, 0.06, 0.0], gas_gwei=100.0)
+    grid = parameter_grid(min_apy_diff=[0.0], risk_threshold=[3.0], gas_payback_days=[7, 365])
+    bt = backtest(history, max_protocol_share=1.0)
+    results = bt.run(grid, PORTFOLIOS, decision_every=24 * 7)
+
+    # Depositing the idle 20k cannot pay mainnet-priced gas within a week; within a year it can
+    assert results["migrations"][0, 1] == 0
+    assert results["gas_usd"][0, 1] == 0
+    assert results["final_value"][0, 1] == 20_000.0
+    assert results["migrations"][1, 1] == 1
+    assert results["gas_usd"][1, 1] > 0
+    assert (results["final_value"] > 0).all()
+
+def test_hold_baseline_keeps_the_start():
+    history = flat_history([0.05, 0.06, 0.15])
+    bt = backtest(history)
+    hold = bt.hold(PORTFOLIOS)
+    assert hold[1] == 20_000.0
+    assert hold[0] == pytest.approx(1_000.0 * np.exp(bt.log_growth[-1, 0] - bt.log_growth[0, 0]))
@@ -0,0 +1,88 @@
+import pytest
+from agent_layer.bulk_rebalance import BulkRebalancer
+from agent_layer.defi_agent import DeFiAgent, allocation_optimizer, proposal_from_plan
+from models.allocator import HOLD_REASONS
+from config.settings import settings
+
+def pool(protocol, apy, risk, tvl=1e9):
+    return {
+        "protocol": protocol,
+        "pool_id": f"{protocol.lower()}-usdc",
+        "apy": apy,
+        "risk_adjusted_apy": apy * (1 - risk / 10),
+        "risk_score": risk,
+        "tvl": tvl
+    }
+
+POOLS = [pool("Aave", 0.05, 1.0), pool("Spark", 0.06, 1.2), pool("Morpho", 0.09, 2.0), pool("Curve", 0.2, 9.0)]
+
+PORTFOLIOS = [
+    {"balances": {"USDC": 0}, "positions": {}},
+    {"balances": {"USDC": 5_000}, "positions": {}},
+    {"balances": {"USDC": 0}, "positions": {"Aave": {"USDC": 2_000, "apy": 0.05}}},
+    {"balances": {"USDC": 0}, "positions": {"Morpho": {"USDC": 1_000, "apy": 0.09}}},
+    {"balances": {"USDC": 50}, "positions": {"Spark": {"USDC": 800, "apy": 0.06}}},
+    # held outside the index: earns what the position reports
+    {"balances": {"USDC": 0}, "positions": {"Legacy": {"USDC": 3_000, "apy": 0.075}}}
+]
+
+@pytest.mark.parametrize("gas_price_gwei", [None, 0.05, 50.0])
+def test_bulk_sweep_decides_like_the_defi_agent(gas_price_gwei):
+    decision = BulkRebalancer().evaluate(PORTFOLIOS, POOLS, gas_price_gwei)
+    agent = DeFiAgent(None)
+
+    for i, portfolio in enumerate(PORTFOLIOS):
+        single = agent._analyze_opportunities(portfolio["positions"], portfolio["balances"], POOLS, gas_price_gwei)
+        bulk = proposal_from_plan(
+            allocation_optimizer.plan(decision["pools"], decision["solved"], i), portfolio["positions"]
+        )
+        assert bulk["action"] == single["action"] == ("migrate" if decision["act"][i] else "hold")
+        if single["action"] == "migrate":
+            assert (bulk["source"], bulk["destination"]) == (single["source"], single["destination"])
+            assert bulk["amount"] == pytest.approx(single["amount"])
+
+def test_proposals_for_unindexed_holdings_are_json_safe():
+    import json
+    for i, portfolio in enumerate(PORTFOLIOS):
+        decision = BulkRebalancer().evaluate(PORTFOLIOS, POOLS, 0.05)
+        proposal = proposal_from_plan(allocation_optimizer.plan(decision["pools"], decision["solved"], i), portfolio["positions"])
+        json.dumps(proposal, allow_nan=False)
+    single = DeFiAgent(None)._analyze_opportunities(PORTFOLIOS[5]["positions"], PORTFOLIOS[5]["balances"], POOLS, 0.05)
+    json.dumps(single, allow_nan=False)
+
+def test_min_apy_diff_is_the_agents_setting():
+    # 0.5% better than what is held: below MIN_APY_DIFF, so both paths hold
+    pools = [pool("Aave", 0.05, 0.0), pool("Spark", 0.05 + settings.MIN_APY_DIFF / 4, 0.0)]
+    portfolio = {"balances": {"USDC": 0}, "positions": {"Aave": {"USDC": 10_000, "apy": 0.05}}}
+
+    decision = BulkRebalancer().evaluate([portfolio], pools)
+    assert HOLD_REASONS[decision["reason"][0]] == "gain_below_min"
+    assert DeFiAgent(None)._analyze_opportunities(portfolio["positions"], portfolio["balances"], pools)["action"] == "hold"
+
+def test_concurrent_bulk_sweeps_are_rejected_with_429(monkeypatch):
+    import asyncio
+    from fastapi import HTTPException
+    import api
+
+    class SlowRebalancer:
+        def __init__(self, coord):
+            pass
+
+        async def run(self, portfolios, execute, dry_run):
+            await asyncio.sleep(0.01)
+            return {"portfolios": len(portfolios)}
+
+    monkeypatch.setattr(api, "BulkRebalancer", SlowRebalancer)
+    monkeypatch.setattr(api.settings, "BULK_MAX_CONCURRENT", 1)
+    request = api.BulkRebalanceRequest(portfolios=[{"wallet_address": "0xabc", **PORTFOLIOS[1]}], execute=False)
+
+    async def two_sweeps():
+        return await asyncio.gather(api.bulk_rebalance(request), api.bulk_rebalance(request), return_exceptions=True)
+
+    first, second = asyncio.run(two_sweeps())
+    assert first == {"portfolios": 1}
+    assert isinstance(second, HTTPException) and second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert api.bulk_sweeps["running"] == 0
+    # The slot is free again once the first sweep finishes
+    assert asyncio.run(api.bulk_rebalance(request)) == {"portfolios": 1}
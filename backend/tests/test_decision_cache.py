@@ -0,0 +1,87 @@
+import asyncio
+import copy
+import coordination_layer.cache as cache_module
+from agent_layer.decision_cache import DecisionCache
+
+class Clock:
+    '''Stands in for the time module inside coordination_layer.cache'''
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def make_state(**overrides):
+    state = {
+        "user_input": "Rebalance my USDC for the best yield.",
+        "balances": {"USDC": 10000.0},
+        "positions": {},
+        "defi_proposal": {"protocol": "Curve", "amount": 10000, "signature": "0xaaa"},
+        "risk_assessment": None,
+        "prediction_forecast": None,
+        "agent_reasoning": ["DeFi: Curve pays 8%", "Orchestrator: sending to risk"]
+    }
+    state.update(overrides)
+    return state
+
+def test_equivalent_situations_share_a_key():
+    cache = DecisionCache()
+    key = cache.key_for(make_state(), "gemini")
+
+    same = make_state(
+        user_input="  rebalance my   USDC for the BEST yield  ",
+        defi_proposal={"protocol": "Curve", "amount": 10000, "signature": "0xbbb", "signed_by": "0x1"},
+        agent_reasoning=["DeFi: Curve pays 8%", "Orchestrator: something else entirely"]
+    )
+    assert cache.key_for(same, "gemini") == key
+
+def test_prompt_inputs_and_model_change_the_key():
+    cache = DecisionCache()
+    key = cache.key_for(make_state(), "gemini")
+
+    assert cache.key_for(make_state(), "other-model") != key
+    assert cache.key_for(make_state(balances={"USDC": 5000.0}), "gemini") != key
+    assert cache.key_for(make_state(defi_proposal={"protocol": "Aave", "amount": 10000}), "gemini") != key
+    assert cache.key_for(make_state(agent_reasoning=["Risk: Curve scored 4.0"]), "gemini") != key
+
+def test_only_the_last_five_agent_lines_count():
+    cache = DecisionCache()
+    lines = [f"DeFi: step {i}" for i in range(8)]
+    older = make_state(agent_reasoning=["Risk: long ago"] + lines)
+    assert cache.key_for(older, "gemini") == cache.key_for(make_state(agent_reasoning=lines), "gemini")
+
+def test_decisions_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    cache = DecisionCache(ttl=60)
+    key = cache.key_for(make_state(), "gemini")
+    decision = {"next_agent": "risk", "reasoning": "check the proposal"}
+
+    async def scenario():
+        await cache.set(key, copy.deepcopy(decision))
+        clock.now += 59
+        hit = await cache.get(key)
+        clock.now += 2
+        expired = await cache.get(key)
+        return hit, expired
+
+    hit, expired = asyncio.run(scenario())
+    assert hit == decision
+    assert expired is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+    assert stats["redis_enabled"] is False
+
+def test_least_recently_used_decision_is_evicted():
+    cache = DecisionCache(max_size=2)
+
+    async def scenario():
+        await cache.set("a", {"next_agent": "defi"})
+        await cache.set("b", {"next_agent": "risk"})
+        await cache.get("a")
+        await cache.set("c", {"next_agent": "END"})
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,101 @@
+import asyncio
+from coordination_layer.events import ExecutionEventBus
+
+def collect(bus, execution_id, last_event_id=0):
+    async def scenario():
+        return [event async for event in bus.subscribe(execution_id, last_event_id=last_event_id, heartbeat=1)]
+    return asyncio.run(scenario())
+
+def publish_steps(bus, execution_id, steps):
+    for step in range(steps):
+        bus.publish(execution_id, "reasoning", {"step": step})
+    bus.end(execution_id, "completed")
+
+def test_resume_after_last_event_id():
+    bus = ExecutionEventBus()
+    publish_steps(bus, "a", 3)
+
+    events = collect(bus, "a", last_event_id=2)
+    assert [event["id"] for event in events] == [3, 4]
+    assert events[-1] == {**events[-1], "type": "end", "data": {"status": "completed"}}
+
+def test_live_subscriber_receives_events_from_another_thread():
+    bus = ExecutionEventBus()
+
+    async def scenario():
+        async def publisher():
+            await asyncio.sleep(0.01)
+            await asyncio.to_thread(publish_steps, bus, "a", 2)
+        task = asyncio.create_task(publisher())
+        events = [event async for event in bus.subscribe("a", heartbeat=1)]
+        await task
+        return events
+
+    assert [event["type"] for event in asyncio.run(scenario())] == ["reasoning", "reasoning", "end"]
+    assert bus.get_metrics()["subscribers"] == 0
+
+def test_resume_from_before_the_window_resyncs():
+    bus = ExecutionEventBus(history=3)
+    publish_steps(bus, "a", 5)  # ids 1-6, ids 4-6 kept
+
+    events = collect(bus, "a", last_event_id=1)
+    assert events[0]["type"] == "resync" and events[0]["data"] == {"from_id": 4}
+    assert [event["id"] for event in events[1:]] == [4, 5, 6]
+    assert bus.metrics["resyncs"] == 1
+
+def test_resume_past_a_recreated_channel_resyncs():
+    bus = ExecutionEventBus()
+    publish_steps(bus, "a", 1)  # ids start over after the channel expired
+
+    events = collect(bus, "a", last_event_id=40)
+    assert events[0]["type"] == "resync"
+    assert [event["id"] for event in events[1:]] == [1, 2]
+
+def test_ended_channels_expire_after_ttl():
+    bus = ExecutionEventBus(ttl=60)
+    publish_steps(bus, "old", 1)
+    publish_steps(bus, "recent", 1)
+    bus._channels["old"].ended_at -= 61
+
+    bus.publish("new", "reasoning", {})  # expiry runs when a channel is created
+    assert not bus.known("old")
+    assert bus.known("recent") and bus.known("new")
+
+def test_idle_channels_without_subscribers_expire():
+    bus = ExecutionEventBus(idle_ttl=600)
+    bus.publish("crashed", "reasoning", {})  # never ends
+    bus.publish("running", "reasoning", {})
+    bus._channels["crashed"].active_at -= 601
+    bus._channels["running"].active_at -= 599
+
+    bus.publish("new", "reasoning", {})
+    assert not bus.known("crashed")
+    assert bus.known("running")
+
+def test_channels_with_subscribers_are_kept():
+    bus = ExecutionEventBus(ttl=0, idle_ttl=0, max_executions=1)
+
+    async def scenario():
+        stream = bus.subscribe("watched", heartbeat=1)
+        waiting = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        bus._channels["watched"].active_at -= 10
+        bus.publish("other", "reasoning", {})
+        known = bus.known("watched")
+        waiting.cancel()
+        return known
+
+    assert asyncio.run(scenario())
+
+def test_limit_drops_ended_then_longest_idle():
+    bus = ExecutionEventBus(max_executions=3)
+    bus.publish("idle-old", "reasoning", {})
+    bus.publish("idle-new", "reasoning", {})
+    publish_steps(bus, "ended", 1)
+    bus._channels["idle-old"].active_at -= 10
+
+    bus.publish("fourth", "reasoning", {})
+    assert not bus.known("ended")
+    bus.publish("fifth", "reasoning", {})
+    assert not bus.known("idle-old")
+    assert [bus.known(i) for i in ("idle-new", "fourth", "fifth")] == [True, True, True]
@@ -0,0 +1,72 @@
+import asyncio
+from scheduler.execution_registry import ExecutionRegistry
+
+class FakeCoord:
+    '''Older executions the registry no longer indexes, newest first'''
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.calls = []
+
+    def list_executions(self, limit=50, offset=0, status=None, portfolio_id=None):
+        self.calls.append({"limit": limit, "offset": offset, "status": status})
+        rows = [r for r in self.rows if status is None or r["status"] == status]
+        return rows[offset:offset + limit]
+
+    def get_execution(self, execution_id):
+        return None
+
+def ids(page):
+    return [item["execution_id"] for item in page["items"]]
+
+def fill(registry, n, portfolios=("p0", "p1")):
+    for i in range(n):
+        registry.add(f"e{i}", portfolios[i % len(portfolios)], {}, status="running")
+
+def test_pages_are_newest_first_per_status_in_start_order():
+    registry = ExecutionRegistry(FakeCoord())
+    fill(registry, 6)
+    # Finish out of start order: the status index must still be newest-started first
+    for execution_id in ("e4", "e1", "e5", "e2"):
+        registry.update(execution_id, status="completed")
+
+    page = asyncio.run(registry.list(limit=3, status="completed"))
+    assert ids(page) == ["e5", "e4", "e2"]
+    assert page["next_offset"] == 3
+    assert ids(asyncio.run(registry.list(limit=3, offset=3, status="completed"))) == ["e1"]
+    assert ids(asyncio.run(registry.list(status="running"))) == ["e3", "e0"]
+    assert ids(asyncio.run(registry.list(portfolio_id="p1", status="completed"))) == ["e5", "e1"]
+    assert ids(asyncio.run(registry.list(limit=2, offset=1))) == ["e4", "e3"]
+
+def test_trimming_drops_oldest_from_every_index():
+    registry = ExecutionRegistry(FakeCoord(), max_index=4)
+    fill(registry, 3)
+    registry.update("e0", status="completed")
+    for execution_id, portfolio_id in (("e3", "p2"), ("e4", "p1"), ("e5", "p1")):
+        registry.add(execution_id, portfolio_id, {}, status="running")
+
+    assert list(registry._order) == ["e2", "e3", "e4", "e5"]
+    assert "completed" not in registry._by_status
+    assert list(registry._by_portfolio["p0"]) == ["e2"]
+    assert list(registry._by_portfolio["p1"]) == ["e4", "e5"]
+    assert set(registry._summaries) == set(registry._seq) == {"e2", "e3", "e4", "e5"}
+    assert registry.get_metrics()["indexed"] == 4
+
+def test_page_past_trimmed_index_reads_the_coordination_layer():
+    cold = [{"execution_id": f"old{i}", "status": "completed", "portfolio_id": "p0"} for i in range(5)]
+    # The coordination layer also holds what is still indexed (newest first)
+    coord = FakeCoord([{"execution_id": f"e{i}", "status": "completed"} for i in (3, 2)] + cold)
+    registry = ExecutionRegistry(coord, max_index=2)
+    fill(registry, 4)
+    for execution_id in ("e2", "e3"):
+        registry.update(execution_id, status="completed")
+
+    page = asyncio.run(registry.list(limit=3, offset=1, status="completed"))
+    assert ids(page) == ["e2", "old0", "old1"]
+    assert page["source"] == "index+coordination_layer"
+    assert coord.calls == [{"limit": 2, "offset": 2, "status": "completed"}]
+
+    # Entirely past the index: the offset is passed through as is
+    page = asyncio.run(registry.list(limit=2, offset=4, status="completed"))
+    assert ids(page) == ["old2", "old3"]
+    assert coord.calls[-1]["offset"] == 4
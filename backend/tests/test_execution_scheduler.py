@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from scheduler.execution_scheduler import ExecutionScheduler, SchedulerSaturated
+from scheduler.execution_registry import ExecutionRegistry
+
+class Runs:
+    '''Records start order; every run blocks until released'''
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+
+    async def __call__(self, execution_id):
+        self.started.append(execution_id)
+        gate = self.gates.setdefault(execution_id, asyncio.Event())
+        await gate.wait()
+
+    def release(self, execution_id):
+        self.gates.setdefault(execution_id, asyncio.Event()).set()
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_waiting_jobs_run_by_priority_then_fifo():
+    async def scenario():
+        runs = Runs()
+        scheduler = ExecutionScheduler(runs, max_workers=1, max_per_portfolio=5)
+        await scheduler.start()
+        scheduler.submit("blocker", "p0", priority=5)
+        await settle()
+
+        scheduler.submit("low-1", "p1", priority=8)
+        scheduler.submit("high", "p2", priority=1)
+        scheduler.submit("low-2", "p3", priority=8)
+        scheduler.submit("mid", "p4", priority=5)
+        for execution_id in ("blocker", "high", "mid", "low-1", "low-2"):
+            runs.release(execution_id)
+            await settle()
+        await scheduler.stop()
+        return runs.started
+
+    assert asyncio.run(scenario()) == ["blocker", "high", "mid", "low-1", "low-2"]
+
+def test_portfolio_limit_parks_jobs_without_blocking_others():
+    async def scenario():
+        runs = Runs()
+        scheduler = ExecutionScheduler(runs, max_workers=2, max_per_portfolio=1)
+        await scheduler.start()
+        scheduler.submit("a-1", "a")
+        scheduler.submit("a-2", "a")
+        scheduler.submit("b-1", "b")
+        await settle()
+
+        assert runs.started == ["a-1", "b-1"]
+        assert scheduler.get_metrics()["parked"] == 1
+
+        runs.release("a-1")
+        await settle()
+        assert runs.started == ["a-1", "b-1", "a-2"]
+        assert scheduler.get_metrics()["parked"] == 0
+
+        runs.release("b-1")
+        runs.release("a-2")
+        await settle()
+        metrics = scheduler.get_metrics()
+        await scheduler.stop()
+        return metrics, dict(scheduler._queued)
+
+    metrics, queued = asyncio.run(scenario())
+    assert metrics["completed"] == 3
+    assert metrics["running"] == 0
+    assert queued == {}
+
+def test_admission_limits_raise_saturated():
+    async def scenario():
+        runs = Runs()
+        scheduler = ExecutionScheduler(runs, max_workers=1, max_queue=3, max_queued_per_portfolio=2)
+        await scheduler.start()
+        scheduler.submit("a-1", "a")
+        scheduler.submit("a-2", "a")
+        with pytest.raises(SchedulerSaturated):
+            scheduler.submit("a-3", "a")
+        scheduler.submit("b-1", "b")
+        with pytest.raises(SchedulerSaturated) as saturated:
+            scheduler.submit("c-1", "c")
+        await scheduler.stop()
+        return saturated.value, scheduler.metrics["rejected"]
+
+    error, rejected = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert rejected == 2
+
+def test_out_of_range_priority_is_clamped():
+    async def scenario():
+        runs = Runs()
+        scheduler = ExecutionScheduler(runs, max_workers=1)
+        await scheduler.start()
+        scheduler.submit("x", "p", priority=-4)
+        scheduler.submit("y", "q", priority=99)
+        priorities = sorted(item[0] for item in scheduler._queue._queue)
+        await scheduler.stop()
+        return priorities
+
+    assert asyncio.run(scenario()) == [0, 9]
+
+def test_chat_request_bounds_priority():
+    from api import ChatRequest
+    assert ChatRequest(message="hi").priority == 5
+    for priority in (None, -1, 10):
+        with pytest.raises(ValidationError):
+            ChatRequest(message="hi", priority=priority)
+
+def test_rejected_submit_closes_the_execution_row(monkeypatch):
+    from fastapi import HTTPException
+    import api
+
+    class FullScheduler:
+        def check_admission(self, portfolio_id=None):
+            pass
+
+        def submit(self, execution_id, portfolio_id, priority):
+            raise SchedulerSaturated("queue full", retry_after=3)
+
+    async def fake_request(chat_request):
+        api.executions.add("exec-1", "p1", {"execution_id": "exec-1", "error_messages": []}, status="queued")
+        return {"execution_id": "exec-1", "portfolio_id": "p1", "status": "queued", "message": "queued"}
+
+    writes = []
+    class FakeLayer:
+        async def write_state(self, state, snapshot=False, status="running"):
+            writes.append((state["execution_id"], snapshot, status))
+
+    monkeypatch.setattr(api, "scheduler", FullScheduler())
+    monkeypatch.setattr(api, "process_chat_request", fake_request)
+    monkeypatch.setattr(api, "coord_layer", FakeLayer())
+    monkeypatch.setattr(api, "executions", ExecutionRegistry(api.coord_layer))
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(api.chat_endpoint(api.ChatRequest(message="hi")))
+    assert raised.value.status_code == 429
+    assert raised.value.headers["Retry-After"] == "3"
+    assert writes == [("exec-1", True, "rejected")]
+    assert api.executions.get("exec-1")["status"] == "rejected"
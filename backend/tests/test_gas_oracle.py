@@ -0,0 +1,48 @@
+import asyncio
+import numpy as np
+import tools.gas_oracle as gas_oracle_module
+from tools.gas_oracle import GasOracle
+from tools.metrics_store import MetricsStore
+
+GENESIS = 1_700_000_000
+BLOCK_TIME = 2
+
+class FeeHistoryClient:
+    '''Chain whose head advances between polls; block n is mined at GENESIS + n * BLOCK_TIME'''
+
+    def __init__(self, head):
+        self.head = head
+        self.header_reads = []
+
+    async def request(self, method, params):
+        if method == "eth_feeHistory":
+            count = int(params[0], 16)
+            oldest = self.head - count + 1
+            return {
+                "oldestBlock": hex(oldest),
+                "baseFeePerGas": [hex(10**9 + n) for n in range(oldest, self.head + 2)],
+                "reward": [[hex(1), hex(2 * 10**8), hex(3)] for _ in range(count)]
+            }
+        if method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            self.header_reads.append(number)
+            return {"number": params[0], "timestamp": hex(GENESIS + number * BLOCK_TIME)}
+        raise AssertionError(method)
+
+def test_gas_history_is_stamped_with_block_times(tmp_path, monkeypatch):
+    client = FeeHistoryClient(head=100)
+    monkeypatch.setattr(gas_oracle_module, "get_rpc_client", lambda url: client)
+    store = MetricsStore(str(tmp_path))
+    oracle = GasOracle("http://rpc", window=5, history=store)
+
+    async def polls():
+        assert await oracle.refresh()
+        client.head = 103
+        assert await oracle.refresh()
+    asyncio.run(polls())
+
+    records = store.tail("_gas", 100)
+    assert list(records["block"]) == list(range(96, 104))
+    assert list(records["timestamp"]) == [GENESIS + n * BLOCK_TIME for n in range(96, 104)]
+    assert records["gas_gwei"][0] == (10**9 + 96 + 2 * 10**8) / 1e9
+    assert client.header_reads == list(range(96, 104))  # only new blocks are read
@@ -0,0 +1,80 @@
+import copy
+import pytest
+import tools.intent_batch as intent_batch
+from tools.intent_batch import (
+    proposal_intent, risk_intent, intent_hash, merkle_levels, merkle_proof, verify_proof,
+    sign_intent_batch, verify_intent_batch, verify_batched_intent
+)
+from tools.web3_tools import AgentKeyRegistry
+
+@pytest.fixture
+def keys(monkeypatch):
+    registry = AgentKeyRegistry({"risk_agent": "0x" + "11" * 32, "defi_agent": "0x" + "22" * 32})
+    monkeypatch.setattr(intent_batch, "agent_keys", registry)
+    return registry
+
+def intents(n):
+    return [
+        risk_intent(f"exec-{i}", {"protocol": "Curve", "risk_score": 2.0 + i, "safe": True})
+        for i in range(n)
+    ]
+
+def signer(keys):
+    return keys.address("risk_agent")
+
+def test_single_intent_batch(keys):
+    batch = sign_intent_batch("risk_agent", intents(1))
+    item = batch["items"][0]
+    assert batch["count"] == 1
+    assert item["proof"] == []
+    assert batch["root"] == item["leaf"]  # one leaf is its own root
+    assert verify_intent_batch(batch, signer(keys)) == [True]
+
+@pytest.mark.parametrize("n", [2, 3, 5, 8])
+def test_every_item_verifies_including_odd_leaves(keys, n):
+    batch = sign_intent_batch("risk_agent", intents(n))
+    assert verify_intent_batch(batch, signer(keys)) == [True] * n
+    for item in batch["items"]:
+        assert verify_batched_intent(item, batch["root"], batch["count"], batch["signature"], signer(keys))
+
+def test_odd_leaf_is_carried_up_unchanged():
+    leaves = [intent_hash(intent) for intent in intents(3)]
+    levels = merkle_levels(leaves)
+    assert [len(level) for level in levels] == [3, 2, 1]
+    assert levels[1][1] == leaves[2]
+    proof = merkle_proof(levels, 2)
+    assert proof == [levels[1][0]]
+    assert verify_proof(leaves[2], proof, levels[-1][0])
+
+def test_tampered_intent_or_proof_fails(keys):
+    batch = sign_intent_batch("risk_agent", intents(3))
+    root, count, signature = batch["root"], batch["count"], batch["signature"]
+
+    forged = copy.deepcopy(batch["items"][1])
+    forged["intent"]["message"]["safe"] = False
+    assert not verify_batched_intent(forged, root, count, signature, signer(keys))
+    del forged["leaf"]  # even without the claimed leaf, the proof no longer reaches the root
+    assert not verify_batched_intent(forged, root, count, signature, signer(keys))
+
+    bad_proof = copy.deepcopy(batch["items"][0])
+    node = bytearray(bytes.fromhex(bad_proof["proof"][0]))
+    node[0] ^= 1
+    bad_proof["proof"][0] = node.hex()
+    assert not verify_batched_intent(bad_proof, root, count, signature, signer(keys))
+
+    tampered = copy.deepcopy(batch)
+    tampered["items"][2]["intent"]["message"]["riskScoreBps"] = 100
+    assert verify_intent_batch(tampered, signer(keys)) == [True, True, False]
+
+def test_wrong_signer_or_count_rejects_the_batch(keys):
+    batch = sign_intent_batch("risk_agent", intents(2))
+    assert verify_intent_batch(batch, keys.address("defi_agent")) == [False, False]
+    assert verify_intent_batch(dict(batch, count=3), signer(keys)) == [False, False]
+
+def test_proposal_intents_and_errors(keys):
+    proposal = proposal_intent("exec-1", {"action": "move", "source": "Aave", "destination": "Curve", "asset": "USDC", "amount": 100})
+    batch = sign_intent_batch("defi_agent", [proposal])
+    assert verify_intent_batch(batch, keys.address("defi_agent")) == [True]
+
+    assert "error" in sign_intent_batch("qa_agent", [proposal])  # no key
+    assert "error" in sign_intent_batch("defi_agent", [])
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+from tools.metrics_store import MetricsStore, RECORD_DTYPE
+
+def segment_files(root, series="aave"):
+    return sorted(os.listdir(os.path.join(root, series)))
+
+def test_append_rolls_segments_and_drops_out_of_order(tmp_path):
+    store = MetricsStore(str(tmp_path), segment_records=4)
+    assert store.append("Aave", store.records(np.arange(10) * 60, apy=0.05)) == 10
+    assert store.append("Aave", store.records([120, 600], apy=0.06)) == 1  # 120 is older than the tail
+
+    assert len(segment_files(tmp_path)) == 3
+    assert store.metrics["out_of_order"] == 1
+    assert store.last("aave")["timestamp"] == 600
+    assert list(store.tail("aave", 2)["timestamp"]) == [540, 600]
+
+def test_range_within_and_across_segments(tmp_path):
+    store = MetricsStore(str(tmp_path), segment_records=4)
+    store.append("aave", store.records(np.arange(10) * 60, apy=np.arange(10) / 100))
+
+    inside = store.range("aave", 60, 180)
+    assert list(inside["timestamp"]) == [60, 120]
+    assert isinstance(inside, np.memmap)  # one segment: zero-copy view
+
+    across = store.range("aave", 120, 420)
+    assert list(across["timestamp"]) == [120, 180, 240, 300, 360]
+    assert np.allclose(store.window("aave", "apy", 480), [0.08, 0.09])
+    assert len(store.range("aave", 1000)) == 0
+    assert len(store.range("unknown")) == 0
+
+def test_compact_merges_and_downsamples_sealed_segments(tmp_path):
+    store = MetricsStore(str(tmp_path), segment_records=4)
+    store.append("aave", store.records(np.arange(12) * 60, apy=np.arange(12) / 100))
+
+    # Segments [0-180], [240-420] are sealed and older than 500; [480-660] is active
+    result = store.compact("aave", before=500, resolution=120)
+    assert result == {"segments_in": 2, "segments_out": 1, "records_in": 8, "records_out": 4}
+    assert list(store.range("aave")["timestamp"]) == [60, 180, 300, 420, 480, 540, 600, 660]
+    assert not any(name.endswith(".compacting") for name in segment_files(tmp_path))
+    assert len(segment_files(tmp_path)) == 2
+
+def test_restart_reads_existing_segments(tmp_path):
+    store = MetricsStore(str(tmp_path), segment_records=4)
+    store.append("aave", store.records(np.arange(6) * 60, apy=0.05))
+
+    reopened = MetricsStore(str(tmp_path), segment_records=4)
+    assert list(reopened.range("aave")["timestamp"]) == list(np.arange(6) * 60)
+    reopened.append("aave", reopened.records([360, 420], apy=0.06))
+    assert len(reopened.range("aave", 300)) == 3
+    assert reopened.series() == ["aave"]
+
+def test_torn_write_is_truncated_before_appending(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    store.append("aave", store.records([0, 60], apy=0.05))
+    path = os.path.join(tmp_path, "aave", segment_files(tmp_path)[0])
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD_DTYPE.itemsize // 2))  # crash mid-record
+
+    # Same process: the next append drops the partial record first
+    store.append("aave", store.records([120], apy=0.06))
+    assert os.path.getsize(path) == 3 * RECORD_DTYPE.itemsize
+    assert list(store.range("aave")["timestamp"]) == [0, 60, 120]
+
+    # After a restart: opening the segment drops it
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 5)
+    reopened = MetricsStore(str(tmp_path))
+    assert len(reopened.range("aave")) == 3
+    reopened.append("aave", reopened.records([180], apy=0.07))
+    assert np.allclose(reopened.window("aave", "apy"), [0.05, 0.05, 0.06, 0.07])
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+import tools.defi_tools as defi_tools
+import tools.opportunity_index as opportunity_module
+from tools.opportunity_index import OpportunityIndex, OpportunitySource, FixtureSource
+
+RISK = {"Aave": 2.0, "Curve": 4.0, "Yearn": 8.0, "Uniswap": 3.0}
+
+class FakeRiskModel:
+    def __init__(self):
+        self.calls = []
+
+    def assess_protocols(self, protocols):
+        self.calls.append(list(protocols))
+        return [(RISK.get(p, 9.0), {}) for p in protocols]
+
+class LiveSource(OpportunitySource):
+    name = "live"
+
+    def __init__(self, pools):
+        self.pools = pools
+        self.down = False
+
+    async def fetch(self):
+        if self.down:
+            raise ConnectionError("source unreachable")
+        return [dict(pool) for pool in self.pools]
+
+LIVE_POOLS = [
+    {"pool_id": "eth-aave", "protocol": "Aave", "asset": "USDC", "apy": 0.04, "tvl": 9e9, "utilization": 0.8, "chain": "Ethereum"},
+    {"pool_id": "eth-curve", "protocol": "Curve", "asset": "USDC-WETH", "apy": 0.09, "tvl": 1e8, "utilization": None, "chain": "Ethereum"}
+]
+
+@pytest.fixture
+def risk_model(monkeypatch):
+    model = FakeRiskModel()
+    monkeypatch.setattr(opportunity_module, "get_risk_model", lambda: model)
+    return model
+
+def make_index(monkeypatch, *sources):
+    index = OpportunityIndex(list(sources))
+    recorded = []
+    monkeypatch.setattr(index, "_record_history", recorded.append)  # no disk or forecaster
+    index.recorded = recorded
+    return index
+
+def test_sources_must_implement_fetch():
+    with pytest.raises(TypeError):
+        OpportunitySource()
+
+def test_refresh_ranks_by_risk_adjusted_apy(monkeypatch, risk_model):
+    index = make_index(monkeypatch, FixtureSource())
+    asyncio.run(index.refresh())
+
+    # Yearn's 12% at risk 8 (2.4%) ranks below Aave's 5% at risk 2 (4%)
+    ranked = [(pool["protocol"], round(pool["risk_adjusted_apy"], 4)) for pool in index.top(k=4)]
+    assert ranked == [("Curve", 0.048), ("Aave", 0.04), ("Yearn", 0.024), ("Uniswap", 0.021)]
+    assert risk_model.calls == [["Aave", "Curve", "Uniswap", "Yearn"]]  # one pass per refresh
+    assert index.recorded == []  # fixture pools are not market history
+
+def test_filters_mask_the_ranked_pools(monkeypatch, risk_model):
+    index = make_index(monkeypatch, FixtureSource(), LiveSource(LIVE_POOLS))
+    asyncio.run(index.refresh())
+
+    assert [pool["pool_id"] for pool in index.top(asset="WETH")] == ["eth-curve"]
+    assert len(index.top(asset="usdc")) == 6
+    assert [pool["pool_id"] for pool in index.top(chain="ethereum", min_tvl=1e9)] == ["eth-aave"]
+    assert {pool["protocol"] for pool in index.top(max_risk=3.0)} == {"Aave", "Uniswap"}
+    assert index.top(protocol="Compound") == [] and index.top(asset="DAI") == []
+    assert index.best_apy("Curve") == 0.09
+    assert index.best_apy("Curve", asset="WETH") == 0.09
+    assert index.best_apy("Compound") is None
+    assert len(index.recorded) == 1 and len(index.recorded[0].pools) == 2
+
+def test_failed_source_keeps_its_last_pools(monkeypatch, risk_model):
+    live = LiveSource(LIVE_POOLS)
+    index = make_index(monkeypatch, FixtureSource(), live)
+    asyncio.run(index.refresh())
+
+    live.down = True
+    asyncio.run(index.refresh())
+    assert len(index) == 6
+    assert index.metrics["source_errors"] == 1
+    assert index.get_metrics()["sources"] == {"fixture": 4, "live": 2}
+
+def test_get_all_opportunities_falls_back_until_the_index_is_loaded(monkeypatch, risk_model):
+    index = make_index(monkeypatch, FixtureSource())
+    monkeypatch.setattr(defi_tools, "opportunity_index", index)
+
+    fallback = defi_tools.get_all_opportunities()
+    assert [pool["protocol"] for pool in fallback] == ["Aave", "Curve", "Yearn"]
+    assert defi_tools.get_protocol_apy("Yearn") == 0.12
+
+    asyncio.run(index.ensure_loaded())
+    assert [pool["pool_id"] for pool in defi_tools.get_all_opportunities(k=2)] == ["fixture-curve-usdc", "fixture-aave-usdc"]
+    assert defi_tools.get_all_opportunities(k=5, protocol="Yearn")[0]["risk_score"] == 8.0
@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from eth_abi import encode, decode
+from web3 import Web3
+import tools.portfolio_snapshot as snapshot_module
+from tools.portfolio_snapshot import (
+    PortfolioSnapshotService, AGGREGATE3, GET_ETH_BALANCE, BALANCE_OF, DECIMALS, GET_USER_ACCOUNT_DATA,
+    DEMO_BALANCES
+)
+
+ALICE = Web3.to_checksum_address("0x" + "a1" * 20)
+BOB = Web3.to_checksum_address("0x" + "b2" * 20)
+
+class FakeChain:
+    '''
+    Answers eth_blockNumber and Multicall3.aggregate3 eth_calls from
+    in-memory balances; records the wallets each aggregate asked about.
+    '''
+
+    def __init__(self, service: PortfolioSnapshotService, block: int = 100):
+        self.block = block
+        self.tokens = {token: symbol for symbol, token in service.tokens.items()}
+        self.decimals = {"USDC": 6, "WETH": 18}
+        self.eth = {}  # wallet -> wei
+        self.erc20 = {}  # (wallet, symbol) -> raw amount
+        self.aave = {}  # wallet -> account data tuple
+        self.calls = []  # [(block, decimals requested, wallets)]
+        self.down = False
+
+    async def request(self, method, params=None):
+        if self.down:
+            raise ConnectionError("node unreachable")
+        if method == "eth_blockNumber":
+            return hex(self.block)
+        call, block = params
+        data = bytes.fromhex(call["data"][2:])
+        assert data[:4] == AGGREGATE3
+        requests = decode(["(address,bool,bytes)[]"], data[4:])[0]
+        results, wallets, decimals = [], [], 0
+        for target, _, call_data in requests:
+            target = Web3.to_checksum_address(target)
+            selector, arg = call_data[:4], call_data[4:]
+            wallet = Web3.to_checksum_address(decode(["address"], arg)[0]) if arg else None
+            if selector == DECIMALS:
+                decimals += 1
+                results.append((True, encode(["uint8"], [self.decimals[self.tokens[target]]])))
+            elif selector == GET_ETH_BALANCE:
+                wallets.append(wallet)
+                results.append((True, encode(["uint256"], [self.eth.get(wallet, 0)])))
+            elif selector == BALANCE_OF:
+                results.append((True, encode(["uint256"], [self.erc20.get((wallet, self.tokens[target]), 0)])))
+            elif selector == GET_USER_ACCOUNT_DATA:
+                data = self.aave.get(wallet)
+                results.append((data is not None, encode(["uint256"] * 6, list(data)) if data else b""))
+        self.calls.append((int(block, 16), decimals, wallets))
+        return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+@pytest.fixture
+def chain(monkeypatch):
+    service = PortfolioSnapshotService("http://node", batch_window=0.01)
+    chain = FakeChain(service)
+    monkeypatch.setattr(snapshot_module, "get_rpc_client", lambda url: chain)
+    monkeypatch.setattr(snapshot_module, "get_protocol_apy", lambda protocol: 0.05)
+    return service, chain
+
+def test_one_aggregate_reads_every_balance_and_position(chain):
+    service, node = chain
+    node.eth[ALICE] = 2 * 10 ** 18
+    node.erc20[(ALICE, "USDC")] = 1500 * 10 ** 6
+    node.erc20[(ALICE, "WETH")] = 5 * 10 ** 17
+    node.aave[ALICE] = (1000 * 10 ** 8, 200 * 10 ** 8, 0, 0, 0, 3 * 10 ** 18)
+
+    snapshot = asyncio.run(service.snapshots([ALICE.lower()]))[ALICE]
+    assert snapshot["block"] == 100
+    assert snapshot["balances"] == {"ETH": 2.0, "USDC": 1500.0, "WETH": 0.5}
+    assert snapshot["positions"]["Aave"] == {"USDC": 1000.0, "debt": 200.0, "health_factor": 3.0, "apy": 0.05}
+    assert node.calls == [(100, 2, [ALICE])]
+
+def test_decimals_are_fetched_once_and_snapshots_cached_per_block(chain):
+    service, node = chain
+
+    async def scenario():
+        await service.snapshots([ALICE])
+        await service.snapshots([ALICE])  # same head block: cached
+        node.block = 101
+        service._head.clear()
+        await service.snapshots([ALICE])
+        await service.snapshots([ALICE], block=100)
+
+    asyncio.run(scenario())
+    assert [(block, decimals) for block, decimals, _ in node.calls] == [(100, 2), (101, 0)]
+    assert service.get_metrics()["cache_hits"] == 2
+
+def test_concurrent_snapshots_share_one_aggregate(chain):
+    service, node = chain
+
+    async def scenario():
+        return await asyncio.gather(service.snapshot(ALICE), service.snapshot(BOB), service.snapshot(ALICE))
+
+    alice, bob, again = asyncio.run(scenario())
+    assert alice is again
+    assert (alice["wallet"], bob["wallet"]) == (ALICE, BOB)
+    assert len(node.calls) == 1 and len(node.calls[0][2]) == 2
+
+def test_large_wallet_lists_are_chunked(chain):
+    service, node = chain
+    service.max_wallets_per_call = 2
+    wallets = ["0x" + f"{n:040x}" for n in range(1, 6)]
+    assert len(asyncio.run(service.snapshots(wallets, block=100))) == 5
+    assert [len(wallets) for _, _, wallets in node.calls] == [2, 2, 1]
+
+def test_empty_accounts_have_no_aave_position(chain):
+    service, node = chain
+    snapshot = asyncio.run(service.snapshots([ALICE], block=100))
+    assert snapshot[ALICE]["positions"] == {}
+
+def test_failures_reach_every_waiter_and_fall_back_to_demo(chain, monkeypatch):
+    service, node = chain
+    node.down = True
+
+    async def scenario():
+        return await asyncio.gather(service.snapshot(ALICE, block=100), service.snapshot(BOB, block=100), return_exceptions=True)
+
+    assert all(isinstance(e, ConnectionError) for e in asyncio.run(scenario()))
+    assert service.metrics["failures"] == 2
+
+    monkeypatch.setattr(snapshot_module, "portfolio_snapshots", service)
+    states = asyncio.run(snapshot_module.portfolio_states([ALICE, "0xDemoWallet123"]))
+    assert states[ALICE][0] == DEMO_BALANCES
+    assert states["0xDemoWallet123"][0] == DEMO_BALANCES
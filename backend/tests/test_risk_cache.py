@@ -0,0 +1,41 @@
+import asyncio
+import config.settings as settings_module
+from agent_layer.risk_cache import RiskAssessmentCache
+from models.risk_ebm import RiskModel
+
+ASSESSMENT = {"protocol": "Curve", "risk_score": 3.1, "safe": False, "signature": "0xabc"}
+
+def test_key_follows_features_model_and_threshold(monkeypatch):
+    cache = RiskAssessmentCache()
+    model = RiskModel()
+    key = cache.key_for(model, "Curve")
+    assert key == cache.key_for(RiskModel(), "Curve")  # same inputs, same key
+    assert key != cache.key_for(model, "Aave")
+
+    model.update_protocol("Curve", {"age": 3.5, "tvl": 2e9, "audits": 4, "hacks": 0})
+    assert cache.key_for(model, "Curve") != key
+
+    retrained = RiskModel()
+    retrained.version = "ebm-v3"
+    assert cache.key_for(retrained, "Curve") != key
+
+    monkeypatch.setattr(settings_module.settings, "RISK_THRESHOLD", 5.0)
+    assert cache.key_for(RiskModel(), "Curve") != key
+
+def test_feature_change_misses_and_invalidate_drops():
+    cache = RiskAssessmentCache()
+    model = RiskModel()
+
+    async def scenario():
+        await cache.set(model, "Curve", ASSESSMENT)
+        hit = await cache.get(model, "Curve")
+        model.update_protocol("Curve", {"age": 3.5, "tvl": 2e9, "audits": 4, "hacks": 1})
+        after_update = await cache.get(model, "Curve")
+
+        await cache.set(model, "Curve", ASSESSMENT)
+        await cache.invalidate(model, "Curve")
+        after_invalidate = await cache.get(model, "Curve")
+        return hit, after_update, after_invalidate
+
+    assert asyncio.run(scenario()) == (ASSESSMENT, None, None)
+    assert cache.stats()["hits"] == 1
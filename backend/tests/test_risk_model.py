@@ -0,0 +1,101 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from models.risk_ebm import (
+    RiskModel, FEATURES, CONTRIBUTION_NAMES, UNKNOWN_SCORE, MAX_SCORE,
+    artifact_path, latest_artifact_version, load_risk_model
+)
+
+PROTOCOLS = ["Aave", "Curve", "Uniswap", "Yearn"]
+
+def test_batch_scores_match_one_by_one():
+    model = RiskModel()
+    batch = model.assess_protocols(PROTOCOLS)
+    for protocol, (score, factors) in zip(PROTOCOLS, batch):
+        single_score, single_factors = model.assess_protocol(protocol)
+        assert score == pytest.approx(single_score)  # matmul order may differ in the last bit
+        assert factors == pytest.approx(single_factors)
+        assert set(factors) == set(CONTRIBUTION_NAMES)
+        assert 0.0 <= score <= MAX_SCORE
+
+def test_dataframe_and_array_inputs_agree():
+    model = RiskModel()
+    matrix = model.feature_matrix(PROTOCOLS)
+    frame = pd.DataFrame(matrix, columns=list(FEATURES)).assign(name=PROTOCOLS)  # extra column ignored
+
+    scores, contributions = model.assess_batch(matrix)
+    frame_scores, frame_contributions = model.assess_batch(frame[["name", *reversed(FEATURES)]])
+    assert np.array_equal(scores, frame_scores)
+    assert np.array_equal(contributions, frame_contributions)
+    assert contributions.shape == (len(PROTOCOLS), len(FEATURES))
+
+def test_unknown_protocols_and_missing_features_score_unknown():
+    model = RiskModel()
+    assert model.assess_protocols(["Aave", "Nope"])[1] == (UNKNOWN_SCORE, {"reason": "Unknown protocol"})
+
+    rows = model.feature_matrix(["Aave", "Aave"])
+    rows[1, FEATURES.index("audits")] = np.nan
+    scores, contributions = model.assess_batch(rows)
+    assert scores[1] == UNKNOWN_SCORE
+    assert not contributions[1].any()
+
+def test_rank_protocols_safest_first_with_threshold():
+    model = RiskModel()
+    ranked = model.rank_protocols()
+    scores = [entry["risk_score"] for entry in ranked]
+    assert scores == sorted(scores)
+    assert {entry["protocol"] for entry in ranked} == set(PROTOCOLS)
+
+    threshold = ranked[1]["risk_score"] + 1e-9
+    assert [entry["protocol"] for entry in model.rank_protocols(threshold=threshold)] == [ranked[0]["protocol"], ranked[1]["protocol"]]
+
+def test_update_protocol_reindexes_the_database():
+    model = RiskModel()
+    model.update_protocol("Morpho", {"age": 1.0, "tvl": 1e9, "audits": 2, "hacks": 0, "ignored": 1})
+    assert model.features_for("Morpho") == {"age": 1.0, "tvl": 1e9, "audits": 2, "hacks": 0}
+    score, _ = model.assess_protocol("Morpho")
+    assert score != UNKNOWN_SCORE
+    assert "Morpho" in [entry["protocol"] for entry in model.rank_protocols()]
+
+class StubEBM:
+    '''Stands in for a fitted ExplainableBoostingClassifier: P(risky) = offset'''
+
+    def __init__(self, offset: float):
+        self.offset = offset
+
+    def predict_proba(self, x):
+        return np.column_stack([np.full(len(x), 1 - self.offset), np.full(len(x), self.offset)])
+
+    def eval_terms(self, x):
+        return np.full(x.shape, self.offset)
+
+def save_artifact(model_dir, version, offset, features=FEATURES):
+    joblib.dump({"model": StubEBM(offset), "features": features, "version": version}, artifact_path(str(model_dir), version))
+
+def test_no_artifact_falls_back_to_mock(tmp_path):
+    assert latest_artifact_version(str(tmp_path)) is None
+    assert load_risk_model(str(tmp_path), "latest").version == "mock"
+
+def test_latest_and_pinned_versions(tmp_path):
+    for version, offset in ((1, 0.1), (2, 0.2), (10, 0.5)):
+        save_artifact(tmp_path, version, offset)
+    (tmp_path / "risk_ebm-vX.joblib").write_bytes(b"not a version")
+
+    assert latest_artifact_version(str(tmp_path)) == 10
+    latest = load_risk_model(str(tmp_path), "latest")
+    assert latest.version == "ebm-v10"
+    assert latest.assess_protocol("Aave")[0] == pytest.approx(0.5 * MAX_SCORE)
+
+    pinned = load_risk_model(str(tmp_path), "v2")
+    assert pinned.version == "ebm-v2"
+    assert pinned.assess_protocol("Aave") == (pytest.approx(2.0), {name: pytest.approx(0.2) for name in CONTRIBUTION_NAMES})
+    assert pinned.assess_protocol("Nope")[0] == UNKNOWN_SCORE
+
+def test_bad_artifacts_fall_back_to_mock(tmp_path):
+    save_artifact(tmp_path, 1, 0.1, features=("tvl", "age"))
+    assert load_risk_model(str(tmp_path), "1").version == "mock"
+
+    (tmp_path / "risk_ebm-v2.joblib").write_bytes(b"truncated")
+    assert load_risk_model(str(tmp_path), "latest").version == "mock"
+    assert load_risk_model(str(tmp_path), "7").version == "mock"  # pinned version missing
@@ -0,0 +1,60 @@
+import pytest
+import agent_layer.routing as routing
+from agent_layer.routing import RuleBasedRoutingPolicy, LLMRoutingPolicy, RoutingStats, get_routing_policy
+from config.settings import settings
+
+def make_state(**overrides):
+    state = {
+        "iteration_count": 1,
+        "executed_transactions": [],
+        "defi_proposal": {"action": "move", "destination": "Curve"},
+        "risk_assessment": {"protocol": "Curve", "risk_score": 2.0, "safe": True}
+    }
+    state.update(overrides)
+    return state
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setattr(routing, "can_execute_trade", lambda state: state.get("signed", False))
+    return RuleBasedRoutingPolicy()
+
+def next_agent(policy, **overrides):
+    decision = policy.route(make_state(**overrides))
+    return decision and decision["next_agent"]
+
+def test_opening_step_defers_to_the_llm(policy):
+    assert policy.route(make_state(defi_proposal=None, risk_assessment=None)) is None
+
+def test_terminal_states_end(policy):
+    assert next_agent(policy, iteration_count=settings.MAX_ITERATIONS) == "END"
+    assert next_agent(policy, executed_transactions=[{"tx_hash": "0x1"}]) == "END"
+    assert next_agent(policy, defi_proposal={"action": "hold"}) == "END"
+
+def test_unchecked_proposal_goes_to_risk(policy):
+    assert next_agent(policy, risk_assessment=None) == "risk_agent"
+    # A risk check of another protocol does not count
+    assert next_agent(policy, defi_proposal={"action": "move", "destination": "Yearn"}) == "risk_agent"
+
+def test_risky_proposal_is_rejected(policy):
+    decision = policy.route(make_state(risk_assessment={"protocol": "Curve", "risk_score": settings.RISK_THRESHOLD + 1, "safe": True}))
+    assert decision["next_agent"] == "END"
+    assert "exceeds threshold" in decision["reasoning"]
+    assert next_agent(policy, risk_assessment={"protocol": "Curve", "risk_score": 1.0, "safe": False}) == "END"
+
+def test_approved_proposal_executes_only_when_signed(policy):
+    assert next_agent(policy, signed=True) == "EXECUTE_TRADE"
+    decision = policy.route(make_state(signed=False))
+    assert decision["next_agent"] == "END"
+    assert "signatures" in decision["reasoning"]
+
+def test_policy_lookup():
+    assert isinstance(get_routing_policy("rules"), RuleBasedRoutingPolicy)
+    assert LLMRoutingPolicy().route(make_state()) is None
+    with pytest.raises(ValueError):
+        get_routing_policy("random")
+
+def test_routing_stats_share():
+    stats = RoutingStats()
+    for source in ("rules", "rules", "cache", "llm"):
+        stats.record(source)
+    assert stats.get_stats() == {"rules": 2, "cache": 1, "llm": 1, "total": 4, "llm_share": 0.25}
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from web3 import Web3
+from tools.rpc_client import BatchingRPCClient, BatchingSyncProvider
+
+class FakeResponse:
+
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+class FakeNode:
+    '''Records every HTTP body; answers each call with a result derived from its method'''
+
+    RESULTS = {"eth_gasPrice": "0x3b9aca00", "eth_getTransactionCount": "0x7", "eth_blockNumber": "0x10"}
+
+    def __init__(self):
+        self.posts = []
+
+    async def post(self, url, content):
+        body = json.loads(content)
+        self.posts.append(body)
+        await asyncio.sleep(0)
+        answer = lambda call: {"jsonrpc": "2.0", "id": call["id"], "result": self.RESULTS.get(call["method"], "0x1")}
+        return FakeResponse([answer(call) for call in body] if isinstance(body, list) else answer(body))
+
+def client_with_node(**kwargs):
+    client = BatchingRPCClient("http://node", **kwargs)
+    client._ensure_client()
+    node = client._client = FakeNode()
+    return client, node
+
+def test_concurrent_reads_share_one_batch():
+    async def scenario():
+        client, node = client_with_node(batch_window=0.01)
+        results = await asyncio.gather(
+            client.gas_price(),
+            client.get_transaction_count("0xabc"),
+            client.request("eth_blockNumber"),
+            client.get_balance("0xabc")
+        )
+        return results, node.posts, client.get_metrics()
+
+    results, posts, metrics = asyncio.run(scenario())
+    assert results == [10**9, 7, "0x10", 1]
+    assert len(posts) == 1 and len(posts[0]) == 4
+    assert metrics["batches"] == 1 and metrics["avg_batch_size"] == 4
+
+def test_writes_are_not_batched():
+    async def scenario():
+        client, node = client_with_node(batch_window=0.01)
+        await asyncio.gather(client.request("eth_sendRawTransaction", ["0x01"]), client.request("eth_sendRawTransaction", ["0x02"]))
+        return node.posts
+
+    posts = asyncio.run(scenario())
+    assert len(posts) == 2 and all(isinstance(body, dict) for body in posts)
+
+def test_max_batch_splits_large_bursts():
+    async def scenario():
+        client, node = client_with_node(batch_window=0.01, max_batch=3)
+        await asyncio.gather(*(client.request("eth_blockNumber") for _ in range(7)))
+        return sorted(len(body) if isinstance(body, list) else 1 for body in node.posts)
+
+    assert asyncio.run(scenario()) == [1, 3, 3]
+
+def test_sync_provider_batches_calls_from_worker_threads():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        client = BatchingRPCClient("http://node", batch_window=0.05)
+        async def bind():
+            client._ensure_client()
+            client._client = FakeNode()
+        asyncio.run_coroutine_threadsafe(bind(), loop).result()
+
+        w3 = Web3(BatchingSyncProvider(client))
+        barrier = threading.Barrier(4)
+        results = []
+        def worker(read):
+            barrier.wait()
+            results.append(read())
+        reads = [lambda: w3.eth.gas_price, lambda: w3.eth.get_transaction_count(Web3.to_checksum_address("0x" + "ab" * 20)), lambda: w3.eth.block_number, lambda: w3.eth.gas_price]
+        workers = [threading.Thread(target=worker, args=(read,)) for read in reads]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        assert sorted(results) == [7, 16, 10**9, 10**9]
+        assert len(client._client.posts) == 1 and len(client._client.posts[0]) == 4
+        assert w3.provider.metrics == {"bridged": 4, "fallback": 0}
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def test_sync_provider_falls_back_without_a_running_loop():
+    class Fallback:
+        def make_request(self, method, params):
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x2a"}
+
+    w3 = Web3(BatchingSyncProvider(BatchingRPCClient("http://node"), fallback=Fallback()))
+    assert w3.eth.block_number == 42
+    assert w3.provider.metrics["fallback"] == 1
@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from eth_abi import encode
+import tools.simulator as simulator_module
+from tools.rpc_client import RPCError
+from tools.simulator import TransactionSimulator, decode_revert_reason, state_changes, to_rpc_tx, ZERO_WORD
+
+def revert(selector: str, abi_type: str, value) -> str:
+    return selector + encode([abi_type], [value]).hex()
+
+def word(n: int) -> str:
+    return "0x" + n.to_bytes(32, "big").hex()
+
+def test_revert_reasons_are_decoded():
+    assert decode_revert_reason(revert("0x08c379a0", "string", "ERC20: transfer amount exceeds balance")) == "ERC20: transfer amount exceeds balance"
+    assert decode_revert_reason(revert("0x4e487b71", "uint256", 0x11)) == "panic: arithmetic overflow/underflow"
+    assert decode_revert_reason(revert("0x4e487b71", "uint256", 0x99)) == "panic: 0x99"
+    assert decode_revert_reason("0xe450d38c" + "00" * 96) == "custom error 0xe450d38c"
+    assert decode_revert_reason("0x08c379a0" + "zz") == "custom error 0x08c379a0"  # malformed payload
+    assert decode_revert_reason(None) == decode_revert_reason("0x") == "execution reverted"
+
+def test_rpc_call_object_uses_hex_quantities():
+    call = to_rpc_tx({"to": "0xabc", "data": b"\x01\x02", "value": 10, "gas": 21000, "nonce": 4}, sender="0xme")
+    assert call == {"from": "0xme", "to": "0xabc", "data": "0x0102", "value": "0xa", "gas": "0x5208"}
+
+def test_state_changes_from_prestate_diff():
+    trace = {
+        "pre": {
+            "0xwallet": {"balance": "0x10", "nonce": 3},
+            "0xtoken": {"balance": "0x0", "code": "0x60", "storage": {"0x01": word(100), "0x02": word(5)}}
+        },
+        "post": {
+            "0xwallet": {"balance": "0x8", "nonce": 4},
+            "0xtoken": {"storage": {"0x01": word(60), "0x03": word(40)}},
+            "0xnew": {"balance": "0x1"}
+        }
+    }
+    changes = state_changes(trace)
+    assert changes["0xwallet"] == {"balance": {"from": "0x10", "to": "0x8"}, "nonce": {"from": 3, "to": 4}}
+    assert changes["0xtoken"] == {"storage": {
+        "0x01": {"from": word(100), "to": word(60)},
+        "0x02": {"from": word(5), "to": ZERO_WORD},  # missing from post: cleared
+        "0x03": {"from": ZERO_WORD, "to": word(40)}
+    }}
+    assert changes["0xnew"] == {"balance": {"from": None, "to": "0x1"}}
+    assert state_changes({"pre": {"0xa": {"balance": "0x1"}}, "post": {}}) == {}
+
+class FakeNode:
+    '''Answers each method from `responses` (an exception is raised)'''
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.methods = []
+
+    async def request(self, method, params):
+        self.methods.append(method)
+        response = self.responses[method]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def run(node, monkeypatch, simulator=None):
+    monkeypatch.setattr(simulator_module, "get_rpc_client", lambda url: node)
+    simulator = simulator or TransactionSimulator("http://fork")
+    return asyncio.run(simulator.simulate({"to": "0xabc", "data": "0x"}, sender="0xme")), simulator
+
+def test_successful_simulation(monkeypatch):
+    node = FakeNode({
+        "eth_call": "0x01",
+        "eth_estimateGas": "0xc350",
+        "debug_traceCall": {"pre": {"0xa": {"nonce": 1}}, "post": {"0xa": {"nonce": 2}}}
+    })
+    result, simulator = run(node, monkeypatch)
+    assert result["success"] and result["gas_used"] == 50000
+    assert result["state_diff"] == {"0xa": {"nonce": {"from": 1, "to": 2}}}
+    assert simulator.get_metrics()["simulations"] == 1
+
+def test_reverted_simulation(monkeypatch):
+    reason = revert("0x08c379a0", "string", "Pool is paused")
+    node = FakeNode({
+        "eth_call": RPCError("execution reverted", 3, reason),
+        "eth_estimateGas": RPCError("execution reverted", 3, reason),
+        "debug_traceCall": {}
+    })
+    result, simulator = run(node, monkeypatch)
+    assert not result["success"]
+    assert result["revert_reason"] == "Pool is paused"
+    assert simulator.metrics["reverted"] == 1
+
+    # Nested {"data": ...} and a revert without data
+    node.responses["eth_call"] = RPCError("execution reverted", -32000, {"data": reason})
+    assert run(node, monkeypatch)[0]["revert_reason"] == "Pool is paused"
+    node.responses["eth_call"] = RPCError("execution reverted", 3)
+    assert run(node, monkeypatch)[0]["revert_reason"] == "execution reverted"
+
+def test_transport_failure_is_an_error_not_a_revert(monkeypatch):
+    node = FakeNode({
+        "eth_call": RPCError("RPC transport error: connection refused"),
+        "eth_estimateGas": RPCError("RPC transport error: connection refused"),
+        "debug_traceCall": RPCError("RPC transport error: connection refused")
+    })
+    result, simulator = run(node, monkeypatch)
+    assert result == {"success": False, "error": "RPC transport error: connection refused", "block": "latest"}
+    assert simulator.metrics["errors"] == 1
+
+def test_missing_debug_namespace_disables_tracing(monkeypatch):
+    node = FakeNode({
+        "eth_call": "0x",
+        "eth_estimateGas": "0x5208",
+        "debug_traceCall": RPCError("the method debug_traceCall does not exist", -32601)
+    })
+    result, simulator = run(node, monkeypatch)
+    assert result["success"] and result["state_diff"] is None
+    assert simulator.trace is False
+
+    node.methods.clear()
+    run(node, monkeypatch, simulator)
+    assert node.methods == ["eth_call", "eth_estimateGas"]
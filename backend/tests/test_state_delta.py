@@ -0,0 +1,97 @@
+import pytest
+from coordination_layer.state_delta import StateDeltaLog, StateGapError, apply_delta, diff_state, rebuild_state
+
+def base_state():
+    return {
+        "execution_id": "exec-1",
+        "portfolio_id": "p-1",
+        "agent_reasoning": ["start"],
+        "risk_scores": {"Aave": 1.0},
+        "status": "running"
+    }
+
+def test_diff_appends_to_grown_lists_and_replaces_the_rest():
+    old = base_state()
+    new = dict(old, agent_reasoning=["start", "a", "b"], risk_scores={"Aave": 1.2}, extra=1)
+    del new["status"]
+
+    ops = diff_state(old, new)
+    assert {"op": "add", "path": "/agent_reasoning/-", "value": "a"} in ops
+    assert {"op": "add", "path": "/agent_reasoning/-", "value": "b"} in ops
+    assert {"op": "replace", "path": "/risk_scores", "value": {"Aave": 1.2}} in ops
+    assert {"op": "add", "path": "/extra", "value": 1} in ops
+    assert {"op": "remove", "path": "/status"} in ops
+    assert apply_delta(dict(old), ops) == new
+
+def test_diff_of_equal_states_is_empty():
+    assert diff_state(base_state(), base_state()) == []
+
+def test_ops_do_not_alias_the_state():
+    old = base_state()
+    new = dict(old, risk_scores={"Aave": 2.0})
+    ops = diff_state(old, new)
+    new["risk_scores"]["Aave"] = 9.0
+    assert apply_delta(base_state(), ops)["risk_scores"] == {"Aave": 2.0}
+
+def states():
+    state = base_state()
+    yield dict(state)
+    for i in range(12):
+        state = dict(state, agent_reasoning=state["agent_reasoning"] + [f"step {i}"], step=i)
+        yield state
+
+def test_log_round_trips_every_version():
+    log = StateDeltaLog(snapshot_interval=5)
+    written = list(states())
+    entries = [log.record(dict(s)) for s in written]
+
+    assert [e["version"] for e in entries] == list(range(len(written)))
+    assert [e["version"] for e in entries if e["is_snapshot"]] == [0, 5, 10]
+
+    for version, expected in enumerate(written):
+        snap = max((e for e in entries if e["is_snapshot"] and e["version"] <= version), key=lambda e: e["version"])
+        deltas = [e for e in entries if not e["is_snapshot"] and e["version"] > snap["version"]]
+        rebuilt = rebuild_state(snap["state_data"], deltas, version, base_version=snap["version"])
+        assert rebuilt == expected
+
+def test_unchanged_write_records_nothing():
+    log = StateDeltaLog()
+    log.record(base_state())
+    assert log.record(base_state()) is None
+    assert log.version("exec-1") == 0
+
+def test_rebuild_detects_a_missing_delta():
+    log = StateDeltaLog(snapshot_interval=100)
+    entries = [log.record(dict(s)) for s in states()]
+    snap, deltas = entries[0], entries[1:]
+    del deltas[3]  # v4 lost
+
+    with pytest.raises(StateGapError):
+        rebuild_state(snap["state_data"], deltas, base_version=0)
+    # Versions before the gap are still readable
+    assert rebuild_state(snap["state_data"], deltas, 3, base_version=0)["step"] == 2
+
+def test_rebuild_without_base_version_keeps_old_behaviour():
+    snapshot = base_state()
+    deltas = [{"version": 3, "ops": [{"op": "add", "path": "/x", "value": 1}]}]
+    assert rebuild_state(snapshot, deltas)["x"] == 1
+
+def test_forget_and_eviction_drop_version_counters():
+    log = StateDeltaLog(max_executions=2)
+    for n in range(3):
+        log.record(dict(base_state(), execution_id=f"exec-{n}"))
+    assert log.version("exec-0") is None  # evicted with its shadow
+    assert log.version("exec-2") == 0
+
+    log.forget("exec-2")
+    assert log.version("exec-2") is None
+    assert len(log._versions) == 1
+
+def test_seed_keeps_versions_monotonic_after_eviction():
+    log = StateDeltaLog()
+    log.seed("exec-1", 7)  # what the store already has
+    entry = log.record(base_state())
+    assert entry["is_snapshot"] and entry["version"] == 8
+
+    log.seed("exec-1", 0)  # already tracked: ignored
+    assert log.record(dict(base_state(), step=1))["version"] == 9
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+import pytest
+from tools.tx_pipeline import NonceManager, TransactionPipeline, send_failure_kind
+
+class Web3RPCError(Exception):
+    '''Stands in for web3.exceptions.Web3RPCError (matched by class name)'''
+
+class StubEth:
+
+    def __init__(self, pending_nonce=0):
+        self.pending_nonce = pending_nonce
+        self.count_calls = 0
+        self.sent = []
+        self.fail_with = []  # exceptions raised by the next sends
+        self.gas_price = 1000
+        self.account = SimpleNamespace(sign_transaction=self._sign)
+
+    def get_transaction_count(self, address, block):
+        self.count_calls += 1
+        return self.pending_nonce
+
+    @staticmethod
+    def _sign(tx, key):
+        return SimpleNamespace(raw_transaction=tx)
+
+    def send_raw_transaction(self, tx):
+        if self.fail_with:
+            raise self.fail_with.pop(0)
+        self.sent.append(tx)
+        self.pending_nonce = max(self.pending_nonce, tx["nonce"] + 1)
+        return f"0x{tx['nonce']:02x}{len(self.sent):02x}"
+
+    def get_transaction_receipt(self, tx_hash):
+        raise LookupError("not mined")
+
+class StubWeb3:
+
+    def __init__(self, pending_nonce=0):
+        self.eth = StubEth(pending_nonce)
+
+    @staticmethod
+    def to_hex(value):
+        return value
+
+def pipeline(pending_nonce=0):
+    w3 = StubWeb3(pending_nonce)
+    pipe = TransactionPipeline(w3, "key", "0xabc", 1)
+    pipe._ensure_tracker = lambda: None  # no background thread in tests
+    return w3, pipe
+
+def test_allocate_reads_node_once_then_counts_locally():
+    w3 = StubWeb3(pending_nonce=7)
+    nonces = NonceManager(w3, "0xabc")
+    assert [nonces.allocate() for _ in range(3)] == [7, 8, 9]
+    assert w3.eth.count_calls == 1
+
+def test_release_reuses_lowest_nonce_first():
+    nonces = NonceManager(StubWeb3(), "0xabc")
+    a, b, c = nonces.allocate(), nonces.allocate(), nonces.allocate()
+    nonces.release(c)  # the last one simply rewinds
+    assert nonces.allocate() == c
+    nonces.release(b)
+    nonces.release(a)
+    assert [nonces.allocate(), nonces.allocate(), nonces.allocate()] == [a, b, c + 1]
+
+def test_resync_rereads_pending_nonce():
+    w3 = StubWeb3(pending_nonce=0)
+    nonces = NonceManager(w3, "0xabc")
+    nonces.allocate()
+    nonces.release(0)
+    w3.eth.pending_nonce = 5
+    nonces.resync()
+    assert nonces.allocate() == 5
+
+@pytest.mark.parametrize("error,kind", [
+    (Web3RPCError("nonce too low: next nonce 4, tx nonce 0"), "nonce"),
+    (Web3RPCError("replacement transaction underpriced"), "nonce"),
+    (Web3RPCError("already known"), "nonce"),
+    (Web3RPCError("insufficient funds for gas * price + value"), "rejected"),
+    (ConnectionRefusedError(), "unsent"),
+    (TimeoutError("read timed out"), "unknown")
+])
+def test_send_failure_kind(error, kind):
+    assert send_failure_kind(error) == kind
+
+def test_nonce_too_low_resyncs_and_recovers():
+    w3, pipe = pipeline(pending_nonce=0)
+    w3.eth.pending_nonce = 4  # another process used nonces 0-3
+    pipe.nonces._next = 0
+    w3.eth.fail_with = [Web3RPCError("nonce too low")]
+
+    with pytest.raises(Web3RPCError):
+        pipe.submit({"to": "0xdef", "value": 1})
+    pipe.submit({"to": "0xdef", "value": 1})
+    assert w3.eth.sent[-1]["nonce"] == 4
+
+def test_rejected_send_releases_nonce():
+    w3, pipe = pipeline(pending_nonce=3)
+    w3.eth.fail_with = [Web3RPCError("insufficient funds")]
+    with pytest.raises(Web3RPCError):
+        pipe.submit({"to": "0xdef", "value": 1})
+    pipe.submit({"to": "0xdef", "value": 1})
+    assert w3.eth.sent[-1]["nonce"] == 3
+    assert w3.eth.count_calls == 1
+
+def test_ambiguous_send_failure_resyncs():
+    w3, pipe = pipeline(pending_nonce=3)
+    w3.eth.fail_with = [TimeoutError("read timed out")]
+    with pytest.raises(TimeoutError):
+        pipe.submit({"to": "0xdef", "value": 1})
+    w3.eth.pending_nonce = 4  # the node did take it
+    pipe.submit({"to": "0xdef", "value": 1})
+    assert w3.eth.sent[-1]["nonce"] == 4
+
+def test_replacement_keeps_nonce_and_bumps_fees():
+    w3, pipe = pipeline(pending_nonce=2)
+    tx_hash = pipe.submit({"to": "0xdef", "value": 1})
+    nonce = w3.eth.sent[-1]["nonce"]
+    tracked = pipe._pending[nonce]
+
+    pipe._replace(nonce, tracked)
+    replacement = w3.eth.sent[-1]
+    assert replacement["nonce"] == nonce
+    assert replacement["gasPrice"] > w3.eth.sent[0]["gasPrice"]
+    assert tracked["replacements"] == 1
+    assert pipe.status(tx_hash)["hashes"] == tracked["hashes"]
@@ -0,0 +1,80 @@
+import asyncio
+from agent_layer.base import BaseAgent
+from graph.workflow import _partial_update_node
+
+class RecordingLayer:
+
+    def __init__(self):
+        self.writes = []
+
+    def write_state(self, state, **kwargs):
+        self.writes.append(dict(state))
+
+class ScoringAgent(BaseAgent):
+    '''Mutates a nested dict in place, the way RiskAgent fills risk_scores'''
+
+    def __init__(self, coord, protocol, score):
+        super().__init__(f"{protocol}_agent", coord)
+        self.protocol = protocol
+        self.score = score
+
+    async def execute(self, state):
+        await asyncio.sleep(0)  # let the other branch run in between
+        state["risk_scores"][self.protocol] = self.score
+        state["agent_reasoning"].append(f"{self.name}: scored")
+        await self.write_state(state)
+        return state
+
+class JoinAgent(BaseAgent):
+
+    async def execute(self, state):
+        state["next_agent"] = "END"
+        return state
+
+def fanned_out_state():
+    return {
+        "execution_id": "exec-1",
+        "risk_scores": {"Aave": 1.0},
+        "agent_reasoning": [],
+        "parallel_agents": ["a_agent", "b_agent"],
+        "next_agent": "a_agent"
+    }
+
+def run_branches(layer, state):
+    nodes = [
+        _partial_update_node(ScoringAgent(layer, "Curve", 3.1)),
+        _partial_update_node(ScoringAgent(layer, "Yearn", 10.0))
+    ]
+    async def both():
+        return await asyncio.gather(*(node(state) for node in nodes))
+    return asyncio.run(both())
+
+def test_branches_work_on_isolated_copies():
+    layer = RecordingLayer()
+    state = fanned_out_state()
+    curve, yearn = run_branches(layer, state)
+
+    assert state["risk_scores"] == {"Aave": 1.0}
+    assert curve["risk_scores"] == {"Aave": 1.0, "Curve": 3.1}
+    assert yearn["risk_scores"] == {"Aave": 1.0, "Yearn": 10.0}
+    assert curve["agent_reasoning"] == ["Curve_agent: scored"]
+
+def test_branches_do_not_persist_partial_state():
+    layer = RecordingLayer()
+    run_branches(layer, fanned_out_state())
+    assert layer.writes == []
+
+def test_join_persists_merged_state_once():
+    layer = RecordingLayer()
+    merged = dict(fanned_out_state(), risk_scores={"Aave": 1.0, "Curve": 3.1, "Yearn": 10.0})
+    update = asyncio.run(_partial_update_node(JoinAgent("orchestrator", layer), join=True)(merged))
+
+    assert len(layer.writes) == 1
+    assert layer.writes[0]["risk_scores"] == merged["risk_scores"]
+    assert update["next_agent"] == "END"
+
+def test_single_agent_step_still_writes():
+    layer = RecordingLayer()
+    state = dict(fanned_out_state(), parallel_agents=[])
+    asyncio.run(_partial_update_node(ScoringAgent(layer, "Curve", 3.1))(state))
+    assert len(layer.writes) == 1
@@ -0,0 +1,191 @@
+import asyncio
+import httpx
+from postgrest.exceptions import APIError
+from coordination_layer.layer import CoordinationLayer, WriteBehindBuffer, INSERTED, REJECTED, UNAVAILABLE
+from coordination_layer.async_layer import AsyncWriteBehindBuffer
+
+class FakeLayer:
+    '''Records writes; inserts of rows marked "bad" are rejected and everything fails while `down`'''
+
+    def __init__(self):
+        self.inserts = []
+        self.attempts = 0
+        self.states = []
+        self.down = False
+
+    def _bulk_insert(self, table, rows):
+        self.attempts += 1
+        if self.down:
+            return UNAVAILABLE
+        if any(row.get("bad") for row in rows):
+            return REJECTED
+        self.inserts.append((table, list(rows)))
+        return INSERTED
+
+    def _write_state_row(self, state, status="running"):
+        if self.down:
+            return False
+        self.states.append((state["execution_id"], state["version"], status))
+        return True
+
+class AsyncFakeLayer(FakeLayer):
+
+    async def _bulk_insert(self, table, rows):
+        return FakeLayer._bulk_insert(self, table, rows)
+
+    async def _write_state_row(self, state, status="running"):
+        return FakeLayer._write_state_row(self, state, status)
+
+def written(layer, table):
+    return [row["n"] for t, rows in layer.inserts if t == table for row in rows]
+
+def test_rows_are_grouped_into_one_insert_per_table():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, batch_size=100)
+    for n in range(3):
+        buffer.add_row("agent_decisions", {"n": n})
+    buffer.add_row("risk_assessments", {"n": 9})
+
+    assert buffer.flush() == 2
+    assert len(layer.inserts) == 2
+    assert written(layer, "agent_decisions") == [0, 1, 2]
+    assert buffer.pending() == 0
+
+def test_state_updates_coalesce_per_execution():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer)
+    for version in range(5):
+        buffer.put_state({"execution_id": "a", "version": version})
+    buffer.put_state({"execution_id": "b", "version": 0}, status="completed")
+
+    buffer.flush()
+    assert sorted(layer.states) == [("a", 4, "running"), ("b", 0, "completed")]
+    assert buffer.metrics["coalesced_states"] == 4
+
+def test_full_table_flushes_inline_without_event_loop():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, batch_size=2)
+    buffer.add_row("agent_reasoning", {"n": 0})
+    assert layer.inserts == []
+    buffer.add_row("agent_reasoning", {"n": 1})
+    assert written(layer, "agent_reasoning") == [0, 1]
+
+def test_bad_row_does_not_drop_its_batch():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, batch_size=100, max_retries=2)
+    for n in range(4):
+        buffer.add_row("agent_decisions", {"n": n, "bad": n == 2})
+
+    buffer.flush()
+    assert written(layer, "agent_decisions") == [0, 1, 3]
+    assert buffer.metrics["row_fallbacks"] == 1
+    assert buffer.pending() == 1  # the bad row gets one more try
+
+    buffer.flush()
+    assert buffer.pending() == 0
+    assert buffer.metrics["dropped_writes"] == 1
+    assert buffer.metrics["rows_written"] == 3
+
+def test_failed_writes_are_requeued_until_the_store_recovers():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, batch_size=100, max_retries=3)
+    buffer.add_row("agent_decisions", {"n": 0})
+    buffer.put_state({"execution_id": "a", "version": 1})
+
+    layer.down = True
+    buffer.flush()
+    assert buffer.pending() == 2
+
+    buffer.add_row("agent_decisions", {"n": 1})
+    layer.down = False
+    buffer.flush()
+    assert written(layer, "agent_decisions") == [0, 1]  # original order kept
+    assert layer.states == [("a", 1, "running")]
+    assert buffer.metrics["retried_writes"] == 2
+    assert buffer.metrics["dropped_writes"] == 0
+
+def test_outage_does_not_fall_back_row_by_row():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, batch_size=100)
+    for n in range(5):
+        buffer.add_row("agent_decisions", {"n": n})
+
+    layer.down = True
+    buffer.flush()
+    assert layer.attempts == 1
+    assert buffer.metrics["row_fallbacks"] == 0
+    assert buffer.pending() == 5
+
+def test_only_row_errors_count_as_rejected():
+    rejected = CoordinationLayer._rows_rejected
+    assert rejected(APIError({"code": "23505"}))     # unique violation
+    assert rejected(APIError({"code": "PGRST204"}))  # unknown column
+    assert rejected(APIError({"code": 413}))         # non-JSON error body
+    assert not rejected(APIError({"code": "PGRST000"}))  # database unreachable
+    assert not rejected(APIError({"code": 502}))
+    assert not rejected(httpx.ConnectError("refused"))
+
+def test_batch_being_flushed_stays_readable():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer)
+    buffer.add_row("agent_state_deltas", {"execution_id": "a", "version": 0})
+    buffer.put_state({"execution_id": "a", "version": 0}, status="completed")
+    buffer._drain()  # a flush has taken the batch but not written it
+    buffer.add_row("agent_state_deltas", {"execution_id": "a", "version": 1})
+    buffer.add_row("agent_state_deltas", {"execution_id": "b", "version": 0})
+
+    assert [row["version"] for row in buffer.unflushed_rows("agent_state_deltas", "a")] == [0, 1]
+    assert buffer.unflushed_state("a") == ({"execution_id": "a", "version": 0}, "completed")
+
+    buffer.flush()
+    assert buffer.unflushed_rows("agent_state_deltas", "a") == []
+    assert buffer.unflushed_state("a") is None
+
+def test_retries_are_bounded():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer, max_retries=3)
+    buffer.add_row("agent_decisions", {"n": 0})
+    layer.down = True
+    for _ in range(5):
+        buffer.flush()
+    assert buffer.pending() == 0
+    assert buffer.metrics["failed_writes"] == 3
+    assert buffer.metrics["dropped_writes"] == 1
+
+def test_failed_state_is_superseded_by_newer_state():
+    layer = FakeLayer()
+    buffer = WriteBehindBuffer(layer)
+    buffer.put_state({"execution_id": "a", "version": 1})
+    layer.down = True
+    rows, states = buffer._drain()
+    buffer.put_state({"execution_id": "a", "version": 2})  # queued while the flush runs
+    for state, status, attempts in states.values():
+        buffer._record_state(state, status, attempts, layer._write_state_row(state, status))
+
+    layer.down = False
+    buffer.flush()
+    assert layer.states == [("a", 2, "running")]
+
+def test_async_buffer_falls_back_row_by_row():
+    layer = AsyncFakeLayer()
+    buffer = AsyncWriteBehindBuffer(layer, batch_size=100, max_retries=1)
+    for n in range(3):
+        buffer.add_row("agent_decisions", {"n": n, "bad": n == 0})
+    buffer.put_state({"execution_id": "a", "version": 3})
+
+    asyncio.run(buffer.aflush())
+    assert written(layer, "agent_decisions") == [1, 2]
+    assert layer.states == [("a", 3, "running")]
+    assert buffer.pending() == 0
+    assert buffer.metrics["dropped_writes"] == 1
+
+def test_async_buffer_does_not_fall_back_during_outage():
+    layer = AsyncFakeLayer()
+    layer.down = True
+    buffer = AsyncWriteBehindBuffer(layer, batch_size=100)
+    for n in range(3):
+        buffer.add_row("agent_decisions", {"n": n})
+
+    asyncio.run(buffer.aflush())
+    assert layer.attempts == 1
+    assert buffer.pending() == 3
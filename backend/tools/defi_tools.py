@@ -1,5 +1,12 @@
+from config.settings import settings
+from tools.web3_tools import gas_oracle
+from tools.opportunity_index import opportunity_index
+
 def get_protocol_apy(protocol: str) -> float:
-    '''Mock APY fetcher'''
+    '''Best indexed APY for a protocol (mock APYs until the index is loaded)'''
+    apy = opportunity_index.best_apy(protocol)
+    if apy is not None:
+        return apy
     apys = {
         "Aave": 0.05,
         "Curve": 0.08,
@@ -8,8 +15,10 @@ def get_protocol_apy(protocol: str) -> float:
     }
     return apys.get(protocol, 0.0)
 
-def get_all_opportunities():
-    '''Get all available yield opportunities'''
+def get_all_opportunities(k: int = None, **filters):
+    '''Top yield opportunities from the index, best risk-adjusted APY first (see OpportunityIndex.top)'''
+    if len(opportunity_index):
+        return opportunity_index.top(k or settings.OPPORTUNITY_TOP_K, **filters)
     return [
         {"protocol": "Aave", "apy": 0.05, "tvl": 8e9},
         {"protocol": "Curve", "apy": 0.08, "tvl": 3e9},
@@ -17,5 +26,6 @@ def get_all_opportunities():
     ]
 
 def get_gas_price():
-    '''Mock gas price'''
-    return 50
\ No newline at end of file
+    '''Gas price in gwei from the gas oracle (mock 50 gwei until it has data)'''
+    price = gas_oracle.gas_price_gwei()
+    return price if price is not None else 50
@@ -0,0 +1,257 @@
+# tools/gas_oracle.py
+"""
+Gas price oracle.
+
+Polls eth_feeHistory in the background and keeps a rolling window of the
+last `window` blocks' priority-fee percentiles plus the next block's base
+fee. Fee reads (fees(), fee_fields()) are served from that cache without
+an RPC call, so they are safe from sync code and worker threads too.
+
+Gas limits come from eth_estimateGas, cached per call type and target
+(contract + selector), with the old hard-coded limits as fallback.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+import numpy as np
+from coordination_layer.cache import TTLCache
+from tools.rpc_client import get_rpc_client, RPCError
+
+# Reward percentiles requested from eth_feeHistory; SPEEDS index into them
+REWARD_PERCENTILES = [10, 50, 90]
+SPEEDS = {"slow": 0, "standard": 1, "fast": 2}
+
+# Previous hard-coded limits per call type, used when estimation is unavailable
+DEFAULT_GAS_LIMITS = {
+    "wallet": 21000,
+    "aave": 300000,
+    "yearn": 300000,
+    "curve": 350000,
+    "uniswap": 400000
+}
+
+# Head-room on top of eth_estimateGas
+GAS_LIMIT_MARGIN = 1.2
+
+class GasOracle:
+
+    def __init__(self, rpc_url: str, window: int = 20, poll_interval: float = 12.0, estimate_ttl: float = 300.0, history=None):
+        self.rpc_url = rpc_url
+        self.history = history  # optional MetricsStore: one "_gas" record per new block
+        self.window = window
+        self.poll_interval = poll_interval
+
+        self._rewards = deque(maxlen=window)  # one [p10, p50, p90] row per block (wei)
+        self._base_fee: Optional[int] = None   # next block's base fee (wei)
+        self._last_block: Optional[int] = None
+        self._updated_at: Optional[float] = None
+        self._last_failure: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._estimates = TTLCache(max_size=512, ttl=estimate_ttl)
+        self._estimates_lock = threading.Lock()  # sync estimates run in worker threads
+        self._latest_limits: Dict[str, int] = {}  # call type -> most recent limit
+
+        self.metrics = {
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "estimates": 0,
+            "estimate_cache_hits": 0,
+            "estimate_fallbacks": 0
+        }
+
+    # ---------- polling ----------
+
+    async def refresh(self) -> bool:
+        """Pull the latest fee history into the window. Returns False on RPC failure."""
+        client = get_rpc_client(self.rpc_url)
+        try:
+            history = await client.request("eth_feeHistory", [hex(self.window), "latest", REWARD_PERCENTILES])
+        except Exception as e:
+            self.metrics["refresh_errors"] += 1
+            self._last_failure = time.monotonic()
+            print(f"⚠️ Gas oracle refresh failed: {e}")
+            return False
+
+        oldest = int(history["oldestBlock"], 16)
+        rewards = history.get("reward") or []
+        first_new = 0 if self._last_block is None else max(0, self._last_block + 1 - oldest)
+        for row in rewards[first_new:]:
+            self._rewards.append([int(value, 16) for value in row])
+        if self.history is not None and first_new < len(rewards):
+            await self._record(client, oldest, first_new, history, rewards)
+
+        self._base_fee = int(history["baseFeePerGas"][-1], 16)
+        self._last_block = oldest + len(rewards) - 1
+        self._updated_at = time.monotonic()
+        self.metrics["refreshes"] += 1
+        return True
+
+    async def _record(self, client, oldest: int, first_new: int, history: Dict[str, Any], rewards):
+        """
+        Append the new blocks' price paid per gas (base fee + median tip) to
+        the history store, stamped with each block's own timestamp (fee
+        history has none; the header reads share one batch).
+        """
+        blocks = np.arange(oldest + first_new, oldest + len(rewards))
+        try:
+            headers = await asyncio.gather(*(client.request("eth_getBlockByNumber", [hex(int(n)), False]) for n in blocks))
+        except Exception as e:
+            print(f"⚠️ Gas history not recorded (block headers unavailable): {e}")
+            return
+        base = np.array([int(value, 16) for value in history["baseFeePerGas"][first_new:len(rewards)]], dtype=float)
+        tips = np.array([int(row[SPEEDS["standard"]], 16) for row in rewards[first_new:]], dtype=float)
+        try:
+            await asyncio.to_thread(self.history.append, "_gas", self.history.records(
+                np.array([int(header["timestamp"], 16) for header in headers], dtype=np.int64),
+                block=blocks,
+                gas_gwei=(base + tips) / 1e9
+            ))
+        except OSError as e:
+            print(f"⚠️ Could not write gas history: {e}")
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start background polling (call from inside the event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        # Drop the reference once the loop exits so start() can run it again
+        if task is self._task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Gas oracle polling stopped: {task.exception()}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_fresh(self) -> bool:
+        return self._updated_at is not None and time.monotonic() - self._updated_at < self.poll_interval * 3
+
+    async def ensure_fresh(self) -> bool:
+        """Refresh now if the window is stale (at most one attempt per poll interval after a failure)"""
+        if self.is_fresh():
+            return True
+        if self._last_failure is not None and time.monotonic() - self._last_failure < self.poll_interval:
+            return False
+        return await self.refresh()
+
+    # ---------- fees ----------
+
+    def fees(self, speed: str = "standard") -> Optional[Dict[str, int]]:
+        """
+        Cached EIP-1559 fees in wei, or None before the first successful poll.
+        Priority fee = median over the window of the speed's reward percentile;
+        max fee = 2 x next base fee + priority fee (survives ~6 full blocks).
+        """
+        if self._base_fee is None:
+            return None
+        if self._rewards:
+            priority = int(np.median(np.array(self._rewards)[:, SPEEDS[speed]]))
+        else:
+            priority = 0
+        return {
+            "baseFeePerGas": self._base_fee,
+            "maxPriorityFeePerGas": priority,
+            "maxFeePerGas": 2 * self._base_fee + priority
+        }
+
+    def fee_fields(self, speed: str = "standard") -> Dict[str, int]:
+        """Transaction fee fields: EIP-1559 if the oracle has data, else {} (caller falls back)"""
+        fees = self.fees(speed)
+        if fees is None:
+            return {}
+        return {
+            "maxFeePerGas": fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": fees["maxPriorityFeePerGas"]
+        }
+
+    def gas_price_gwei(self, speed: str = "standard") -> Optional[float]:
+        """Expected price paid per gas (base + priority) in gwei"""
+        fees = self.fees(speed)
+        if fees is None:
+            return None
+        return (fees["baseFeePerGas"] + fees["maxPriorityFeePerGas"]) / 1e9
+
+    # ---------- gas limits ----------
+
+    @staticmethod
+    def _estimate_key(tx: Dict[str, Any], call_type: str) -> str:
+        data = tx.get("data") or "0x"
+        if isinstance(data, bytes):
+            data = "0x" + data.hex()
+        return f"{call_type}:{str(tx.get('to', '')).lower()}:{data[:10]}"
+
+    def estimate_gas(self, w3, tx: Dict[str, Any], call_type: str) -> int:
+        """
+        Gas limit for `tx` via the sync web3 instance, cached per call type,
+        target and selector. Falls back to DEFAULT_GAS_LIMITS.
+        """
+        key = self._estimate_key(tx, call_type)
+        with self._estimates_lock:
+            cached = self._estimates.get(key)
+        if cached is not None:
+            self.metrics["estimate_cache_hits"] += 1
+            return cached
+
+        self.metrics["estimates"] += 1
+        try:
+            limit = int(w3.eth.estimate_gas(tx) * GAS_LIMIT_MARGIN)
+        except Exception:
+            # Reverts on placeholder contracts, RPC errors... keep the known-good limit
+            self.metrics["estimate_fallbacks"] += 1
+            limit = DEFAULT_GAS_LIMITS.get(call_type, 300000)
+
+        with self._estimates_lock:
+            self._estimates.set(key, limit)
+            self._latest_limits[call_type] = limit
+        return limit
+
+    async def aestimate_gas(self, tx: Dict[str, Any], call_type: str) -> int:
+        """estimate_gas() over the async batching client"""
+        key = self._estimate_key(tx, call_type)
+        with self._estimates_lock:
+            cached = self._estimates.get(key)
+        if cached is not None:
+            self.metrics["estimate_cache_hits"] += 1
+            return cached
+
+        self.metrics["estimates"] += 1
+        try:
+            estimate = await get_rpc_client(self.rpc_url).request("eth_estimateGas", [tx])
+            limit = int(int(estimate, 16) * GAS_LIMIT_MARGIN)
+        except (RPCError, ValueError, TypeError):
+            self.metrics["estimate_fallbacks"] += 1
+            limit = DEFAULT_GAS_LIMITS.get(call_type, 300000)
+
+        with self._estimates_lock:
+            self._estimates.set(key, limit)
+            self._latest_limits[call_type] = limit
+        return limit
+
+    def gas_limit(self, call_type: str) -> int:
+        """Typical gas limit for a call type (latest estimate, else the default) - no RPC call"""
+        return self._latest_limits.get(call_type, DEFAULT_GAS_LIMITS.get(call_type, 300000))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics.update({
+            "fresh": self.is_fresh(),
+            "window_blocks": len(self._rewards),
+            "last_block": self._last_block,
+            "fees": self.fees()
+        })
+        return metrics
@@ -0,0 +1,199 @@
+# tools/intent_batch.py
+"""
+Batched intent signing.
+
+Agents describe intents as EIP-712 typed data (a proposal or a risk
+assessment for one execution). Instead of one signature per intent, an
+agent signs a Merkle root over many intents once; each intent then carries
+an inclusion proof. Verifying a batch costs one ECDSA recovery (cached) plus
+a few keccak hashes per intent.
+"""
+from typing import Dict, List, Optional
+from web3 import Web3
+from eth_account.messages import encode_typed_data
+from tools.web3_tools import agent_keys, recovery_cache, CHAIN_ID
+
+DOMAIN = {
+    "name": "H2K DeFi Agents",
+    "version": "1",
+    "chainId": CHAIN_ID
+}
+
+DOMAIN_TYPE = [
+    {"name": "name", "type": "string"},
+    {"name": "version", "type": "string"},
+    {"name": "chainId", "type": "uint256"}
+]
+
+INTENT_TYPES = {
+    "Proposal": [
+        {"name": "executionId", "type": "string"},
+        {"name": "action", "type": "string"},
+        {"name": "source", "type": "string"},
+        {"name": "destination", "type": "string"},
+        {"name": "asset", "type": "string"},
+        {"name": "amount", "type": "string"}
+    ],
+    "RiskAssessment": [
+        {"name": "executionId", "type": "string"},
+        {"name": "protocol", "type": "string"},
+        {"name": "riskScoreBps", "type": "uint256"},
+        {"name": "safe", "type": "bool"}
+    ],
+    "IntentBatch": [
+        {"name": "root", "type": "bytes32"},
+        {"name": "count", "type": "uint256"}
+    ]
+}
+
+# ==================== TYPED INTENTS ====================
+
+def proposal_intent(execution_id: str, proposal: Dict) -> Dict:
+    """Typed intent for a DeFi Agent proposal"""
+    return {
+        "type": "Proposal",
+        "message": {
+            "executionId": execution_id,
+            "action": str(proposal.get("action")),
+            "source": str(proposal.get("source")),
+            "destination": str(proposal.get("destination")),
+            "asset": str(proposal.get("asset")),
+            "amount": str(proposal.get("amount"))
+        }
+    }
+
+def risk_intent(execution_id: str, assessment: Dict) -> Dict:
+    """Typed intent for a Risk Agent assessment"""
+    return {
+        "type": "RiskAssessment",
+        "message": {
+            "executionId": execution_id,
+            "protocol": str(assessment.get("protocol")),
+            "riskScoreBps": int(round(assessment.get("risk_score", 0) * 100)),
+            "safe": bool(assessment.get("safe"))
+        }
+    }
+
+def _typed_message(primary_type: str, message: Dict):
+    return encode_typed_data(full_message={
+        "types": {"EIP712Domain": DOMAIN_TYPE, primary_type: INTENT_TYPES[primary_type]},
+        "primaryType": primary_type,
+        "domain": DOMAIN,
+        "message": message
+    })
+
+def intent_hash(intent: Dict) -> bytes:
+    """EIP-712 digest of a typed intent (the Merkle leaf)"""
+    signable = _typed_message(intent["type"], intent["message"])
+    return bytes(Web3.keccak(b"\x19" + signable.version + signable.header + signable.body))
+
+# ==================== MERKLE TREE ====================
+
+def _hash_pair(a: bytes, b: bytes) -> bytes:
+    # Sorted pairs: proofs need no left/right flags (OpenZeppelin MerkleProof layout)
+    return bytes(Web3.keccak(a + b if a < b else b + a))
+
+def merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """All tree levels, leaves first. An odd node is carried up unchanged."""
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([
+            _hash_pair(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ])
+    return levels
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[bytes]:
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+def verify_proof(leaf: bytes, proof: List[bytes], root: bytes) -> bool:
+    node = leaf
+    for sibling in proof:
+        node = _hash_pair(node, sibling)
+    return node == root
+
+# ==================== SIGN / VERIFY ====================
+
+def _batch_message(root: bytes, count: int):
+    return _typed_message("IntentBatch", {"root": root, "count": count})
+
+def sign_intent_batch(agent_name: str, intents: List[Dict]) -> Dict:
+    """
+    Sign many typed intents with one signature over their Merkle root.
+    Returns {"root", "count", "signature", "signer_address", "items"}; each
+    item is {"intent", "leaf", "proof"} and can be verified on its own.
+    """
+    account = agent_keys.account(agent_name)
+    if not account:
+        return {"error": f"No key found for agent {agent_name}"}
+
+    try:
+        leaves = [intent_hash(intent) for intent in intents]
+        levels = merkle_levels(leaves)
+        root = levels[-1][0]
+        signed = account.sign_message(_batch_message(root, len(leaves)))
+
+        return {
+            "agent": agent_name,
+            "root": root.hex(),
+            "count": len(leaves),
+            "signature": signed.signature.hex(),
+            "signer_address": account.address,
+            "items": [
+                {
+                    "intent": intent,
+                    "leaf": leaf.hex(),
+                    "proof": [node.hex() for node in merkle_proof(levels, i)]
+                }
+                for i, (intent, leaf) in enumerate(zip(intents, leaves))
+            ]
+        }
+    except Exception as e:
+        return {"error": f"Batch signing failed: {str(e)}"}
+
+def recover_batch_signer(root: str, count: int, signature: str) -> Optional[str]:
+    """Signer of a batch root (one cached ECDSA recovery per batch)"""
+    try:
+        return recovery_cache.recover_signable(_batch_message(bytes.fromhex(root), count), signature)
+    except Exception as e:
+        print(f"Batch signature verification failed: {e}")
+        return None
+
+def verify_batched_intent(item: Dict, root: str, count: int, signature: str, expected_address: str) -> bool:
+    """
+    Verify one intent from a batch: the leaf matches the intent, the proof
+    leads to the root, and the root was signed by `expected_address`.
+    """
+    leaf = intent_hash(item["intent"])
+    if leaf.hex() != item.get("leaf", leaf.hex()):
+        return False
+    if not verify_proof(leaf, [bytes.fromhex(node) for node in item["proof"]], bytes.fromhex(root)):
+        return False
+
+    signer = recover_batch_signer(root, count, signature)
+    return signer is not None and signer.lower() == expected_address.lower()
+
+def verify_intent_batch(batch: Dict, expected_address: str) -> List[bool]:
+    """Verify every item of a batch: one recovery plus one proof walk per item"""
+    signer = recover_batch_signer(batch["root"], batch["count"], batch["signature"])
+    if signer is None or signer.lower() != expected_address.lower():
+        return [False] * len(batch["items"])
+
+    root = bytes.fromhex(batch["root"])
+    return [
+        verify_proof(
+            intent_hash(item["intent"]),
+            [bytes.fromhex(node) for node in item["proof"]],
+            root
+        )
+        for item in batch["items"]
+    ]
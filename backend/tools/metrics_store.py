@@ -0,0 +1,384 @@
+# tools/metrics_store.py
+"""
+Protocol metrics history store.
+
+Append-only time series of fixed-width records (RECORD_DTYPE), one
+directory per series (protocol, or "_gas" for the gas oracle), split into
+segment files of at most `segment_records` records:
+
+    <root>/<series>/<first timestamp, zero-padded>.seg
+
+Segments are raw record arrays with no header, so a file's length gives its
+record count and reads are np.memmap views: the OS pages in only what a
+query touches, and years of per-block data never have to fit in RAM.
+
+Range lookups bisect the in-memory segment list and then the memory-mapped
+timestamp column, so they cost O(log n) page reads. A range that falls
+inside one segment is returned as a zero-copy view.
+
+compact() merges sealed segments older than a cutoff into larger ones,
+optionally downsampled to one record per `resolution` seconds.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Iterable
+import numpy as np
+from config.settings import settings
+
+# 48 bytes per record; fields a source does not provide are NaN
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<i8"),   # unix seconds
+    ("block", "<i8"),       # block number, -1 if unknown
+    ("apy", "<f8"),
+    ("tvl", "<f8"),
+    ("utilization", "<f8"),
+    ("gas_gwei", "<f8")
+])
+
+SEGMENT_SUFFIX = ".seg"
+
+def _segment_order(name: str):
+    """Sort key for "<first ts>[-<n>].seg" (a suffix marks a later segment with the same first timestamp)"""
+    first, _, n = name[:-len(SEGMENT_SUFFIX)].partition("-")
+    return int(first), int(n or 0)
+
+def _series_dir_name(series: str) -> str:
+    """Filesystem-safe directory name for a series ("Aave" -> "aave")"""
+    return re.sub(r"[^a-z0-9_.-]+", "-", series.lower()).strip("-") or "_"
+
+class _Segment:
+    """One segment file; the memory map is reopened only when the file has grown"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._count = 0
+        self._records: Optional[np.ndarray] = None
+        self.refresh()
+
+    def refresh(self):
+        count, torn = divmod(os.path.getsize(self.path), RECORD_DTYPE.itemsize)
+        if torn:
+            # A write cut short (crash, full disk): drop the partial record so appends stay aligned
+            os.truncate(self.path, count * RECORD_DTYPE.itemsize)
+        if count != self._count or self._records is None:
+            self._count = count
+            self._records = (
+                np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+                if count else np.empty(0, dtype=RECORD_DTYPE)
+            )
+
+    @property
+    def records(self) -> np.ndarray:
+        return self._records
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def first_ts(self) -> int:
+        return int(self._records["timestamp"][0])
+
+    @property
+    def last_ts(self) -> int:
+        return int(self._records["timestamp"][-1])
+
+    def position(self, timestamp: int, side: str = "left") -> int:
+        """Binary search of the memory-mapped timestamp column (touches O(log n) pages)"""
+        # bisect on the strided view reads single elements; np.searchsorted would copy the column
+        timestamps = self._records["timestamp"]
+        if side == "left":
+            return bisect.bisect_left(timestamps, timestamp)
+        return bisect.bisect_right(timestamps, timestamp)
+
+class _Series:
+    """One series directory: its non-empty segments in time order, and the lock writers hold"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        names = sorted((n for n in os.listdir(path) if n.endswith(SEGMENT_SUFFIX)), key=_segment_order)
+        segments = [_Segment(os.path.join(path, n)) for n in names]
+        self.segments = [s for s in segments if len(s)]
+        self._reindex()
+
+    def new_segment_path(self, first: int, taken: set = None) -> str:
+        """First "<first ts>[-<n>].seg" name not in `taken` (default: not on disk)"""
+        n = 0
+        while True:
+            path = os.path.join(self.path, f"{first:020d}{f'-{n}' if n else ''}{SEGMENT_SUFFIX}")
+            if (path not in taken) if taken is not None else not os.path.exists(path):
+                return path
+            n += 1
+
+    def _reindex(self):
+        self._starts = [s.first_ts for s in self.segments]
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return self.segments[-1].last_ts if self.segments else None
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+class MetricsStore:
+
+    def __init__(self, root: str, segment_records: int = 1 << 20, fsync: bool = False):
+        self.root = root
+        self.segment_records = segment_records
+        self.fsync = fsync
+
+        self._series: Dict[str, _Series] = {}
+        self._series_lock = threading.Lock()
+
+        self.metrics = {
+            "appended": 0,
+            "out_of_order": 0,
+            "queries": 0,
+            "compactions": 0
+        }
+
+    def _get(self, series: str, create: bool = False) -> Optional[_Series]:
+        name = _series_dir_name(series)
+        entry = self._series.get(name)
+        if entry is None:
+            path = os.path.join(self.root, name)
+            if not create and not os.path.isdir(path):
+                return None
+            with self._series_lock:
+                entry = self._series.get(name)
+                if entry is None:
+                    entry = self._series[name] = _Series(path)
+        return entry
+
+    def series(self) -> List[str]:
+        """Series directories present on disk"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(n for n in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, n)))
+
+    # ---------- writes ----------
+
+    @staticmethod
+    def records(timestamp, block=-1, apy=np.nan, tvl=np.nan, utilization=np.nan, gas_gwei=np.nan) -> np.ndarray:
+        """Build a record array from scalars or equal-length arrays (missing fields NaN)"""
+        timestamp = np.atleast_1d(np.asarray(timestamp, dtype=np.int64))
+        out = np.empty(len(timestamp), dtype=RECORD_DTYPE)
+        out["timestamp"] = timestamp
+        out["block"] = block
+        # float conversion turns None (e.g. pools without utilisation) into NaN
+        for field, values in (("apy", apy), ("tvl", tvl), ("utilization", utilization), ("gas_gwei", gas_gwei)):
+            out[field] = np.asarray(values, dtype=float)
+        return out
+
+    def append(self, series: str, records: np.ndarray) -> int:
+        """
+        Append records (sorted by timestamp here). Records older than the
+        series' last timestamp are dropped, keeping the files append-only.
+        Returns the number written.
+        """
+        records = np.asarray(records, dtype=RECORD_DTYPE)
+        if not len(records):
+            return 0
+        records = records[np.argsort(records["timestamp"], kind="stable")]
+
+        entry = self._get(series, create=True)
+        with entry.lock:
+            last = entry.last_ts
+            if last is not None:
+                keep = records["timestamp"] >= last
+                self.metrics["out_of_order"] += int((~keep).sum())
+                records = records[keep]
+
+            written = 0
+            while written < len(records):
+                if not entry.segments or len(entry.segments[-1]) >= self.segment_records:
+                    path = entry.new_segment_path(int(records["timestamp"][written]))
+                    open(path, "wb").close()
+                    entry.segments.append(_Segment(path))
+
+                segment = entry.segments[-1]
+                chunk = records[written:written + self.segment_records - len(segment)]
+                with open(segment.path, "ab") as f:
+                    torn = f.tell() % RECORD_DTYPE.itemsize
+                    if torn:
+                        f.truncate(f.tell() - torn)  # partial record from a failed write
+                    f.write(chunk.tobytes())
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                segment.refresh()
+                written += len(chunk)
+
+            entry._reindex()
+        self.metrics["appended"] += written
+        return written
+
+    def append_many(self, timestamp: int, series: Iterable[str], **columns) -> int:
+        """One record per series at the same timestamp (e.g. one index refresh)"""
+        series = list(series)
+        batch = self.records(np.full(len(series), timestamp), **columns)
+        return sum(self.append(name, batch[i:i + 1]) for i, name in enumerate(series))
+
+    # ---------- reads ----------
+
+    def _overlapping(self, entry: _Series, start: Optional[int], end: Optional[int]) -> List[np.ndarray]:
+        """Views of every segment's records with start <= timestamp < end"""
+        segments = entry.segments
+        first = 0 if start is None else max(0, bisect.bisect_right(entry._starts, start) - 1)
+        last = len(segments) if end is None else bisect.bisect_left(entry._starts, end)
+
+        views = []
+        for segment in segments[first:last]:
+            lo = 0 if start is None else segment.position(start, "left")
+            hi = len(segment) if end is None else segment.position(end, "left")
+            if hi > lo:
+                views.append(segment.records[lo:hi])
+        return views
+
+    def views(self, series: str, start: int = None, end: int = None) -> List[np.ndarray]:
+        """Zero-copy memory-mapped views covering [start, end), one per segment"""
+        self.metrics["queries"] += 1
+        entry = self._get(series)
+        if entry is None:
+            return []
+        with entry.lock:
+            return self._overlapping(entry, start, end)
+
+    def range(self, series: str, start: int = None, end: int = None) -> np.ndarray:
+        """Records with start <= timestamp < end; a view if they sit in one segment, else a copy"""
+        views = self.views(series, start, end)
+        if not views:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def tail(self, series: str, n: int) -> np.ndarray:
+        """Last n records (view when they sit in the last segment)"""
+        self.metrics["queries"] += 1
+        entry = self._get(series)
+        if entry is None or n <= 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        with entry.lock:
+            views = []
+            for segment in reversed(entry.segments):
+                take = min(n, len(segment))
+                views.append(segment.records[len(segment) - take:])
+                n -= take
+                if n == 0:
+                    break
+        views.reverse()
+        if not views:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def window(self, series: str, field: str, start: int = None, end: int = None) -> np.ndarray:
+        """One column over [start, end) (strided view into the map when in one segment)"""
+        return self.range(series, start, end)[field]
+
+    def last(self, series: str) -> Optional[np.void]:
+        entry = self._get(series)
+        if entry is None or not entry.segments:
+            return None
+        return entry.segments[-1].records[-1]
+
+    # ---------- compaction ----------
+
+    def compact(self, series: str, before: int, resolution: int = None) -> Dict[str, int]:
+        """
+        Merge every sealed segment that ends before `before` into segments of
+        up to segment_records records, keeping the last record of each
+        `resolution`-second bucket if given. The active (last) segment is never
+        touched. New files are written under a temporary name and renamed
+        before the old ones are removed; readers holding views of the old
+        maps keep working (the data stays mapped until they drop them).
+        """
+        entry = self._get(series)
+        if entry is None:
+            return {"segments_in": 0, "segments_out": 0, "records_in": 0, "records_out": 0}
+
+        with entry.lock:
+            sealed = [s for s in entry.segments[:-1] if s.last_ts < before]
+            if len(sealed) < 2 and not (sealed and resolution):
+                return {"segments_in": 0, "segments_out": 0, "records_in": 0, "records_out": 0}
+
+            merged = np.concatenate([s.records for s in sealed])
+            records_in = len(merged)
+            if resolution:
+                buckets = merged["timestamp"] // resolution
+                # Last record per bucket: positions where the next bucket differs
+                keep = np.append(buckets[1:] != buckets[:-1], True)
+                merged = merged[keep]
+
+            remaining = [s for s in entry.segments if s not in sealed]
+            # Sealed files may be overwritten; the remaining ones never
+            taken = {s.path for s in remaining}
+            new_segments = []
+            for i in range(0, len(merged), self.segment_records):
+                chunk = merged[i:i + self.segment_records]
+                path = entry.new_segment_path(int(chunk["timestamp"][0]), taken)
+                taken.add(path)
+                tmp = f"{path}.compacting"
+                with open(tmp, "wb") as f:
+                    f.write(chunk.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                new_segments.append((tmp, path))
+
+            old_paths = {s.path for s in sealed}
+            for tmp, path in new_segments:
+                os.replace(tmp, path)
+            for path in old_paths - {path for _, path in new_segments}:
+                os.remove(path)
+
+            entry.segments = sorted(
+                [_Segment(path) for _, path in new_segments] + remaining,
+                key=lambda s: _segment_order(os.path.basename(s.path))
+            )
+            entry._reindex()
+
+        self.metrics["compactions"] += 1
+        return {
+            "segments_in": len(sealed),
+            "segments_out": len(new_segments),
+            "records_in": records_in,
+            "records_out": len(merged)
+        }
+
+    def compact_all(self, max_age_seconds: float, resolution: int = None) -> Dict[str, Dict[str, int]]:
+        """compact() every series, for segments older than max_age_seconds"""
+        before = int(time.time() - max_age_seconds)
+        return {name: self.compact(name, before, resolution) for name in self.series()}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["series"] = {
+            name: {"records": len(entry), "segments": len(entry.segments)}
+            for name, entry in self._series.items()
+        }
+        return metrics
+
+metrics_store = MetricsStore(
+    settings.METRICS_STORE_DIR,
+    segment_records=settings.METRICS_SEGMENT_RECORDS
+)
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect or compact the metrics history store")
+    parser.add_argument("--compact", action="store_true", help="Compact segments older than METRICS_COMPACT_AFTER_DAYS")
+    args = parser.parse_args()
+
+    if args.compact:
+        results = metrics_store.compact_all(
+            settings.METRICS_COMPACT_AFTER_DAYS * 86400,
+            resolution=settings.METRICS_COMPACT_RESOLUTION or None
+        )
+        print(json.dumps(results, indent=2))
+    for name in metrics_store.series():
+        last = metrics_store.last(name)
+        print(f"{name}: {len(metrics_store._get(name))} records, last at {int(last['timestamp']) if last is not None else None}")
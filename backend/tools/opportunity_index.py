@@ -0,0 +1,344 @@
+# tools/opportunity_index.py
+"""
+Yield opportunity index.
+
+Pools (APY, TVL, utilisation, chain) are pulled from pluggable sources on a
+background refresh and kept as column arrays sorted by risk-adjusted yield:
+
+    risk_adjusted_apy = apy * (1 - risk_score / MAX_SCORE)
+
+with risk scores from the shared RiskModel (one batch pass per refresh).
+Queries (top-k, filtered by asset / chain / protocol / min TVL / max risk)
+only mask those arrays, so agents read opportunities without any I/O.
+
+Each refresh builds a new immutable _IndexSnapshot and swaps it in, so
+readers never see a half-built index and need no lock.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
+import httpx
+import numpy as np
+from config.settings import settings
+from models.risk_ebm import get_risk_model, MAX_SCORE
+from models.apy_forecaster import get_apy_forecaster
+from tools.metrics_store import metrics_store
+
+# Local pools: the demo opportunities, also used for tests and offline runs
+FIXTURE_POOLS = [
+    {"pool_id": "fixture-aave-usdc", "protocol": "Aave", "asset": "USDC", "apy": 0.05, "tvl": 8e9, "utilization": 0.78, "chain": "Base"},
+    {"pool_id": "fixture-curve-usdc", "protocol": "Curve", "asset": "USDC", "apy": 0.08, "tvl": 3e9, "utilization": None, "chain": "Base"},
+    {"pool_id": "fixture-uniswap-usdc", "protocol": "Uniswap", "asset": "USDC", "apy": 0.03, "tvl": 5e9, "utilization": None, "chain": "Base"},
+    {"pool_id": "fixture-yearn-usdc", "protocol": "Yearn", "asset": "USDC", "apy": 0.12, "tvl": 5e8, "utilization": None, "chain": "Base"}
+]
+
+class OpportunitySource(ABC):
+    """A source of pools. fetch() returns dicts with the FIXTURE_POOLS keys."""
+
+    name = "source"
+
+    @abstractmethod
+    async def fetch(self) -> List[Dict[str, Any]]:
+        pass
+
+class FixtureSource(OpportunitySource):
+    """Static pools (FIXTURE_POOLS by default)"""
+
+    name = "fixture"
+
+    def __init__(self, pools: List[Dict[str, Any]] = None):
+        self.pools = pools if pools is not None else FIXTURE_POOLS
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        return [dict(pool) for pool in self.pools]
+
+class DefiLlamaSource(OpportunitySource):
+    """
+    DefiLlama yields API: /pools for APY and TVL, /lendBorrow for lending
+    pools' supply and borrow totals (utilisation). Both are fetched together.
+    """
+
+    name = "defillama"
+
+    # DefiLlama project slug -> protocol name used by the risk model and executor
+    PROJECT_NAMES = {
+        "aave-v2": "Aave",
+        "aave-v3": "Aave",
+        "curve-dex": "Curve",
+        "yearn-finance": "Yearn",
+        "uniswap-v2": "Uniswap",
+        "uniswap-v3": "Uniswap",
+        "compound-v2": "Compound",
+        "compound-v3": "Compound"
+    }
+
+    def __init__(self, base_url: str = "https://yields.llama.fi", chains: List[str] = None, min_tvl: float = 0.0, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.chains = {c.lower() for c in chains} if chains else None
+        self.min_tvl = min_tvl
+        self.timeout = timeout
+
+    async def fetch(self) -> List[Dict[str, Any]]:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            pools_response, lend_response = await asyncio.gather(
+                client.get(f"{self.base_url}/pools"),
+                client.get(f"{self.base_url}/lendBorrow"),
+                return_exceptions=True
+            )
+        if isinstance(pools_response, Exception):
+            raise pools_response
+        pools_response.raise_for_status()
+
+        utilization = {}
+        if not isinstance(lend_response, Exception) and lend_response.status_code == 200:
+            for row in lend_response.json():
+                supplied, borrowed = row.get("totalSupplyUsd"), row.get("totalBorrowUsd")
+                if supplied:
+                    utilization[row.get("pool")] = (borrowed or 0) / supplied
+
+        pools = []
+        for row in pools_response.json().get("data", []):
+            tvl = row.get("tvlUsd") or 0
+            if tvl < self.min_tvl or row.get("apy") is None:
+                continue
+            if self.chains is not None and str(row.get("chain", "")).lower() not in self.chains:
+                continue
+            project = row.get("project", "")
+            pools.append({
+                "pool_id": row.get("pool"),
+                "protocol": self.PROJECT_NAMES.get(project, project.replace("-", " ").title()),
+                "asset": row.get("symbol", ""),
+                "apy": row["apy"] / 100,  # DefiLlama reports percent
+                "tvl": float(tvl),
+                "utilization": utilization.get(row.get("pool")),
+                "chain": row.get("chain")
+            })
+        return pools
+
+class _IndexSnapshot:
+    """Pools sorted by risk-adjusted APY (best first) plus column arrays for filtering"""
+
+    def __init__(self, pools: List[Dict[str, Any]]):
+        pools = sorted(pools, key=lambda p: p["risk_adjusted_apy"], reverse=True)
+        self.pools = pools
+        self.apy = np.array([p["apy"] for p in pools], dtype=float)
+        self.tvl = np.array([p["tvl"] for p in pools], dtype=float)
+        self.risk = np.array([p["risk_score"] for p in pools], dtype=float)
+        # Chain / protocol as integer codes: filtering compares ints, not strings
+        self.chain_codes, self.chain = self._encode([str(p.get("chain") or "").lower() for p in pools])
+        self.protocol_codes, self.protocol = self._encode([p["protocol"].lower() for p in pools])
+
+        # Asset -> positions (ascending = best first); "USDC-WETH" is listed under both tokens
+        by_asset: Dict[str, List[int]] = {}
+        for i, pool in enumerate(pools):
+            for token in str(pool.get("asset", "")).upper().replace("/", "-").split("-"):
+                if token:
+                    by_asset.setdefault(token, []).append(i)
+        self.by_asset = {asset: np.array(rows, dtype=np.int64) for asset, rows in by_asset.items()}
+
+    @staticmethod
+    def _encode(values: List[str]):
+        codes: Dict[str, int] = {}
+        column = np.array([codes.setdefault(v, len(codes)) for v in values], dtype=np.int32)
+        return codes, column
+
+class OpportunityIndex:
+    """
+    Pools from every source, ranked by risk-adjusted APY. refresh() (every
+    `refresh_interval` seconds once start() runs) swaps in a new snapshot; a
+    source that fails keeps its pools from the last refresh. top() and
+    best_apy() only read the current snapshot.
+    """
+
+    def __init__(self, sources: List[OpportunitySource], refresh_interval: float = 300.0):
+        self.sources = sources
+        self.refresh_interval = refresh_interval
+
+        self._snapshot = _IndexSnapshot([])
+        self._source_pools: Dict[str, List[Dict[str, Any]]] = {}  # last good result per source
+        self._refreshed_at: Optional[float] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._history_loaded = False
+
+        self.metrics = {
+            "refreshes": 0,
+            "source_errors": 0,
+            "queries": 0,
+            "last_refresh_ms": 0.0
+        }
+
+    # ---------- refresh ----------
+
+    async def refresh(self):
+        """Fetch every source concurrently, score the pools and swap in a new snapshot"""
+        started = time.perf_counter()
+        results = await asyncio.gather(*(source.fetch() for source in self.sources), return_exceptions=True)
+        for source, result in zip(self.sources, results):
+            if isinstance(result, Exception):
+                # Keep the source's previous pools rather than dropping them from the index
+                self.metrics["source_errors"] += 1
+                print(f"⚠️ Opportunity source '{source.name}' failed: {result}")
+            else:
+                self._source_pools[source.name] = result
+
+        pools = [dict(pool, source=name) for name, source_pools in self._source_pools.items() for pool in source_pools]
+
+        # One risk-model pass over the distinct protocols
+        protocols = list(dict.fromkeys(pool["protocol"] for pool in pools))
+        risk = {protocol: score for protocol, (score, _) in zip(protocols, get_risk_model().assess_protocols(protocols))}
+        for pool in pools:
+            pool["risk_score"] = round(risk[pool["protocol"]], 2)
+            pool["risk_adjusted_apy"] = pool["apy"] * max(0.0, 1.0 - risk[pool["protocol"]] / MAX_SCORE)
+
+        self._snapshot = _IndexSnapshot(pools)
+        # Fixture pools are static demo data, not market history; disk appends run off the loop
+        live = [pool for pool in pools if pool["source"] != FixtureSource.name]
+        if live:
+            await asyncio.to_thread(self._record_history, _IndexSnapshot(live))
+        self._refreshed_at = time.monotonic()
+        self.metrics["refreshes"] += 1
+        self.metrics["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _record_history(self, snap: _IndexSnapshot):
+        """
+        One point per protocol (TVL-weighted APY, total TVL, mean utilisation):
+        appended to the metrics history store and fed to the APY forecaster,
+        which is first warm-started from the stored history.
+        Runs in a worker thread (the store and the forecaster lock internally).
+        """
+        if not snap.pools:
+            return
+        names = [None] * len(snap.protocol_codes)
+        for pool, code in zip(snap.pools, snap.protocol):
+            names[code] = pool["protocol"]
+        tvl = np.bincount(snap.protocol, weights=snap.tvl, minlength=len(names))
+        weighted = np.bincount(snap.protocol, weights=snap.apy * snap.tvl, minlength=len(names))
+        counts = np.bincount(snap.protocol, minlength=len(names))
+        plain = np.bincount(snap.protocol, weights=snap.apy, minlength=len(names)) / np.maximum(counts, 1)
+        apy = np.where(tvl > 0, weighted / np.where(tvl > 0, tvl, 1.0), plain)
+
+        utilization = np.array([np.nan if p.get("utilization") is None else p["utilization"] for p in snap.pools])
+        known = ~np.isnan(utilization)
+        util_counts = np.bincount(snap.protocol[known], minlength=len(names))
+        util_sum = np.bincount(snap.protocol[known], weights=utilization[known], minlength=len(names))
+        utilization = np.where(util_counts > 0, util_sum / np.maximum(util_counts, 1), np.nan)
+
+        forecaster = get_apy_forecaster()
+        if not self._history_loaded:
+            self._history_loaded = True
+            history = {name: np.array(metrics_store.tail(name, forecaster.window)["apy"]) for name in names}
+            forecaster.fit({name: values[~np.isnan(values)] for name, values in history.items() if len(values)})
+
+        try:
+            metrics_store.append_many(int(time.time()), names, apy=apy, tvl=tvl, utilization=utilization)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics history: {e}")
+        forecaster.update(names, apy, tvl)
+
+    async def ensure_loaded(self):
+        """Refresh once if the index has never been loaded (e.g. CLI runs without the background task)"""
+        if self._refreshed_at is None:
+            if self._refresh_lock is None:
+                self._refresh_lock = asyncio.Lock()
+            async with self._refresh_lock:
+                if self._refreshed_at is None:
+                    await self.refresh()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Opportunity index refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start background refresh (call from inside the event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        # Drop the reference once the loop exits so start() can run it again
+        if task is self._task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Opportunity index refresh stopped: {task.exception()}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- queries ----------
+
+    def top(
+        self,
+        k: int = 10,
+        asset: str = None,
+        chain: str = None,
+        protocol: str = None,
+        min_tvl: float = None,
+        max_risk: float = None
+    ) -> List[Dict[str, Any]]:
+        """Best k pools by risk-adjusted APY matching every given filter"""
+        self.metrics["queries"] += 1
+        snap = self._snapshot
+
+        if asset is not None:
+            rows = snap.by_asset.get(asset.upper())
+            if rows is None:
+                return []
+        else:
+            rows = np.arange(len(snap.pools))
+
+        mask = np.ones(len(rows), dtype=bool)
+        if min_tvl is not None:
+            mask &= snap.tvl[rows] >= min_tvl
+        if max_risk is not None:
+            mask &= snap.risk[rows] <= max_risk
+        if chain is not None:
+            mask &= snap.chain[rows] == snap.chain_codes.get(chain.lower(), -1)
+        if protocol is not None:
+            mask &= snap.protocol[rows] == snap.protocol_codes.get(protocol.lower(), -1)
+
+        return [dict(snap.pools[i]) for i in rows[mask][:k]]
+
+    def best_apy(self, protocol: str, asset: str = None) -> Optional[float]:
+        """Highest APY offered by `protocol` (optionally for `asset`), or None if not indexed"""
+        pools = self.top(k=len(self._snapshot.pools), asset=asset, protocol=protocol)
+        return max((pool["apy"] for pool in pools), default=None)
+
+    def __len__(self):
+        return len(self._snapshot.pools)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["pools"] = len(self)
+        metrics["sources"] = {name: len(pools) for name, pools in self._source_pools.items()}
+        metrics["age_seconds"] = round(time.monotonic() - self._refreshed_at, 1) if self._refreshed_at else None
+        return metrics
+
+def build_sources(names: str) -> List[OpportunitySource]:
+    """Sources from a comma-separated list ("fixture", "defillama")"""
+    sources = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        if name == "fixture":
+            sources.append(FixtureSource())
+        elif name == "defillama":
+            chains = [c for c in settings.OPPORTUNITY_CHAINS.split(",") if c.strip()]
+            sources.append(DefiLlamaSource(chains=chains or None, min_tvl=settings.OPPORTUNITY_MIN_TVL))
+        elif name:
+            print(f"⚠️ Unknown opportunity source '{name}' ignored")
+    return sources or [FixtureSource()]
+
+opportunity_index = OpportunityIndex(
+    build_sources(settings.OPPORTUNITY_SOURCES),
+    refresh_interval=settings.OPPORTUNITY_REFRESH_INTERVAL
+)
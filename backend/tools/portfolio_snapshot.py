@@ -0,0 +1,268 @@
+# tools/portfolio_snapshot.py
+"""
+On-chain portfolio snapshots via Multicall3.
+
+Every token balance, token decimals and Aave account data for one or more
+wallets is read in a single Multicall3.aggregate3 eth_call pinned to one
+block. Snapshots are cached per (wallet, block); concurrent snapshot()
+calls for different wallets within `batch_window` share one aggregate.
+
+Token decimals never change, so they are only fetched the first time.
+"""
+import asyncio
+import os
+from typing import Dict, Any, List, Optional, Set, Tuple
+from eth_abi import encode, decode
+from web3 import Web3
+from coordination_layer.cache import TTLCache
+from tools.rpc_client import get_rpc_client
+from tools.web3_tools import RPC_URL, CONTRACTS
+from tools.defi_tools import get_protocol_apy
+
+# Same address on every chain it is deployed to (including Base / Base Sepolia)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# ERC20 tokens included in every snapshot: symbol -> CONTRACTS key
+TOKENS = {
+    "USDC": "usdc",
+    "WETH": "weth"
+}
+
+# Returned when the chain cannot be read (no RPC, placeholder wallet address)
+DEMO_BALANCES = {"USDC": 10000, "ETH": 2}
+DEMO_POSITIONS = {"Aave": {"USDC": 10000, "apy": 0.05}}
+
+def _selector(signature: str) -> bytes:
+    return bytes(Web3.keccak(text=signature)[:4])
+
+AGGREGATE3 = _selector("aggregate3((address,bool,bytes)[])")
+GET_ETH_BALANCE = _selector("getEthBalance(address)")
+BALANCE_OF = _selector("balanceOf(address)")
+DECIMALS = _selector("decimals()")
+GET_USER_ACCOUNT_DATA = _selector("getUserAccountData(address)")
+
+# Aave V3 account data: (collateral, debt, available borrows) in USD with 8 decimals, ..., health factor (18 decimals)
+ACCOUNT_DATA_TYPES = ["uint256", "uint256", "uint256", "uint256", "uint256", "uint256"]
+AAVE_BASE_DECIMALS = 8
+
+class PortfolioSnapshotService:
+
+    def __init__(
+        self,
+        rpc_url: str,
+        cache_size: int = 1024,
+        head_ttl: float = 2.0,
+        batch_window: float = 0.01,
+        max_wallets_per_call: int = 100
+    ):
+        self.rpc_url = rpc_url
+        self.batch_window = batch_window
+        self.max_wallets_per_call = max_wallets_per_call
+
+        self.tokens = {
+            symbol: Web3.to_checksum_address(CONTRACTS[key])
+            for symbol, key in TOKENS.items()
+        }
+        self.aave_pool = Web3.to_checksum_address(CONTRACTS["aave_pool"])
+        self.decimals: Dict[str, int] = {}
+
+        self._cache = TTLCache(max_size=cache_size, ttl=300)  # "wallet:block" -> snapshot
+        self._head = TTLCache(max_size=1, ttl=head_ttl)  # latest block number, ~one block time
+        self._queue: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._resolving: Set[asyncio.Task] = set()  # in-flight flushes, referenced until done
+
+        self.metrics = {
+            "snapshots": 0,
+            "cache_hits": 0,
+            "multicalls": 0,
+            "wallets_fetched": 0,
+            "failures": 0
+        }
+
+    # ---------- public ----------
+
+    async def snapshot(self, wallet: str, block: int = None) -> Dict[str, Any]:
+        """
+        {"wallet", "block", "balances", "positions"} for one wallet. Calls for
+        other wallets made within batch_window share the same aggregate call.
+        """
+        self.metrics["snapshots"] += 1
+        wallet = Web3.to_checksum_address(wallet)
+        if block is not None:
+            return (await self.snapshots([wallet], block))[wallet]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.setdefault(wallet, []).append(future)
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def snapshots(self, wallets: List[str], block: int = None) -> Dict[str, Dict[str, Any]]:
+        """Snapshots for many wallets at one block (default latest): one eth_call per max_wallets_per_call"""
+        wallets = [Web3.to_checksum_address(w) for w in wallets]
+        if block is None:
+            block = await self.head()
+
+        results, missing = {}, []
+        for wallet in dict.fromkeys(wallets):
+            cached = self._cache.get(f"{wallet}:{block}")
+            if cached is not None:
+                self.metrics["cache_hits"] += 1
+                results[wallet] = cached
+            else:
+                missing.append(wallet)
+
+        chunks = [missing[i:i + self.max_wallets_per_call] for i in range(0, len(missing), self.max_wallets_per_call)]
+        for fetched in await asyncio.gather(*(self._fetch(chunk, block) for chunk in chunks)):
+            for wallet, snapshot in fetched.items():
+                self._cache.set(f"{wallet}:{block}", snapshot)
+                results[wallet] = snapshot
+        return results
+
+    async def head(self) -> int:
+        block = self._head.get("head")
+        if block is None:
+            block = int(await get_rpc_client(self.rpc_url).request("eth_blockNumber"), 16)
+            self._head.set("head", block)
+        return block
+
+    # ---------- batching ----------
+
+    def _flush(self):
+        self._flush_handle = None
+        queue, self._queue = self._queue, {}
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(self._resolve(queue))
+        self._resolving.add(task)
+        task.add_done_callback(self._resolving.discard)
+
+    async def _resolve(self, queue: Dict[str, List[asyncio.Future]]):
+        try:
+            results = await self.snapshots(list(queue))
+        except Exception as e:
+            for futures in queue.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for wallet, futures in queue.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results[wallet])
+
+    # ---------- multicall ----------
+
+    def _calls(self, wallets: List[str]) -> List[Tuple[str, str, Any]]:
+        """(kind, key, (target, callData)) for every read in one aggregate"""
+        calls = []
+        for symbol, token in self.tokens.items():
+            if symbol not in self.decimals:
+                calls.append(("decimals", symbol, (token, DECIMALS)))
+
+        for wallet in wallets:
+            arg = encode(["address"], [wallet])
+            calls.append(("eth", wallet, (MULTICALL3_ADDRESS, GET_ETH_BALANCE + arg)))
+            for symbol, token in self.tokens.items():
+                calls.append(("balance", (wallet, symbol), (token, BALANCE_OF + arg)))
+            calls.append(("aave", wallet, (self.aave_pool, GET_USER_ACCOUNT_DATA + arg)))
+        return calls
+
+    async def _fetch(self, wallets: List[str], block: int) -> Dict[str, Dict[str, Any]]:
+        calls = self._calls(wallets)
+        data = AGGREGATE3 + encode(
+            ["(address,bool,bytes)[]"],
+            [[(target, True, call_data) for _, _, (target, call_data) in calls]]
+        )
+
+        self.metrics["multicalls"] += 1
+        try:
+            raw = await get_rpc_client(self.rpc_url).request(
+                "eth_call",
+                [{"to": MULTICALL3_ADDRESS, "data": "0x" + data.hex()}, hex(block)]
+            )
+        except Exception:
+            self.metrics["failures"] += 1
+            raise
+        results = decode(["(bool,bytes)[]"], bytes.fromhex(raw[2:]))[0]
+        self.metrics["wallets_fetched"] += len(wallets)
+
+        snapshots = {
+            wallet: {"wallet": wallet, "block": block, "balances": {}, "positions": {}}
+            for wallet in wallets
+        }
+        balances = []
+        for (kind, key, _), (success, payload) in zip(calls, results):
+            if not success or not payload:
+                continue
+            if kind == "decimals":
+                self.decimals[key] = decode(["uint8"], payload)[0]
+            elif kind == "eth":
+                snapshots[key]["balances"]["ETH"] = decode(["uint256"], payload)[0] / 1e18
+            elif kind == "balance":
+                balances.append((key, decode(["uint256"], payload)[0]))
+            elif kind == "aave":
+                collateral, debt, _, _, _, health = decode(ACCOUNT_DATA_TYPES, payload)
+                if collateral or debt:
+                    snapshots[key]["positions"]["Aave"] = {
+                        "USDC": collateral / 10 ** AAVE_BASE_DECIMALS,  # USD value, as USDC
+                        "debt": debt / 10 ** AAVE_BASE_DECIMALS,
+                        "health_factor": health / 1e18 if debt else None,
+                        "apy": get_protocol_apy("Aave")
+                    }
+
+        # Balances last: decimals may have arrived in this same aggregate
+        for (wallet, symbol), amount in balances:
+            if symbol in self.decimals:
+                snapshots[wallet]["balances"][symbol] = amount / 10 ** self.decimals[symbol]
+
+        return snapshots
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["cached"] = len(self._cache)
+        return metrics
+
+portfolio_snapshots = PortfolioSnapshotService(
+    RPC_URL,
+    cache_size=int(os.getenv("SNAPSHOT_CACHE_SIZE", "1024")),
+    head_ttl=float(os.getenv("SNAPSHOT_HEAD_TTL", "2"))
+)
+
+async def portfolio_state(wallet: str) -> Tuple[Dict, Dict]:
+    """
+    (balances, positions) for an AgentState: live on-chain snapshot, or the
+    demo portfolio when the wallet is not a real address or the chain is unreachable.
+    """
+    if not Web3.is_address(wallet):
+        return dict(DEMO_BALANCES), {k: dict(v) for k, v in DEMO_POSITIONS.items()}
+    try:
+        snapshot = await portfolio_snapshots.snapshot(wallet)
+        # Copies: the cached snapshot is shared with other executions
+        return dict(snapshot["balances"]), {k: dict(v) for k, v in snapshot["positions"].items()}
+    except Exception as e:
+        print(f"⚠️ Portfolio snapshot failed for {wallet}: {e} - using demo portfolio")
+        return dict(DEMO_BALANCES), {k: dict(v) for k, v in DEMO_POSITIONS.items()}
+
+async def portfolio_states(wallets: List[str]) -> Dict[str, Tuple[Dict, Dict]]:
+    """
+    portfolio_state() for many wallets: the real addresses share one
+    snapshots() pass (one aggregate per max_wallets_per_call wallets).
+    """
+    real = [w for w in dict.fromkeys(wallets) if Web3.is_address(w)]
+    snapshots = {}
+    if real:
+        try:
+            snapshots = await portfolio_snapshots.snapshots(real)
+        except Exception as e:
+            print(f"⚠️ Portfolio snapshots failed for {len(real)} wallets: {e} - using demo portfolios")
+
+    states = {}
+    for wallet in wallets:
+        snapshot = snapshots.get(Web3.to_checksum_address(wallet)) if Web3.is_address(wallet) else None
+        if snapshot is None:
+            states[wallet] = (dict(DEMO_BALANCES), {k: dict(v) for k, v in DEMO_POSITIONS.items()})
+        else:
+            states[wallet] = (dict(snapshot["balances"]), {k: dict(v) for k, v in snapshot["positions"].items()})
+    return states
@@ -0,0 +1,329 @@
+# tools/rpc_client.py
+"""
+Async JSON-RPC client with request coalescing.
+
+Concurrent read calls made within `batch_window` seconds of each other are
+sent as one JSON-RPC batch over a pooled httpx connection. Each endpoint
+has its own client (see get_rpc_client) with a cap on in-flight HTTP
+requests and per-method latency histograms.
+
+BatchingSyncProvider plugs the client into the synchronous Web3 used on
+the execution path (worker threads and the receipt tracker), so their
+nonce, fee, estimate and receipt reads are coalesced too.
+"""
+import asyncio
+import bisect
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set, Tuple
+import httpx
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers.base import JSONBaseProvider
+from config.settings import settings
+
+# Read-only methods that may share a batch; everything else is sent on its own
+BATCHABLE_METHODS = {
+    "eth_getTransactionCount",
+    "eth_gasPrice",
+    "eth_maxPriorityFeePerGas",
+    "eth_call",
+    "eth_getBalance",
+    "eth_blockNumber",
+    "eth_chainId",
+    "eth_estimateGas",
+    "eth_feeHistory",
+    "eth_getBlockByNumber",
+    "eth_getTransactionReceipt",
+    "eth_getCode",
+    "debug_traceCall"
+}
+
+class RPCError(Exception):
+    """JSON-RPC error response (or a transport failure for the request)"""
+
+    def __init__(self, message: str, code: int = None, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Upper bound of the bucket holding the pct-th percentile"""
+        if not self.total:
+            return None
+        rank = pct / 100 * self.total
+        seen = 0
+        for bound, count in zip(self.BUCKETS_MS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}ms" for b in self.BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+class BatchingRPCClient:
+    """
+    One JSON-RPC endpoint.
+
+    - request() queues a call; batchable calls are flushed together after
+      `batch_window` seconds or once `max_batch` are queued
+    - at most `max_concurrency` HTTP requests are in flight at once
+    - latency is recorded per method (time from request() to result) and
+      per HTTP round trip
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_batch: int = 50,
+        batch_window: float = 0.002,
+        max_concurrency: int = 8,
+        timeout: float = 10.0
+    ):
+        self.url = url
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # loop the pooled session belongs to
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ids = itertools.count(1)
+        self._queue: List[Tuple[Dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sends: Set[asyncio.Task] = set()  # in-flight sends, referenced until done
+
+        self.method_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.http_latency = LatencyHistogram()
+        self.metrics = {
+            "requests": 0,
+            "http_requests": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "errors": 0
+        }
+
+    def _ensure_client(self):
+        # Created lazily so they bind to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                headers={"Content-Type": "application/json"}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.loop = asyncio.get_running_loop()
+
+    # ---------- requests ----------
+
+    async def request_raw(self, method: str, params: Any = None) -> Dict[str, Any]:
+        """Queue a call and return the raw JSON-RPC response ({"result"} or {"error"})"""
+        self._ensure_client()
+        self.metrics["requests"] += 1
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or []}
+        future = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+
+        if method in BATCHABLE_METHODS:
+            self._queue.append((payload, future))
+            if len(self._queue) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        else:
+            self._spawn_send([(payload, future)])
+
+        try:
+            return await future
+        finally:
+            self.method_latency[method].observe((time.perf_counter() - started) * 1000)
+
+    async def request(self, method: str, params: Any = None) -> Any:
+        """Queue a call and return its result; raises RPCError on an error response"""
+        response = await self.request_raw(method, params)
+        if "error" in response:
+            error = response["error"] or {}
+            raise RPCError(error.get("message", "RPC error"), error.get("code"), error.get("data"))
+        return response.get("result")
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            self._spawn_send(batch)
+
+    def _spawn_send(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(self._send(batch))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        payloads = [payload for payload, _ in batch]
+        body = payloads[0] if len(payloads) == 1 else payloads
+
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                response = await self._client.post(self.url, content=json.dumps(body, cls=Web3JsonEncoder))
+                self.http_latency.observe((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            results = response.json()
+        except Exception as e:
+            self.metrics["errors"] += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RPCError(f"RPC transport error: {e}"))
+            return
+        finally:
+            self.metrics["http_requests"] += 1
+            if len(batch) > 1:
+                self.metrics["batches"] += 1
+                self.metrics["batched_requests"] += len(batch)
+
+        if isinstance(results, dict):
+            results = [results]
+        by_id = {result.get("id"): result for result in results if isinstance(result, dict)}
+
+        for payload, future in batch:
+            if future.done():
+                continue
+            result = by_id.get(payload["id"])
+            if result is None:
+                self.metrics["errors"] += 1
+                future.set_exception(RPCError(f"No response for {payload['method']} (id {payload['id']})"))
+            else:
+                if "error" in result:
+                    self.metrics["errors"] += 1
+                future.set_result(result)
+
+    # ---------- common reads ----------
+
+    async def get_transaction_count(self, address: str, block: str = "pending") -> int:
+        return int(await self.request("eth_getTransactionCount", [address, block]), 16)
+
+    async def gas_price(self) -> int:
+        return int(await self.request("eth_gasPrice"), 16)
+
+    async def get_balance(self, address: str, block: str = "latest") -> int:
+        return int(await self.request("eth_getBalance", [address, block]), 16)
+
+    async def call(self, tx: Dict[str, Any], block: str = "latest") -> str:
+        return await self.request("eth_call", [tx, block])
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self.loop = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["avg_batch_size"] = round(metrics["batched_requests"] / metrics["batches"], 2) if metrics["batches"] else 0.0
+        metrics["http_latency"] = self.http_latency.snapshot()
+        metrics["methods"] = {method: hist.snapshot() for method, hist in self.method_latency.items()}
+        return metrics
+
+class BatchingSyncProvider(JSONBaseProvider):
+    """
+    Synchronous Web3 provider that hands each request to a BatchingRPCClient
+    on the event loop that owns its pooled session, so calls from worker
+    threads share batches and connections with the async code.
+
+    Falls back to `fallback` (a plain HTTPProvider) when the client has no
+    running loop yet, or when called on that loop's own thread (blocking it
+    on its own future would deadlock).
+    """
+
+    def __init__(self, client: BatchingRPCClient, fallback=None, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.fallback = fallback
+        self.metrics = {"bridged": 0, "fallback": 0}
+        self._lock = threading.Lock()
+
+    def _bridge_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        loop = self.client.loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return None
+        try:
+            if asyncio.get_running_loop() is loop:
+                return None
+        except RuntimeError:
+            pass  # not on any loop: a worker thread
+        return loop
+
+    def make_request(self, method, params):
+        loop = self._bridge_loop()
+        if loop is None:
+            if self.fallback is None:
+                raise RPCError(f"No event loop for batched {method} and no fallback provider")
+            with self._lock:
+                self.metrics["fallback"] += 1
+            return self.fallback.make_request(method, params)
+
+        with self._lock:
+            self.metrics["bridged"] += 1
+        future = asyncio.run_coroutine_threadsafe(self.client.request_raw(method, params), loop)
+        return future.result(timeout=self.client.timeout * 2)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            return "result" in self.make_request("web3_clientVersion", [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+
+# One client per endpoint, shared by everything in this process
+_clients: Dict[str, BatchingRPCClient] = {}
+
+def get_rpc_client(url: str) -> BatchingRPCClient:
+    client = _clients.get(url)
+    if client is None:
+        client = _clients[url] = BatchingRPCClient(
+            url,
+            max_batch=settings.RPC_MAX_BATCH,
+            batch_window=settings.RPC_BATCH_WINDOW,
+            max_concurrency=settings.RPC_MAX_CONCURRENCY,
+            timeout=settings.RPC_TIMEOUT
+        )
+    return client
+
+def rpc_metrics() -> Dict[str, Any]:
+    return {url: client.get_metrics() for url, client in _clients.items()}
+
+async def close_rpc_clients():
+    for client in _clients.values():
+        await client.close()
@@ -0,0 +1,224 @@
+# tools/simulator.py
+"""
+Dry-run transaction simulation.
+
+Runs the exact transactions execute_transaction would build (see
+web3_tools.build_transaction) with eth_call / eth_estimateGas against a
+simulation node - normally a local fork of the live chain:
+
+    anvil --fork-url $RPC_URL        # SIM_RPC_URL defaults to http://127.0.0.1:8545
+
+Nothing is signed or broadcast. For each transaction the result has gas
+used, the decoded revert reason, and (when the node supports
+debug_traceCall with the prestate tracer) the state diff.
+
+All calls go through the batching RPC client, so simulate_many() over
+thousands of trades costs a few HTTP round trips per batch window.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional
+from eth_abi import decode
+from tools.rpc_client import get_rpc_client, RPCError
+from tools.web3_tools import build_transaction, MY_ADDRESS
+
+SIM_RPC_URL = os.getenv("SIM_RPC_URL", "http://127.0.0.1:8545")
+# Sender for simulated calls: the execution wallet, else anvil's first dev account
+SIM_FROM = os.getenv("SIM_FROM") or MY_ADDRESS or "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+
+ERROR_SELECTOR = "0x08c379a0"  # Error(string)
+PANIC_SELECTOR = "0x4e487b71"  # Panic(uint256)
+PANIC_CODES = {
+    0x01: "assertion failed",
+    0x11: "arithmetic overflow/underflow",
+    0x12: "division by zero",
+    0x21: "invalid enum value",
+    0x31: "pop on empty array",
+    0x32: "array index out of bounds",
+    0x41: "out of memory",
+    0x51: "call to zero-initialized function"
+}
+
+ZERO_WORD = "0x" + "00" * 32
+
+def decode_revert_reason(data: Optional[str]) -> str:
+    """Human-readable reason from revert data (Error(string), Panic(uint256) or a custom error)"""
+    if not data or data == "0x":
+        return "execution reverted"
+    try:
+        if data.startswith(ERROR_SELECTOR):
+            return decode(["string"], bytes.fromhex(data[10:]))[0]
+        if data.startswith(PANIC_SELECTOR):
+            code = decode(["uint256"], bytes.fromhex(data[10:]))[0]
+            return f"panic: {PANIC_CODES.get(code, hex(code))}"
+    except Exception:
+        pass
+    return f"custom error {data[:10]}"
+
+def _revert_data(error: RPCError) -> Optional[str]:
+    # Nodes put revert data in error.data as a hex string, or nested as {"data": "0x..."}
+    data = error.data
+    if isinstance(data, dict):
+        data = data.get("data")
+    return data if isinstance(data, str) and data.startswith("0x") else None
+
+def to_rpc_tx(tx: Dict[str, Any], sender: str = None) -> Dict[str, Any]:
+    """web3-style transaction dict -> JSON-RPC call object (hex quantities)"""
+    call = {"from": tx.get("from") or sender or SIM_FROM}
+    for field in ("to", "data"):
+        if tx.get(field) is not None:
+            call[field] = tx[field] if isinstance(tx[field], str) else "0x" + bytes(tx[field]).hex()
+    for field in ("value", "gas", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+        if tx.get(field) is not None:
+            call[field] = hex(tx[field]) if isinstance(tx[field], int) else tx[field]
+    return call
+
+def state_changes(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compact per-account diff from a prestateTracer diffMode result:
+    {address: {"balance"|"nonce"|"code": {"from", "to"}, "storage": {slot: {"from", "to"}}}}.
+    In diffMode `post` only lists what changed; a slot missing from `post`
+    was cleared to zero.
+    """
+    pre, post = trace.get("pre") or {}, trace.get("post") or {}
+    changes = {}
+    for address in set(pre) | set(post):
+        before, after = pre.get(address, {}), post.get(address, {})
+        entry = {}
+        for field in ("balance", "nonce", "code"):
+            if field in after and after[field] != before.get(field):
+                entry[field] = {"from": before.get(field), "to": after[field]}
+
+        before_slots, after_slots = before.get("storage") or {}, after.get("storage") or {}
+        storage = {}
+        for slot in set(before_slots) | set(after_slots):
+            old, new = before_slots.get(slot, ZERO_WORD), after_slots.get(slot, ZERO_WORD)
+            if old != new:
+                storage[slot] = {"from": old, "to": new}
+        if storage:
+            entry["storage"] = storage
+
+        if entry:
+            changes[address] = entry
+    return changes
+
+class TransactionSimulator:
+    """
+    simulate() sends eth_call, eth_estimateGas and debug_traceCall for one
+    transaction at once (they share a JSON-RPC batch). If the node has no
+    debug namespace, tracing is switched off and state_diff is None.
+    """
+
+    def __init__(self, rpc_url: str, trace: bool = True):
+        self.rpc_url = rpc_url
+        self.trace = trace
+
+        self.metrics = {
+            "simulations": 0,
+            "reverted": 0,
+            "errors": 0,
+            "total_ms": 0.0
+        }
+
+    async def simulate(self, tx: Dict[str, Any], block: str = "latest", sender: str = None) -> Dict[str, Any]:
+        """
+        Simulate one transaction. Returns {"success", "gas_used", "return_data",
+        "revert_reason", "state_diff", "block"}; "error" instead when the node
+        could not be reached.
+        """
+        client = get_rpc_client(self.rpc_url)
+        call = to_rpc_tx(tx, sender)
+        started = time.perf_counter()
+        self.metrics["simulations"] += 1
+
+        requests = [
+            client.request("eth_call", [call, block]),
+            client.request("eth_estimateGas", [call, block])
+        ]
+        if self.trace:
+            requests.append(client.request(
+                "debug_traceCall",
+                [call, block, {"tracer": "prestateTracer", "tracerConfig": {"diffMode": True}}]
+            ))
+        call_result, gas_result, *trace_result = await asyncio.gather(*requests, return_exceptions=True)
+        self.metrics["total_ms"] += (time.perf_counter() - started) * 1000
+
+        result = {
+            "success": True,
+            "gas_used": None,
+            "return_data": None,
+            "revert_reason": None,
+            "state_diff": None,
+            "block": block
+        }
+
+        if isinstance(call_result, Exception):
+            revert_data = _revert_data(call_result) if isinstance(call_result, RPCError) else None
+            if revert_data is None and getattr(call_result, "code", None) not in (3, -32000, -32015):
+                # Transport failure or unsupported call, not a revert
+                self.metrics["errors"] += 1
+                return {"success": False, "error": str(call_result), "block": block}
+            self.metrics["reverted"] += 1
+            result["success"] = False
+            result["revert_reason"] = decode_revert_reason(revert_data) if revert_data else str(call_result)
+            return result
+
+        result["return_data"] = call_result
+        if isinstance(gas_result, Exception):
+            result["revert_reason"] = f"gas estimation failed: {gas_result}"
+        else:
+            result["gas_used"] = int(gas_result, 16)
+
+        if trace_result:
+            trace = trace_result[0]
+            if isinstance(trace, RPCError) and trace.code == -32601:
+                print(f"⚠️ {self.rpc_url} has no debug_traceCall - state diffs disabled")
+                self.trace = False
+            elif not isinstance(trace, Exception):
+                result["state_diff"] = state_changes(trace)
+
+        return result
+
+    async def simulate_many(self, txs: List[Dict[str, Any]], block: str = "latest", sender: str = None) -> List[Dict[str, Any]]:
+        """Simulate independent transactions concurrently against the same block"""
+        return await asyncio.gather(*(self.simulate(tx, block, sender) for tx in txs))
+
+    async def simulate_trade(
+        self,
+        protocol: str,
+        action: str,
+        amount: float,
+        token: str = "ETH",
+        recipient: str = None,
+        block: str = "latest"
+    ) -> Dict[str, Any]:
+        """Dry run of execute_transaction(protocol, action, amount, token): same transaction, nothing broadcast"""
+        try:
+            tx, call_type, label = build_transaction(protocol, action, amount, token, recipient or SIM_FROM)
+        except Exception as e:
+            return {"status": "failed", "error": str(e)}
+
+        simulation = await self.simulate(tx, block)
+        if "error" in simulation:
+            status = "failed"
+        else:
+            status = "simulated" if simulation["success"] else "reverted"
+
+        print(f"🧪 SIMULATED: {label} {amount} {token} -> {status}")
+        return {
+            "status": status,
+            "protocol": call_type,
+            "action": "transfer" if call_type == "wallet" else action,
+            "amount": amount,
+            "token": token,
+            "simulation": simulation
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["avg_ms"] = round(metrics["total_ms"] / metrics["simulations"], 2) if metrics["simulations"] else 0.0
+        metrics["trace"] = self.trace
+        return metrics
+
+simulator = TransactionSimulator(SIM_RPC_URL, trace=os.getenv("SIM_TRACE", "true").lower() == "true")
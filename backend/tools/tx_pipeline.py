@@ -0,0 +1,316 @@
+# tools/tx_pipeline.py
+"""
+Nonce management and pipelined submission for the execution wallet.
+
+Transactions are signed with a locally allocated nonce and sent back to
+back; a background tracker polls for receipts and replaces transactions
+that stay pending too long (same nonce, bumped gas price).
+
+Works against any JSON-RPC node - point RPC_URL at a local dev chain
+(anvil / hardhat node) to exercise it without testnet funds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
+
+# Send errors meaning the node's view of the account's nonce differs from ours
+# (another process or wallet used the key, or the tx is already in the pool)
+NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "replacement transaction underpriced",
+    "already known",
+    "known transaction"
+)
+
+def send_failure_kind(error: Exception) -> str:
+    """
+    Classify a send_raw_transaction failure:
+    "nonce"    - nonce conflict; local nonce state is stale
+    "rejected" - the node answered with an error, so the tx was not accepted
+    "unsent"   - the request never reached the node (connection refused)
+    "unknown"  - e.g. a timeout: the node may have accepted the tx
+    """
+    message = str(error).lower()
+    if any(marker in message for marker in NONCE_ERRORS):
+        return "nonce"
+    if isinstance(error, ConnectionRefusedError) or "connection refused" in message:
+        return "unsent"
+    # web3 raises Web3RPCError (v7+) / ValueError (v6) for JSON-RPC error responses
+    if type(error).__name__ == "Web3RPCError" or type(error) is ValueError:
+        return "rejected"
+    return "unknown"
+
+class NonceManager:
+    """
+    Hands out nonces for one account without a get_transaction_count
+    round trip per transaction. Safe across concurrent executions within
+    one process only: nonces are allocated in memory, so several processes
+    (e.g. uvicorn workers) signing with the same key will collide. Run the
+    executor in a single process, or give each process its own key.
+    """
+
+    def __init__(self, w3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next: Optional[int] = None
+        self._released = []  # nonces handed out but never broadcast
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._released:
+                return self._released.pop(0)
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce: int):
+        """Give back a nonce whose transaction was never accepted by the node"""
+        with self._lock:
+            if self._next is not None and nonce == self._next - 1:
+                self._next -= 1
+            else:
+                self._released.append(nonce)
+                self._released.sort()
+
+    def resync(self):
+        """Forget local state; the next allocate() reads the pending nonce from the node"""
+        with self._lock:
+            self._next = None
+            self._released.clear()
+
+class TransactionPipeline:
+    """
+    submit() signs and broadcasts immediately and returns the tx hash;
+    wait() / receipt_future() give the receipt. One tracker thread polls every pending transaction; a
+    transaction still pending after `stuck_after` seconds is re-sent with
+    the same nonce and gas price x `gas_bump` (at most `max_replacements`
+    times). Whichever version is mined resolves the Future.
+    """
+
+    def __init__(
+        self,
+        w3,
+        private_key: str,
+        address: str,
+        chain_id: int,
+        poll_interval: float = 2.0,
+        stuck_after: float = 60.0,
+        gas_bump: float = 1.125,
+        max_replacements: int = 3,
+        receipt_timeout: float = 600.0,
+        max_tracked: int = 10000
+    ):
+        self.w3 = w3
+        self.private_key = private_key
+        self.address = address
+        self.chain_id = chain_id
+        self.nonces = NonceManager(w3, address)
+
+        self.poll_interval = poll_interval
+        self.stuck_after = stuck_after
+        self.gas_bump = gas_bump
+        self.max_replacements = max_replacements
+        self.receipt_timeout = receipt_timeout
+        self.max_tracked = max_tracked
+
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Any]] = {}  # nonce -> tracked tx
+        self._by_hash: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # recent hashes sent -> tracked tx
+        self._tracker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.metrics = {
+            "submitted": 0,
+            "confirmed": 0,
+            "reverted": 0,
+            "replaced": 0,
+            "send_failures": 0,
+            "timeouts": 0
+        }
+
+    # ---------- submission ----------
+
+    def _sign_and_send(self, tx: Dict) -> str:
+        signed = self.w3.eth.account.sign_transaction(tx, self.private_key)
+        return self.w3.to_hex(self.w3.eth.send_raw_transaction(signed.raw_transaction))
+
+    def submit(self, tx: Dict, meta: Dict = None) -> str:
+        """
+        Fill in nonce / gas price / chain id, sign and broadcast without
+        waiting. Returns the transaction hash.
+        """
+        tx = dict(tx)
+        tx.setdefault("chainId", self.chain_id)
+        if "gasPrice" not in tx and "maxFeePerGas" not in tx:
+            tx["gasPrice"] = self.w3.eth.gas_price
+        tx["nonce"] = self.nonces.allocate()
+
+        try:
+            signed = self.w3.eth.account.sign_transaction(tx, self.private_key)
+        except Exception:
+            self.nonces.release(tx["nonce"])  # nothing was sent
+            raise
+
+        try:
+            tx_hash = self.w3.to_hex(self.w3.eth.send_raw_transaction(signed.raw_transaction))
+        except Exception as e:
+            self.metrics["send_failures"] += 1
+            if send_failure_kind(e) in ("rejected", "unsent"):
+                # Provably not in the node's pool: the nonce can be reused
+                self.nonces.release(tx["nonce"])
+            else:
+                # Stale nonce, or the node may hold the tx: re-read the pending nonce
+                self.nonces.resync()
+            raise
+
+        tracked = {
+            "tx": tx,
+            "hashes": [tx_hash],
+            "sent_at": time.monotonic(),
+            "submitted_at": time.monotonic(),
+            "replacements": 0,
+            "status": "pending",
+            "receipt": None,
+            "meta": meta or {},
+            "future": Future()
+        }
+        with self._lock:
+            self._pending[tx["nonce"]] = tracked
+            self._remember(tx_hash, tracked)
+            self._ensure_tracker()
+        self.metrics["submitted"] += 1
+
+        return tx_hash
+
+    def receipt_future(self, tx_hash: str) -> Future:
+        """Future resolved with the receipt of whichever version of the tx is mined"""
+        return self._by_hash[tx_hash]["future"]
+
+    def wait(self, tx_hash: str, timeout: float = None):
+        """Block until the transaction (or a replacement) is mined; returns the receipt"""
+        return self.receipt_future(tx_hash).result(timeout=timeout)
+
+    def _remember(self, tx_hash: str, tracked: Dict):
+        self._by_hash[tx_hash] = tracked
+        while len(self._by_hash) > self.max_tracked:
+            self._by_hash.popitem(last=False)
+
+    @staticmethod
+    def _bump_fees(tx: Dict, factor: float) -> Dict:
+        bumped = dict(tx)
+        for field in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+            if field in bumped:
+                bumped[field] = int(bumped[field] * factor) + 1
+        return bumped
+
+    def _replace(self, nonce: int, tracked: Dict):
+        tx = self._bump_fees(tracked["tx"], self.gas_bump)
+        try:
+            tx_hash = self._sign_and_send(tx)
+        except Exception as e:
+            # Usually "nonce too low": an earlier version was mined; the receipt poll will find it
+            print(f"⚠️ Replacement for nonce {nonce} not sent: {e}")
+            tracked["sent_at"] = time.monotonic()
+            return
+
+        with self._lock:
+            tracked["tx"] = tx
+            tracked["hashes"].append(tx_hash)
+            tracked["sent_at"] = time.monotonic()
+            tracked["replacements"] += 1
+            self._remember(tx_hash, tracked)
+        self.metrics["replaced"] += 1
+        print(f"🔁 Replaced stuck tx nonce {nonce} -> {tx_hash}")
+
+    # ---------- receipt tracking ----------
+
+    def _ensure_tracker(self):
+        # Called with self._lock held; the tracker clears self._tracker under the same lock
+        if self._tracker is None:
+            self._stop.clear()
+            self._tracker = threading.Thread(target=self._track, name="tx-tracker", daemon=True)
+            self._tracker.start()
+
+    def _track(self):
+        while not self._stop.is_set():
+            with self._lock:
+                pending = list(self._pending.items())
+                if not pending:
+                    self._tracker = None
+                    return
+
+            for nonce, tracked in pending:
+                receipt = self._find_receipt(tracked)
+                if receipt is not None:
+                    self._resolve(nonce, tracked, receipt)
+                    continue
+
+                now = time.monotonic()
+                if now - tracked["submitted_at"] > self.receipt_timeout:
+                    self._fail(nonce, tracked, TimeoutError(f"No receipt for nonce {nonce} after {self.receipt_timeout}s"))
+                elif now - tracked["sent_at"] > self.stuck_after and tracked["replacements"] < self.max_replacements:
+                    self._replace(nonce, tracked)
+
+            self._stop.wait(self.poll_interval)
+
+        with self._lock:
+            self._tracker = None
+
+    def _find_receipt(self, tracked: Dict):
+        for tx_hash in reversed(tracked["hashes"]):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except Exception:
+                continue  # not mined yet (TransactionNotFound) or transient RPC error
+            if receipt is not None:
+                return receipt
+        return None
+
+    def _resolve(self, nonce: int, tracked: Dict, receipt):
+        with self._lock:
+            self._pending.pop(nonce, None)
+        tracked["receipt"] = receipt
+        tracked["status"] = "success" if receipt.get("status", 1) == 1 else "reverted"
+        self.metrics["confirmed" if tracked["status"] == "success" else "reverted"] += 1
+        tracked["future"].set_result(receipt)
+
+    def _fail(self, nonce: int, tracked: Dict, error: Exception):
+        with self._lock:
+            self._pending.pop(nonce, None)
+        tracked["status"] = "timeout"
+        self.metrics["timeouts"] += 1
+        # The nonce may still be mined later; re-read it from the node next time
+        self.nonces.resync()
+        tracked["future"].set_exception(error)
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------- queries ----------
+
+    def status(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """Tracking info for any hash sent through the pipeline (original or replacement)"""
+        tracked = self._by_hash.get(tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}")
+        if tracked is None:
+            return None
+        receipt = tracked["receipt"]
+        return {
+            "status": tracked["status"],
+            "nonce": tracked["tx"]["nonce"],
+            "hashes": list(tracked["hashes"]),
+            "replacements": tracked["replacements"],
+            "mined_hash": self.w3.to_hex(receipt["transactionHash"]) if receipt else None,
+            "block": receipt["blockNumber"] if receipt else None,
+            **tracked["meta"]
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics = dict(self.metrics)
+        metrics["pending"] = len(self._pending)
+        return metrics
@@ -1,15 +1,32 @@
 # tools/web3_tools.py
 import os
+from collections import OrderedDict
 from web3 import Web3
 from eth_account import Account
 from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
+from tools.tx_pipeline import TransactionPipeline
+from tools.rpc_client import BatchingSyncProvider, get_rpc_client
+from tools.gas_oracle import GasOracle
+from tools.metrics_store import metrics_store
 
 load_dotenv()
 
 # Connect to Blockchain
 RPC_URL = os.getenv("RPC_URL", "https://sepolia.base.org")
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
+CHAIN_ID = int(os.getenv("CHAIN_ID", "84532"))  # Base Sepolia
+# Execution-path calls (worker threads, receipt tracker) go through the shared
+# batching client on the API loop; plain HTTP when no loop is running (CLI)
+w3 = Web3(BatchingSyncProvider(get_rpc_client(RPC_URL), fallback=Web3.HTTPProvider(RPC_URL)))
+
+# Fee-history polling (started by the API / CLI event loop) and cached gas estimates
+gas_oracle = GasOracle(
+    RPC_URL,
+    window=int(os.getenv("GAS_FEE_WINDOW", "20")),
+    poll_interval=float(os.getenv("GAS_POLL_INTERVAL", "12")),
+    estimate_ttl=float(os.getenv("GAS_ESTIMATE_TTL", "300")),
+    history=metrics_store
+)
 
 # Setup Wallets
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")  # Main execution wallet
@@ -30,6 +47,24 @@ if PRIVATE_KEY and PRIVATE_KEY.strip():
 else:
     print("⚠️  PRIVATE_KEY not set - execution disabled")
 
+# Nonces allocated locally, transactions sent back to back, receipts tracked in the background.
+# Nonce allocation is per process: run the executor in one process per key.
+tx_pipeline = None
+if PRIVATE_KEY:
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        print("⚠️  WEB_CONCURRENCY > 1: worker processes share PRIVATE_KEY and will allocate colliding nonces")
+    tx_pipeline = TransactionPipeline(
+        w3,
+        PRIVATE_KEY,
+        MY_ADDRESS,
+        CHAIN_ID,
+        poll_interval=float(os.getenv("TX_POLL_INTERVAL", "2")),
+        stuck_after=float(os.getenv("TX_STUCK_AFTER", "60")),
+        gas_bump=float(os.getenv("TX_GAS_BUMP", "1.125")),
+        max_replacements=int(os.getenv("TX_MAX_REPLACEMENTS", "3")),
+        receipt_timeout=float(os.getenv("TX_RECEIPT_TIMEOUT", "600"))
+    )
+
 # Agent addresses for verification
 AGENT_KEYS = {
     "orchestrator": ORCHESTRATOR_KEY,
@@ -39,23 +74,82 @@ AGENT_KEYS = {
     "qa_agent": QA_AGENT_KEY
 }
 
+class AgentKeyRegistry:
+    """
+    Agent signing accounts, derived once at startup.
+    Account.from_key (secp256k1 point multiplication) used to run on every
+    sign and every signature check.
+    """
+
+    def __init__(self, keys: dict):
+        self._accounts = {}
+        for agent_name, key in keys.items():
+            if not key:
+                continue
+            try:
+                self._accounts[agent_name] = Account.from_key(key)
+            except Exception as e:
+                print(f"❌ Invalid key for {agent_name}: {e}")
+
+    def account(self, agent_name: str):
+        return self._accounts.get(agent_name.lower())
+
+    def address(self, agent_name: str):
+        account = self.account(agent_name)
+        return account.address if account else None
+
+class RecoveryCache:
+    """
+    LRU of (message hash, signature) -> recovered signer address.
+    The same intent is verified by the routing policy, the Orchestrator and
+    every later check of the state; only the first one pays for ECDSA recovery.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def recover(self, intent_data: str, signature: str) -> str:
+        return self.recover_signable(encode_defunct(text=intent_data), signature)
+
+    def recover_signable(self, message, signature: str) -> str:
+        """Recover the signer of any SignableMessage (EIP-191 text or EIP-712 typed data)"""
+        digest = Web3.keccak(b"\x19" + message.version + message.header + message.body)
+        key = (bytes(digest), signature.lower())
+        address = self._data.get(key)
+        if address is not None:
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return address
+
+        self.stats["misses"] += 1
+        address = Account.recover_message(message, signature=signature)
+        self._data[key] = address
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return address
+
+    def clear(self):
+        self._data.clear()
+
+agent_keys = AgentKeyRegistry(AGENT_KEYS)
+recovery_cache = RecoveryCache(int(os.getenv("SIGNATURE_CACHE_SIZE", "4096")))
+
+# Signatures required before a trade can execute
+REQUIRED_SIGNERS = ("defi_agent", "risk_agent")
+
 # Get agent addresses
 def get_agent_address(agent_name: str):
-    key = AGENT_KEYS.get(agent_name.lower())
-    if key:
-        try:
-            return Account.from_key(key).address
-        except:
-            return None
-    return None
+    return agent_keys.address(agent_name)
 
 def sign_intent(agent_name: str, intent_data: str):
     """
     Agents sign their intents instead of executing directly.
     This creates cryptographic proof of their decisions.
     """
-    agent_key = AGENT_KEYS.get(agent_name.lower())
-    if not agent_key:
+    account = agent_keys.account(agent_name)
+    if not account:
         return {"error": f"No key found for agent {agent_name}"}
 
     try:
@@ -63,13 +157,13 @@ def sign_intent(agent_name: str, intent_data: str):
         msg = encode_defunct(text=intent_data)
 
         # Sign it
-        signed_msg = Account.sign_message(msg, private_key=agent_key)
+        signed_msg = account.sign_message(msg)
 
         return {
             "agent": agent_name,
             "signature": signed_msg.signature.hex(),
             "intent": intent_data,
-            "signer_address": Account.from_key(agent_key).address
+            "signer_address": account.address
         }
     except Exception as e:
         return {"error": f"Signing failed: {str(e)}"}
@@ -79,14 +173,37 @@ def verify_signature(signature: str, intent_data: str, expected_address: str):
     Verify that a signature matches the intent and comes from the expected agent.
     """
     try:
-        msg = encode_defunct(text=intent_data)
-        recovered_address = Account.recover_message(msg, signature=signature)
+        recovered_address = recovery_cache.recover(intent_data, signature)
 
         return recovered_address.lower() == expected_address.lower()
     except Exception as e:
         print(f"Signature verification failed: {e}")
         return False
 
+def _verify_agent_output(state, output: dict, agent_name: str) -> bool:
+    """
+    Check an agent output's signature: either a single signed text intent
+    ("signature" + "intent") or membership in a signed batch ("batch").
+    """
+    address = get_agent_address(agent_name)
+    if not address:
+        return False
+
+    if output.get("batch"):
+        # Batched EIP-712 intent - must describe exactly this execution's output
+        from tools.intent_batch import proposal_intent, risk_intent, verify_batched_intent
+
+        batch = output["batch"]
+        build = proposal_intent if agent_name == "defi_agent" else risk_intent
+        if batch["item"]["intent"] != build(state["execution_id"], output):
+            return False
+        return verify_batched_intent(batch["item"], batch["root"], batch["count"], batch["signature"], address)
+
+    if output.get("signature"):
+        return verify_signature(output["signature"], output.get("intent", ""), address)
+
+    return False
+
 def collect_signatures(state):
     """
     Collect all required signatures for execution.
@@ -95,43 +212,31 @@ def collect_signatures(state):
     signatures = []
 
     # Check for DeFi Agent signature
-    defi_proposal = state.get("defi_proposal", {})
-    if defi_proposal.get("signature"):
-        defi_address = get_agent_address("defi_agent")
-        if defi_address and verify_signature(
-            defi_proposal["signature"],
-            defi_proposal.get("intent", ""),
-            defi_address
-        ):
-            signatures.append("defi_agent")
+    defi_proposal = state.get("defi_proposal") or {}
+    if _verify_agent_output(state, defi_proposal, "defi_agent"):
+        signatures.append("defi_agent")
 
     # Check for Risk Agent signature
-    risk_assessment = state.get("risk_assessment", {})
-    if risk_assessment.get("signature"):
-        risk_address = get_agent_address("risk_agent")
-        if risk_address and verify_signature(
-            risk_assessment["signature"],
-            risk_assessment.get("intent", ""),
-            risk_address
-        ):
-            signatures.append("risk_agent")
+    risk_assessment = state.get("risk_assessment") or {}
+    if _verify_agent_output(state, risk_assessment, "risk_agent"):
+        signatures.append("risk_agent")
 
     return signatures
 
-def can_execute_trade(state):
+def can_execute_trade(state, signatures: list = None):
     """
     Check if we have enough signatures to execute a trade.
     Requires at least DeFi Agent and Risk Agent signatures.
+    Pass `signatures` from collect_signatures() to avoid verifying twice.
     """
-    required_signatures = ["defi_agent", "risk_agent"]
-    collected_signatures = collect_signatures(state)
+    collected_signatures = signatures if signatures is not None else collect_signatures(state)
 
-    return all(sig in collected_signatures for sig in required_signatures)
+    return all(sig in collected_signatures for sig in REQUIRED_SIGNERS)
 
 # Base Sepolia Testnet Contract Addresses
 CONTRACTS = {
     "aave_pool": "0x6Ae43d3271ff6888e7Fc43Fd7321EF205df9809d",  # Aave Pool V3 Sepolia
-    "usdc": "0x036CbD53842c5426634e7929541eC2318f3dCF7",  # USDC on Base Sepolia
+    "usdc": "0x036CbD53842c5426634e7929541eC2318f3dCF7e",  # USDC on Base Sepolia
     "weth": "0x4200000000000000000000000000000000000006",  # WETH on Base
 }
 
@@ -143,10 +248,13 @@ ERC20_ABI = [
 ]
 
 # Simple Transfer Function (Agent calls this)
-def execute_transaction(protocol: str, action: str, amount: float, token: str = "ETH", recipient: str = None):
+def execute_transaction(protocol: str, action: str, amount: float, token: str = "ETH", recipient: str = None, wait: bool = True):
     """
     Real on-chain execution wrapper.
     For hackathon, we can swap USDC/ETH on a testnet DEX or just send self-transfers to simulate.
+
+    With wait=False the transaction is broadcast and returned as "pending";
+    tx_pipeline tracks the receipt (see tx_pipeline.status(hash)).
     """
     print(f"🔗 EXECUTING ON-CHAIN: {protocol} {action} {amount} {token}...")
 
@@ -164,228 +272,139 @@ def execute_transaction(protocol: str, action: str, amount: float, token: str =
         }
     
     try:
-        if protocol.lower() == "aave":
-            return _execute_aave_transaction(action, amount, token)
-        elif protocol.lower() == "uniswap":
-            return _execute_uniswap_transaction(action, amount, token)
-        elif protocol.lower() == "curve":
-            return _execute_curve_transaction(action, amount, token)
-        elif protocol.lower() == "yearn":
-            return _execute_yearn_transaction(action, amount, token)
-        else:
-            # Default to wallet transfer
-            return _execute_transfer(amount, token, recipient or MY_ADDRESS)
+        tx, call_type, label = build_transaction(protocol, action, amount, token, recipient)
+        if call_type == "wallet":
+            action = "transfer"
+        return _submit(tx, call_type, action, amount, token, wait, label)
 
     except Exception as e:
         print(f"❌ Transaction Failed: {e}")
         return {"status": "failed", "error": str(e)}
 
-def _execute_transfer(amount: float, token: str, recipient: str):
-    """Execute a simple token transfer"""
-    try:
-        if token.upper() == "ETH":
-            # ETH transfer - ensure amount is reasonable for testnet
-            eth_amount = min(amount, 0.01)  # Max 0.01 ETH for testing
-            tx = {
-                'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-                'to': recipient,
-                'value': w3.to_wei(eth_amount, 'ether'),
-                'gas': 21000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 84532
-            }
-        else:
-            # For ERC20 tokens like USDC, we'd need approval and transfer
-            # For demo, convert USDC amount to equivalent ETH value (rough approximation)
-            eth_equivalent = min(amount / 2000, 0.01)  # Assume 1 USDC = ~0.0005 ETH, max 0.01 ETH
-            tx = {
-                'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-                'to': recipient,
-                'value': w3.to_wei(eth_equivalent, 'ether'),
-                'gas': 21000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 84532
-            }
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"✅ Transfer successful! Hash: {receipt.transactionHash.hex()}")
-        return {
-            "status": "success",
-            "hash": receipt.transactionHash.hex(),
-            "block": receipt.blockNumber,
-            "protocol": "wallet",
-            "action": "transfer",
-            "amount": amount,
-            "token": token
-        }
-
-    except Exception as e:
-        print(f"❌ Transfer failed: {e}")
-        return {"status": "failed", "error": str(e)}
-
-def _execute_aave_transaction(action: str, amount: float, token: str):
-    """Execute Aave protocol transaction (deposit/withdraw)"""
-    try:
-        # For Aave, we'll interact with the actual pool contract
-        # This is a simplified version - in production would need full Aave ABI
-        pool_address = CONTRACTS["aave_pool"]
-        
-        if action.lower() == "deposit":
-            # Deposit to Aave (supply assets) - use reasonable amount
-            eth_amount = min(amount if token == "ETH" else amount / 2000, 0.005)  # Max 0.005 ETH
-            tx = {
-                'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-                'to': pool_address,
-                'value': w3.to_wei(eth_amount, 'ether'),
-                'gas': 300000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 84532
-            }
-        elif action.lower() == "withdraw":
-            # Withdraw from Aave
-            tx = {
-                'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-                'to': pool_address,
-                'value': 0,
-                'gas': 300000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 84532
-            }
-        else:
-            # Default action
-            eth_amount = min(amount if token == "ETH" else amount / 2000, 0.005)
-            tx = {
-                'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-                'to': pool_address,
-                'value': w3.to_wei(eth_amount, 'ether'),
-                'gas': 300000,
-                'gasPrice': w3.eth.gas_price,
-                'chainId': 84532
-            }
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"✅ Aave {action} successful! Hash: {receipt.transactionHash.hex()}")
-        return {
-            "status": "success",
-            "hash": receipt.transactionHash.hex(),
-            "block": receipt.blockNumber,
-            "protocol": "aave",
-            "action": action,
-            "amount": amount,
-            "token": token
-        }
-
-    except Exception as e:
-        print(f"❌ Aave transaction failed: {e}")
-        return {"status": "failed", "error": str(e)}
-
-def _execute_uniswap_transaction(action: str, amount: float, token: str):
-    """Execute Uniswap protocol transaction (swap)"""
-    try:
-        # For Uniswap, we'd interact with the router contract
-        # For demo, we'll simulate with a transfer
-        router_address = "0x2626664c2603336E57B271c5C0b26F421741e481"  # Uniswap V3 Router on Base Sepolia
-        eth_amount = min(amount if token == "ETH" else amount / 2000, 0.005)
-        
-        tx = {
-            'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-            'to': router_address,
-            'value': w3.to_wei(eth_amount, 'ether'),
-            'gas': 400000,  # Higher gas for DEX swap
-            'gasPrice': w3.eth.gas_price,
-            'chainId': 84532
-        }
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"✅ Uniswap {action} successful! Hash: {receipt.transactionHash.hex()}")
-        return {
-            "status": "success",
-            "hash": receipt.transactionHash.hex(),
-            "block": receipt.blockNumber,
-            "protocol": "uniswap",
-            "action": action,
-            "amount": amount,
-            "token": token
-        }
-
-    except Exception as e:
-        print(f"❌ Uniswap transaction failed: {e}")
-        return {"status": "failed", "error": str(e)}
-
-def _execute_curve_transaction(action: str, amount: float, token: str):
-    """Execute Curve protocol transaction"""
-    try:
-        # Curve pool address on Base Sepolia (placeholder)
-        curve_pool = "0x6Ae43d3271ff6888e7Fc43Fd7321EF205df9809d"  # Using Aave address as placeholder
-        
-        tx = {
-            'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-            'to': curve_pool,
-            'value': w3.to_wei(amount, 'ether'),
-            'gas': 350000,
-            'gasPrice': w3.eth.gas_price,
-            'chainId': 84532
-        }
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"✅ Curve {action} successful! Hash: {receipt.transactionHash.hex()}")
+def build_transaction(protocol: str, action: str, amount: float, token: str = "ETH", recipient: str = None):
+    """
+    The unsigned transaction execute_transaction would send (no gas, fees or
+    nonce - those are filled in at submission). No RPC calls, so the same
+    transaction can be handed to the simulator (tools/simulator.py).
+    Returns (tx, call_type, label); call_type keys gas estimates and metadata.
+    """
+    if protocol.lower() == "aave":
+        return _build_aave_transaction(action, amount, token), "aave", f"Aave {action}"
+    elif protocol.lower() == "uniswap":
+        return _build_uniswap_transaction(action, amount, token), "uniswap", f"Uniswap {action}"
+    elif protocol.lower() == "curve":
+        return _build_curve_transaction(action, amount, token), "curve", f"Curve {action}"
+    elif protocol.lower() == "yearn":
+        return _build_yearn_transaction(action, amount, token), "yearn", f"Yearn {action}"
+    else:
+        # Default to wallet transfer
+        return _build_transfer(amount, token, recipient or MY_ADDRESS), "wallet", "Transfer"
+
+def _submit(tx: dict, protocol: str, action: str, amount: float, token: str, wait: bool, label: str):
+    """
+    Send through the pipeline; optionally block until the receipt arrives.
+    Gas limit comes from the oracle's cached estimate for the protocol; fees
+    are the oracle's EIP-1559 fees (the pipeline uses gasPrice until it has data).
+    """
+    if "gas" not in tx:
+        tx["gas"] = gas_oracle.estimate_gas(w3, {"from": MY_ADDRESS, **tx}, protocol)
+    if "gasPrice" not in tx and "maxFeePerGas" not in tx:
+        tx.update(gas_oracle.fee_fields())
+
+    tx_hash = tx_pipeline.submit(tx, meta={
+        "protocol": protocol,
+        "action": action,
+        "amount": amount,
+        "token": token
+    })
+    result = {
+        "status": "pending",
+        "hash": tx_hash,
+        "nonce": tx_pipeline.status(tx_hash)["nonce"],
+        "protocol": protocol,
+        "action": action,
+        "amount": amount,
+        "token": token
+    }
+    if not wait:
+        print(f"📤 {label} submitted: {tx_hash}")
+        return result
+
+    receipt = tx_pipeline.wait(tx_hash, timeout=tx_pipeline.receipt_timeout)
+    result.update({
+        "status": "success" if receipt.status == 1 else "reverted",
+        "hash": w3.to_hex(receipt.transactionHash),
+        "block": receipt.blockNumber
+    })
+    print(f"✅ {label} successful! Hash: {result['hash']}")
+    return result
+
+def _build_transfer(amount: float, token: str, recipient: str):
+    """Simple token transfer"""
+    if token.upper() == "ETH":
+        # ETH transfer - ensure amount is reasonable for testnet
+        eth_amount = min(amount, 0.01)  # Max 0.01 ETH for testing
         return {
-            "status": "success",
-            "hash": receipt.transactionHash.hex(),
-            "block": receipt.blockNumber,
-            "protocol": "curve",
-            "action": action,
-            "amount": amount,
-            "token": token
+            'to': recipient,
+            'value': w3.to_wei(eth_amount, 'ether')
         }
 
-    except Exception as e:
-        print(f"❌ Curve transaction failed: {e}")
-        return {"status": "failed", "error": str(e)}
-
-def _execute_yearn_transaction(action: str, amount: float, token: str):
-    """Execute Yearn protocol transaction"""
-    try:
-        # Yearn vault address on Base Sepolia (placeholder)
-        yearn_vault = "0x6Ae43d3271ff6888e7Fc43Fd7321EF205df9809d"  # Using Aave address as placeholder
-        
-        tx = {
-            'nonce': w3.eth.get_transaction_count(MY_ADDRESS),
-            'to': yearn_vault,
-            'value': w3.to_wei(amount, 'ether'),
-            'gas': 300000,
-            'gasPrice': w3.eth.gas_price,
-            'chainId': 84532
-        }
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"✅ Yearn {action} successful! Hash: {receipt.transactionHash.hex()}")
+    # For ERC20 tokens like USDC, we'd need approval and transfer
+    # For demo, convert USDC amount to equivalent ETH value (rough approximation)
+    eth_equivalent = min(amount / 2000, 0.01)  # Assume 1 USDC = ~0.0005 ETH, max 0.01 ETH
+    return {
+        'to': recipient,
+        'value': w3.to_wei(eth_equivalent, 'ether')
+    }
+
+def _build_aave_transaction(action: str, amount: float, token: str):
+    """Aave protocol transaction (deposit/withdraw)"""
+    # For Aave, we'll interact with the actual pool contract
+    # This is a simplified version - in production would need full Aave ABI
+    pool_address = CONTRACTS["aave_pool"]
+
+    if action.lower() == "withdraw":
+        # Withdraw from Aave
         return {
-            "status": "success",
-            "hash": receipt.transactionHash.hex(),
-            "block": receipt.blockNumber,
-            "protocol": "yearn",
-            "action": action,
-            "amount": amount,
-            "token": token
+            'to': pool_address,
+            'value': 0
         }
 
-    except Exception as e:
-        print(f"❌ Yearn transaction failed: {e}")
-        return {"status": "failed", "error": str(e)}
-
+    # Deposit to Aave (supply assets) - use reasonable amount; same for any other action
+    eth_amount = min(amount if token == "ETH" else amount / 2000, 0.005)  # Max 0.005 ETH
+    return {
+        'to': pool_address,
+        'value': w3.to_wei(eth_amount, 'ether')
+    }
+
+def _build_uniswap_transaction(action: str, amount: float, token: str):
+    """Uniswap protocol transaction (swap)"""
+    # For Uniswap, we'd interact with the router contract
+    # For demo, we'll simulate with a transfer
+    router_address = "0x2626664c2603336E57B271c5C0b26F421741e481"  # Uniswap V3 Router on Base Sepolia
+    eth_amount = min(amount if token == "ETH" else amount / 2000, 0.005)
+
+    return {
+        'to': router_address,
+        'value': w3.to_wei(eth_amount, 'ether')
+    }
+
+def _build_curve_transaction(action: str, amount: float, token: str):
+    """Curve protocol transaction"""
+    # Curve pool address on Base Sepolia (placeholder)
+    curve_pool = "0x6Ae43d3271ff6888e7Fc43Fd7321EF205df9809d"  # Using Aave address as placeholder
+
+    return {
+        'to': curve_pool,
+        'value': w3.to_wei(amount, 'ether')
+    }
+
+def _build_yearn_transaction(action: str, amount: float, token: str):
+    """Yearn protocol transaction"""
+    # Yearn vault address on Base Sepolia (placeholder)
+    yearn_vault = "0x6Ae43d3271ff6888e7Fc43Fd7321EF205df9809d"  # Using Aave address as placeholder
+
+    return {
+        'to': yearn_vault,
+        'value': w3.to_wei(amount, 'ether')
+    }
@@ -52,7 +52,6 @@ export default function ChatInterface() {
   const [activeExecution, setActiveExecution] =
     useState<ExecutionStatus | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
-  const statusIntervalRef = useRef<NodeJS.Timeout>();
 
   // Use real wallet data from context
   const { account: walletAddress, balance: walletBalance } = useWallet();
@@ -65,127 +64,152 @@ export default function ChatInterface() {
     scrollToBottom();
   }, [messages]);
 
-  // Poll for execution status updates
+  // Stream execution progress (Server-Sent Events)
   useEffect(() => {
-    if (activeExecution?.execution_id && activeExecution.status === "running") {
-      statusIntervalRef.current = setInterval(async () => {
-        try {
-          const response = await fetch(
-            `http://localhost:8001/api/executions/${activeExecution.execution_id}`
-          );
-          if (response.ok) {
-            const status: ExecutionStatus = await response.json();
-            setActiveExecution(status);
-
-            // Add new reasoning steps to messages
-            if (
-              status.reasoning_chain.length >
-              activeExecution.reasoning_chain.length
-            ) {
-              const newReasoning = status.reasoning_chain.slice(
-                activeExecution.reasoning_chain.length
-              );
-              newReasoning.forEach((reasoning, index) => {
-                const agentName = status.current_agent || "Agent";
-                setMessages((prev) => [
-                  ...prev,
-                  {
-                    id: `${activeExecution.execution_id}-reasoning-${
-                      activeExecution.reasoning_chain.length + index
-                    }`,
-                    type: "agent",
-                    content: reasoning,
-                    timestamp: new Date(),
-                    execution_id: activeExecution.execution_id,
-                    agent_name: agentName,
-                  },
-                ]);
-              });
-            }
-
-            // Check if execution is complete
-            if (status.status === "completed") {
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `${activeExecution.execution_id}-complete`,
-                  type: "system",
-                  content: "✅ Execution completed successfully!",
-                  timestamp: new Date(),
-                  execution_id: activeExecution.execution_id,
-                  status: "completed",
-                },
-              ]);
-
-              // Add final results
-              if (status.final_proposal) {
-                setMessages((prev) => [
-                  ...prev,
-                  {
-                    id: `${activeExecution.execution_id}-proposal`,
-                    type: "agent",
-                    content: `📊 Final Proposal: ${JSON.stringify(
-                      status.final_proposal,
-                      null,
-                      2
-                    )}`,
-                    timestamp: new Date(),
-                    execution_id: activeExecution.execution_id,
-                    agent_name: "DeFi Agent",
-                  },
-                ]);
-              }
+    const executionId = activeExecution?.execution_id;
+    if (!executionId) return;
+
+    const apiBase = `http://localhost:8001/api/executions/${executionId}`;
+    // EventSource reconnects on its own and resumes via Last-Event-ID
+    const source = new EventSource(`${apiBase}/events`);
+
+    const fetchStatus = async (): Promise<ExecutionStatus | null> => {
+      try {
+        const response = await fetch(apiBase);
+        return response.ok ? await response.json() : null;
+      } catch (error) {
+        console.error("Error fetching execution status:", error);
+        return null;
+      }
+    };
 
-              if (status.risk_assessment) {
-                setMessages((prev) => [
-                  ...prev,
-                  {
-                    id: `${activeExecution.execution_id}-risk`,
-                    type: "agent",
-                    content: `🛡️ Risk Assessment: ${JSON.stringify(
-                      status.risk_assessment,
-                      null,
-                      2
-                    )}`,
-                    timestamp: new Date(),
-                    execution_id: activeExecution.execution_id,
-                    agent_name: "Risk Agent",
-                  },
-                ]);
-              }
-
-              setActiveExecution(null);
-              setIsLoading(false);
-            } else if (status.status === "failed") {
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `${activeExecution.execution_id}-failed`,
-                  type: "system",
-                  content: `❌ Execution failed: ${status.error_messages.join(
-                    ", "
-                  )}`,
-                  timestamp: new Date(),
-                  execution_id: activeExecution.execution_id,
-                  status: "failed",
-                },
-              ]);
-              setActiveExecution(null);
-              setIsLoading(false);
+    source.addEventListener("reasoning", (e) => {
+      const step = JSON.parse((e as MessageEvent).data);
+      setActiveExecution((prev) =>
+        prev
+          ? { ...prev, reasoning_chain: [...prev.reasoning_chain, step.text] }
+          : prev
+      );
+      setMessages((prev) => [
+        ...prev,
+        {
+          id: `${executionId}-reasoning-${(e as MessageEvent).lastEventId}`,
+          type: "agent",
+          content: `${step.agent}: ${step.text}`,
+          timestamp: new Date(),
+          execution_id: executionId,
+          agent_name: step.agent,
+        },
+      ]);
+    });
+
+    source.addEventListener("state", (e) => {
+      const update = JSON.parse((e as MessageEvent).data);
+      const changed = update.changed;
+      setActiveExecution((prev) =>
+        prev
+          ? {
+              ...prev,
+              status: update.status,
+              current_agent: changed.next_agent ?? prev.current_agent,
+              final_proposal: changed.defi_proposal ?? prev.final_proposal,
+              risk_assessment: changed.risk_assessment ?? prev.risk_assessment,
+              qa_results: changed.qa_results ?? prev.qa_results,
+              error_messages: changed.error_messages ?? prev.error_messages,
             }
-          }
-        } catch (error) {
-          console.error("Error fetching execution status:", error);
+          : prev
+      );
+    });
+
+    source.addEventListener("resync", async () => {
+      // Missed events - take the full status once
+      const status = await fetchStatus();
+      if (status) setActiveExecution(status);
+    });
+
+    source.addEventListener("end", async () => {
+      source.close();
+      const status = await fetchStatus();
+      if (!status) {
+        setActiveExecution(null);
+        setIsLoading(false);
+        return;
+      }
+
+      // Check if execution is complete
+      if (status.status === "completed") {
+        setMessages((prev) => [
+          ...prev,
+          {
+            id: `${executionId}-complete`,
+            type: "system",
+            content: "✅ Execution completed successfully!",
+            timestamp: new Date(),
+            execution_id: executionId,
+            status: "completed",
+          },
+        ]);
+
+        // Add final results
+        if (status.final_proposal) {
+          setMessages((prev) => [
+            ...prev,
+            {
+              id: `${executionId}-proposal`,
+              type: "agent",
+              content: `📊 Final Proposal: ${JSON.stringify(
+                status.final_proposal,
+                null,
+                2
+              )}`,
+              timestamp: new Date(),
+              execution_id: executionId,
+              agent_name: "DeFi Agent",
+            },
+          ]);
         }
-      }, 2000); // Poll every 2 seconds
 
-      return () => {
-        if (statusIntervalRef.current) {
-          clearInterval(statusIntervalRef.current);
+        if (status.risk_assessment) {
+          setMessages((prev) => [
+            ...prev,
+            {
+              id: `${executionId}-risk`,
+              type: "agent",
+              content: `🛡️ Risk Assessment: ${JSON.stringify(
+                status.risk_assessment,
+                null,
+                2
+              )}`,
+              timestamp: new Date(),
+              execution_id: executionId,
+              agent_name: "Risk Agent",
+            },
+          ]);
         }
-      };
-    }
-  }, [activeExecution]);
+      } else {
+        setMessages((prev) => [
+          ...prev,
+          {
+            id: `${executionId}-failed`,
+            type: "system",
+            content: `❌ Execution ${status.status}: ${status.error_messages.join(
+              ", "
+            )}`,
+            timestamp: new Date(),
+            execution_id: executionId,
+            status: "failed",
+          },
+        ]);
+      }
+
+      setActiveExecution(null);
+      setIsLoading(false);
+    });
+
+    return () => {
+      source.close();
+    };
+  }, [activeExecution?.execution_id]);
 
   const sendMessage = async () => {
     if (!inputMessage.trim() || isLoading) return;
@@ -214,6 +238,24 @@ export default function ChatInterface() {
         }),
       });
 
+      if (response.status === 429) {
+        // Backend is saturated - tell the user when to retry
+        const retryAfter = response.headers.get("Retry-After");
+        setMessages((prev) => [
+          ...prev,
+          {
+            id: `busy-${Date.now()}`,
+            type: "system",
+            content: `⏳ AI agents are busy right now. Please try again in ${
+              retryAfter || "a few"
+            } seconds.`,
+            timestamp: new Date(),
+          },
+        ]);
+        setIsLoading(false);
+        return;
+      }
+
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -232,10 +274,10 @@ export default function ChatInterface() {
         },
       ]);
 
-      // Start polling for status
+      // Start streaming status
       setActiveExecution({
         execution_id: result.execution_id,
-        status: "running",
+        status: result.status,
         reasoning_chain: [],
         error_messages: [],
       });
@@ -24,7 +24,7 @@ export interface AgentExecution {
   execution_id: string;
   portfolio_id: string;
   state_data: any; // JSON data
-  status: "running" | "completed" | "failed";
+  status: "running" | "completed" | "failed" | "rejected";
   created_at?: string;
   updated_at?: string;
 }